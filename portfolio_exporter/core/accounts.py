@@ -0,0 +1,141 @@
+"""Multi-account selection, fan-out and partitioning.
+
+A single TWS/Gateway login sees every account it manages, and
+``positions()``, ``portfolio()``, ``accountSummary()`` and
+``reqExecutions()`` already return rows for all of them on the shared
+session.  Scripts therefore fetch once, request market data once per
+distinct contract, and split the rows by account afterwards instead of
+running one pass per account.  Calls that really are per account
+(``reqPnL`` subscriptions, Client Portal REST) go out concurrently via
+:func:`pnl` and :func:`fan_out`.
+
+Outputs keep an ``account`` column; :func:`totals` adds a consolidated
+``ALL`` row and :func:`save_partitioned` writes one file per account next
+to the consolidated one.
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence, TypeVar
+
+import pandas as pd
+
+from portfolio_exporter.core import io as io_core
+
+logger = logging.getLogger(__name__)
+
+TOTAL = "ALL"
+T = TypeVar("T")
+
+
+def managed(ib: Any) -> List[str]:
+    """Accounts visible to *ib*'s login (empty when unknown)."""
+
+    try:
+        return [a for a in (ib.managedAccounts() or []) if a]
+    except Exception as exc:
+        logger.debug("managedAccounts() failed: %s", exc)
+        return []
+
+
+def resolve(ib: Any, requested: Sequence[str] | None) -> List[str]:
+    """Expand ``"all"`` and drop accounts the session cannot see.
+
+    Returns ``[]`` when no accounts were requested, which callers treat as
+    "whatever the session reports" (the single-account behaviour).
+    """
+
+    if not requested:
+        return []
+    known = managed(ib)
+    if "all" in requested:
+        return known
+    if not known:
+        return list(requested)
+    missing = [a for a in requested if a not in known]
+    if missing:
+        logger.warning("Accounts not managed by this login: %s", ", ".join(missing))
+    return [a for a in requested if a in known]
+
+
+def select(rows: Iterable[T], accounts: Sequence[str] | None, attr: str = "account") -> List[T]:
+    """Keep IB objects (``Position``, ``Fill``…) whose *attr* is in *accounts*."""
+
+    if not accounts:
+        return list(rows)
+    wanted = set(accounts)
+    return [r for r in rows if getattr(r, attr, None) in wanted]
+
+
+def fan_out(
+    fn: Callable[[str], T], accounts: Sequence[str], max_workers: int | None = None
+) -> Dict[str, T | BaseException]:
+    """Run blocking ``fn(account)`` for every account concurrently.
+
+    Failures are returned in place of the result so one bad account does
+    not sink the others.
+    """
+
+    def call(acct: str) -> T | BaseException:
+        try:
+            return fn(acct)
+        except Exception as exc:
+            logger.warning("%s failed for %s: %s", getattr(fn, "__name__", "fetch"), acct, exc)
+            return exc
+
+    if len(accounts) <= 1:
+        return {a: call(a) for a in accounts}
+    with ThreadPoolExecutor(max_workers=max_workers or len(accounts)) as pool:
+        return dict(zip(accounts, pool.map(call, accounts)))
+
+
+def pnl(ib: Any, accounts: Sequence[str], wait: float = 2.0) -> Dict[str, Any]:
+    """Subscribe ``reqPnL`` for all *accounts* at once and wait a single time."""
+
+    subs = {}
+    for acct in accounts:
+        try:
+            subs[acct] = ib.reqPnL(acct, modelCode="")
+        except Exception as exc:
+            logger.warning("reqPnL failed for %s: %s", acct, exc)
+    if subs and wait > 0:
+        ib.sleep(wait)
+    for acct in subs:
+        try:
+            ib.cancelPnL(acct, modelCode="")
+        except Exception:
+            pass
+    return subs
+
+
+def totals(df: pd.DataFrame, columns: Sequence[str], column: str = "account") -> pd.DataFrame:
+    """Per-account sums of *columns* plus a consolidated ``ALL`` row."""
+
+    cols = [c for c in columns if c in df.columns]
+    if column not in df.columns:
+        out = df[cols].sum().to_frame().T
+        out.insert(0, column, TOTAL)
+        return out
+    per = df.groupby(column, sort=True)[cols].sum().reset_index()
+    total = df[cols].sum().to_frame().T
+    total.insert(0, column, TOTAL)
+    return pd.concat([per, total], ignore_index=True)
+
+
+def save_partitioned(
+    df: pd.DataFrame, name: str, fmt: str, outdir: str | Path, column: str = "account"
+) -> List[Path]:
+    """Save *df* as ``name`` and one ``name_<account>`` file per account."""
+
+    paths = [io_core.save(df, name, fmt, outdir)]
+    if column in df.columns:
+        for acct, part in df.groupby(column, sort=True):
+            if acct and acct != TOTAL:
+                paths.append(io_core.save(part.reset_index(drop=True), f"{name}_{acct}", fmt, outdir))
+    return paths
+
+
+__all__ = ["TOTAL", "fan_out", "managed", "pnl", "resolve", "save_partitioned", "select", "totals"]
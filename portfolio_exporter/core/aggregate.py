@@ -0,0 +1,269 @@
+"""Incremental per-underlying and portfolio greek totals.
+
+:class:`GreeksBook` holds one entry per leg and keeps running sums of the
+``*_exposure`` columns produced by ``portfolio_greeks`` (greek × qty ×
+multiplier) plus market value, both per underlying and for the whole book.
+A change to one leg's greeks, price or quantity subtracts its old
+contribution and adds the new one, so a tick costs O(1) regardless of book
+size.  Readers such as the live dashboards call :meth:`GreeksBook.snapshot`
+and get plain dicts back; no DataFrame is built on the read path.
+
+Running float sums drift slowly under many add/subtract cycles, so the book
+re-sums itself from the stored legs every ``resync_every`` updates (an
+amortised O(1) cost).  NaN greeks contribute zero, matching
+``DataFrame.sum()``.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+GREEKS = ("delta", "gamma", "vega", "theta", "vanna", "volga", "charm", "speed")
+EXPOSURES = tuple(f"{g}_exposure" for g in GREEKS)
+FIELDS = EXPOSURES + ("market_value",)
+
+
+@dataclass(frozen=True)
+class BookSnapshot:
+    """Point-in-time copy of the book's totals."""
+
+    version: int
+    timestamp: datetime
+    legs: int
+    portfolio: Dict[str, float]
+    by_underlying: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def totals_frame(self) -> pd.DataFrame:
+        """Single-row frame shaped like ``portfolio_greeks`` totals."""
+
+        return pd.DataFrame([{k: self.portfolio[k] for k in EXPOSURES}])
+
+    def headline(self) -> Dict[str, float]:
+        """Net first-order exposures for compact dashboard rows."""
+
+        return {f"net_{g}": self.portfolio[f"{g}_exposure"] for g in GREEKS[:4]}
+
+
+def _num(value: object) -> float:
+    try:
+        out = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(out) else out
+
+
+def _label(value: object) -> str:
+    return "" if value is None or (isinstance(value, float) and math.isnan(value)) else str(value)
+
+
+class _Leg:
+    __slots__ = ("underlying", "qty", "multiplier", "price", "greeks", "contrib")
+
+    def __init__(self, underlying: str, qty: float, multiplier: float) -> None:
+        self.underlying = underlying
+        self.qty = qty
+        self.multiplier = multiplier
+        self.price = 0.0
+        self.greeks: Dict[str, float] = dict.fromkeys(GREEKS, 0.0)
+        self.contrib: Dict[str, float] = dict.fromkeys(FIELDS, 0.0)
+
+    def contributions(self) -> Dict[str, float]:
+        size = self.qty * self.multiplier
+        out = {f"{g}_exposure": v * size for g, v in self.greeks.items()}
+        out["market_value"] = self.price * size
+        return out
+
+
+class GreeksBook:
+    """Running greek exposure totals keyed by leg (usually ``conId``)."""
+
+    def __init__(self, *, resync_every: int = 10_000) -> None:
+        self.resync_every = resync_every
+        self._legs: Dict[Hashable, _Leg] = {}
+        self._portfolio: Dict[str, float] = dict.fromkeys(FIELDS, 0.0)
+        self._by_und: Dict[str, Dict[str, float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._version = 0
+        self._since_resync = 0
+        self._updated = datetime.now(timezone.utc)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._legs)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._legs
+
+    # ── internal bookkeeping ───────────────────────────────────────────
+    def _apply(self, leg: _Leg, sign: float) -> None:
+        und = self._by_und.get(leg.underlying)
+        if und is None:
+            und = self._by_und[leg.underlying] = dict.fromkeys(FIELDS, 0.0)
+        for k, v in leg.contrib.items():
+            self._portfolio[k] += sign * v
+            und[k] += sign * v
+        n = self._counts.get(leg.underlying, 0) + (1 if sign > 0 else -1)
+        if n:
+            self._counts[leg.underlying] = n
+        else:
+            self._counts.pop(leg.underlying, None)
+            self._by_und.pop(leg.underlying, None)
+
+    def _touch(self) -> None:
+        self._version += 1
+        self._updated = datetime.now(timezone.utc)
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self.resync()
+
+    # ── writes ─────────────────────────────────────────────────────────
+    def upsert(
+        self,
+        key: Hashable,
+        *,
+        underlying: Optional[str] = None,
+        qty: Optional[float] = None,
+        multiplier: Optional[float] = None,
+        price: Optional[float] = None,
+        **greeks: float,
+    ) -> None:
+        """Insert or update one leg in O(1).
+
+        Only the fields passed are changed; unknown greek names raise
+        ``KeyError``.  Changing ``underlying`` moves the leg between buckets.
+        """
+
+        unknown = set(greeks) - set(GREEKS)
+        if unknown:
+            raise KeyError(f"unknown greeks: {sorted(unknown)}")
+        with self._lock:
+            leg = self._legs.get(key)
+            if leg is None:
+                leg = self._legs[key] = _Leg(_label(underlying), _num(qty), _num(multiplier or 1))
+            else:
+                self._apply(leg, -1.0)
+                if underlying is not None:
+                    leg.underlying = _label(underlying)
+                if qty is not None:
+                    leg.qty = _num(qty)
+                if multiplier is not None:
+                    leg.multiplier = _num(multiplier)
+            if price is not None:
+                leg.price = _num(price)
+            for g, v in greeks.items():
+                leg.greeks[g] = _num(v)
+            leg.contrib = leg.contributions()
+            self._apply(leg, 1.0)
+            self._touch()
+
+    def remove(self, key: Hashable) -> None:
+        """Drop a leg (e.g. after a close); missing keys are ignored."""
+
+        with self._lock:
+            leg = self._legs.pop(key, None)
+            if leg is None:
+                return
+            self._apply(leg, -1.0)
+            self._touch()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._legs.clear()
+            self._portfolio = dict.fromkeys(FIELDS, 0.0)
+            self._by_und.clear()
+            self._counts.clear()
+            self._since_resync = 0
+            self._version += 1
+            self._updated = datetime.now(timezone.utc)
+
+    def load(self, pos_df: pd.DataFrame, *, key: str | Tuple[str, ...] = "conId") -> "GreeksBook":
+        """Replace the book with the legs of a ``portfolio_greeks`` positions frame.
+
+        Rows without a usable ``key`` fall back to their index label.  A tuple
+        of column names keys legs on the combination (e.g. the same contract
+        held in several accounts).  Rows sharing a key are one contract held
+        more than once, so their quantities add up.  This is the one O(n)
+        entry point; everything after it is incremental.
+        """
+
+        cols = [c for c in ("underlying", "qty", "multiplier", "price", *GREEKS) if c in pos_df.columns]
+        keys: Iterable[Hashable]
+        if isinstance(key, tuple):
+            if set(key) <= set(pos_df.columns):
+                keys = zip(*(pos_df[k] for k in key))
+            else:
+                keys = pos_df.index
+        elif key in pos_df.columns:
+            keys = pos_df[key].where(pos_df[key].notna(), pd.Series(pos_df.index, index=pos_df.index))
+        else:
+            keys = pos_df.index
+        with self._lock:
+            self.clear()
+            for k, row in zip(keys, pos_df[cols].itertuples(index=False)):
+                rec = row._asdict()
+                leg = _Leg(_label(rec.pop("underlying", "")), _num(rec.pop("qty", 0)), _num(rec.pop("multiplier", 1)))
+                leg.price = _num(rec.pop("price", 0))
+                for g, v in rec.items():
+                    leg.greeks[g] = _num(v)
+                prev = self._legs.get(k)
+                if prev is not None:  # same contract in another row/account
+                    leg.qty += prev.qty
+                leg.contrib = leg.contributions()
+                self._legs[k] = leg
+            self.resync()
+        return self
+
+    def resync(self) -> None:
+        """Re-sum every total exactly from the stored legs (O(n))."""
+
+        with self._lock:
+            portfolio: Dict[str, list] = {k: [] for k in FIELDS}
+            by_und: Dict[str, Dict[str, list]] = {}
+            counts: Dict[str, int] = {}
+            for leg in self._legs.values():
+                bucket = by_und.setdefault(leg.underlying, {k: [] for k in FIELDS})
+                counts[leg.underlying] = counts.get(leg.underlying, 0) + 1
+                for k, v in leg.contrib.items():
+                    portfolio[k].append(v)
+                    bucket[k].append(v)
+            self._portfolio = {k: math.fsum(v) for k, v in portfolio.items()}
+            self._by_und = {u: {k: math.fsum(v) for k, v in b.items()} for u, b in by_und.items()}
+            self._counts = counts
+            self._since_resync = 0
+
+    # ── reads ──────────────────────────────────────────────────────────
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def totals(self, underlying: Optional[str] = None) -> Dict[str, float]:
+        """Copy of the portfolio (or one underlying's) totals."""
+
+        with self._lock:
+            if underlying is None:
+                return dict(self._portfolio)
+            return dict(self._by_und.get(underlying, dict.fromkeys(FIELDS, 0.0)))
+
+    def snapshot(self) -> BookSnapshot:
+        """Consistent copy of all totals; O(underlyings), independent of leg count."""
+
+        with self._lock:
+            return BookSnapshot(
+                version=self._version,
+                timestamp=self._updated,
+                legs=len(self._legs),
+                portfolio=dict(self._portfolio),
+                by_underlying={u: dict(v) for u, v in self._by_und.items()},
+            )
+
+
+# Process-wide book refreshed by ``portfolio_greeks.run`` and read by the dashboards.
+book = GreeksBook()
+
+__all__ = ["BookSnapshot", "EXPOSURES", "GREEKS", "GreeksBook", "book"]
@@ -0,0 +1,187 @@
+"""Greeks-based P&L attribution between positions snapshots.
+
+Each leg's mark-to-market change between two ``portfolio_greeks`` positions
+snapshots is split with a second-order Taylor expansion around the *older*
+snapshot::
+
+    pnl ≈ Δ·dS + ½·Γ·dS² + vega·dσ + θ·days + residual
+
+using the per-share greeks of the older file scaled by ``qty × multiplier``
+(so vega is per vol point and theta per calendar day, like the
+``*_exposure`` columns).  Stock and ETF legs are pure delta.
+
+Any number of snapshots is handled in one pass: all files are stacked and
+every consecutive pair is joined with a single vectorised merge on a leg
+key (``conId``, or a contract description when it is missing).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+COMPONENTS = ("delta_pnl", "gamma_pnl", "vega_pnl", "theta_pnl", "residual")
+_COLUMNS = (
+    "conId",
+    "underlying",
+    "secType",
+    "expiry",
+    "right",
+    "strike",
+    "qty",
+    "multiplier",
+    "price",
+    "underlying_price",
+    "iv",
+    "delta",
+    "gamma",
+    "vega",
+    "theta",
+)
+_STAMP = re.compile(r"(\d{8})[_T-]?(\d{4}(?:\d{2})?)?")
+
+
+def snapshot_time(path: str | Path, df: pd.DataFrame | None = None) -> pd.Timestamp:
+    """Timestamp of a snapshot: filename stamp, ``timestamp`` column, else mtime."""
+
+    m = _STAMP.search(Path(path).stem)
+    if m:
+        day, hm = m.group(1), (m.group(2) or "0000").ljust(6, "0")
+        return pd.Timestamp(datetime.strptime(day + hm, "%Y%m%d%H%M%S"), tz="UTC")
+    if df is not None and "timestamp" in df.columns and df["timestamp"].notna().any():
+        ts = pd.to_datetime(df["timestamp"].dropna().iloc[0], utc=True, errors="coerce")
+        if pd.notna(ts):
+            return ts
+    return pd.Timestamp(os.path.getmtime(path), unit="s", tz="UTC")
+
+
+def read_snapshot(path: str | Path) -> Tuple[pd.Timestamp, pd.DataFrame]:
+    """Load only the columns attribution needs from a positions CSV."""
+
+    df = pd.read_csv(path, usecols=lambda c: c in _COLUMNS or c == "timestamp")
+    return snapshot_time(path, df), df
+
+
+def load_snapshots(paths: Iterable[str | Path]) -> Tuple[List[pd.Timestamp], List[pd.DataFrame]]:
+    """Read several snapshots and return them ordered by time."""
+
+    loaded = sorted((read_snapshot(p) for p in paths), key=lambda x: x[0])
+    return [t for t, _ in loaded], [df for _, df in loaded]
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.reindex(columns=list(_COLUMNS)).copy()
+    for c in ("qty", "multiplier", "price", "underlying_price", "iv", "delta", "gamma", "vega", "theta", "strike"):
+        out[c] = pd.to_numeric(out[c], errors="coerce")
+    linear = out["secType"].isin(["STK", "ETF"])
+    out["multiplier"] = out["multiplier"].fillna(pd.Series(np.where(linear, 1.0, 100.0), index=out.index))
+    # a stock's "spot" is its own mark; its greeks are fixed
+    out["underlying_price"] = out["underlying_price"].where(~linear | out["underlying_price"].notna(), out["price"])
+    for g, v in (("delta", 1.0), ("gamma", 0.0), ("vega", 0.0), ("theta", 0.0)):
+        out[g] = out[g].mask(linear, v)
+    desc = (
+        out["underlying"].astype(str)
+        + "|" + out["expiry"].astype(str)
+        + "|" + out["right"].astype(str)
+        + "|" + out["strike"].astype(str)
+    )
+    cid = pd.to_numeric(out["conId"], errors="coerce")
+    out["key"] = np.where(cid.notna(), cid.astype("Int64").astype(str), desc)
+    return out.drop_duplicates("key", keep="last")
+
+
+def explain_many(frames: Sequence[pd.DataFrame], times: Sequence[pd.Timestamp]) -> pd.DataFrame:
+    """Attribute P&L for every consecutive pair of *frames*.
+
+    Returns one row per leg and step with ``status`` (``held``, ``resized``,
+    ``opened`` or ``closed``), the market moves (``d_spot``, ``d_iv`` in vol
+    points, ``days``), the actual ``pnl`` and the :data:`COMPONENTS`.  Legs
+    that exist on only one side carry their status but no attribution.
+    """
+
+    if len(frames) < 2:
+        raise ValueError("need at least two snapshots to explain")
+    if len(times) != len(frames):
+        raise ValueError("one timestamp per snapshot required")
+
+    stacked = pd.concat(
+        [_prepare(df).assign(step=i) for i, df in enumerate(frames)],
+        ignore_index=True,
+    )
+    n = len(frames)
+    older = stacked[stacked["step"] < n - 1]
+    newer = stacked[stacked["step"] > 0].assign(step=lambda d: d["step"] - 1)
+    legs = older.merge(newer, on=["key", "step"], how="outer", suffixes=("_0", "_1"), indicator=True)
+
+    t = pd.Series(pd.DatetimeIndex(times).tz_convert("UTC"))
+    elapsed = (t.shift(-1) - t).dt.total_seconds().to_numpy()[:-1] / 86_400.0
+    legs["days"] = elapsed[legs["step"].to_numpy()]
+    legs["t0"] = t.to_numpy()[legs["step"].to_numpy()]
+    legs["t1"] = t.to_numpy()[legs["step"].to_numpy() + 1]
+    for c in ("conId", "underlying", "secType", "expiry", "right", "strike", "multiplier"):
+        legs[c] = legs[f"{c}_0"].combine_first(legs[f"{c}_1"])
+
+    both = legs["_merge"] == "both"
+    legs["status"] = np.select(
+        [~both & (legs["_merge"] == "left_only"), ~both, legs["qty_0"] != legs["qty_1"]],
+        ["closed", "opened", "resized"],
+        "held",
+    )
+    size = legs["qty_0"] * legs["multiplier"]
+    d_spot = legs["underlying_price_1"] - legs["underlying_price_0"]
+    d_iv = (legs["iv_1"] - legs["iv_0"]) * 100.0
+    legs["qty"] = legs["qty_0"].where(both)
+    legs["d_spot"] = d_spot.where(both)
+    legs["d_iv"] = d_iv.where(both)
+    legs["pnl"] = ((legs["price_1"] - legs["price_0"]) * size).where(both)
+    legs["delta_pnl"] = (legs["delta_0"] * size * d_spot).where(both)
+    legs["gamma_pnl"] = (0.5 * legs["gamma_0"] * size * d_spot**2).where(both)
+    legs["vega_pnl"] = (legs["vega_0"] * size * d_iv.fillna(0.0)).where(both)
+    legs["theta_pnl"] = (legs["theta_0"] * size * legs["days"]).where(both)
+    explained = legs[["delta_pnl", "gamma_pnl", "vega_pnl", "theta_pnl"]].sum(axis=1, min_count=1)
+    legs["residual"] = legs["pnl"] - explained
+
+    cols = [
+        "step", "t0", "t1", "key", "conId", "underlying", "secType", "expiry",
+        "right", "strike", "status", "qty", "d_spot", "d_iv", "days", "pnl",
+        *COMPONENTS,
+    ]
+    return legs[cols].sort_values(["step", "underlying", "key"], ignore_index=True)
+
+
+def explain(older: pd.DataFrame, newer: pd.DataFrame, *, days: float = 1.0) -> pd.DataFrame:
+    """Attribute P&L between two positions frames *days* apart."""
+
+    t0 = pd.Timestamp(datetime.now(timezone.utc))
+    return explain_many([older, newer], [t0, t0 + pd.Timedelta(days=days)])
+
+
+def summarize(legs: pd.DataFrame, by: str | Sequence[str] = "underlying") -> pd.DataFrame:
+    """Sum ``pnl`` and the attribution components over all steps by *by*."""
+
+    cols = ["pnl", *COMPONENTS]
+    return legs.groupby(by, dropna=False)[cols].sum(min_count=1).reset_index()
+
+
+def totals(legs: pd.DataFrame) -> dict:
+    """Portfolio-level sums of ``pnl`` and each component."""
+
+    return {c: float(legs[c].sum()) for c in ("pnl", *COMPONENTS)}
+
+
+__all__ = [
+    "COMPONENTS",
+    "explain",
+    "explain_many",
+    "load_snapshots",
+    "read_snapshot",
+    "snapshot_time",
+    "summarize",
+    "totals",
+]
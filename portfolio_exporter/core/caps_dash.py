@@ -3,6 +3,7 @@ from rich.table import Table
 from time import sleep
 import datetime as _dt
 
+from portfolio_exporter.core import aggregate
 from portfolio_exporter.scripts import theta_cap, gamma_scalp
 
 REFRESH = 5  # seconds
@@ -18,6 +19,10 @@ def _render():
 
     tbl.add_row("3-day θ-% vs floor", f"{θ_data['theta_pct']:+.1%}")
     tbl.add_row("Net Δ short", f"{θ_data['net_delta']:+.2f}")
+    snap = aggregate.book.snapshot()
+    if snap.legs:
+        tbl.add_row("Book Δ / Γ", f"{snap.portfolio['delta_exposure']:+,.1f} / {snap.portfolio['gamma_exposure']:+,.2f}")
+        tbl.add_row("Book θ / day", f"{snap.portfolio['theta_exposure']:+,.1f}")
     tbl.add_row("Γ-scalp used %", f"{γ_data['used_bucket']:.1%}")
     return tbl
 
@@ -36,20 +36,20 @@ def fetch_chain(symbol: str, expiry: str, strikes: List[float] | None = None) ->
     The resulting DataFrame includes columns: ``strike``, ``right``, ``mid``,
     ``bid``, ``ask``, ``delta``, ``gamma``, ``vega``, ``theta`` and ``iv``.
     """
-    from .ib import quote_option, quote_stock
+    from .ib import quote_many, quote_stock
 
     if not strikes:
         spot = quote_stock(symbol)["mid"]
         strikes = [round((spot // 5 + i) * 5, 0) for i in range(-5, 6)]
+    legs = list(itertools.product(strikes, ["C", "P"]))
+    quotes = quote_many([(symbol, expiry, strike, right) for strike, right in legs])
     rows = []
-    for strike, right in itertools.product(strikes, ["C", "P"]):
-        try:
-            q = quote_option(symbol, expiry, strike, right)
-            q.update({"strike": strike, "right": right})
-            rows.append(q)
-        except ValueError:
+    for (strike, right), q in zip(legs, quotes):
+        if q is None:
             # strike not offered for this weekly; skip gracefully
             continue
+        q.update({"strike": strike, "right": right})
+        rows.append(q)
     return pd.DataFrame(rows)
 
 
@@ -11,7 +11,7 @@ import argparse
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from .config import settings
 
@@ -60,6 +60,34 @@ def add_common_debug_args(parser: argparse.ArgumentParser) -> argparse.ArgumentP
     return parser
 
 
+def parse_accounts(value: str | None) -> List[str]:
+    """Split a comma-separated account list, dropping blanks and duplicates.
+
+    ``"all"`` is kept as-is; callers expand it to every managed account.
+    """
+
+    out: List[str] = []
+    for part in (value or "").split(","):
+        acct = part.strip()
+        if acct.lower() == "all":
+            acct = "all"
+        if acct and acct not in out:
+            out.append(acct)
+    return out
+
+
+def add_accounts_arg(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Register the shared ``--accounts A,B,C`` flag on ``parser``."""
+
+    parser.add_argument(
+        "--accounts",
+        type=parse_accounts,
+        default=None,
+        help="Comma-separated IB account ids (or 'all'); outputs are split per account plus a total",
+    )
+    return parser
+
+
 def resolve_output_dir(arg: str | None) -> Path:
     """Return the effective output directory.
 
@@ -4,6 +4,12 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class GreeksSettings(BaseModel):
     risk_free: float = 0.03
+    model: str = "bs"  # greeks fallback model: "bs" (European) or "american" (BAW)
+    # fallback-greeks LRU cache: entries and quantization steps for the key
+    cache_size: int = 4096
+    cache_spot_tol: float = 0.001  # relative spot move
+    cache_iv_tol: float = 0.001  # absolute vol (0.1 vol point)
+    cache_t_tol_hours: float = 1.0
 
 
 class Settings(BaseSettings):
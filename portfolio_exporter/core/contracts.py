@@ -0,0 +1,455 @@
+"""Persistent contract-details cache for ``qualifyContracts``.
+
+Qualifying a contract is a TWS round-trip, and the scripts do it one
+contract at a time in hot loops.  :class:`ContractCache` keeps qualified
+contracts in SQLite so repeat runs resolve them from disk:
+
+* ``contracts`` — one row per ``conId`` with the contract fields as JSON.
+* ``specs`` — a lookup from a template's description (secType, symbol,
+  expiry, strike, right, tradingClass, exchange, currency) to its ``conId``.
+  A ``NULL`` conId is a negative entry, written only when IB answered with
+  error 200 ("no security definition") and trusted for ``negative_ttl``
+  seconds; ambiguous matches and failed requests are not cached.
+
+Rows whose expiry is in the past are evicted when the database is opened.
+The file lives next to ``combos.db`` in ``settings.output_dir``; set
+``PE_CONTRACTS_DB`` to move it or to ``off`` to disable persistence (an
+in-memory cache is used instead).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from portfolio_exporter.core.config import settings
+
+try:  # optional dependency; bound at import so later stubs can't shadow it
+    from ib_insync import Contract
+except ImportError:  # pragma: no cover - IB extras not installed
+    Contract = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "conId",
+    "symbol",
+    "secType",
+    "lastTradeDateOrContractMonth",
+    "strike",
+    "right",
+    "multiplier",
+    "exchange",
+    "primaryExchange",
+    "currency",
+    "localSymbol",
+    "tradingClass",
+)
+_SPEC_FIELDS = (
+    "secType",
+    "symbol",
+    "lastTradeDateOrContractMonth",
+    "strike",
+    "right",
+    "tradingClass",
+    "exchange",
+    "currency",
+)
+_CHUNK = 500
+NO_SECURITY_DEFINITION = 200
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS contracts (
+    conid INTEGER PRIMARY KEY,
+    expiry TEXT,
+    fields TEXT NOT NULL,
+    ts REAL
+);
+CREATE TABLE IF NOT EXISTS specs (
+    spec TEXT PRIMARY KEY,
+    conid INTEGER,
+    expiry TEXT,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_contracts_expiry ON contracts(expiry);
+CREATE INDEX IF NOT EXISTS idx_specs_expiry ON specs(expiry);
+"""
+
+
+class _Negative:
+    """Marker for a cached "no security definition" result."""
+
+    def __repr__(self) -> str:  # pragma: no cover - debugging aid
+        return "NEGATIVE"
+
+
+NEGATIVE = _Negative()
+
+
+def _expiry(value: Any) -> str:
+    """Normalise an IB expiry (``YYYYMMDD`` or ``YYYYMM``) to a sortable key."""
+
+    s = str(value or "").strip()[:8]
+    if len(s) == 6 and s.isdigit():
+        return s + "31"
+    return s if len(s) == 8 and s.isdigit() else ""
+
+
+def spec_key(contract: Any) -> Optional[str]:
+    """Return the description key of *contract*, or ``None`` if it has no symbol."""
+
+    if not isinstance(getattr(contract, "symbol", None), str) or not contract.symbol:
+        return None
+    parts = []
+    for f in _SPEC_FIELDS:
+        v = getattr(contract, f, "")
+        if f == "strike":
+            try:
+                v = f"{float(v or 0.0):g}"
+            except (TypeError, ValueError):
+                return None
+        parts.append(str(v or "").upper())
+    return "|".join(parts)
+
+
+def _conid(contract: Any) -> int:
+    try:
+        return int(getattr(contract, "conId", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _build(fields: Dict[str, Any]) -> Any:
+    return Contract.create(**fields)
+
+
+@contextmanager
+def _unknown_specs(ib: Any) -> Iterator[Set[str]]:
+    """Collect the spec keys IB answers with error 200 while the block runs."""
+
+    specs: Set[str] = set()
+    event = getattr(ib, "errorEvent", None)
+
+    def _on_error(req_id: int, code: int, msg: str, contract: Any = None, *_: Any) -> None:
+        if code == NO_SECURITY_DEFINITION and contract is not None:
+            spec = spec_key(contract)
+            if spec:
+                specs.add(spec)
+
+    try:
+        event += _on_error
+    except TypeError:  # no eventkit Event (mocks, minimal stand-ins)
+        event = None
+    if event is None:
+        yield specs
+        return
+    try:
+        yield specs
+    finally:
+        event -= _on_error
+
+
+def _details_many(ib: Any, templates: Sequence[Any]) -> List[Any]:
+    """``reqContractDetails`` for each template, concurrently when possible."""
+
+    req = getattr(ib, "reqContractDetailsAsync", None)
+    if req is None or not hasattr(ib, "run"):
+        out: List[Any] = []
+        for t in templates:
+            try:
+                out.append(ib.reqContractDetails(t))
+            except Exception as exc:
+                out.append(exc)
+        return out
+
+    async def _gather() -> List[Any]:
+        return await asyncio.gather(*(req(t) for t in templates), return_exceptions=True)
+
+    return list(ib.run(_gather()))
+
+
+def _fill(template: Any, cached: Any) -> None:
+    """Copy cached fields onto *template* in place, like ``qualifyContracts``."""
+
+    for f in FIELDS:
+        if f == "exchange" and getattr(template, "exchange", ""):
+            continue  # keep the routing the caller asked for
+        try:
+            setattr(template, f, getattr(cached, f))
+        except Exception:  # pragma: no cover - frozen stand-ins
+            pass
+
+
+class ContractCache:
+    """SQLite-backed cache of qualified contracts (see module docstring)."""
+
+    def __init__(self, path: str | Path | None = None, negative_ttl: float = 86_400.0) -> None:
+        self._path = path
+        self.negative_ttl = negative_ttl
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    # -- storage ----------------------------------------------------------
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_CONTRACTS_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "contracts.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Contract cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        self.evict_expired()
+        return conn
+
+    def evict_expired(self, today: date | None = None) -> int:
+        """Drop contracts and specs that expired before *today*."""
+
+        cutoff = (today or date.today()).strftime("%Y%m%d")
+        with self._lock:
+            db = self._db()
+            n = db.execute(
+                "DELETE FROM contracts WHERE expiry != '' AND expiry < ?", (cutoff,)
+            ).rowcount
+            n += db.execute(
+                "DELETE FROM specs WHERE (expiry != '' AND expiry < ?) OR (conid IS NULL AND ts < ?)",
+                (cutoff, time.time() - self.negative_ttl),
+            ).rowcount
+            db.commit()
+        return n
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- lookups ----------------------------------------------------------
+    def _rows(self, sql: str, keys: Sequence[Any]) -> List[tuple]:
+        db = self._db()
+        rows: List[tuple] = []
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i : i + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows.extend(db.execute(sql.format(marks=marks), chunk).fetchall())
+        return rows
+
+    def by_conid(self, conids: Iterable[int]) -> Dict[int, Any]:
+        """Bulk lookup of cached contracts by ``conId``."""
+
+        keys = sorted({int(c) for c in conids if c})
+        with self._lock:
+            rows = self._rows("SELECT conid, fields FROM contracts WHERE conid IN ({marks})", keys)
+        return {cid: _build(json.loads(fields)) for cid, fields in rows}
+
+    def lookup(self, contracts: Sequence[Any]) -> List[Any]:
+        """Return, per template, a cached contract, :data:`NEGATIVE` or ``None``."""
+
+        specs = [None if _conid(c) else spec_key(c) for c in contracts]
+        with self._lock:
+            rows = self._rows(
+                "SELECT spec, conid, ts FROM specs WHERE spec IN ({marks})",
+                sorted({s for s in specs if s}),
+            )
+        now = time.time()
+        spec_map: Dict[str, Any] = {}
+        for spec, cid, ts in rows:
+            if cid is None:
+                if now - (ts or 0.0) < self.negative_ttl:
+                    spec_map[spec] = NEGATIVE
+            else:
+                spec_map[spec] = int(cid)
+        wanted = [_conid(c) for c in contracts] + [v for v in spec_map.values() if v is not NEGATIVE]
+        found = self.by_conid(wanted)
+
+        out: List[Any] = []
+        for c, spec in zip(contracts, specs):
+            cid = _conid(c)
+            hit = found.get(cid) if cid else spec_map.get(spec) if spec else None
+            if isinstance(hit, int):
+                hit = found.get(hit)
+            out.append(hit)
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return out
+
+    # -- writes -----------------------------------------------------------
+    def put(self, contracts: Iterable[Any], specs: Iterable[Optional[str]] | None = None) -> None:
+        """Store qualified *contracts*, also indexing each under its entry in *specs*."""
+
+        now = time.time()
+        crow, srow = [], []
+        for c, extra in zip(contracts, specs if specs is not None else repeat(None)):
+            cid = _conid(c)
+            if not cid:
+                continue
+            fields = {f: getattr(c, f, None) for f in FIELDS}
+            exp = _expiry(fields["lastTradeDateOrContractMonth"])
+            crow.append((cid, exp, json.dumps(fields, default=str), now))
+            for spec in {spec_key(c), extra} - {None}:
+                srow.append((spec, cid, exp, now))
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO contracts VALUES (?, ?, ?, ?)", crow)
+            db.executemany("INSERT OR REPLACE INTO specs VALUES (?, ?, ?, ?)", srow)
+            db.commit()
+
+    def put_missing(self, templates: Iterable[Any]) -> None:
+        """Record that IB has no security definition for *templates*."""
+
+        now = time.time()
+        rows = [
+            (spec, _expiry(getattr(t, "lastTradeDateOrContractMonth", "")), now)
+            for t in templates
+            if (spec := spec_key(t))
+        ]
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO specs VALUES (?, NULL, ?, ?)", rows)
+            db.commit()
+
+    # -- qualification ----------------------------------------------------
+    def qualify(self, ib: Any, *contracts: Any) -> List[Any]:
+        """Cache-first drop-in for ``ib.qualifyContracts``.
+
+        Returns a list aligned with *contracts*: the qualified contract (the
+        template itself, filled in place) or ``None`` when IB has no unique
+        definition.  All cache misses go to IB in a single call; errors from
+        that call propagate.  Only templates IB rejected with error 200 are
+        negative-cached, so ambiguous or timed-out ones are retried next time.
+        """
+
+        out: List[Any] = [None] * len(contracts)
+        pending: List[int] = []
+        for i, (c, hit) in enumerate(zip(contracts, self.lookup(contracts))):
+            if hit is NEGATIVE:
+                continue
+            if hit is None:
+                pending.append(i)
+            else:
+                _fill(c, hit)
+                out[i] = c
+        if not pending:
+            return out
+
+        templates = [contracts[i] for i in pending]
+        specs = [spec_key(t) for t in templates]
+        with _unknown_specs(ib) as unknown:
+            result = list(ib.qualifyContracts(*templates) or [])
+        if len(result) == len(templates):
+            resolved = result
+        else:  # ib_insync returns only the contracts it could qualify
+            ok = {id(c) for c in result if c is not None}
+            resolved = [t if id(t) in ok else None for t in templates]
+
+        good, good_specs, missing = [], [], []
+        for i, t, spec, q in zip(pending, templates, specs, resolved):
+            out[i] = q
+            if q is None:
+                if spec in unknown:
+                    missing.append(t)
+            else:
+                good.append(q)
+                # key on the spec as requested, before IB filled the template in
+                good_specs.append(spec)
+        if good:
+            self.put(good, good_specs)
+        if missing:
+            self.put_missing(missing)
+        return out
+
+    def resolve(self, ib: Any, *templates: Any, prefer: str | None = None) -> List[Any]:
+        """Cache-first ``reqContractDetails`` for possibly ambiguous *templates*.
+
+        Unlike :meth:`qualify` an ambiguous template resolves to the match
+        whose ``tradingClass`` equals *prefer*, else the first one IB lists.
+        Misses are requested concurrently; templates IB rejected with error
+        200 are negative-cached, failed requests are not.  Returns a list
+        aligned with *templates* of contracts or ``None``.
+        """
+
+        out: List[Any] = [None] * len(templates)
+        pending: List[int] = []
+        for i, hit in enumerate(self.lookup(templates)):
+            if hit is None:
+                pending.append(i)
+            elif hit is not NEGATIVE:
+                out[i] = hit
+        if not pending:
+            return out
+
+        specs = [spec_key(templates[i]) for i in pending]
+        with _unknown_specs(ib) as unknown:
+            details = _details_many(ib, [templates[i] for i in pending])
+        good, good_specs, missing = [], [], []
+        for i, spec, cds in zip(pending, specs, details):
+            if isinstance(cds, BaseException):
+                logger.debug("reqContractDetails failed for %s: %s", spec, cds)
+                continue
+            if not cds:
+                if spec in unknown:
+                    missing.append(templates[i])
+                continue
+            chosen = next((cd.contract for cd in cds if prefer and cd.contract.tradingClass == prefer), None)
+            out[i] = chosen or cds[0].contract
+            good.append(out[i])
+            good_specs.append(spec)
+        if good:
+            self.put(good, good_specs)
+        if missing:
+            self.put_missing(missing)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+contract_cache = ContractCache()
+
+
+def qualify(ib: Any, *contracts: Any) -> List[Any]:
+    """Qualify *contracts* through the process-wide :data:`contract_cache`."""
+
+    return contract_cache.qualify(ib, *contracts)
+
+
+def resolve(ib: Any, *templates: Any, prefer: str | None = None) -> List[Any]:
+    """Resolve *templates* through the process-wide :data:`contract_cache`."""
+
+    return contract_cache.resolve(ib, *templates, prefer=prefer)
+
+
+__all__ = [
+    "ContractCache",
+    "FIELDS",
+    "NEGATIVE",
+    "contract_cache",
+    "qualify",
+    "resolve",
+    "spec_key",
+]
@@ -0,0 +1,349 @@
+"""Earnings and dividend calendar with a persistent per-symbol cache.
+
+``tech_signals_ibkr`` used to look up the next earnings date ticker by
+ticker on every run, and nothing else knew about corporate events.
+:data:`event_service` keeps them in one place:
+
+* events live in SQLite, one row per symbol/kind/date (``events`` table)
+  with the kinds of :data:`KINDS`;
+* each symbol carries its own refresh interval (``fetched`` table): daily
+  while an event is less than ``near_days`` away, ``unknown_interval`` when
+  Yahoo lists nothing, ``default_interval`` otherwise, and at once when the
+  stored next event has passed;
+* due symbols are fetched from yfinance concurrently;
+* :func:`before_expiry` answers "is the next event before this expiry?"
+  for a whole position or chain frame with vectorized comparisons.
+
+The database lives next to ``bars.db`` in ``settings.output_dir``; set
+``PE_EVENTS_DB`` to move it or to ``off`` to keep the cache in memory.
+``PE_EVENTS=off`` stops all Yahoo requests and serves only what is stored.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("earnings", "ex_dividend", "dividend")
+DAY = 86_400.0
+
+# yfinance calendar keys per event kind
+_CALENDAR_KEYS = {
+    "earnings": "Earnings Date",
+    "ex_dividend": "Ex-Dividend Date",
+    "dividend": "Dividend Date",
+}
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS events (
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL,
+    PRIMARY KEY (symbol, kind, date)
+);
+CREATE TABLE IF NOT EXISTS fetched (
+    symbol TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    interval REAL NOT NULL
+);
+"""
+
+
+def _dates(val: Any) -> List[date]:
+    """Flatten a calendar value (date, Timestamp, list, Series…) to dates."""
+
+    if val is None:
+        return []
+    if isinstance(val, (list, tuple, pd.Series, pd.Index)):
+        return [d for v in val for d in _dates(v)]
+    ts = pd.to_datetime(val, errors="coerce")
+    if ts is pd.NaT or pd.isna(ts):
+        return []
+    return [ts.date()]
+
+
+def yf_events(symbol: str) -> Dict[str, List[date]]:
+    """Upcoming events of *symbol* from ``yf.Ticker(...).calendar``.
+
+    Falls back to ``get_earnings_dates`` when the calendar has no earnings.
+    Raises on network errors so the caller can keep the stored events.
+    """
+
+    tk = yf.Ticker(symbol)
+    ratelimit.acquire("yahoo")
+    cal = tk.calendar
+    if isinstance(cal, pd.DataFrame):  # older yfinance: rows are event names
+        cal = {k: cal.loc[k].tolist() for k in cal.index}
+    cal = cal or {}
+    out = {kind: _dates(cal.get(key)) for kind, key in _CALENDAR_KEYS.items()}
+    if not out["earnings"]:
+        ratelimit.acquire("yahoo")
+        try:
+            ed = tk.get_earnings_dates(limit=4)
+        except Exception as exc:
+            logger.debug("earnings dates failed for %s: %s", symbol, exc)
+            ed = None
+        if ed is not None and not ed.empty:
+            col = ed["Earnings Date"] if "Earnings Date" in ed.columns else ed.index.to_series()
+            out["earnings"] = _dates(col)
+    return out
+
+
+def _online() -> bool:
+    return os.environ.get("PE_EVENTS", "").lower() != "off"
+
+
+class EventStore:
+    """SQLite store of event dates keyed on ``(symbol, kind, date)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_EVENTS_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "events.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Event cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def status(self, symbols: Sequence[str], today: str) -> Dict[str, Tuple[float, float, str]]:
+        """Return ``{symbol: (ts, interval, next_event)}`` for fetched symbols.
+
+        ``next_event`` is the first stored date on/after *today* (``""`` if none).
+        """
+
+        out: Dict[str, Tuple[float, float, str]] = {}
+        with self._lock:
+            db = self._db()
+            for sym in symbols:
+                row = db.execute("SELECT ts, interval FROM fetched WHERE symbol=?", (sym,)).fetchone()
+                if row is None:
+                    continue
+                (nxt,) = db.execute(
+                    "SELECT MIN(date) FROM events WHERE symbol=? AND date>=?", (sym, today)
+                ).fetchone()
+                out[sym] = (row[0], row[1], nxt or "")
+        return out
+
+    def read(self, symbols: Sequence[str], start: str = "") -> pd.DataFrame:
+        rows: List[Tuple[str, str, str]] = []
+        with self._lock:
+            db = self._db()
+            for sym in dict.fromkeys(symbols):
+                rows.extend(
+                    db.execute(
+                        "SELECT symbol, kind, date FROM events WHERE symbol=? AND date>=?",
+                        (sym, start),
+                    ).fetchall()
+                )
+        df = pd.DataFrame(rows, columns=["symbol", "kind", "date"])
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def write(self, symbol: str, events: Mapping[str, Iterable[date]], interval: float) -> None:
+        """Replace the upcoming events of *symbol* and record its refresh interval."""
+
+        today = date.today().isoformat()
+        rows = sorted({(symbol, kind, d.isoformat()) for kind, ds in events.items() for d in ds})
+        with self._lock:
+            db = self._db()
+            # drop stale future dates (e.g. a moved earnings date); keep history
+            db.execute("DELETE FROM events WHERE symbol=? AND date>=?", (symbol, today))
+            db.executemany("INSERT OR REPLACE INTO events (symbol, kind, date) VALUES (?, ?, ?)", rows)
+            db.execute(
+                "INSERT OR REPLACE INTO fetched (symbol, ts, interval) VALUES (?, ?, ?)",
+                (symbol, time.time(), interval),
+            )
+            db.commit()
+
+
+class EventService:
+    """Resolve corporate events through :class:`EventStore` (see module docstring)."""
+
+    def __init__(
+        self,
+        store: EventStore | None = None,
+        fetcher: Any = None,
+        workers: int = 8,
+        near_days: int = 14,
+        near_interval: float = DAY,
+        default_interval: float = 7 * DAY,
+        unknown_interval: float = 3 * DAY,
+    ) -> None:
+        self.store = store or EventStore()
+        self.fetcher = fetcher or yf_events
+        self.workers = max(1, workers)
+        self.near_days = near_days
+        self.near_interval = near_interval
+        self.default_interval = default_interval
+        self.unknown_interval = unknown_interval
+        self._stats = {"cached": 0, "fetched": 0, "failed": 0}
+
+    def interval(self, events: Mapping[str, Iterable[date]], today: date) -> float:
+        """Refresh interval for a symbol with *events* (seconds)."""
+
+        upcoming = [d for ds in events.values() for d in ds if d >= today]
+        if not upcoming:
+            return self.unknown_interval
+        if (min(upcoming) - today).days <= self.near_days:
+            return self.near_interval
+        return self.default_interval
+
+    def _due(self, symbols: Sequence[str], today: date) -> List[str]:
+        status = self.store.status(symbols, today.isoformat())
+        now = time.time()
+        due = []
+        for sym in symbols:
+            st = status.get(sym)
+            if st is None:
+                due.append(sym)
+                continue
+            ts, interval, nxt = st
+            # a stored event that has just passed means the next one is unknown
+            passed = nxt == "" and interval != self.unknown_interval
+            if now - ts >= interval or passed:
+                due.append(sym)
+        return due
+
+    def refresh(self, symbols: Iterable[str]) -> List[str]:
+        """Fetch every due symbol concurrently; return the symbols refreshed."""
+
+        symbols = [s for s in dict.fromkeys(str(s).upper() for s in symbols) if s and s != "NAN"]
+        today = date.today()
+        due = self._due(symbols, today)
+        self._stats["cached"] += len(symbols) - len(due)
+        if not due or not _online():
+            return []
+
+        def _one(sym: str) -> Dict[str, List[date]] | BaseException:
+            try:
+                return self.fetcher(sym)
+            except Exception as exc:
+                return exc
+
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(due))) as pool:
+            results = list(pool.map(_one, due))
+        done = []
+        for sym, res in zip(due, results):
+            if isinstance(res, BaseException):
+                self._stats["failed"] += 1
+                logger.debug("event lookup failed for %s: %s", sym, res)
+                continue
+            self.store.write(sym, res, self.interval(res, today))
+            done.append(sym)
+        self._stats["fetched"] += len(done)
+        logger.info("events: %d symbols refreshed in %.2fs", len(done), time.monotonic() - t0)
+        return done
+
+    def next_events(
+        self, symbols: Iterable[str], kinds: Sequence[str] = KINDS, on: date | None = None
+    ) -> pd.DataFrame:
+        """Next event on/after *on* (default today) per symbol, one column per kind.
+
+        The frame is indexed by upper-cased symbol; missing events are ``NaT``.
+        """
+
+        symbols = list(dict.fromkeys(str(s).upper() for s in symbols))
+        self.refresh(symbols)
+        start = (on or date.today()).isoformat()
+        ev = self.store.read(symbols, start)
+        ev = ev[ev["kind"].isin(kinds)]
+        nxt = ev.groupby(["symbol", "kind"])["date"].min().unstack("kind")
+        return nxt.reindex(index=symbols, columns=list(kinds)).astype("datetime64[ns]")
+
+    def before_expiry(
+        self,
+        df: pd.DataFrame,
+        symbol: str = "underlying",
+        expiry: str = "expiry",
+        kinds: Sequence[str] = ("earnings", "ex_dividend"),
+        on: date | None = None,
+    ) -> pd.DataFrame:
+        """Per-row ``next_<kind>`` and ``<kind>_before_expiry`` for *df*.
+
+        A row is flagged when the symbol's next event falls on or before its
+        expiry.  The result is aligned to ``df.index``.
+        """
+
+        out = pd.DataFrame(index=df.index)
+        if df.empty:
+            for kind in kinds:
+                out[f"next_{kind}"] = pd.Series(dtype="datetime64[ns]")
+                out[f"{kind}_before_expiry"] = pd.Series(dtype=bool)
+            return out
+        syms = df[symbol].astype(str).str.upper()
+        exp = pd.to_datetime(df[expiry].astype(str), errors="coerce", format="mixed")
+        nxt = self.next_events(syms.unique(), kinds, on)
+        for kind in kinds:
+            when = syms.map(nxt[kind])
+            out[f"next_{kind}"] = when
+            out[f"{kind}_before_expiry"] = (when <= exp).fillna(False).astype(bool)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+event_service = EventService()
+
+
+def next_events(symbols: Iterable[str], kinds: Sequence[str] = KINDS, on: date | None = None) -> pd.DataFrame:
+    """Next events through the process-wide :data:`event_service`."""
+
+    return event_service.next_events(symbols, kinds, on)
+
+
+def before_expiry(df: pd.DataFrame, **kwargs: Any) -> pd.DataFrame:
+    """Event-before-expiry flags through the process-wide :data:`event_service`."""
+
+    return event_service.before_expiry(df, **kwargs)
+
+
+__all__ = [
+    "KINDS",
+    "EventService",
+    "EventStore",
+    "before_expiry",
+    "event_service",
+    "next_events",
+    "yf_events",
+]
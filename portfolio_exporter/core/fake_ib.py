@@ -0,0 +1,732 @@
+"""In-process stand-in for ``ib_insync.IB`` backed by a synthetic market.
+
+Nothing else in the repo can drive the IB code paths at realistic scale
+without a live TWS.  :class:`FakeIB` implements the part of the ``IB``
+interface the scripts use (positions, portfolio, account summary, contract
+qualification and details, market data, option-chain parameters,
+executions, open orders, historical bars and the matching events) on top of
+a deterministic :class:`FakeMarket`.
+
+Setting ``PE_FAKE_IB`` makes every client created through
+:func:`portfolio_exporter.core.ib.make_client` (and so the shared session
+pool and ``core.ib._ib``) a ``FakeIB``, which lets ``portfolio_greeks``,
+``live_feed``, ``option_chain_snapshot`` and ``trades_report`` be timed end
+to end on a laptop::
+
+    PE_FAKE_IB="legs=10000,latency=0.002,errors=0.01" portfolio-greeks
+
+The value is a comma-separated list of :class:`FakeConfig` fields; ``1``
+or an empty spec selects the defaults.  Replies are delayed by
+``latency`` (+ up to ``jitter``) seconds and fail with probability
+``errors``, emitting ``errorEvent`` the way TWS does (codes 200, 101, 354).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from portfolio_exporter.core.greeks import bs_greeks_vec
+
+try:  # optional dependency
+    from eventkit import Event
+    from ib_insync import (
+        AccountValue,
+        BarData,
+        CommissionReport,
+        Contract,
+        ContractDetails,
+        Execution,
+        Fill,
+        Future,
+        Index,
+        LimitOrder,
+        Option,
+        OptionChain,
+        OptionComputation,
+        OrderStatus,
+        PnL,
+        PortfolioItem,
+        Position,
+        Stock,
+        Ticker,
+        Trade,
+        util,
+    )
+except ImportError:  # pragma: no cover - IB extras not installed
+    Event = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT = "DU0000000"
+RISK_FREE = 0.03
+_INDICES = {"VIX", "VVIX", "SPX", "NDX", "RUT", "TNX", "TYX", "DJX"}
+
+
+@dataclass(frozen=True)
+class FakeConfig:
+    """Size and behaviour of the synthetic market (see module docstring)."""
+
+    legs: int = 1_000
+    accounts: int = 1
+    symbols: int = 50
+    expiries: int = 8
+    executions: int = 500
+    orders: int = 20
+    lines: int = 100
+    latency: float = 0.0
+    jitter: float = 0.0
+    errors: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_spec(cls, spec: str | None) -> "FakeConfig":
+        """Parse ``"legs=10000,latency=0.01"``; unknown keys raise ``ValueError``."""
+
+        kwargs: Dict[str, Any] = {}
+        types = {f.name: f.type for f in fields(cls)}
+        for part in (spec or "").split(","):
+            part = part.strip()
+            if not part or part.lower() in {"1", "true", "yes", "on"}:
+                continue
+            key, _, value = part.partition("=")
+            key = key.strip()
+            if key not in types:
+                raise ValueError(f"Unknown PE_FAKE_IB key: {key!r}")
+            kwargs[key] = (int if types[key] in (int, "int") else float)(value)
+        return cls(**kwargs)
+
+
+def _rng(*parts: Any) -> random.Random:
+    return random.Random(zlib.crc32("|".join(map(str, parts)).encode()))
+
+
+class FakeMarket:
+    """Deterministic instruments, prices, positions and order history.
+
+    Underlyings are created on demand for any symbol, so templates the
+    scripts build (index proxies, user tickers) qualify as well.  Options
+    exist on ``config.expiries`` weekly Fridays and a strike grid of
+    ±30 % around spot.
+    """
+
+    def __init__(self, config: FakeConfig) -> None:
+        self.config = config
+        self._lock = threading.RLock()
+        self._next_conid = 100_000
+        self._by_conid: Dict[int, Any] = {}
+        self._by_spec: Dict[Tuple[Any, ...], Any] = {}
+        self._under: Dict[str, Dict[str, Any]] = {}
+        today = date.today()
+        first = today + timedelta(days=(4 - today.weekday()) % 7 or 7)
+        self.expirations = [
+            (first + timedelta(weeks=i)).strftime("%Y%m%d") for i in range(config.expiries)
+        ]
+        self.symbols = [f"FK{i:03d}" for i in range(config.symbols)]
+        self.accounts = [f"DU{i:07d}" for i in range(max(config.accounts, 1))]
+        self.positions = self._make_positions()
+        self.fills = self._make_fills()
+        self.trades = self._make_orders()
+
+    # -- instruments ------------------------------------------------------
+    def _conid(self) -> int:
+        self._next_conid += 1
+        return self._next_conid
+
+    def underlying(self, symbol: str) -> Dict[str, Any]:
+        """Return spot, vol, strike grid and contract for *symbol*."""
+
+        symbol = symbol.upper().lstrip("^")
+        with self._lock:
+            info = self._under.get(symbol)
+            if info is not None:
+                return info
+            rng = _rng(self.config.seed, symbol)
+            spot = round(rng.uniform(20, 500), 2)
+            step = 5.0 if spot >= 200 else 2.5 if spot >= 50 else 1.0
+            lo, hi = math.floor(spot * 0.7 / step), math.ceil(spot * 1.3 / step)
+            if symbol in _INDICES:
+                contract = Index(symbol, "CBOE", "USD")
+            else:
+                contract = Stock(symbol, "SMART", "USD", primaryExchange="NASDAQ")
+            contract.conId = self._conid()
+            contract.localSymbol = contract.tradingClass = symbol
+            info = {
+                "spot": spot,
+                "iv": rng.uniform(0.15, 0.6),
+                "strikes": [round(k * step, 2) for k in range(lo, hi + 1)],
+                "contract": contract,
+            }
+            self._under[symbol] = info
+            self._by_conid[contract.conId] = contract
+            self._by_spec[("STK" if symbol not in _INDICES else "IND", symbol)] = contract
+            return info
+
+    def option(self, symbol: str, expiry: str, strike: float, right: str) -> Optional[Any]:
+        symbol = symbol.upper()
+        info = self.underlying(symbol)
+        right = (right or "").upper()[:1]
+        expiry = str(expiry or "")[:8]
+        strike = round(float(strike or 0.0), 2)
+        if expiry not in self.expirations or strike not in info["strikes"] or right not in {"C", "P"}:
+            return None
+        key = ("OPT", symbol, expiry, strike, right)
+        with self._lock:
+            c = self._by_spec.get(key)
+            if c is None:
+                c = Option(symbol, expiry, strike, right, "SMART", multiplier="100", currency="USD")
+                c.conId = self._conid()
+                c.tradingClass = symbol
+                c.localSymbol = f"{symbol:<6}{expiry[2:]}{right}{int(strike * 1000):08d}"
+                self._by_spec[key] = c
+                self._by_conid[c.conId] = c
+            return c
+
+    def future(self, symbol: str, exchange: str) -> List[Any]:
+        today = date.today()
+        out = []
+        for i in range(1, 4):
+            month = (today.replace(day=1) + timedelta(days=32 * i)).strftime("%Y%m")
+            key = ("FUT", symbol, month)
+            with self._lock:
+                c = self._by_spec.get(key)
+                if c is None:
+                    c = Future(symbol, month, exchange or "CME", currency="USD", multiplier="100")
+                    c.conId = self._conid()
+                    c.localSymbol = c.tradingClass = symbol
+                    self._by_spec[key] = c
+                    self._by_conid[c.conId] = c
+            out.append(c)
+        return out
+
+    def resolve(self, template: Any) -> Optional[Any]:
+        """Return the listed contract matching *template*, or ``None``."""
+
+        conid = int(getattr(template, "conId", 0) or 0)
+        if conid:
+            return self._by_conid.get(conid)
+        sec = getattr(template, "secType", "") or "STK"
+        symbol = (getattr(template, "symbol", "") or "").upper()
+        if not symbol:
+            return None
+        if sec in {"OPT", "FOP"}:
+            return self.option(
+                symbol,
+                template.lastTradeDateOrContractMonth,
+                template.strike,
+                template.right,
+            )
+        if sec == "FUT":
+            month = str(getattr(template, "lastTradeDateOrContractMonth", "") or "")[:6]
+            futs = self.future(symbol, getattr(template, "exchange", ""))
+            return next((f for f in futs if f.lastTradeDateOrContractMonth == month), futs[0])
+        if sec in {"STK", "IND", "CASH"}:
+            return self.underlying(symbol)["contract"]
+        return None
+
+    def contract(self, conid: int) -> Optional[Any]:
+        return self._by_conid.get(conid)
+
+    # -- prices -----------------------------------------------------------
+    def quote(self, contract: Any) -> Dict[str, Any]:
+        """Return bid/ask/last/close and, for options, model greeks."""
+
+        if contract.secType in {"OPT", "FOP"}:
+            info = self.underlying(contract.symbol)
+            expiry = datetime.strptime(contract.lastTradeDateOrContractMonth, "%Y%m%d").date()
+            t = max((expiry - date.today()).days, 0.5) / 365
+            moneyness = math.log(contract.strike / info["spot"])
+            iv = info["iv"] * (1 + 0.5 * moneyness * moneyness - 0.2 * moneyness)
+            g = bs_greeks_vec(
+                info["spot"], contract.strike, t, RISK_FREE, iv, contract.right == "C", 1, with_price=True
+            )
+            price = max(float(g["price"]), 0.01)
+            half = max(0.01, round(price * 0.02, 2))
+            oi = _rng(self.config.seed, contract.conId).randint(0, 20_000)
+            return {
+                "bid": round(price - half, 2),
+                "ask": round(price + half, 2),
+                "last": round(price, 2),
+                "close": round(price * 0.99, 2),
+                "impliedVolatility": iv,
+                "callOpenInterest" if contract.right == "C" else "putOpenInterest": oi,
+                "modelGreeks": OptionComputation(
+                    0,
+                    iv,
+                    float(g["delta"]),
+                    price,
+                    0.0,
+                    float(g["gamma"]),
+                    float(g["vega"]),
+                    float(g["theta"]),
+                    info["spot"],
+                ),
+            }
+        spot = self.underlying(contract.symbol)["spot"]
+        return {
+            "bid": round(spot - 0.01, 2),
+            "ask": round(spot + 0.01, 2),
+            "last": spot,
+            "close": round(spot * 0.995, 2),
+            "volume": 1_000_000,
+        }
+
+    def bars(self, contract: Any, days: int) -> List[Any]:
+        """Daily bars for the last *days* calendar days, ending at spot."""
+
+        spot = self.quote(contract)["last"]
+        rng = _rng(self.config.seed, "bars", contract.conId)
+        today = date.today()
+        dates = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+        dates = [d for d in dates if d.weekday() < 5]
+        closes = [spot]
+        for _ in dates[1:]:
+            closes.append(closes[-1] / math.exp(rng.gauss(0, 0.015)))
+        closes.reverse()
+        out = []
+        for d, c in zip(dates, closes):
+            o = c * math.exp(rng.gauss(0, 0.005))
+            out.append(
+                BarData(
+                    date=d,
+                    open=round(o, 2),
+                    high=round(max(o, c) * 1.005, 2),
+                    low=round(min(o, c) * 0.995, 2),
+                    close=round(c, 2),
+                    volume=rng.randint(100_000, 5_000_000),
+                    average=round((o + c) / 2, 2),
+                    barCount=rng.randint(1_000, 50_000),
+                )
+            )
+        return out
+
+    # -- account ----------------------------------------------------------
+    def _make_positions(self) -> List[Any]:
+        rng = _rng(self.config.seed, "positions")
+        out: List[Any] = []
+        seen: set = set()
+        n_stock = min(len(self.symbols), self.config.legs // 10)
+        for i, sym in enumerate(self.symbols[:n_stock]):
+            c = self.underlying(sym)["contract"]
+            qty = rng.choice([-1, 1]) * rng.randint(1, 20) * 10
+            acct = self.accounts[i % len(self.accounts)]
+            out.append(Position(acct, c, float(qty), self.quote(c)["last"] * rng.uniform(0.8, 1.2)))
+        attempts = 0
+        while len(out) < self.config.legs and attempts < self.config.legs * 20:
+            attempts += 1
+            sym = rng.choice(self.symbols)
+            info = self.underlying(sym)
+            c = self.option(
+                sym, rng.choice(self.expirations), rng.choice(info["strikes"]), rng.choice("CP")
+            )
+            acct = rng.choice(self.accounts)
+            if c is None or (acct, c.conId) in seen:
+                continue
+            seen.add((acct, c.conId))
+            qty = rng.choice([-1, 1]) * rng.randint(1, 10)
+            cost = self.quote(c)["last"] * 100 * rng.uniform(0.7, 1.3)
+            out.append(Position(acct, c, float(qty), cost))
+        return out
+
+    def _make_fills(self) -> List[Any]:
+        rng = _rng(self.config.seed, "fills")
+        now = datetime.now(timezone.utc)
+        out = []
+        for i in range(min(self.config.executions, len(self.positions) * 4)):
+            pos = rng.choice(self.positions)
+            c = pos.contract
+            when = now - timedelta(minutes=rng.randint(1, 10 * 24 * 60))
+            qty = abs(pos.position) or 1
+            price = self.quote(c)["last"]
+            exec_id = f"0000f{i:06d}.01.01"
+            ex = Execution(
+                execId=exec_id,
+                time=when,
+                acctNumber=pos.account,
+                exchange="SMART",
+                side="BOT" if pos.position > 0 else "SLD",
+                shares=qty,
+                price=price,
+                permId=900_000 + i,
+                clientId=0,
+                orderId=i + 1,
+                cumQty=qty,
+                avgPrice=price,
+                orderRef="",
+                lastLiquidity=rng.choice([1, 2]),
+            )
+            report = CommissionReport(exec_id, round(0.65 * qty, 2), "USD", 0.0)
+            out.append(Fill(c, ex, report, when))
+        out.sort(key=lambda f: f.time)
+        return out
+
+    def _make_orders(self) -> List[Any]:
+        rng = _rng(self.config.seed, "orders")
+        out = []
+        for i in range(min(self.config.orders, len(self.positions))):
+            pos = rng.choice(self.positions)
+            price = self.quote(pos.contract)["last"]
+            order = LimitOrder(
+                "SELL" if pos.position > 0 else "BUY",
+                abs(pos.position) or 1,
+                round(price * 1.05, 2),
+                orderId=10_000 + i,
+                permId=800_000 + i,
+                account=pos.account,
+            )
+            status = OrderStatus(orderId=order.orderId, status="Submitted", remaining=order.totalQuantity)
+            out.append(Trade(pos.contract, order, status, [], []))
+        return out
+
+
+_markets: Dict[FakeConfig, FakeMarket] = {}
+_markets_lock = threading.Lock()
+
+
+def market(config: FakeConfig) -> FakeMarket:
+    """Return the shared market for *config* (built once per process)."""
+
+    with _markets_lock:
+        m = _markets.get(config)
+        if m is None:
+            t0 = time.perf_counter()
+            m = _markets[config] = FakeMarket(config)
+            logger.info(
+                "fake IB market: %d positions built in %.2fs", len(m.positions), time.perf_counter() - t0
+            )
+        return m
+
+
+class FakeIB:
+    """Subset of :class:`ib_insync.IB` served from a :class:`FakeMarket`."""
+
+    # no real provider behind it: exempt from ``core.ratelimit`` pacing
+    simulated = True
+
+    def __init__(self, config: FakeConfig | None = None) -> None:
+        if Event is None:  # pragma: no cover - IB extras not installed
+            raise ImportError("FakeIB requires ib_insync")
+        self.config = config or FakeConfig()
+        self.market = market(self.config)
+        self._rng = random.Random(self.config.seed)
+        self._connected = False
+        self.RequestTimeout = 0.0
+        self._req_id = 0
+        self._tickers: Dict[int, Any] = {}
+        self._lines: Dict[int, Any] = {}
+        self._pending: List[Tuple[float, Any, Dict[str, Any]]] = []
+        self.calls: Dict[str, int] = {}
+        self.errorEvent = Event("errorEvent")
+        self.pendingTickersEvent = Event("pendingTickersEvent")
+        self.commissionReportEvent = Event("commissionReportEvent")
+        self.execDetailsEvent = Event("execDetailsEvent")
+        self.connectedEvent = Event("connectedEvent")
+        self.disconnectedEvent = Event("disconnectedEvent")
+
+    @classmethod
+    def from_spec(cls, spec: str | None) -> "FakeIB":
+        return cls(FakeConfig.from_spec(spec))
+
+    # -- plumbing ---------------------------------------------------------
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _delay(self) -> float:
+        cfg = self.config
+        return cfg.latency + (self._rng.uniform(0, cfg.jitter) if cfg.jitter else 0.0)
+
+    def _fails(self) -> bool:
+        return self.config.errors > 0 and self._rng.random() < self.config.errors
+
+    def _error(self, code: int, msg: str, contract: Any = None) -> None:
+        self._req_id += 1
+        self.errorEvent.emit(self._req_id, code, msg, contract)
+
+    def _roundtrip(self) -> None:
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pump(self) -> bool:
+        """Deliver every market-data reply that is due; return ``True`` if any."""
+
+        now = time.monotonic()
+        due = [p for p in self._pending if p[0] <= now]
+        if not due:
+            return False
+        self._pending = [p for p in self._pending if p[0] > now]
+        stamp = datetime.now(timezone.utc)
+        updated = set()
+        for _, tk, values in due:
+            for k, v in values.items():
+                setattr(tk, k, v)
+            tk.time = stamp
+            updated.add(tk)
+        self.pendingTickersEvent.emit(updated)
+        return True
+
+    # -- connection -------------------------------------------------------
+    def connect(self, host: str = "127.0.0.1", port: int = 7497, clientId: int = 1, timeout: float = 4, **_: Any) -> "FakeIB":
+        self._count("connect")
+        self._roundtrip()
+        self._connected = True
+        self.connectedEvent.emit()
+        return self
+
+    async def connectAsync(self, *args: Any, **kwargs: Any) -> "FakeIB":
+        await asyncio.sleep(self._delay())
+        return self.connect(*args, **kwargs)
+
+    def disconnect(self) -> None:
+        if self._connected:
+            self._connected = False
+            self._lines.clear()
+            self._pending.clear()
+            self.disconnectedEvent.emit()
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def reqCurrentTime(self) -> datetime:
+        self._count("reqCurrentTime")
+        self._roundtrip()
+        return datetime.now(timezone.utc)
+
+    def sleep(self, secs: float = 0.02) -> bool:
+        time.sleep(max(secs, 0.0))
+        self._pump()
+        return True
+
+    def waitOnUpdate(self, timeout: float = 0) -> bool:
+        if self._pump():
+            return True
+        deadline = time.monotonic() + (timeout or 3600.0)
+        nxt = min((p[0] for p in self._pending), default=deadline)
+        time.sleep(max(0.0, min(nxt, deadline) - time.monotonic()))
+        return self._pump()
+
+    def run(self, *awaitables: Any, timeout: float | None = None) -> Any:
+        return util.run(*awaitables, timeout=timeout)
+
+    # -- account ----------------------------------------------------------
+    def managedAccounts(self) -> List[str]:
+        return list(self.market.accounts)
+
+    def _held(self, account: str) -> List[Any]:
+        return [p for p in self.market.positions if not account or p.account == account]
+
+    def positions(self, account: str = "") -> List[Any]:
+        self._count("positions")
+        return self._held(account)
+
+    def portfolio(self, account: str = "") -> List[Any]:
+        self._count("portfolio")
+        out = []
+        for p in self._held(account):
+            price = self.market.quote(p.contract)["last"]
+            mult = float(p.contract.multiplier or 1)
+            value = price * mult * p.position
+            out.append(
+                PortfolioItem(p.contract, p.position, price, value, p.avgCost, value - p.avgCost * p.position, 0.0, p.account)
+            )
+        return out
+
+    def accountSummary(self, account: str = "") -> List[Any]:
+        self._count("accountSummary")
+        out = []
+        for acct in self.market.accounts:
+            if account and acct != account:
+                continue
+            net = sum(abs(p.avgCost * p.position) for p in self._held(acct)) or 1_000_000.0
+            out.extend(
+                AccountValue(acct, tag, f"{val:.2f}", "USD", "")
+                for tag, val in (
+                    ("NetLiquidation", net),
+                    ("TotalCashValue", net * 0.4),
+                    ("BuyingPower", net * 2),
+                    ("MaintMarginReq", net * 0.25),
+                )
+            )
+        return out
+
+    def reqPnL(self, account: str, modelCode: str = "", **_: Any) -> Any:
+        self._count("reqPnL")
+        return PnL(account=account or ACCOUNT, modelCode=modelCode, dailyPnL=0.0, unrealizedPnL=0.0, realizedPnL=0.0)
+
+    def cancelPnL(self, account: str, modelCode: str = "") -> None:
+        pass
+
+    def reqExecutions(self, execFilter: Any = None) -> List[Any]:
+        self._count("reqExecutions")
+        self._roundtrip()
+        since = None
+        stamp = getattr(execFilter, "time", "") or ""
+        if stamp:
+            since = datetime.strptime(stamp[:17], "%Y%m%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        fills = [f for f in self.market.fills if since is None or f.time >= since]
+        for f in fills:
+            self.execDetailsEvent.emit(None, f)
+            self.commissionReportEvent.emit(None, f, f.commissionReport)
+        return fills
+
+    def reqAllOpenOrders(self) -> List[Any]:
+        self._count("reqAllOpenOrders")
+        self._roundtrip()
+        return list(self.market.trades)
+
+    def openTrades(self) -> List[Any]:
+        return list(self.market.trades)
+
+    def openOrders(self) -> List[Any]:
+        return [t.order for t in self.market.trades]
+
+    # -- contracts --------------------------------------------------------
+    def _qualify(self, contracts: Sequence[Any]) -> List[Any]:
+        out = []
+        for c in contracts:
+            found = None if self._fails() else self.market.resolve(c)
+            if found is None:
+                self._error(200, "No security definition has been found for the request", c)
+                continue
+            for f in ("conId", "symbol", "secType", "lastTradeDateOrContractMonth", "strike", "right",
+                      "multiplier", "currency", "localSymbol", "tradingClass", "primaryExchange"):
+                try:
+                    setattr(c, f, getattr(found, f))
+                except Exception:  # pragma: no cover - frozen stand-ins
+                    pass
+            if not getattr(c, "exchange", ""):
+                c.exchange = found.exchange
+            out.append(c)
+        return out
+
+    def qualifyContracts(self, *contracts: Any) -> List[Any]:
+        self._count("qualifyContracts")
+        self._roundtrip()
+        return self._qualify(contracts)
+
+    async def qualifyContractsAsync(self, *contracts: Any) -> List[Any]:
+        self._count("qualifyContracts")
+        await asyncio.sleep(self._delay())
+        return self._qualify(contracts)
+
+    def _details(self, contract: Any) -> List[Any]:
+        if self._fails():
+            self._error(200, "No security definition has been found for the request", contract)
+            return []
+        if getattr(contract, "secType", "") == "FUT" and not contract.lastTradeDateOrContractMonth:
+            found = self.market.future(contract.symbol, contract.exchange)
+        else:
+            one = self.market.resolve(contract)
+            found = [one] if one is not None else []
+        if not found:
+            self._error(200, "No security definition has been found for the request", contract)
+        return [ContractDetails(contract=Contract.create(**util.dataclassAsDict(c))) for c in found]
+
+    def reqContractDetails(self, contract: Any) -> List[Any]:
+        self._count("reqContractDetails")
+        self._roundtrip()
+        return self._details(contract)
+
+    async def reqContractDetailsAsync(self, contract: Any) -> List[Any]:
+        self._count("reqContractDetails")
+        await asyncio.sleep(self._delay())
+        return self._details(contract)
+
+    def reqSecDefOptParams(
+        self, underlyingSymbol: str, futFopExchange: str, underlyingSecType: str, underlyingConId: int
+    ) -> List[Any]:
+        self._count("reqSecDefOptParams")
+        self._roundtrip()
+        info = self.market.underlying(underlyingSymbol)
+        return [
+            OptionChain(
+                "SMART", underlyingConId, underlyingSymbol.upper(), "100",
+                list(self.market.expirations), list(info["strikes"]),
+            )
+        ]
+
+    # -- market data ------------------------------------------------------
+    def reqMarketDataType(self, marketDataType: int) -> None:
+        self._count("reqMarketDataType")
+
+    def reqMktData(
+        self,
+        contract: Any,
+        genericTickList: str = "",
+        snapshot: bool = False,
+        regulatorySnapshot: bool = False,
+        mktDataOptions: Any = None,
+    ) -> Any:
+        self._count("reqMktData")
+        conid = int(getattr(contract, "conId", 0) or 0)
+        tk = self._tickers.get(conid) if conid else None
+        if tk is None:
+            tk = Ticker(contract=contract)
+            if conid:
+                self._tickers[conid] = tk
+        if not snapshot:
+            if len(self._lines) >= self.config.lines and id(tk) not in self._lines:
+                self._error(101, "Max number of tickers has been reached", contract)
+                return tk
+            self._lines[id(tk)] = tk
+        listed = self.market.resolve(contract)
+        if listed is None:
+            self._error(200, "No security definition has been found for the request", contract)
+        elif self._fails():
+            self._error(354, "Requested market data is not subscribed", contract)
+        else:
+            self._pending.append((time.monotonic() + self._delay(), tk, self.market.quote(listed)))
+        return tk
+
+    def cancelMktData(self, contract: Any) -> None:
+        self._count("cancelMktData")
+        conid = int(getattr(contract, "conId", 0) or 0)
+        tk = self._tickers.get(conid)
+        if tk is None:
+            tk = next((t for t in self._lines.values() if t.contract is contract), None)
+        if tk is not None:
+            self._lines.pop(id(tk), None)
+
+    def ticker(self, contract: Any) -> Optional[Any]:
+        return self._tickers.get(int(getattr(contract, "conId", 0) or 0))
+
+    def reqTickers(self, *contracts: Any, regulatorySnapshot: bool = False) -> List[Any]:
+        self._count("reqTickers")
+        tickers = [self.reqMktData(c, "", True) for c in contracts]
+        deadline = time.monotonic() + max(self.config.latency + self.config.jitter, 0.0) + 0.01
+        while self._pending and time.monotonic() < deadline:
+            self.waitOnUpdate(timeout=deadline - time.monotonic())
+        return tickers
+
+    def _history(self, contract: Any, durationStr: str) -> List[Any]:
+        if self._fails():
+            self._error(162, "Historical Market Data Service error message", contract)
+            return []
+        listed = self.market.resolve(contract)
+        if listed is None:
+            self._error(200, "No security definition has been found for the request", contract)
+            return []
+        n, unit = (durationStr or "1 D").split()
+        days = int(n) * {"S": 1, "D": 1, "W": 7, "M": 31, "Y": 365}.get(unit.upper()[:1], 1)
+        return self.market.bars(listed, max(days, 1))
+
+    def reqHistoricalData(self, contract: Any, endDateTime: Any = "", durationStr: str = "1 D", *args: Any, **kwargs: Any) -> List[Any]:
+        self._count("reqHistoricalData")
+        self._roundtrip()
+        return self._history(contract, durationStr)
+
+    async def reqHistoricalDataAsync(self, contract: Any, endDateTime: Any = "", durationStr: str = "1 D", *args: Any, **kwargs: Any) -> List[Any]:
+        self._count("reqHistoricalData")
+        await asyncio.sleep(self._delay())
+        return self._history(contract, durationStr)
+
+
+__all__ = ["ACCOUNT", "FakeConfig", "FakeIB", "FakeMarket", "market"]
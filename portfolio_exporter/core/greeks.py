@@ -1,19 +1,380 @@
-"""Black-Scholes Greek helpers."""
+"""Black-Scholes Greek helpers.
+
+:func:`bs_greeks_vec` is the single pricing kernel; scalar helpers here, in
+``utils/bs.py`` and in ``tech_signals_ibkr`` delegate to it.
+"""
 
 from __future__ import annotations
 
 import math
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict
+
+import numpy as np
+from numpy.typing import ArrayLike
+from scipy.special import ndtr
+
+_INV_SQRT_2PI = 1.0 / math.sqrt(2.0 * math.pi)
+
+
+def bs_greeks_vec(
+    spot: ArrayLike,
+    strike: ArrayLike,
+    t: ArrayLike,
+    r: ArrayLike,
+    vol: ArrayLike,
+    is_call: ArrayLike = True,
+    multiplier: ArrayLike = 100,
+    *,
+    with_price: bool = False,
+    higher_order: bool = False,
+) -> Dict[str, np.ndarray]:
+    """Return Delta, Gamma, Theta and Vega for arrays of vanilla options.
+
+    All inputs are broadcast against each other, so scalars and arrays can be
+    mixed freely (e.g. one spot for a whole chain).  Scaling follows
+    :func:`bs_greeks`: values are multiplied by ``multiplier``, vega is per 1%
+    vol move and theta is per calendar day.  Rows with non-positive or NaN
+    spot, strike, time or vol yield NaN instead of raising.
+
+    With ``with_price=True`` the option value (× ``multiplier``) is returned
+    under ``"price"`` from the same pass.  ``higher_order=True`` adds the
+    second-order sensitivities, scaled consistently with the first-order ones:
+    ``vanna`` (delta per 1% vol), ``volga`` (vega per 1% vol), ``charm``
+    (delta change per calendar day) and ``speed`` (gamma per 1.0 spot move).
+    """
+
+    # Inputs are not broadcast up front: sub-expressions that depend on only
+    # some axes (e.g. log-moneyness on a spot × strike grid) stay small and
+    # only the final terms expand to the full shape.
+    s = np.asarray(spot, dtype=float)
+    k = np.asarray(strike, dtype=float)
+    tt = np.asarray(t, dtype=float)
+    rr = np.asarray(r, dtype=float)
+    v = np.asarray(vol, dtype=float)
+    put = ~np.asarray(is_call, dtype=bool)
+    mult = np.asarray(multiplier, dtype=float)
+    shape = np.broadcast_shapes(s.shape, k.shape, tt.shape, rr.shape, v.shape, put.shape, mult.shape)
+    valid = np.broadcast_to((s > 0) & (k > 0) & (tt > 0) & (v > 0) & np.isfinite(rr), shape)
+
+    with np.errstate(all="ignore"):
+        sqrt_t = np.sqrt(tt)
+        vol_sqrt_t = v * sqrt_t
+        d1 = (np.log(s / k) + (rr + 0.5 * v**2) * tt) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        pdf_d1 = np.exp(-0.5 * d1**2) * _INV_SQRT_2PI
+        cdf_d1 = ndtr(d1)
+        cdf_d2 = ndtr(d2)
+        disc_k = k * np.exp(-rr * tt)
+        carry = rr * disc_k
+        s_pdf = s * pdf_d1
+
+        delta = cdf_d1 - put
+        theta = -s_pdf * v / (2 * sqrt_t) - carry * (cdf_d2 - put)
+        gamma = pdf_d1 / (s * vol_sqrt_t)
+        vega = s_pdf * sqrt_t
+
+        out = {
+            "delta": delta * mult,
+            "gamma": gamma * mult,
+            "vega": vega * (mult / 100),  # IB convention: per 1% move
+            "theta": theta * (mult / 365),  # per-day decay
+        }
+        if with_price:
+            # put via parity: C - S + K·e^(-rT)
+            out["price"] = (s * cdf_d1 - disc_k * cdf_d2 - put * (s - disc_k)) * mult
+        if higher_order:
+            # no dividend yield, so charm is the same for calls and puts
+            out["vanna"] = -pdf_d1 * d2 / v * (mult / 100)
+            out["volga"] = vega * d1 * d2 / v * (mult / 10_000)
+            out["charm"] = (
+                -pdf_d1 * (2 * rr * tt - d2 * vol_sqrt_t) / (2 * tt * vol_sqrt_t) * (mult / 365)
+            )
+            out["speed"] = -gamma / s * (d1 / vol_sqrt_t + 1.0) * mult
+    for key, arr in out.items():
+        arr = np.array(np.broadcast_to(arr, shape), dtype=float)
+        arr[~valid] = np.nan
+        out[key] = arr
+    return out
+
+
+GREEKS_MODELS = ("bs", "american")
+
+
+def greeks_kernel(model: str = "bs") -> Callable[..., Dict[str, np.ndarray]]:
+    """Return the vectorised greeks function for a fallback *model*.
+
+    ``"bs"`` is :func:`bs_greeks_vec`; ``"american"`` is the Barone-Adesi-Whaley
+    engine in :mod:`portfolio_exporter.core.american`.  Both share a signature.
+    """
+
+    model = (model or "bs").lower()
+    if model == "american":
+        from .american import american_greeks_vec
+
+        return american_greeks_vec
+    if model == "bs":
+        return bs_greeks_vec
+    raise ValueError(f"unknown greeks model {model!r}; expected one of {GREEKS_MODELS}")
+
+
+class GreeksCache:
+    """Bounded LRU cache for fallback greeks keyed on quantized market state.
+
+    A row's key is ``(conId, log-spot bucket, IV bucket, time bucket, rate)``
+    plus the model and kernel options, so a leg whose spot, IV and time to
+    expiry stay inside one bucket between refreshes reuses the greeks
+    computed the first time; a new risk-free rate (the FRED yield moves
+    daily) always recomputes.  Misses of a call are computed together in one
+    kernel pass.  The cache holds at least the legs of the last call, so a
+    book larger than ``maxsize`` is not evicted before its next refresh.
+
+    Keying costs a Python pass over the legs, more than the closed-form
+    Black-Scholes kernel itself; it pays off for the Barone-Adesi-Whaley
+    model, which ``portfolio_greeks`` routes through this cache.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        *,
+        spot_tol: float = 1e-3,
+        iv_tol: float = 1e-3,
+        t_tol: float = 1.0 / (365 * 24),
+    ) -> None:
+        self.maxsize = maxsize
+        self.spot_tol = spot_tol
+        self.iv_tol = iv_tol
+        self.t_tol = t_tol
+        self._data: OrderedDict[tuple, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def greeks_vec(
+        self,
+        con_ids: ArrayLike,
+        spot: ArrayLike,
+        strike: ArrayLike,
+        t: ArrayLike,
+        r: float,
+        vol: ArrayLike,
+        is_call: ArrayLike = True,
+        multiplier: float = 1,
+        *,
+        model: str = "bs",
+        **kernel_kw,
+    ) -> Dict[str, np.ndarray]:
+        """Cached :func:`greeks_kernel` ``(model)`` call for 1-D arrays of legs.
+
+        Rows with a missing ``conId`` or unusable inputs bypass the cache.
+        """
+
+        ids, s, k, tt, v, call = np.broadcast_arrays(
+            np.asarray(con_ids, dtype=object),
+            np.asarray(spot, dtype=float),
+            np.asarray(strike, dtype=float),
+            np.asarray(t, dtype=float),
+            np.asarray(vol, dtype=float),
+            np.asarray(is_call, dtype=bool),
+        )
+        with np.errstate(all="ignore"):
+            qs = np.round(np.log(s) / self.spot_tol)
+            qv = np.round(v / self.iv_tol)
+            qt = np.round(tt / self.t_tol)
+        cacheable = np.isfinite(qs) & np.isfinite(qv) & np.isfinite(qt) & (tt > 0) & (v > 0)
+        rate = float(r)
+        extra = (model, float(multiplier), tuple(sorted(kernel_kw.items())))
+
+        # keys are built from plain Python lists: indexing numpy scalars row
+        # by row costs more than the BS kernel itself
+        ok = cacheable & np.array([c is not None and c == c for c in ids.tolist()], dtype=bool)
+        keys: list[tuple | None] = [
+            (cid, a, b, c, rate, d, extra) if use else None
+            for use, cid, a, b, c, d in zip(
+                ok.tolist(), ids.tolist(), qs.tolist(), qv.tolist(), qt.tolist(), call.tolist()
+            )
+        ]
+        data = self._data
+        hit_idx: list[int] = []
+        hit_rows: list[tuple] = []
+        for i, key in enumerate(keys):
+            if key is not None and (val := data.get(key)) is not None:
+                data.move_to_end(key)
+                hit_idx.append(i)
+                hit_rows.append(val)
+        miss = np.ones(len(ids), dtype=bool)
+        miss[hit_idx] = False
+        self.hits += len(hit_idx)
+        self.misses += int((miss & ok).sum())
+
+        fresh = greeks_kernel(model)(
+            s[miss], k[miss], tt[miss], r, v[miss], call[miss], multiplier, **kernel_kw
+        )
+        names = list(fresh)
+        out = {g: np.full(len(ids), np.nan) for g in names}
+        for g in names:
+            out[g][miss] = fresh[g]
+        if hit_idx:
+            hits = np.array(hit_rows, dtype=float)
+            for j, g in enumerate(names):
+                out[g][hit_idx] = hits[:, j]
+        miss_idx = np.flatnonzero(miss)
+        if len(miss_idx):
+            rows = np.column_stack([np.asarray(fresh[g], dtype=float) for g in names]).tolist()
+            for i, row in zip(miss_idx.tolist(), rows):
+                if keys[i] is not None:
+                    data[keys[i]] = tuple(row)
+        # never evict rows of the book being priced: they come round again
+        # on the next refresh
+        cap = max(self.maxsize, len(ids))
+        while len(data) > cap:
+            data.popitem(last=False)
+        return out
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters suitable for a run manifest."""
+
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = self.misses = 0
+
+
+def _default_cache() -> GreeksCache:
+    from .config import settings
+
+    cfg = settings.greeks
+    return GreeksCache(
+        cfg.cache_size,
+        spot_tol=cfg.cache_spot_tol,
+        iv_tol=cfg.cache_iv_tol,
+        t_tol=cfg.cache_t_tol_hours / (365 * 24),
+    )
+
+
+greeks_cache = _default_cache()  # process-wide; shared by refresh loops
+
+
+def _bs_price(s, k, t, r, vol, call):
+    """Unmasked Black-Scholes price; callers handle invalid rows."""
+
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(s / k) + (r + 0.5 * vol**2) * t) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    disc_k = k * np.exp(-r * t)
+    return np.where(
+        call, s * ndtr(d1) - disc_k * ndtr(d2), disc_k * ndtr(-d2) - s * ndtr(-d1)
+    )
+
+
+def bs_price_vec(
+    spot: ArrayLike,
+    strike: ArrayLike,
+    t: ArrayLike,
+    r: ArrayLike,
+    vol: ArrayLike,
+    is_call: ArrayLike = True,
+) -> np.ndarray:
+    """Return per-share Black-Scholes prices for arrays of vanilla options.
+
+    Inputs broadcast like :func:`bs_greeks_vec`; invalid rows yield NaN.
+    """
+
+    s, k, tt, rr, v, call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float),
+        np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float),
+        np.asarray(r, dtype=float),
+        np.asarray(vol, dtype=float),
+        np.asarray(is_call, dtype=bool),
+    )
+    valid = (s > 0) & (k > 0) & (tt > 0) & (v > 0) & np.isfinite(rr)
+    with np.errstate(all="ignore"):
+        price = np.asarray(_bs_price(s, k, tt, rr, v, call), dtype=float)
+    price[~valid] = np.nan
+    return price
+
+
+def implied_vol_vec(
+    price: ArrayLike,
+    spot: ArrayLike,
+    strike: ArrayLike,
+    t: ArrayLike,
+    r: ArrayLike = 0.0,
+    is_call: ArrayLike = True,
+    *,
+    tol: float = 1e-6,
+    max_iter: int = 50,
+    vol_lo: float = 1e-4,
+    vol_hi: float = 5.0,
+) -> np.ndarray:
+    """Solve Black-Scholes implied volatility for a whole chain at once.
+
+    ``price`` is the per-share option mark (e.g. mid).  Each row runs a
+    safeguarded Newton iteration inside a ``[vol_lo, vol_hi]`` bracket that
+    shrinks as the solve progresses; whenever the Newton step would leave the
+    bracket or vega is too small to trust, that row takes a bisection step
+    instead.  Prices outside the no-arbitrage bounds, with less than ``tol``
+    of time value (the solve could not tell them from intrinsic), or not
+    attainable within the bracket, yield NaN.
+    """
+
+    p, s, k, tt, rr, call = np.broadcast_arrays(
+        np.asarray(price, dtype=float),
+        np.asarray(spot, dtype=float),
+        np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float),
+        np.asarray(r, dtype=float),
+        np.asarray(is_call, dtype=bool),
+    )
+    out = np.full(p.shape, np.nan)
 
-from scipy.stats import norm
+    with np.errstate(all="ignore"):
+        disc_k = k * np.exp(-rr * tt)
+        lower = np.where(call, np.maximum(s - disc_k, 0.0), np.maximum(disc_k - s, 0.0))
+        upper = np.where(call, s, disc_k)
+        ok = (s > 0) & (k > 0) & (tt > 0) & np.isfinite(rr) & (p > lower + tol) & (p < upper)
+        if not ok.any():
+            return out
 
+        p, s, k, tt, rr, call = (a[ok] for a in (p, s, k, tt, rr, call))
+        lo = np.full(p.shape, vol_lo)
+        hi = np.full(p.shape, vol_hi)
+        attainable = (_bs_price(s, k, tt, rr, lo, call) <= p) & (
+            _bs_price(s, k, tt, rr, hi, call) >= p
+        )
+        # Brenner-Subrahmanyam ATM approximation as the starting point
+        sqrt_t = np.sqrt(tt)
+        sigma = np.clip(np.sqrt(2 * math.pi / tt) * p / s, vol_lo * 2, vol_hi / 2)
+        active = attainable.copy()
 
-def _d1_d2(s: float, k: float, t: float, r: float, vol: float) -> Tuple[float, float]:
-    """Return the ``d1`` and ``d2`` terms of the Black-Scholes formula."""
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            diff = _bs_price(s, k, tt, rr, sigma, call) - p
+            done = np.abs(diff) < tol
+            active &= ~done
+            hi = np.where(active & (diff > 0), sigma, hi)
+            lo = np.where(active & (diff < 0), sigma, lo)
+            d1 = (np.log(s / k) + (rr + 0.5 * sigma**2) * tt) / (sigma * sqrt_t)
+            vega = s * np.exp(-0.5 * d1**2) * _INV_SQRT_2PI * sqrt_t
+            newton = sigma - diff / vega
+            use_newton = (vega > 1e-10) & (newton > lo) & (newton < hi)
+            step = np.where(use_newton, newton, 0.5 * (lo + hi))
+            sigma = np.where(active, step, sigma)
+            active &= (hi - lo) > tol * 1e-3
 
-    d1 = (math.log(s / k) + (r + 0.5 * vol**2) * t) / (vol * math.sqrt(t))
-    d2 = d1 - vol * math.sqrt(t)
-    return d1, d2
+    solved = np.where(attainable, sigma, np.nan)
+    out[ok] = solved
+    return out
 
 
 def bs_greeks(
@@ -28,26 +389,9 @@ def bs_greeks(
 ) -> Dict[str, float]:
     """Return Delta, Gamma, Theta and Vega for a vanilla option.
 
-    Values are per contract using ``multiplier`` (typically 100).
+    Values are per contract using ``multiplier`` (typically 100).  Scalar
+    front-end to :func:`bs_greeks_vec`; invalid inputs yield NaN.
     """
 
-    d1, d2 = _d1_d2(s, k, t, r, vol)
-    if call:
-        delta = norm.cdf(d1)
-        theta = -s * norm.pdf(d1) * vol / (2 * math.sqrt(t)) - r * k * math.exp(
-            -r * t
-        ) * norm.cdf(d2)
-    else:
-        delta = -norm.cdf(-d1)
-        theta = -s * norm.pdf(d1) * vol / (2 * math.sqrt(t)) + r * k * math.exp(
-            -r * t
-        ) * norm.cdf(-d2)
-
-    gamma = norm.pdf(d1) / (s * vol * math.sqrt(t))
-    vega = s * norm.pdf(d1) * math.sqrt(t)
-    return {
-        "delta": delta * multiplier,
-        "gamma": gamma * multiplier,
-        "vega": vega * multiplier / 100,  # IB convention: per 1% move
-        "theta": theta * multiplier / 365,  # per-day decay
-    }
+    out = bs_greeks_vec(s, k, t, r, vol, call, multiplier)
+    return {g: float(v) for g, v in out.items()}
@@ -0,0 +1,456 @@
+"""Shared daily-bar service with IB pacing and a local bar cache.
+
+Several tools need daily OHLCV history (``tech_signals_ibkr``,
+``historic_prices``, ``daily_pulse``, ``utils.analysis``).  They all go
+through :func:`daily_bars`, which:
+
+* keeps bars in SQLite, one row per symbol/source/date (``bars`` table),
+  and remembers which window each series covers (``fetched`` table).  A
+  repeat run only requests the tail since the last stored bar, and a
+  series refreshed less than ``ttl`` seconds ago is served from disk.
+  IB futures are stored per contract (``symbol@conId``): a root symbol
+  names a new contract month after each roll, and a tail refresh under
+  the root would splice two months into one series;
+* keeps up to ``IB_HIST_CONCURRENCY`` ``reqHistoricalDataAsync`` requests
+  in flight; each takes an ``ib_hist`` token from
+  :mod:`~portfolio_exporter.core.ratelimit`, which holds every process to
+  IB's pacing limit of 60 historical requests per ten minutes.  Duplicate
+  symbols in one call are fetched once;
+* sends symbols IB cannot serve (or every symbol when offline) to
+  yfinance, with one batched ``yf.download`` per start date.
+
+The cache is SQLite rather than columnar files (Parquet per symbol):
+the stack has no Parquet engine (``pyarrow`` is not a dependency), a tail
+refresh is an upsert of a few rows instead of a file rewrite, and SQLite
+serialises the concurrent writers several scripts launched together
+would otherwise race on.  Reads select one series in date order and
+writes go through one ``executemany``, so the row layout stays cheap.
+
+The database lives next to ``contracts.db`` in ``settings.output_dir``; set
+``PE_BARS_DB`` to move it or to ``off`` to keep the cache in memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core.config import settings
+from portfolio_exporter.core.ib_config import HIST_CONCURRENCY as _HIST_CONCURRENCY
+
+try:  # optional dependency; only needed for default IB stock contracts
+    from ib_insync import Stock
+except ImportError:  # pragma: no cover - IB extras not installed
+    Stock = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("date", "open", "high", "low", "close", "adj_close", "volume")
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    source TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    adj_close REAL,
+    volume REAL,
+    PRIMARY KEY (symbol, source, date)
+);
+CREATE TABLE IF NOT EXISTS fetched (
+    symbol TEXT NOT NULL,
+    source TEXT NOT NULL,
+    first TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (symbol, source)
+);
+"""
+
+_YF_COLUMNS = {
+    "Date": "date",
+    "Datetime": "date",
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Close": "close",
+    "Adj Close": "adj_close",
+    "Volume": "volume",
+}
+
+
+class BarStore:
+    """SQLite store of daily bars keyed on ``(symbol, source, date)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_BARS_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "bars.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Bar cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def coverage(self, symbol: str, source: str) -> Optional[Tuple[str, str, float]]:
+        """Return ``(first, last, ts)`` for a cached series, or ``None``."""
+
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT first, ts FROM fetched WHERE symbol=? AND source=?",
+                (symbol, source),
+            ).fetchone()
+            if row is None:
+                return None
+            (last,) = db.execute(
+                "SELECT MAX(date) FROM bars WHERE symbol=? AND source=?",
+                (symbol, source),
+            ).fetchone()
+        return row[0], last or "", row[1]
+
+    def read(self, symbol: str, source: str, start: str) -> pd.DataFrame:
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM bars "
+                "WHERE symbol=? AND source=? AND date>=? ORDER BY date",
+                (symbol, source, start),
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=list(COLUMNS))
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def write(self, symbol: str, source: str, bars: pd.DataFrame, first: str) -> None:
+        """Upsert *bars* and record that the series now starts at *first*."""
+
+        frame = pd.DataFrame({c: pd.to_numeric(bars[c], errors="coerce") for c in COLUMNS[1:]})
+        frame.insert(0, "date", pd.to_datetime(bars["date"]).dt.strftime("%Y-%m-%d").to_numpy())
+        frame.insert(0, "source", source)
+        frame.insert(0, "symbol", symbol)
+        # NaN -> NULL in one pass; rows go to sqlite as plain tuples
+        frame = frame.astype(object).where(frame.notna(), None)
+        rows = list(frame.itertuples(index=False, name=None))
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                f"INSERT OR REPLACE INTO bars (symbol, source, {', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                rows,
+            )
+            prev = db.execute(
+                "SELECT first FROM fetched WHERE symbol=? AND source=?", (symbol, source)
+            ).fetchone()
+            if prev is not None:
+                first = min(first, prev[0])
+            db.execute(
+                "INSERT OR REPLACE INTO fetched (symbol, source, first, ts) VALUES (?, ?, ?, ?)",
+                (symbol, source, first, time.time()),
+            )
+            db.commit()
+
+
+def _store_symbol(symbol: str, contract: Any) -> Optional[str]:
+    """Bar-store key of *symbol* requested from IB as *contract*.
+
+    Futures are keyed on their conId (or expiry); ``None`` for a future
+    that carries neither, whose bars are then fetched in full and not
+    cached.
+    """
+
+    if getattr(contract, "secType", "") not in {"FUT", "FOP"}:
+        return symbol
+    ident = getattr(contract, "conId", 0) or getattr(contract, "lastTradeDateOrContractMonth", "")
+    return f"{symbol}@{ident}" if ident else None
+
+
+def _ib_duration(since: date, today: date) -> str:
+    days = (today - since).days + 1
+    return f"{days} D" if days <= 365 else f"{math.ceil(days / 365)} Y"
+
+
+def _ib_frame(bars: Sequence[Any]) -> pd.DataFrame:
+    df = pd.DataFrame(
+        [
+            {
+                "date": b.date,
+                "open": b.open,
+                "high": b.high,
+                "low": b.low,
+                "close": b.close,
+                "adj_close": b.close,
+                "volume": b.volume,
+            }
+            for b in bars
+        ],
+        columns=list(COLUMNS),
+    )
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _yf_frame(data: pd.DataFrame, symbol: str, batch: Sequence[str]) -> pd.DataFrame:
+    """Extract *symbol* from a (possibly multi-ticker) ``yf.download`` frame."""
+
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return pd.DataFrame(columns=list(COLUMNS))
+        sub = data[symbol]
+    elif len(batch) == 1:
+        sub = data
+    else:
+        return pd.DataFrame(columns=list(COLUMNS))
+    sub = sub.reset_index().rename(columns=_YF_COLUMNS)
+    if "adj_close" not in sub:
+        sub["adj_close"] = sub.get("close")
+    sub = sub.dropna(subset=["close"])
+    sub["date"] = pd.to_datetime(sub["date"]).dt.tz_localize(None)
+    return sub.reindex(columns=list(COLUMNS))
+
+
+class HistoryService:
+    """Fetch daily bars through :class:`BarStore` (see module docstring)."""
+
+    def __init__(
+        self,
+        store: BarStore | None = None,
+        concurrency: int | None = None,
+        ttl: float = 900.0,
+    ) -> None:
+        self.store = store or BarStore()
+        self.concurrency = max(1, int(concurrency or _HIST_CONCURRENCY))
+        self.ttl = ttl
+        self._stats = {"cached": 0, "tail": 0, "full": 0, "ib": 0, "yf": 0, "failed": 0}
+
+    # -- fetchers ---------------------------------------------------------
+    def _ib_fetch(self, ib: Any, jobs: List[Tuple[str, Any, str, str]]) -> List[Any]:
+        """Run ``(symbol, contract, duration, what)`` jobs; bars or exception each."""
+
+        req = getattr(ib, "reqHistoricalDataAsync", None)
+        if req is None or not hasattr(ib, "run"):
+            out: List[Any] = []
+            for _, contract, duration, what in jobs:
+                ratelimit.acquire("ib_hist", client=ib)
+                try:
+                    out.append(ib.reqHistoricalData(contract, "", duration, "1 day", what, useRTH=True))
+                except Exception as exc:
+                    out.append(exc)
+            return out
+
+        async def _gather() -> List[Any]:
+            sem = asyncio.Semaphore(self.concurrency)
+
+            async def _one(contract: Any, duration: str, what: str) -> Any:
+                async with sem:
+                    await ratelimit.acquire_async("ib_hist", client=ib)
+                    return await req(contract, "", duration, "1 day", what, True)
+
+            return await asyncio.gather(
+                *(_one(c, d, w) for _, c, d, w in jobs), return_exceptions=True
+            )
+
+        return list(ib.run(_gather()))
+
+    def _yf_fetch(self, symbols: Sequence[str], since: date, today: date) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        ratelimit.acquire("yahoo")
+        try:
+            data = yf.download(
+                tickers=list(symbols),
+                start=since.isoformat(),
+                end=(today + timedelta(days=1)).isoformat(),
+                interval="1d",
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+            )
+        except Exception as exc:
+            logger.warning("yfinance history error %s: %s", ",".join(symbols), exc)
+            return {}
+        if data is None or data.empty:
+            return {}
+        return {s: _yf_frame(data, s, symbols) for s in symbols}
+
+    # -- public API -------------------------------------------------------
+    def _since(self, symbol: str, source: str, start: date) -> Optional[date]:
+        """Return the first date to request, or ``None`` if the cache is fresh."""
+
+        cov = self.store.coverage(symbol, source)
+        if cov is None or cov[0] > start.isoformat():
+            self._stats["full"] += 1
+            return start
+        first, last, ts = cov
+        if time.time() - ts < self.ttl:
+            self._stats["cached"] += 1
+            return None
+        self._stats["tail"] += 1
+        # re-request the last stored bar: it may have been a partial session
+        return max(date.fromisoformat(last), start) if last else start
+
+    def daily_bars(
+        self,
+        symbols: Iterable[str],
+        days: int = 365,
+        ib: Any = None,
+        contracts: Mapping[str, Any] | None = None,
+        what: str | Mapping[str, str] = "TRADES",
+    ) -> Dict[str, pd.DataFrame]:
+        """Return ``{symbol: bars}`` covering the last *days* calendar days.
+
+        Each frame has the columns of :data:`COLUMNS` with a tz-naive
+        ``date``; symbols no source could serve map to an empty frame.
+        With a connected *ib*, symbols are requested from IB using
+        ``contracts[symbol]`` (default: a SMART ``Stock``) and *what* (a
+        ``whatToShow`` value, or a per-symbol mapping); anything IB returns
+        empty falls back to yfinance.
+        """
+
+        symbols = list(dict.fromkeys(symbols))
+        today = date.today()
+        start = today - timedelta(days=days)
+        use_ib = ib is not None and getattr(ib, "isConnected", lambda: True)()
+        source: Dict[str, str] = {}
+        yf_due: Dict[str, date] = {}
+        ib_jobs: List[Tuple[str, Any, str, str]] = []
+        ib_since: Dict[str, date] = {}
+        ib_key: Dict[str, Optional[str]] = {}
+        uncached: Dict[str, pd.DataFrame] = {}
+
+        for sym in symbols:
+            if use_ib:
+                kind = what if isinstance(what, str) else what.get(sym, "TRADES")
+                source[sym] = f"ib:{kind}"
+                contract = (contracts or {}).get(sym)
+                if contract is None:
+                    contract = Stock(sym, "SMART", "USD")
+                key = ib_key[sym] = _store_symbol(sym, contract)
+                if key is None:
+                    self._stats["full"] += 1
+                    since = start
+                else:
+                    since = self._since(key, source[sym], start)
+                if since is not None:
+                    ib_jobs.append((sym, contract, _ib_duration(since, today), kind))
+                    ib_since[sym] = since
+            else:
+                source[sym] = "yf"
+                since = self._since(sym, "yf", start)
+                if since is not None:
+                    yf_due[sym] = since
+
+        if ib_jobs:
+            t0 = time.monotonic()
+            results = self._ib_fetch(ib, ib_jobs)
+            for (sym, _, _, _), res in zip(ib_jobs, results):
+                if isinstance(res, Exception) or not res:
+                    if isinstance(res, Exception):
+                        logger.warning("IB hist error %s: %s", sym, res)
+                    source[sym] = "yf"
+                    since = self._since(sym, "yf", start)
+                    if since is not None:
+                        yf_due[sym] = since
+                    continue
+                self._stats["ib"] += 1
+                frame = _ib_frame(res)
+                if ib_key[sym] is None:
+                    uncached[sym] = frame[frame["date"] >= pd.Timestamp(start)].reset_index(drop=True)
+                else:
+                    self.store.write(ib_key[sym], source[sym], frame, ib_since[sym].isoformat())
+            logger.info(
+                "historical bars: %d IB requests in %.2fs", len(ib_jobs), time.monotonic() - t0
+            )
+
+        batches: Dict[date, List[str]] = {}
+        for sym, since in yf_due.items():
+            batches.setdefault(since, []).append(sym)
+        for since, batch in batches.items():
+            frames = self._yf_fetch(batch, since, today)
+            for sym in batch:
+                frame = frames.get(sym)
+                if frame is None or frame.empty:
+                    self._stats["failed"] += 1
+                    continue
+                self._stats["yf"] += 1
+                self.store.write(sym, "yf", frame, since.isoformat())
+
+        out: Dict[str, pd.DataFrame] = {}
+        for sym in symbols:
+            if sym in uncached:
+                out[sym] = uncached[sym]
+            else:
+                key = sym if source[sym] == "yf" else ib_key[sym]
+                out[sym] = self.store.read(key, source[sym], start.isoformat())
+        return out
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self._stats)
+
+
+def long_frame(frames: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """Stack ``{ticker: bars}`` into one frame with a ``ticker`` column."""
+
+    parts = [df.assign(ticker=t) for t, df in frames.items() if not df.empty]
+    if not parts:
+        return pd.DataFrame(columns=["date", "ticker", *COLUMNS[1:]])
+    return pd.concat(parts, ignore_index=True)[["date", "ticker", *COLUMNS[1:]]]
+
+
+history_service = HistoryService()
+
+
+def daily_bars(
+    symbols: Iterable[str],
+    days: int = 365,
+    ib: Any = None,
+    contracts: Mapping[str, Any] | None = None,
+    what: str | Mapping[str, str] = "TRADES",
+) -> Dict[str, pd.DataFrame]:
+    """Daily bars through the process-wide :data:`history_service`."""
+
+    return history_service.daily_bars(symbols, days, ib=ib, contracts=contracts, what=what)
+
+
+__all__ = [
+    "BarStore",
+    "COLUMNS",
+    "HistoryService",
+    "daily_bars",
+    "history_service",
+    "long_frame",
+]
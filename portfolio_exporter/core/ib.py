@@ -1,21 +1,40 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import os
 from portfolio_exporter.core.ib_config import HOST as _IB_HOST, PORT as _IB_PORT, client_id as _client_id
+from portfolio_exporter.core.ib_config import MARKET_DATA_LINES as _MARKET_DATA_LINES
+from portfolio_exporter.core.ib_config import (
+    BREAKER_COOLDOWN as _BREAKER_COOLDOWN,
+    BREAKER_FAILURES as _BREAKER_FAILURES,
+)
+import atexit
+import logging
 import math
 import threading
-from typing import Any, Dict
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
 import yfinance as yf
 from ib_insync import IB, Option, Stock
 
+from portfolio_exporter.core import open_interest as oi_core
+from portfolio_exporter.core import ratelimit
 from portfolio_exporter.core.config import settings
 
 _IB_CID = _client_id("core", default=29)
 
 _ib_singleton: IB | None = None
 
+# Upper bound for a snapshot quote; quote_* return as soon as data is in
+QUOTE_TIMEOUT = 1.0
+
+logger = logging.getLogger(__name__)
+
 
 def _ensure_loop() -> asyncio.AbstractEventLoop:
     """Return a running event loop, creating one in this thread if needed."""
@@ -28,12 +47,555 @@ def _ensure_loop() -> asyncio.AbstractEventLoop:
         return loop
 
 
+def _finite(value: Any) -> bool:
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _has_bid_ask(tk: Any) -> bool:
+    bid, ask = getattr(tk, "bid", None), getattr(tk, "ask", None)
+    return _finite(bid) and _finite(ask) and bid > 0 and ask > 0
+
+
+def _has_quote(tk: Any) -> bool:
+    return _has_bid_ask(tk) or _finite(getattr(tk, "last", None))
+
+
+def _has_price(tk: Any) -> bool:
+    return _finite(getattr(tk, "last", None)) or _finite(getattr(tk, "close", None)) or _has_quote(tk)
+
+
+def _has_greeks(tk: Any) -> bool:
+    for name in ("modelGreeks", "lastGreeks", "bidGreeks", "askGreeks"):
+        if _finite(getattr(getattr(tk, name, None), "delta", None)):
+            return True
+    return False
+
+
+def _has_iv(tk: Any) -> bool:
+    return _finite(getattr(tk, "impliedVolatility", None)) or _finite(
+        getattr(getattr(tk, "modelGreeks", None), "impliedVol", None)
+    )
+
+
+def _has_oi(tk: Any) -> bool:
+    return any(
+        _finite(getattr(tk, f, None))
+        for f in ("openInterest", "callOpenInterest", "putOpenInterest")
+    )
+
+
+READY_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "quote": _has_quote,  # two-sided bid/ask or a last trade
+    "bid_ask": _has_bid_ask,  # two-sided bid/ask only
+    "price": _has_price,  # any usable mark: last, close or quote
+    "greeks": _has_greeks,
+    "iv": _has_iv,
+    "oi": _has_oi,
+    "volume": lambda tk: _finite(getattr(tk, "volume", None)) and tk.volume >= 0,
+    "time": lambda tk: getattr(tk, "time", None) is not None,
+}
+
+
+def wait_ready(
+    ib: Any,
+    tickers: Iterable[Any],
+    require: Sequence[str] = ("quote",),
+    timeout: float = 4.0,
+) -> List[bool]:
+    """Block until every ticker has the *require* fields or *timeout* passes.
+
+    Instead of sleeping a fixed interval this wakes on each network update
+    (``ib.waitOnUpdate``) and re-checks only the tickers still pending, so it
+    returns as soon as the last required field arrives.  *require* names
+    entries of :data:`READY_CHECKS`.  Returns a readiness flag per ticker.
+    """
+
+    tickers = list(tickers)
+    checks = [READY_CHECKS[r] for r in require]
+    ready = [False] * len(tickers)
+    pending = list(range(len(tickers)))
+    deadline = time.monotonic() + timeout
+    wait = getattr(ib, "waitOnUpdate", None)
+    while True:
+        still = []
+        for i in pending:
+            if tickers[i] is not None and all(chk(tickers[i]) for chk in checks):
+                ready[i] = True
+            else:
+                still.append(i)
+        pending = still
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            return ready
+        if wait is not None:
+            wait(timeout=remaining)
+        else:
+            ib.sleep(min(remaining, 0.05))
+
+
+class LineScheduler:
+    """Pages market-data subscriptions through a fixed line budget.
+
+    IB caps concurrent market-data lines; requesting more fails with error
+    101 and the excess tickers silently stay empty.  :meth:`subscribe`
+    accepts any number of contracts, keeps at most ``budget`` streams open
+    and cancels each one as soon as its ticker passes the readiness checks
+    of :func:`wait_ready` (or has held its line for ``timeout`` seconds),
+    handing the line to the next queued contract.  Cancelled tickers keep
+    their last values.
+
+    :meth:`stats` reports the peak lines used, queue wait and throughput
+    accumulated over all calls so the budget can be tuned.
+    """
+
+    def __init__(self, ib: Any, budget: int | None = None) -> None:
+        self.ib = ib
+        self.budget = max(1, int(budget or _MARKET_DATA_LINES))
+        self._stats: Dict[str, float] = {
+            "requests": 0,
+            "ready": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "peak_lines": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "elapsed": 0.0,
+        }
+
+    def subscribe(
+        self,
+        contracts: Iterable[Any],
+        require: Sequence[str] = ("quote",),
+        timeout: float = 4.0,
+        generic_ticks: str = "",
+    ) -> List[Any]:
+        """Stream *contracts* through the budget; return tickers in input order.
+
+        Entries are ``None`` where IB rejected the request.
+        """
+
+        contracts = list(contracts)
+        checks = [READY_CHECKS[r] for r in require]
+        out: List[Any] = [None] * len(contracts)
+        queue = deque(range(len(contracts)))
+        active: Dict[int, Tuple[Any, float]] = {}
+        wait = getattr(self.ib, "waitOnUpdate", None)
+        st = self._stats
+        timeouts_before = st["timeouts"]
+        start = time.monotonic()
+        while queue or active:
+            while queue and len(active) < self.budget:
+                i = queue.popleft()
+                ratelimit.acquire("ib_mktdata", client=self.ib)
+                now = time.monotonic()
+                try:
+                    tk = self.ib.reqMktData(contracts[i], generic_ticks, False, False)
+                except Exception as exc:
+                    logger.debug("reqMktData failed for %s: %s", contracts[i], exc)
+                    tk = None
+                if tk is None:
+                    st["errors"] += 1
+                    continue
+                out[i] = tk
+                active[i] = (tk, now)
+                st["requests"] += 1
+                st["queue_wait_total"] += now - start
+                st["queue_wait_max"] = max(st["queue_wait_max"], now - start)
+                st["peak_lines"] = max(st["peak_lines"], len(active))
+
+            now = time.monotonic()
+            done = []
+            for i, (tk, t0) in active.items():
+                if all(chk(tk) for chk in checks):
+                    st["ready"] += 1
+                    done.append(i)
+                elif now - t0 >= timeout:
+                    st["timeouts"] += 1
+                    done.append(i)
+            for i in done:
+                tk, _ = active.pop(i)
+                try:
+                    self.ib.cancelMktData(tk.contract)
+                except Exception:  # pragma: no cover - already gone
+                    pass
+            if active and not done:
+                remaining = min(t0 for _, t0 in active.values()) + timeout - now
+                if wait is not None:
+                    wait(timeout=max(remaining, 0.01))
+                else:
+                    self.ib.sleep(min(max(remaining, 0.0), 0.05))
+        st["elapsed"] += time.monotonic() - start
+        logger.info(
+            "market data: %d tickers via ≤%d lines in %.2fs (%d timed out)",
+            len(contracts),
+            self.budget,
+            time.monotonic() - start,
+            st["timeouts"] - timeouts_before,
+        )
+        return out
+
+    def stats(self) -> Dict[str, float]:
+        st = dict(self._stats)
+        n = st["requests"] or 1
+        st["budget"] = self.budget
+        st["queue_wait_avg"] = st["queue_wait_total"] / n
+        st["throughput"] = st["requests"] / st["elapsed"] if st["elapsed"] else 0.0
+        return st
+
+
+_schedulers: "weakref.WeakKeyDictionary[Any, LineScheduler]" = weakref.WeakKeyDictionary()
+
+
+def line_scheduler(ib: Any) -> LineScheduler:
+    """Return the shared :class:`LineScheduler` for *ib* (one per session)."""
+
+    try:
+        sched = _schedulers.get(ib)
+        if sched is None:
+            sched = _schedulers[ib] = LineScheduler(ib)
+        return sched
+    except TypeError:  # not weak-referenceable
+        return LineScheduler(ib)
+
+
+@functools.lru_cache(maxsize=None)
+def _fake_factory(spec: str) -> Callable[[], Any]:
+    from portfolio_exporter.core.fake_ib import FakeConfig, FakeIB
+
+    return functools.partial(FakeIB, FakeConfig.from_spec(spec))
+
+
+def _recorded(factory: Callable[[], Any], path: str) -> Any:
+    from portfolio_exporter.core.replay import Recorder
+
+    return Recorder(factory(), path)
+
+
+@functools.lru_cache(maxsize=None)
+def _record_factory(factory: Callable[[], Any], path: str) -> Callable[[], Any]:
+    return functools.partial(_recorded, factory, path)
+
+
+@functools.lru_cache(maxsize=None)
+def _replay_factory(path: str, speed: str) -> Callable[[], Any]:
+    from portfolio_exporter.core.replay import ReplayIB
+
+    rate = 0.0 if speed.lower() in {"0", "max", "fast"} else float(speed)
+    return functools.partial(ReplayIB, path, rate)
+
+
+def client_factory(factory: Callable[[], Any] | None = None) -> Callable[[], Any]:
+    """Return the callable used to build IB clients.
+
+    ``PE_IB_REPLAY`` (a recording path; pace via ``PE_IB_REPLAY_SPEED``,
+    ``1`` or ``max``) selects :class:`~portfolio_exporter.core.replay.ReplayIB`.
+    Otherwise ``PE_FAKE_IB`` selects the in-process
+    :class:`~portfolio_exporter.core.fake_ib.FakeIB` for that spec, whatever
+    *factory* was passed, and the default is *factory* (``ib_insync.IB``).
+    ``PE_IB_RECORD`` wraps the chosen client in a
+    :class:`~portfolio_exporter.core.replay.Recorder` writing to that path.
+    """
+
+    replay = os.getenv("PE_IB_REPLAY")
+    if replay:
+        return _replay_factory(replay, os.getenv("PE_IB_REPLAY_SPEED", "1").strip())
+    spec = os.getenv("PE_FAKE_IB")
+    base = _fake_factory(spec.strip()) if spec else factory or IB
+    record = os.getenv("PE_IB_RECORD")
+    if record:
+        return _record_factory(base, record)
+    return base
+
+
+def make_client(factory: Callable[[], Any] | None = None) -> Any:
+    """Build an unconnected IB client via :func:`client_factory`."""
+
+    return client_factory(factory)()
+
+
+class SessionPool:
+    """Process-wide pool of connected ``IB`` sessions.
+
+    Scripts borrow a session instead of building and connecting their own
+    ``IB()``; a TWS handshake costs 1–3 s, so a menu batch that runs several
+    tools pays it once.  Sessions are keyed on ``(host, port, clientId,
+    factory)``.  By default every borrower shares one client id, resolved via
+    :func:`portfolio_exporter.core.ib_config.client_id` under the name
+    ``"session"`` (so ``IB_CLIENT_ID_SESSION`` overrides it).
+
+    A cached session is health-checked before it is handed out: it must still
+    report ``isConnected()`` and, once idle for ``probe_after`` seconds, answer
+    a ``reqCurrentTime`` round-trip.  Unhealthy sessions are dropped and
+    reconnected transparently.  Borrowers must not ``disconnect()`` a pooled
+    session; the pool closes everything at interpreter exit.
+    """
+
+    def __init__(self, probe_after: float = 30.0, probe_timeout: float = 2.0) -> None:
+        self.probe_after = probe_after
+        self.probe_timeout = probe_timeout
+        self._lock = threading.RLock()
+        self._sessions: Dict[Tuple[str, int, int, Any], IB] = {}
+        self._last_used: Dict[Tuple[str, int, int, Any], float] = {}
+        self._stats = {"connects": 0, "reuses": 0, "reconnects": 0}
+
+    @staticmethod
+    def default_client_id() -> int:
+        return _client_id("session", default=_IB_CID)
+
+    def _healthy(self, key: Tuple[str, int, int, Any], ib: Any) -> bool:
+        is_connected = getattr(ib, "isConnected", None)
+        if is_connected is not None and not is_connected():
+            return False
+        if time.monotonic() - self._last_used.get(key, 0.0) < self.probe_after:
+            return True
+        probe = getattr(ib, "reqCurrentTime", None)
+        if probe is None:
+            return True
+        prev = getattr(ib, "RequestTimeout", 0)
+        try:
+            ib.RequestTimeout = self.probe_timeout
+            probe()
+            return True
+        except Exception as exc:
+            logger.warning("IB session %s failed health probe: %s", key[:3], exc)
+            return False
+        finally:
+            ib.RequestTimeout = prev
+
+    def session(
+        self,
+        *,
+        client_id: int | None = None,
+        host: str | None = None,
+        port: int | None = None,
+        timeout: float = 5.0,
+        factory: Callable[[], Any] | None = None,
+    ) -> IB:
+        """Return a connected session, connecting on first use.
+
+        ``factory`` defaults to :class:`ib_insync.IB`; scripts pass their own
+        module-level ``IB`` binding so it can still be replaced in tests.
+        Connection errors propagate to the caller, which keeps its existing
+        offline fallback.
+        """
+
+        factory = client_factory(factory)
+        cid = self.default_client_id() if client_id is None else int(client_id)
+        key = (host or _IB_HOST, int(port or _IB_PORT), cid, factory)
+        with self._lock:
+            ib = self._sessions.get(key)
+            if ib is not None:
+                if self._healthy(key, ib):
+                    self._stats["reuses"] += 1
+                    self._last_used[key] = time.monotonic()
+                    return ib
+                self._drop(key)
+                self._stats["reconnects"] += 1
+            _ensure_loop()
+            ib = factory()
+            ib.connect(key[0], key[1], clientId=cid, timeout=timeout)
+            self._stats["connects"] += 1
+            self._sessions[key] = ib
+            self._last_used[key] = time.monotonic()
+            return ib
+
+    @contextmanager
+    def borrow(self, **kwargs: Any) -> Iterator[IB]:
+        """Context-manager form of :meth:`session`; leaves the session open."""
+
+        yield self.session(**kwargs)
+
+    def peek(self, client_id: int | None = None) -> IB | None:
+        """Return an already-connected default-factory session, if any."""
+
+        cid = self.default_client_id() if client_id is None else int(client_id)
+        with self._lock:
+            ib = self._sessions.get((_IB_HOST, int(_IB_PORT), cid, client_factory()))
+            if ib is not None and ib.isConnected():
+                return ib
+        return None
+
+    def _drop(self, key: Tuple[str, int, int, Any]) -> None:
+        ib = self._sessions.pop(key, None)
+        self._last_used.pop(key, None)
+        if ib is not None:
+            try:
+                ib.disconnect()
+            except Exception:  # pragma: no cover - best effort
+                pass
+
+    def close_all(self) -> None:
+        """Disconnect and forget every pooled session."""
+
+        with self._lock:
+            for key in list(self._sessions):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "open": len(self._sessions)}
+
+
+pool = SessionPool()
+atexit.register(pool.close_all)
+
+
+class HealthMonitor:
+    """Per-source success rates, latencies and a circuit breaker.
+
+    Quote helpers :meth:`record` every attempt against a source (``"ib"``,
+    ``"yfinance"``).  After ``failures`` consecutive failures the source's
+    circuit opens and :meth:`allow` answers ``False`` for ``cooldown``
+    seconds, so callers go straight to their fallback instead of waiting on
+    blank snapshots or reconnect attempts.  Once the cool-down has passed a
+    single trial call is let through; one more failure re-opens the circuit,
+    a success closes it.  The IB connection itself is left alone.
+    """
+
+    def __init__(
+        self,
+        failures: int | None = None,
+        cooldown: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failures = max(1, int(failures or _BREAKER_FAILURES))
+        self.cooldown = float(_BREAKER_COOLDOWN if cooldown is None else cooldown)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict[str, Any]] = {}
+
+    def _source(self, name: str) -> Dict[str, Any]:
+        src = self._sources.get(name)
+        if src is None:
+            src = self._sources[name] = {
+                "calls": 0,
+                "ok": 0,
+                "streak": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "opened_at": None,
+                "trips": 0,
+                "skipped": 0,
+            }
+        return src
+
+    def allow(self, name: str) -> bool:
+        """Return ``True`` unless *name*'s circuit is open."""
+
+        with self._lock:
+            src = self._source(name)
+            opened = src["opened_at"]
+            if opened is None:
+                return True
+            if self._clock() - opened >= self.cooldown:
+                src["opened_at"] = None
+                src["streak"] = self.failures - 1  # half-open: one trial
+                return True
+            src["skipped"] += 1
+            return False
+
+    def record(self, name: str, ok: bool, latency: float = 0.0) -> None:
+        """Account one attempt against *name* and trip the breaker if due."""
+
+        with self._lock:
+            src = self._source(name)
+            src["calls"] += 1
+            src["latency_total"] += latency
+            src["latency_max"] = max(src["latency_max"], latency)
+            if ok:
+                src["ok"] += 1
+                src["streak"] = 0
+                return
+            src["streak"] += 1
+            if src["streak"] >= self.failures and src["opened_at"] is None:
+                src["opened_at"] = self._clock()
+                src["trips"] += 1
+                logger.info(
+                    "%s unhealthy after %d failures; using fallback for %.0fs",
+                    name,
+                    src["streak"],
+                    self.cooldown,
+                )
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        """Record the wrapped block as a success unless it raises."""
+
+        t0 = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(name, False, time.monotonic() - t0)
+            raise
+        self.record(name, True, time.monotonic() - t0)
+
+    def is_open(self, name: str) -> bool:
+        with self._lock:
+            opened = self._source(name)["opened_at"]
+            return opened is not None and self._clock() - opened < self.cooldown
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-source counters, success rate and mean latency."""
+
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            names = list(self._sources)
+        for name in names:
+            with self._lock:
+                src = dict(self._sources[name])
+            n = src["calls"]
+            out[name] = {
+                "calls": n,
+                "ok": src["ok"],
+                "failures": n - src["ok"],
+                "success_rate": src["ok"] / n if n else 1.0,
+                "latency_avg": src["latency_total"] / n if n else 0.0,
+                "latency_max": src["latency_max"],
+                "trips": src["trips"],
+                "skipped": src["skipped"],
+                "state": "open" if self.is_open(name) else "closed",
+            }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._sources.clear()
+
+
+health = HealthMonitor()
+
+
+def _healthy_ib() -> IB | None:
+    """Return the connected IB session, or ``None`` while its circuit is open."""
+
+    if not health.allow("ib"):
+        return None
+    t0 = time.monotonic()
+    ib = _ib()
+    if ib.isConnected():
+        return ib
+    health.record("ib", False, time.monotonic() - t0)
+    return None
+
+
+def session(**kwargs: Any) -> IB:
+    """Return the process-wide shared IB session (see :class:`SessionPool`)."""
+
+    return pool.session(**kwargs)
+
+
 def _ib() -> IB:
     """Return a cached IB connection if available."""
     global _ib_singleton
+    shared = pool.peek()
+    if shared is not None:
+        return shared
     if _ib_singleton and _ib_singleton.isConnected():
         return _ib_singleton
-    _ib_singleton = IB()
+    _ib_singleton = make_client()
 
     async def _try_connect():
         try:
@@ -54,23 +616,28 @@ def _ib() -> IB:
 def quote_stock(symbol: str) -> Dict[str, Any]:
     """Fetch snapshot quote for a stock.
 
-    Attempts IBKR first and falls back to yfinance.
+    Attempts IBKR first and falls back to yfinance.  While the IB circuit
+    is open (see :class:`HealthMonitor`) the IB attempt is skipped.
     """
-    ib = _ib()
-    if ib.isConnected():
+    ib = _healthy_ib()
+    if ib is not None:
+        t0 = time.monotonic()
         stk = Stock(symbol, "SMART", "USD")
+        ratelimit.acquire("ib_mktdata", client=ib)
         ticker = ib.reqMktData(stk, "", snapshot=True)
-        ib.sleep(0.3)
+        wait_ready(ib, [ticker], ("quote",), timeout=QUOTE_TIMEOUT)
         mid = (
             (ticker.bid + ticker.ask) / 2 if ticker.bid and ticker.ask else ticker.last
         )
         # IB can return blanks outside RTH; if so, fall back to yfinance
-        if mid is None or (isinstance(mid, float) and math.isnan(mid)):
-            ib.disconnect()
-        else:
+        ok = not (mid is None or (isinstance(mid, float) and math.isnan(mid)))
+        health.record("ib", ok, time.monotonic() - t0)
+        if ok:
             return {"mid": mid, "bid": ticker.bid, "ask": ticker.ask}
-    yf_tkr = yf.Ticker(symbol)
-    price = yf_tkr.history(period="1d")["Close"].iloc[-1]
+    ratelimit.acquire("yahoo")
+    with health.track("yfinance"):
+        yf_tkr = yf.Ticker(symbol)
+        price = yf_tkr.history(period="1d")["Close"].iloc[-1]
     return {"mid": price, "bid": price, "ask": price}
 
 
@@ -87,76 +654,164 @@ def quote_option(symbol: str, expiry: str, strike: float, right: str) -> Dict[st
         Dictionary with keys ``mid``, ``bid``, ``ask``, ``delta``, ``gamma``,
         ``vega``, ``theta`` and ``iv``.
     """
-    ib = _ib()
-    if ib.isConnected():
+    ib = _healthy_ib()
+    if ib is not None:
+        t0 = time.monotonic()
         # IB expects yyyymmdd string for lastTradeDateOrContractMonth
         opt = Option(symbol, expiry.replace("-", ""), strike, right, "SMART", "USD")
+        ratelimit.acquire("ib_mktdata", client=ib)
         ticker = ib.reqMktData(opt, "", snapshot=True)
-        ib.sleep(0.3)
-        mid = (
-            (ticker.bid + ticker.ask) / 2 if ticker.bid and ticker.ask else ticker.last
-        )
-        if mid is None or (isinstance(mid, float) and math.isnan(mid)):
-            # empty snapshot → disconnect so we hit the fallback below
-            ib.disconnect()
-        else:
-            g = ticker.modelGreeks
-            return {
-                "mid": mid,
-                "bid": ticker.bid,
-                "ask": ticker.ask,
-                "delta": getattr(g, "delta", math.nan),
-                "gamma": getattr(g, "gamma", math.nan),
-                "vega": getattr(g, "vega", math.nan),
-                "theta": getattr(g, "theta", math.nan),
-                "iv": getattr(g, "impliedVol", math.nan),
-            }
+        wait_ready(ib, [ticker], ("quote", "greeks"), timeout=QUOTE_TIMEOUT)
+        q = _ib_option_quote(ticker)
+        # an empty snapshot counts against IB; the session stays connected
+        health.record("ib", q is not None, time.monotonic() - t0)
+        if q is not None:
+            return q
 
-    yf_tkr = yf.Ticker(symbol)
-    chain = yf_tkr.option_chain(expiry)
-    tbl = chain.calls if right == "C" else chain.puts
-    row = tbl.loc[tbl["strike"] == strike]
-    if row.empty:
+    q = _yf_option_quotes(symbol, expiry, [(strike, right)]).get((strike, right))
+    if q is None:
         raise ValueError("Strike not found in yfinance chain")
-    bid = row["bid"].values[0]
-    ask = row["ask"].values[0]
-    iv = row["impliedVolatility"].values[0]
-    mid = (bid + ask) / 2
-    q = {
+    return q
+
+
+def _ib_option_quote(ticker: Any) -> Dict[str, Any] | None:
+    """Map an IB option ticker to the :func:`quote_option` dict, if priced."""
+
+    if ticker is None:
+        return None
+    bid, ask = ticker.bid, ticker.ask
+    mid = (bid + ask) / 2 if bid and ask else ticker.last
+    if mid is None or (isinstance(mid, float) and math.isnan(mid)):
+        return None
+    g = ticker.modelGreeks
+    return {
         "mid": mid,
         "bid": bid,
         "ask": ask,
-        "delta": math.nan,
-        "gamma": math.nan,
-        "vega": math.nan,
-        "theta": math.nan,
-        "iv": iv,
+        "delta": getattr(g, "delta", math.nan),
+        "gamma": getattr(g, "gamma", math.nan),
+        "vega": getattr(g, "vega", math.nan),
+        "theta": getattr(g, "theta", math.nan),
+        "iv": getattr(g, "impliedVol", math.nan),
     }
-    if (
-        (
-            q["delta"] is None
-            or (isinstance(q["delta"], float) and math.isnan(q["delta"]))
+
+
+def _yf_option_quotes(
+    symbol: str, expiry: str, legs: Sequence[Tuple[float, str]]
+) -> Dict[Tuple[float, str], Dict[str, Any]]:
+    """Quote *legs* ``(strike, right)`` from one yfinance chain download.
+
+    Greeks are filled with Black-Scholes from the chain IV; strikes missing
+    from the chain are absent from the result.
+    """
+
+    yf_tkr = yf.Ticker(symbol)
+    ratelimit.acquire("yahoo")
+    with health.track("yfinance"):
+        chain = yf_tkr.option_chain(expiry)
+    # the chain carries open interest too: share it with OI-only callers
+    oi_core.oi_service.record(symbol, expiry, chain)
+    out: Dict[Tuple[float, str], Dict[str, Any]] = {}
+    spot = None
+    for strike, right in legs:
+        tbl = chain.calls if right == "C" else chain.puts
+        row = tbl.loc[tbl["strike"] == strike]
+        if row.empty:
+            continue
+        bid = row["bid"].values[0]
+        ask = row["ask"].values[0]
+        iv = row["impliedVolatility"].values[0]
+        q = {
+            "mid": (bid + ask) / 2,
+            "bid": bid,
+            "ask": ask,
+            "delta": math.nan,
+            "gamma": math.nan,
+            "vega": math.nan,
+            "theta": math.nan,
+            "iv": iv,
+        }
+        if iv and not math.isnan(iv):
+            from datetime import date
+
+            from portfolio_exporter.core.greeks import bs_greeks
+
+            if spot is None:
+                ratelimit.acquire("yahoo")
+                hist = yf_tkr.history(period="1d")
+                spot = hist["Close"].iloc[-1] if not hist.empty else math.nan
+            t = (date.fromisoformat(expiry) - date.today()).days / 365
+            greeks = bs_greeks(
+                strike if math.isnan(spot) else spot,
+                strike,
+                t,
+                settings.greeks.risk_free,
+                iv,
+                call=(right == "C"),
+                multiplier=100,
+            )
+            q.update(greeks)
+        out[(strike, right)] = q
+    return out
+
+
+def quote_many(
+    specs: Iterable[Tuple[str, str, float, str]],
+    timeout: float = QUOTE_TIMEOUT,
+    max_workers: int = 8,
+) -> List[Dict[str, Any] | None]:
+    """Quote many options at once; the batch form of :func:`quote_option`.
+
+    *specs* are ``(symbol, expiry, strike, right)`` tuples with ``expiry`` in
+    ``YYYY-MM-DD`` format.  All IB requests go out together through the
+    session's :func:`line_scheduler`, so the batch waits roughly one quote
+    timeout rather than one per contract.  Contracts IB leaves unpriced are
+    filled from yfinance, downloading each ``(symbol, expiry)`` chain once
+    and chains in parallel.  IB is skipped while its circuit is open.
+
+    Returns one dict per spec, in input order, with the same keys as
+    :func:`quote_option`; entries are ``None`` where no source lists the
+    strike.
+    """
+
+    specs = [(sym, exp, float(k), r.upper()) for sym, exp, k, r in specs]
+    quotes: List[Dict[str, Any] | None] = [None] * len(specs)
+    if not specs:
+        return quotes
+
+    ib = _healthy_ib()
+    if ib is not None:
+        t0 = time.monotonic()
+        contracts = [
+            Option(sym, exp.replace("-", ""), k, r, "SMART", "USD")
+            for sym, exp, k, r in specs
+        ]
+        tickers = line_scheduler(ib).subscribe(
+            contracts, ("quote", "greeks"), timeout=timeout
         )
-        and iv
-        and not math.isnan(iv)
-    ):
-        from datetime import date
-
-        from portfolio_exporter.core.greeks import bs_greeks
-
-        hist = yf_tkr.history(period="1d")
-        spot = hist["Close"].iloc[-1] if not hist.empty else strike
-        expiry_dt = date.fromisoformat(expiry)
-        t = (expiry_dt - date.today()).days / 365
-        mult = 100
-        greeks = bs_greeks(
-            spot,
-            strike,
-            t,
-            settings.greeks.risk_free,
-            iv,
-            call=(right == "C"),
-            multiplier=mult,
+        quotes = [_ib_option_quote(tk) for tk in tickers]
+        health.record(
+            "ib", any(q is not None for q in quotes), time.monotonic() - t0
         )
-        q.update(greeks)
-    return q
+
+    misses: Dict[Tuple[str, str], List[int]] = {}
+    for i, q in enumerate(quotes):
+        if q is None:
+            misses.setdefault(specs[i][:2], []).append(i)
+    if not misses:
+        return quotes
+
+    def _fetch(key: Tuple[str, str]) -> Dict[Tuple[float, str], Dict[str, Any]]:
+        try:
+            return _yf_option_quotes(*key, [specs[i][2:] for i in misses[key]])
+        except Exception as exc:
+            logger.debug("yfinance chain %s %s failed: %s", *key, exc)
+            return {}
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as ex:
+        for key, found in zip(misses, ex.map(_fetch, misses)):
+            for i in misses[key]:
+                quotes[i] = found.get(specs[i][2:])
+    return quotes
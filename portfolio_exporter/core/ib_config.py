@@ -12,6 +12,14 @@ Environment variables
 - `IB_CLIENT_ID_<NAME>`: Per-script client id override, where `<NAME>` is the
   uppercased name passed to `client_id(name, default)` (e.g., `update_tickers`
   → `IB_CLIENT_ID_UPDATE_TICKERS`).
+- `IB_MARKET_DATA_LINES`: Concurrent market-data lines a script may hold
+  (default: `90`, leaving headroom under IB's standard 100-line allowance).
+- `IB_HIST_CONCURRENCY`: Historical-data requests kept in flight at once by
+  `core.history` (default: `6`).
+- `IB_BREAKER_FAILURES`: Consecutive failed IB quotes before `core.ib` stops
+  asking IB and goes straight to the fallback source (default: `3`).
+- `IB_BREAKER_COOLDOWN`: Seconds the breaker stays open before IB is tried
+  again (default: `120`).
 
 The `client_id` helper returns a stable integer that callers can use when
 connecting via `ib_insync`. Callers typically pass a human-friendly name and a
@@ -25,6 +33,10 @@ import os
 # Defaults align with a typical TWS paper-trading setup.
 HOST: str = os.getenv("IB_HOST", "127.0.0.1")
 PORT: int = int(os.getenv("IB_PORT", "7497"))
+MARKET_DATA_LINES: int = int(os.getenv("IB_MARKET_DATA_LINES", "90"))
+HIST_CONCURRENCY: int = int(os.getenv("IB_HIST_CONCURRENCY", "6"))
+BREAKER_FAILURES: int = int(os.getenv("IB_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN: float = float(os.getenv("IB_BREAKER_COOLDOWN", "120"))
 
 
 def client_id(name: str, default: int = 0) -> int:
@@ -55,5 +67,13 @@ def client_id(name: str, default: int = 0) -> int:
     return int(default)
 
 
-__all__ = ["HOST", "PORT", "client_id"]
+__all__ = [
+    "BREAKER_COOLDOWN",
+    "BREAKER_FAILURES",
+    "HIST_CONCURRENCY",
+    "HOST",
+    "MARKET_DATA_LINES",
+    "PORT",
+    "client_id",
+]
 
@@ -0,0 +1,297 @@
+"""Yahoo open interest with a persistent per-trade-date cache.
+
+Open interest is published once a day, yet ``option_chain_snapshot``,
+``portfolio_greeks`` and the ``core.ib`` yfinance fallback each rebuilt
+``yf.Ticker(sym).option_chain(expiry)`` from scratch for it.  Every caller
+now goes through :data:`oi_service`, which:
+
+* keeps open interest in SQLite keyed on ``(symbol, expiry, trade_date)``
+  with one row per strike/right, and remembers which chains were fetched
+  for a trade date (``fetched`` table) so an empty chain is not retried;
+* stores a chain with one vectorized concat of its calls and puts, and
+  takes chains other code already downloaded via :meth:`OpenInterestService.record`;
+* prefetches every ``(symbol, expiry)`` of a book concurrently and maps the
+  result onto a frame of legs with a single merge (:meth:`~OpenInterestService.merge`).
+
+Expiries are stored as ``YYYY-MM-DD``; IB-style ``YYYYMMDD`` is accepted
+everywhere.  The trade date is the current New York calendar date.
+
+The database lives next to ``bars.db`` in ``settings.output_dir``; set
+``PE_OI_DB`` to move it or to ``off`` to keep the cache in memory.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import yfinance as yf
+
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo("America/New_York")
+COLUMNS = ("strike", "right", "open_interest")
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS open_interest (
+    symbol TEXT NOT NULL,
+    expiry TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    strike REAL NOT NULL,
+    right TEXT NOT NULL,
+    oi INTEGER,
+    PRIMARY KEY (symbol, expiry, trade_date, strike, right)
+);
+CREATE TABLE IF NOT EXISTS fetched (
+    symbol TEXT NOT NULL,
+    expiry TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (symbol, expiry, trade_date)
+);
+"""
+
+
+def yf_expiry(expiry: str) -> str:
+    """Normalise IB ``YYYYMMDD`` (or already dashed) expiries to ``YYYY-MM-DD``."""
+
+    exp = str(expiry).strip()
+    if len(exp) >= 8 and exp[:8].isdigit():
+        return f"{exp[:4]}-{exp[4:6]}-{exp[6:8]}"
+    return exp
+
+
+def trade_date() -> str:
+    return datetime.now(MARKET_TZ).date().isoformat()
+
+
+def chain_frame(chain: Any) -> pd.DataFrame:
+    """Flatten a yfinance ``option_chain`` result to :data:`COLUMNS`."""
+
+    parts = []
+    for right, tbl in (("C", getattr(chain, "calls", None)), ("P", getattr(chain, "puts", None))):
+        if tbl is None or getattr(tbl, "empty", True) or "openInterest" not in tbl:
+            continue
+        parts.append(
+            pd.DataFrame(
+                {
+                    "strike": pd.to_numeric(tbl["strike"], errors="coerce"),
+                    "right": right,
+                    "open_interest": pd.to_numeric(tbl["openInterest"], errors="coerce"),
+                }
+            )
+        )
+    if not parts:
+        return pd.DataFrame(columns=list(COLUMNS))
+    return pd.concat(parts, ignore_index=True).dropna()
+
+
+class OpenInterestStore:
+    """SQLite store of open interest keyed on ``(symbol, expiry, trade_date)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_OI_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "open_interest.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("OI cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def has(self, symbol: str, expiry: str, day: str) -> bool:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT 1 FROM fetched WHERE symbol=? AND expiry=? AND trade_date=?",
+                (symbol, expiry, day),
+            ).fetchone()
+        return row is not None
+
+    def read(self, keys: Iterable[Tuple[str, str]], day: str) -> pd.DataFrame:
+        """Rows for every ``(symbol, expiry)`` in *keys* on trade date *day*."""
+
+        keys = list(dict.fromkeys(keys))
+        rows: List[Tuple[Any, ...]] = []
+        with self._lock:
+            db = self._db()
+            for sym, exp in keys:
+                rows.extend(
+                    db.execute(
+                        "SELECT symbol, expiry, strike, right, oi FROM open_interest "
+                        "WHERE symbol=? AND expiry=? AND trade_date=?",
+                        (sym, exp, day),
+                    ).fetchall()
+                )
+        return pd.DataFrame(rows, columns=["symbol", "expiry", *COLUMNS])
+
+    def write(self, symbol: str, expiry: str, day: str, frame: pd.DataFrame) -> None:
+        rows = [
+            (symbol, expiry, day, float(k), str(r), int(oi))
+            for k, r, oi in frame[list(COLUMNS)].itertuples(index=False)
+        ]
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO open_interest "
+                "(symbol, expiry, trade_date, strike, right, oi) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO fetched (symbol, expiry, trade_date, ts) VALUES (?, ?, ?, ?)",
+                (symbol, expiry, day, time.time()),
+            )
+            db.commit()
+
+
+class OpenInterestService:
+    """Resolve open interest through :class:`OpenInterestStore` (see module docstring)."""
+
+    def __init__(self, store: OpenInterestStore | None = None, workers: int = 8) -> None:
+        self.store = store or OpenInterestStore()
+        self.workers = max(1, workers)
+        self._stats = {"cached": 0, "fetched": 0, "recorded": 0, "failed": 0}
+
+    def record(self, symbol: str, expiry: str, chain: Any) -> None:
+        """Store the open interest of a chain some other caller downloaded."""
+
+        frame = chain_frame(chain)
+        if frame.empty:
+            return
+        self.store.write(symbol, yf_expiry(expiry), trade_date(), frame)
+        self._stats["recorded"] += 1
+
+    def _fetch(self, key: Tuple[str, str], day: str) -> None:
+        symbol, expiry = key
+        ratelimit.acquire("yahoo")
+        try:
+            chain = yf.Ticker(symbol).option_chain(expiry)
+        except Exception as exc:
+            self._stats["failed"] += 1
+            logger.debug("yfinance OI fetch fail %s %s: %s", symbol, expiry, exc)
+            return
+        self.store.write(symbol, expiry, day, chain_frame(chain))
+        self._stats["fetched"] += 1
+
+    def prefetch(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Fetch every ``(symbol, expiry)`` not yet stored for today, concurrently."""
+
+        day = trade_date()
+        keys = list(dict.fromkeys((str(s), yf_expiry(e)) for s, e in keys if s and e))
+        due = [k for k in keys if not self.store.has(*k, day)]
+        self._stats["cached"] += len(keys) - len(due)
+        if not due:
+            return
+        t0 = time.monotonic()
+        if len(due) == 1:
+            self._fetch(due[0], day)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(due))) as pool:
+                list(pool.map(lambda k: self._fetch(k, day), due))
+        logger.info("open interest: %d chains fetched in %.2fs", len(due), time.monotonic() - t0)
+
+    def chain(self, symbol: str, expiry: str) -> pd.DataFrame:
+        """Open interest of one chain as a :data:`COLUMNS` frame."""
+
+        self.prefetch([(symbol, expiry)])
+        return self.store.read([(symbol, yf_expiry(expiry))], trade_date())[list(COLUMNS)]
+
+    def mapping(self, symbol: str, expiry: str) -> Dict[Tuple[float, str], int]:
+        """``{(strike, right): open_interest}`` for one chain (``{}`` if unavailable)."""
+
+        df = self.chain(symbol, expiry)
+        return {(float(k), r): int(oi) for k, r, oi in df.itertuples(index=False)}
+
+    def merge(
+        self,
+        df: pd.DataFrame,
+        symbol: str = "symbol",
+        expiry: str = "expiry",
+        strike: str = "strike",
+        right: str = "right",
+    ) -> pd.Series:
+        """Open interest for each leg of *df*, aligned to its index (NaN if unknown).
+
+        All chains of the book are prefetched first, then looked up with a
+        single merge.
+        """
+
+        if df.empty:
+            return pd.Series(dtype=float, index=df.index)
+        legs = pd.DataFrame(
+            {
+                "symbol": df[symbol].astype(str).to_numpy(),
+                "expiry": df[expiry].astype(str).map(yf_expiry).to_numpy(),
+                "strike": pd.to_numeric(df[strike], errors="coerce").to_numpy(dtype=float),
+                "right": df[right].astype(str).str.upper().str[:1].to_numpy(),
+            }
+        )
+        keys = list(zip(legs["symbol"], legs["expiry"]))
+        self.prefetch(keys)
+        table = self.store.read(keys, trade_date())
+        out = legs.merge(table, on=["symbol", "expiry", "strike", "right"], how="left")
+        return pd.Series(out["open_interest"].to_numpy(dtype=float), index=df.index, name="open_interest")
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+oi_service = OpenInterestService()
+
+
+def mapping(symbol: str, expiry: str) -> Dict[Tuple[float, str], int]:
+    """Chain open interest through the process-wide :data:`oi_service`."""
+
+    return oi_service.mapping(symbol, expiry)
+
+
+def merge(df: pd.DataFrame, **columns: str) -> pd.Series:
+    """Per-leg open interest through the process-wide :data:`oi_service`."""
+
+    return oi_service.merge(df, **columns)
+
+
+__all__ = [
+    "COLUMNS",
+    "OpenInterestService",
+    "OpenInterestStore",
+    "chain_frame",
+    "mapping",
+    "merge",
+    "oi_service",
+    "yf_expiry",
+]
@@ -0,0 +1,205 @@
+"""Cross-process token buckets for external data sources.
+
+Scripts launched together from ``orchestrate_dataset`` or the menus used
+to pace themselves independently (fixed sleeps, per-process windows) and
+hit provider throttling together.  Every fetch path now calls
+:func:`acquire` with its source name before a request:
+
+* each source of :data:`LIMITS` is a token bucket of ``count`` tokens
+  refilled over ``period`` seconds, so bursts up to ``count`` go out at
+  once and the sustained rate is exactly ``count / period``;
+* bucket state lives in one SQLite file shared by all processes; a
+  reservation happens inside ``BEGIN IMMEDIATE`` and may drive the bucket
+  negative, which queues later callers (in any process) behind it instead
+  of having them poll;
+* clients that only simulate IB (``FakeIB``, ``ReplayIB``; anything with a
+  true ``simulated`` attribute) pass ``client=`` and are never paced.
+
+The database lives next to ``bars.db`` in ``settings.output_dir``; set
+``PE_RATELIMIT_DB`` to move it or to ``off`` to share buckets only within
+the process.  ``PE_RATELIMIT=off`` disables pacing altogether, and
+``PE_RATE_<SOURCE>=count/seconds`` (e.g. ``PE_RATE_YAHOO=100/60``)
+overrides a limit.  Per-source counters (:meth:`RateLimiter.stats`) are
+reported in the run manifests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+from portfolio_exporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# source -> (requests, per seconds)
+LIMITS: Dict[str, Tuple[float, float]] = {
+    "ib_hist": (60, 600.0),  # IB historical data: 60 requests per 10 minutes
+    "ib_mktdata": (50, 1.0),  # IB API: 50 messages per second
+    "yahoo": (200, 120.0),  # unofficial; stays clear of Yahoo's 429s
+    "fred": (120, 60.0),  # FRED API: 120 requests per minute
+    "cp": (10, 1.0),  # Client Portal Web API: 10 requests per second
+}
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS buckets (
+    source TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def _enabled() -> bool:
+    return os.environ.get("PE_RATELIMIT", "").lower() != "off"
+
+
+def _simulated(client: Any) -> bool:
+    return client is not None and bool(getattr(client, "simulated", False))
+
+
+class RateLimiter:
+    """Token buckets keyed per source (see module docstring)."""
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        limits: Mapping[str, Tuple[float, float]] | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._path = path
+        self._limits = dict(limits or LIMITS)
+        self._clock = clock
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_RATELIMIT_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "ratelimit.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Rate-limit state at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def limit(self, source: str) -> Tuple[float, float]:
+        """``(count, period)`` for *source*, honouring ``PE_RATE_<SOURCE>``."""
+
+        env = os.environ.get(f"PE_RATE_{source.upper()}")
+        if env:
+            try:
+                count, _, period = env.partition("/")
+                parsed = float(count), float(period or 1.0)
+                if not all(v > 0 and math.isfinite(v) for v in parsed):
+                    raise ValueError(env)
+                return parsed
+            except ValueError:
+                logger.warning("Ignoring malformed PE_RATE_%s=%r", source.upper(), env)
+        if source not in self._limits:
+            raise KeyError(f"unknown rate-limit source {source!r}")
+        return self._limits[source]
+
+    def reserve(self, source: str, n: float = 1.0) -> float:
+        """Take *n* tokens from *source*; return the seconds to wait before using them."""
+
+        count, period = self.limit(source)
+        rate = count / period
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT tokens, updated FROM buckets WHERE source=?", (source,)
+                ).fetchone()
+                now = self._clock()
+                tokens = count if row is None else min(count, row[0] + (now - row[1]) * rate)
+                tokens -= n
+                db.execute(
+                    "INSERT OR REPLACE INTO buckets (source, tokens, updated) VALUES (?, ?, ?)",
+                    (source, tokens, now),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        wait = max(0.0, -tokens / rate)
+        st = self._stats.setdefault(source, {"acquired": 0, "waited": 0, "wait_total": 0.0})
+        st["acquired"] += n
+        if wait > 0:
+            st["waited"] += 1
+            st["wait_total"] += wait
+        return wait
+
+    def acquire(self, source: str, n: float = 1.0, client: Any = None) -> float:
+        """Block until *n* tokens of *source* are available; return the wait.
+
+        The wait goes through ``client.sleep`` when the client has one, so an
+        ``ib_insync.IB`` keeps processing its network events meanwhile.
+        """
+
+        if not _enabled() or _simulated(client):
+            return 0.0
+        wait = self.reserve(source, n)
+        if wait > 0:
+            logger.debug("%s rate limit: waiting %.2fs", source, wait)
+            getattr(client, "sleep", time.sleep)(wait)
+        return wait
+
+    async def acquire_async(self, source: str, n: float = 1.0, client: Any = None) -> float:
+        """:meth:`acquire` for coroutines: awaits instead of blocking the loop."""
+
+        if not _enabled() or _simulated(client):
+            return 0.0
+        wait = self.reserve(source, n)
+        if wait > 0:
+            logger.debug("%s rate limit: waiting %.2fs", source, wait)
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {s: dict(v) for s, v in self._stats.items()}
+
+
+limiter = RateLimiter()
+
+
+def acquire(source: str, n: float = 1.0, client: Any = None) -> float:
+    """Acquire from the process-wide :data:`limiter`."""
+
+    return limiter.acquire(source, n, client)
+
+
+async def acquire_async(source: str, n: float = 1.0, client: Any = None) -> float:
+    """Async acquire from the process-wide :data:`limiter`."""
+
+    return await limiter.acquire_async(source, n, client)
+
+
+__all__ = ["LIMITS", "RateLimiter", "acquire", "acquire_async", "limiter"]
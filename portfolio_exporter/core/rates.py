@@ -0,0 +1,316 @@
+"""Treasury yields from FRED with a local, incremental series store.
+
+``live_feed`` used to call ``DataReader(series, "fred")`` for every yield
+on every run, downloading each series in full just to read its last
+value.  :class:`YieldService` instead:
+
+* keeps every observation in SQLite, one row per series/date (``yields``
+  table), and remembers when each series was last checked (``fetched``);
+* only requests observations after the last stored date, and skips the
+  request entirely when the series was checked less than ``ttl`` seconds
+  ago (FRED publishes constant-maturity yields once a day);
+* fetches the due series concurrently;
+* records failed fetches (``failures``) and backs off before retrying a
+  failing series, doubling the delay from ``backoff`` seconds up to
+  ``ttl``, so an outage does not cost a request per series on every call.
+
+:func:`risk_free_rate` turns the latest observation of a T-bill series
+into the decimal rate used by the greeks code, falling back to the
+configured ``settings.greeks.risk_free`` when nothing is available.
+
+The database lives next to ``bars.db`` in ``settings.output_dir``; set
+``PE_YIELDS_DB`` to move it or to ``off`` to keep the cache in memory.
+``PE_FRED=off`` stops all FRED requests and serves only what is stored.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core.config import settings
+
+try:  # optional dependency; only needed to reach FRED
+    from pandas_datareader import data as web
+except ImportError:  # pragma: no cover - datareader not installed
+    web = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# first date requested for a series the store has never seen
+HISTORY_START = date(1990, 1, 1)
+# 3-month constant-maturity Treasury: the usual short rate for option models
+RISK_FREE_SERIES = "DGS3MO"
+
+Reader = Callable[[str, date, date], pd.Series]
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS yields (
+    series TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (series, date)
+);
+CREATE TABLE IF NOT EXISTS fetched (
+    series TEXT PRIMARY KEY,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    series TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def fred_reader(series: str, start: date, end: date) -> pd.Series:
+    """Observations of *series* between *start* and *end* from FRED."""
+
+    if web is None:
+        raise RuntimeError("pandas_datareader is not installed")
+    ratelimit.acquire("fred")
+    df = web.DataReader(series, "fred", start, end)
+    return df[series] if series in df else df.iloc[:, 0]
+
+
+def _online() -> bool:
+    return os.environ.get("PE_FRED", "").lower() != "off"
+
+
+class YieldStore:
+    """SQLite store of series observations keyed on ``(series, date)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_YIELDS_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "yields.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Yield cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def coverage(self, series: str) -> Optional[Tuple[str, float]]:
+        """Return ``(last_date, ts)`` for a checked series, or ``None``."""
+
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT ts FROM fetched WHERE series=?", (series,)).fetchone()
+            if row is None:
+                return None
+            (last,) = db.execute("SELECT MAX(date) FROM yields WHERE series=?", (series,)).fetchone()
+        return last or "", row[0]
+
+    def failure(self, series: str) -> Optional[Tuple[float, int]]:
+        """Return ``(ts, count)`` of the failed fetches since the last success."""
+
+        with self._lock:
+            row = self._db().execute("SELECT ts, count FROM failures WHERE series=?", (series,)).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def mark_failed(self, series: str) -> None:
+        """Record a failed fetch of *series* now."""
+
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO failures (series, ts, count) VALUES (?, ?, 1) "
+                "ON CONFLICT(series) DO UPDATE SET ts=excluded.ts, count=count+1",
+                (series, time.time()),
+            )
+            db.commit()
+
+    def read(self, series: str, start: str = "") -> pd.Series:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT date, value FROM yields WHERE series=? AND date>=? ORDER BY date",
+                (series, start),
+            ).fetchall()
+        idx = pd.to_datetime([d for d, _ in rows])
+        return pd.Series([math.nan if v is None else v for _, v in rows], index=idx, name=series, dtype=float)
+
+    def last(self, series: str) -> Optional[Tuple[pd.Timestamp, float]]:
+        """Return ``(date, value)`` of the last non-blank observation, or ``None``."""
+
+        with self._lock:
+            row = self._db().execute(
+                "SELECT date, value FROM yields WHERE series=? AND value IS NOT NULL "
+                "ORDER BY date DESC LIMIT 1",
+                (series,),
+            ).fetchone()
+        return None if row is None else (pd.Timestamp(row[0]), float(row[1]))
+
+    def write(self, series: str, values: pd.Series) -> None:
+        """Upsert observations and mark *series* as checked now."""
+
+        values = pd.to_numeric(values, errors="coerce")
+        rows = [
+            (series, d, None if math.isnan(v) else float(v))
+            for d, v in zip(pd.to_datetime(values.index).strftime("%Y-%m-%d"), values.astype(float))
+        ]
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO yields (series, date, value) VALUES (?, ?, ?)", rows)
+            db.execute("INSERT OR REPLACE INTO fetched (series, ts) VALUES (?, ?)", (series, time.time()))
+            db.execute("DELETE FROM failures WHERE series=?", (series,))
+            db.commit()
+
+
+class YieldService:
+    """Fetch FRED series through :class:`YieldStore` (see module docstring)."""
+
+    def __init__(
+        self,
+        store: YieldStore | None = None,
+        reader: Reader | None = None,
+        ttl: float = 6 * 3600.0,
+        workers: int = 4,
+        backoff: float = 300.0,
+    ) -> None:
+        self.store = store or YieldStore()
+        self.reader = reader or fred_reader
+        self.ttl = ttl
+        self.workers = max(1, workers)
+        self.backoff = backoff
+        self._stats = {"cached": 0, "tail": 0, "full": 0, "failed": 0, "backoff": 0}
+
+    def _since(self, series: str, today: date) -> Optional[date]:
+        """Return the first date to request, or ``None`` if fresh or backing off."""
+
+        failed = self.store.failure(series)
+        if failed is not None:
+            ts, count = failed
+            if time.time() - ts < min(self.backoff * 2 ** (count - 1), self.ttl):
+                self._stats["backoff"] += 1
+                return None
+        cov = self.store.coverage(series)
+        if cov is None:
+            self._stats["full"] += 1
+            return HISTORY_START
+        last, ts = cov
+        if time.time() - ts < self.ttl:
+            self._stats["cached"] += 1
+            return None
+        since = date.fromisoformat(last) + timedelta(days=1) if last else HISTORY_START
+        if since > today:
+            self._stats["cached"] += 1
+            return None
+        self._stats["tail"] += 1
+        return since
+
+    def refresh(self, series: Iterable[str]) -> Dict[str, int]:
+        """Bring *series* up to date; return new observations per series."""
+
+        today = date.today()
+        due = {s: since for s in dict.fromkeys(series) if (since := self._since(s, today)) is not None}
+        if not due or not _online():
+            return {}
+
+        def _one(item: Tuple[str, date]) -> pd.Series | BaseException:
+            sid, since = item
+            try:
+                return self.reader(sid, since, today)
+            except Exception as exc:
+                return exc
+
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(due))) as pool:
+            results = list(pool.map(_one, due.items()))
+        added: Dict[str, int] = {}
+        for (sid, since), res in zip(due.items(), results):
+            if isinstance(res, BaseException):
+                self._stats["failed"] += 1
+                self.store.mark_failed(sid)
+                logger.warning("FRED fetch failed for %s: %s", sid, res)
+                continue
+            res = res[pd.to_datetime(res.index) >= pd.Timestamp(since)]
+            self.store.write(sid, res)
+            added[sid] = len(res)
+        logger.info("FRED: %d series refreshed in %.2fs", len(due), time.monotonic() - t0)
+        return added
+
+    def history(self, series: str, start: date | str | None = None) -> pd.Series:
+        """Stored observations of *series* (refreshed first when due)."""
+
+        self.refresh([series])
+        return self.store.read(series, str(start or ""))
+
+    def latest(self, series: Sequence[str]) -> Dict[str, Tuple[pd.Timestamp, float]]:
+        """Return ``{series: (date, value)}`` of the last valid observation."""
+
+        self.refresh(series)
+        return {sid: obs for sid in series if (obs := self.store.last(sid)) is not None}
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+yield_service = YieldService()
+
+
+def latest(series: Sequence[str]) -> Dict[str, Tuple[pd.Timestamp, float]]:
+    """Latest observations through the process-wide :data:`yield_service`."""
+
+    return yield_service.latest(series)
+
+
+def risk_free_rate(series: str = RISK_FREE_SERIES, default: float | None = None) -> float:
+    """Latest *series* yield as a decimal rate (``4.25`` → ``0.0425``).
+
+    Returns *default* (``settings.greeks.risk_free`` when omitted) if the
+    series cannot be read.
+    """
+
+    fallback = settings.greeks.risk_free if default is None else default
+    try:
+        obs = latest([series]).get(series)
+    except Exception as exc:
+        logger.debug("risk-free lookup failed for %s: %s", series, exc)
+        obs = None
+    return obs[1] / 100.0 if obs else fallback
+
+
+__all__ = [
+    "HISTORY_START",
+    "RISK_FREE_SERIES",
+    "YieldService",
+    "YieldStore",
+    "fred_reader",
+    "latest",
+    "risk_free_rate",
+    "yield_service",
+]
@@ -0,0 +1,554 @@
+"""Record IB sessions to disk and replay them deterministically.
+
+Market data depends on the time of day, so timings and outputs of
+``list_positions``, ``snapshot_chain`` or ``fetch_ib_quotes`` cannot be
+compared across code changes against a live TWS.  :class:`Recorder` wraps
+an ``IB`` client, forwards every call and writes requests, responses,
+ticker updates and ``errorEvent`` emissions with timestamps to a gzip
+stream of pickled records.  :class:`ReplayIB` serves that stream back to
+the same code, either at the recorded pace (``speed=1``) or as fast as
+possible (``speed=0``).
+
+Both are selected through :func:`portfolio_exporter.core.ib.make_client`::
+
+    PE_IB_RECORD=run.ibrec portfolio-greeks          # live run, recorded
+    PE_IB_REPLAY=run.ibrec portfolio-greeks          # replay at 1x
+    PE_IB_REPLAY=run.ibrec PE_IB_REPLAY_SPEED=max portfolio-greeks
+
+Calls are matched on method name plus a digest of their arguments and
+fall back to recording order when the arguments differ (e.g. an
+``ExecutionFilter`` stamped with today's date).  Ticker updates are
+scheduled relative to the ``reqMktData`` call that created the ticker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import dataclasses
+import gzip
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import pickle
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+try:  # optional dependency
+    from eventkit import Event
+    from ib_insync import Ticker, util
+except ImportError:  # pragma: no cover - IB extras not installed
+    Event = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Request/response methods whose results are recorded verbatim
+CALLS = frozenset(
+    {
+        "positions",
+        "portfolio",
+        "accountSummary",
+        "accountValues",
+        "managedAccounts",
+        "reqPnL",
+        "reqContractDetails",
+        "reqSecDefOptParams",
+        "reqExecutions",
+        "reqHistoricalData",
+        "reqTickers",
+        "reqAllOpenOrders",
+        "reqOpenOrders",
+        "openTrades",
+        "openOrders",
+        "fills",
+        "executions",
+        "reqCurrentTime",
+    }
+)
+ASYNC_CALLS = frozenset({"reqContractDetailsAsync", "reqHistoricalDataAsync", "reqTickersAsync"})
+
+# Ticker attributes captured on every update
+TICK_FIELDS = (
+    "time",
+    "bid",
+    "bidSize",
+    "ask",
+    "askSize",
+    "last",
+    "lastSize",
+    "volume",
+    "open",
+    "high",
+    "low",
+    "close",
+    "markPrice",
+    "halted",
+    "impliedVolatility",
+    "histVolatility",
+    "callOpenInterest",
+    "putOpenInterest",
+    "bidGreeks",
+    "askGreeks",
+    "lastGreeks",
+    "modelGreeks",
+)
+
+
+class ReplayError(LookupError):
+    """Raised when a replayed session receives a call it never recorded."""
+
+
+def _norm(value: Any) -> Any:
+    if hasattr(value, "secType") and hasattr(value, "symbol"):
+        return (
+            "contract",
+            int(getattr(value, "conId", 0) or 0),
+            value.symbol,
+            value.secType,
+            getattr(value, "lastTradeDateOrContractMonth", ""),
+            float(getattr(value, "strike", 0.0) or 0.0),
+            getattr(value, "right", ""),
+        )
+    if isinstance(value, (list, tuple)):
+        return tuple(_norm(v) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return (type(value).__name__,) + tuple(
+            (f.name, _norm(getattr(value, f.name))) for f in dataclasses.fields(value)
+        )
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def signature(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """Stable digest of call arguments used to match recorded responses."""
+
+    key = repr((_norm(args), sorted((k, _norm(v)) for k, v in kwargs.items())))
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def _same(a: Any, b: Any) -> bool:
+    if a is b:
+        return True
+    try:
+        if a == b:
+            return True
+    except Exception:
+        return False
+    return isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b)
+
+
+def _tick_state(tk: Any) -> Dict[str, Any]:
+    return {f: getattr(tk, f, None) for f in TICK_FIELDS}
+
+
+def _copy_contract(dst: Any, src: Any) -> None:
+    for f in dataclasses.fields(src):
+        try:
+            setattr(dst, f.name, getattr(src, f.name))
+        except Exception:  # pragma: no cover - foreign contract stand-ins
+            pass
+
+
+def read_records(path: str) -> Iterator[Tuple[Any, ...]]:
+    """Yield the records of a recording, header first."""
+
+    with gzip.open(path, "rb") as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+
+class _Writer:
+    """Append-only record stream shared by every recorder on one path."""
+
+    _open: Dict[str, "_Writer"] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.t0 = time.monotonic()
+        self.records = 0
+        self.seq = itertools.count()
+        self.tid = itertools.count()
+        self._lock = threading.Lock()
+        self._fh = gzip.open(path, "wb", compresslevel=6)
+        self.write(
+            ("header", {"version": FORMAT_VERSION, "started": datetime.now(timezone.utc).isoformat()})
+        )
+        atexit.register(self.close)
+
+    @classmethod
+    def get(cls, path: str) -> "_Writer":
+        with cls._open_lock:
+            w = cls._open.get(path)
+            if w is None or w._fh is None:
+                w = cls._open[path] = cls(path)
+            return w
+
+    def now(self) -> float:
+        return time.monotonic() - self.t0
+
+    def write(self, record: Tuple[Any, ...]) -> None:
+        with self._lock:
+            if self._fh is None:
+                return
+            pickle.dump(record, self._fh, protocol=pickle.HIGHEST_PROTOCOL)
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+                logger.info("IB recording: %d records written to %s", self.records, self.path)
+
+
+class Recorder:
+    """Transparent proxy around an ``IB`` client that records the session.
+
+    Record layout (all times are seconds since the recording started):
+
+    * ``("call", seq, t, name, sig, duration, result, extra)``
+    * ``("tick", t, ticker_id, {field: value})`` – only changed fields
+    * ``("error", t, seq, reqId, code, message, contract)`` – ``seq`` is the
+      last call issued before the error arrived
+    """
+
+    def __init__(self, ib: Any, path: str) -> None:
+        self._ib = ib
+        self._writer = _Writer.get(path)
+        self._last_seq = -1
+        self._live: Dict[int, Tuple[int, Any, Dict[str, Any]]] = {}
+        error_event = getattr(ib, "errorEvent", None)
+        if error_event is not None:
+            error_event += self._on_error
+        pending = getattr(ib, "pendingTickersEvent", None)
+        if pending is not None:
+            pending += self._capture
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._ib, name)
+        if name in CALLS:
+            return self._wrap(name, attr)
+        if name in ASYNC_CALLS:
+            return self._wrap_async(name, attr)
+        return attr
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._ib, name, value)
+
+    # -- calls ------------------------------------------------------------
+    def _begin(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[int, str, float]:
+        seq = self._last_seq = next(self._writer.seq)
+        return seq, signature(args, kwargs), self._writer.now()
+
+    def _end(self, call: Tuple[int, str, float], name: str, result: Any, extra: Any = None) -> None:
+        seq, sig, start = call
+        self._writer.write(("call", seq, start, name, sig, self._writer.now() - start, result, extra))
+
+    def _wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        def call(*args: Any, **kwargs: Any) -> Any:
+            begun = self._begin(args, kwargs)
+            result = fn(*args, **kwargs)
+            self._end(begun, name, result)
+            return result
+
+        return call
+
+    def _wrap_async(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            begun = self._begin(args, kwargs)
+            result = await fn(*args, **kwargs)
+            self._end(begun, name, result)
+            return result
+
+        return call
+
+    def _qualified(self, begun: Tuple[int, str, float], name: str, args: Tuple[Any, ...], result: List[Any]) -> List[Any]:
+        ids = {id(c) for c in result}
+        idx = [i for i, c in enumerate(args) if id(c) in ids]
+        self._end(begun, name, [args[i] for i in idx], idx)
+        return result
+
+    def qualifyContracts(self, *contracts: Any) -> List[Any]:
+        begun = self._begin(contracts, {})
+        return self._qualified(begun, "qualifyContracts", contracts, self._ib.qualifyContracts(*contracts))
+
+    async def qualifyContractsAsync(self, *contracts: Any) -> List[Any]:
+        begun = self._begin(contracts, {})
+        result = await self._ib.qualifyContractsAsync(*contracts)
+        return self._qualified(begun, "qualifyContractsAsync", contracts, result)
+
+    # -- market data ------------------------------------------------------
+    def reqMktData(self, contract: Any, *args: Any, **kwargs: Any) -> Any:
+        begun = self._begin((contract,) + args, kwargs)
+        tk = self._ib.reqMktData(contract, *args, **kwargs)
+        tid = next(self._writer.tid)
+        state = _tick_state(tk)
+        self._live[id(tk)] = (tid, tk, state)
+        self._end(begun, "reqMktData", dict(state), tid)
+        return tk
+
+    def cancelMktData(self, contract: Any) -> Any:
+        for key, (_, tk, _) in list(self._live.items()):
+            if tk.contract is contract:
+                self._capture([tk])
+                del self._live[key]
+        return self._ib.cancelMktData(contract)
+
+    def _capture(self, tickers: Any = None) -> None:
+        t = self._writer.now()
+        entries = (
+            self._live.values()
+            if tickers is None
+            else [self._live[id(tk)] for tk in tickers if id(tk) in self._live]
+        )
+        for tid, tk, state in list(entries):
+            changed = {}
+            for f in TICK_FIELDS:
+                value = getattr(tk, f, None)
+                if not _same(value, state[f]):
+                    changed[f] = state[f] = value
+            if changed:
+                self._writer.write(("tick", t, tid, changed))
+
+    def waitOnUpdate(self, timeout: float = 0) -> bool:
+        result = self._ib.waitOnUpdate(timeout=timeout)
+        self._capture()
+        return result
+
+    def sleep(self, *args: Any) -> bool:
+        result = self._ib.sleep(*args)
+        self._capture()
+        return result
+
+    def _on_error(self, req_id: int, code: int, message: str, contract: Any = None, *_: Any) -> None:
+        self._writer.write(("error", self._writer.now(), self._last_seq, req_id, code, message, contract))
+
+    def disconnect(self) -> None:
+        self._capture()
+        self._ib.disconnect()
+        self._writer.close()
+
+
+class ReplayIB:
+    """``IB`` stand-in that plays back a :class:`Recorder` stream.
+
+    ``speed`` scales recorded latencies: ``1.0`` reproduces the live pace,
+    ``0`` returns every response and ticker update immediately.
+    """
+
+    # recorded latencies already carry the live pacing; see ``core.ratelimit``
+    simulated = True
+
+    def __init__(self, path: str, speed: float = 1.0) -> None:
+        if Event is None:  # pragma: no cover - IB extras not installed
+            raise ImportError("ReplayIB requires ib_insync")
+        self.path = path
+        self.speed = max(float(speed), 0.0)
+        self.RequestTimeout = 0.0
+        self._connected = False
+        self._calls: Dict[Tuple[str, str], Deque[list]] = {}
+        self._by_name: Dict[str, Deque[list]] = {}
+        self._ticks: Dict[int, List[Tuple[float, Dict[str, Any]]]] = {}
+        self._errors: Dict[int, List[Tuple[Any, ...]]] = {}
+        self._pending: List[Tuple[float, int, Any, Dict[str, Any]]] = []
+        self._order = itertools.count()
+        self._lock = threading.RLock()
+        self.header: Dict[str, Any] = {}
+        self.misses: Dict[str, int] = {}
+        self._load()
+        self.errorEvent = Event("errorEvent")
+        self.pendingTickersEvent = Event("pendingTickersEvent")
+
+    def __getattr__(self, name: str) -> Any:
+        if name.endswith("Event"):
+            ev = Event(name)
+            setattr(self, name, ev)
+            return ev
+        raise AttributeError(name)
+
+    def _load(self) -> None:
+        subscribed: Dict[int, float] = {}
+        for rec in read_records(self.path):
+            kind = rec[0]
+            if kind == "header":
+                self.header = rec[1]
+                if self.header.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"Unsupported recording version in {self.path}")
+            elif kind == "call":
+                _, seq, t, name, sig, duration, result, extra = rec
+                entry = [False, seq, duration, result, extra]
+                self._calls.setdefault((name, sig), deque()).append(entry)
+                self._by_name.setdefault(name, deque()).append(entry)
+                if name == "reqMktData":
+                    subscribed[extra] = t + duration
+            elif kind == "tick":
+                _, t, tid, fields = rec
+                self._ticks.setdefault(tid, []).append((t - subscribed.get(tid, t), fields))
+            elif kind == "error":
+                self._errors.setdefault(rec[2], []).append(rec[3:])
+
+    def _delay(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0.0
+
+    def _take(self, name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> list:
+        with self._lock:
+            for queue in (self._calls.get((name, signature(args, kwargs))), self._by_name.get(name)):
+                while queue and queue[0][0]:
+                    queue.popleft()
+                if queue:
+                    entry = queue.popleft()
+                    entry[0] = True
+                    return entry
+        self.misses[name] = self.misses.get(name, 0) + 1
+        raise ReplayError(f"{name} was not recorded in {self.path}")
+
+    def _emit_errors(self, seq: int) -> None:
+        for req_id, code, message, contract in self._errors.pop(seq, []):
+            self.errorEvent.emit(req_id, code, message, contract)
+
+    def _replay(self, name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+        _, seq, duration, result, _ = self._take(name, args, kwargs)
+        delay = self._delay(duration)
+        if delay > 0:
+            time.sleep(delay)
+        self._emit_errors(seq)
+        return result
+
+    # -- connection -------------------------------------------------------
+    def connect(self, *args: Any, **kwargs: Any) -> "ReplayIB":
+        self._connected = True
+        return self
+
+    async def connectAsync(self, *args: Any, **kwargs: Any) -> "ReplayIB":
+        return self.connect()
+
+    def disconnect(self) -> None:
+        self._connected = False
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def run(self, *awaitables: Any, timeout: float | None = None) -> Any:
+        return util.run(*awaitables, timeout=timeout)
+
+    def reqMarketDataType(self, marketDataType: int) -> None:
+        pass
+
+    # -- contracts --------------------------------------------------------
+    def _qualify(self, contracts: Tuple[Any, ...], entry: list) -> List[Any]:
+        _, seq, _, found, idx = entry
+        for i, src in zip(idx, found):
+            if i < len(contracts):
+                _copy_contract(contracts[i], src)
+        self._emit_errors(seq)
+        return [contracts[i] for i in idx if i < len(contracts)]
+
+    def qualifyContracts(self, *contracts: Any) -> List[Any]:
+        entry = self._take("qualifyContracts", contracts, {})
+        delay = self._delay(entry[2])
+        if delay > 0:
+            time.sleep(delay)
+        return self._qualify(contracts, entry)
+
+    async def qualifyContractsAsync(self, *contracts: Any) -> List[Any]:
+        entry = self._take("qualifyContractsAsync", contracts, {})
+        await asyncio.sleep(self._delay(entry[2]))
+        return self._qualify(contracts, entry)
+
+    # -- market data ------------------------------------------------------
+    def reqMktData(self, contract: Any, *args: Any, **kwargs: Any) -> Any:
+        tk = Ticker(contract=contract)
+        try:
+            _, seq, _, state, tid = self._take("reqMktData", (contract,) + args, kwargs)
+        except ReplayError:
+            logger.debug("replay: no recorded market data for %s", contract)
+            return tk
+        for f, v in state.items():
+            setattr(tk, f, v)
+        now = time.monotonic()
+        with self._lock:
+            for dt, fields in self._ticks.pop(tid, []):
+                heapq.heappush(self._pending, (now + self._delay(dt), next(self._order), tk, fields))
+        self._emit_errors(seq)
+        return tk
+
+    def cancelMktData(self, contract: Any) -> None:
+        with self._lock:
+            self._pending = [p for p in self._pending if p[2].contract is not contract]
+            heapq.heapify(self._pending)
+
+    def _pump(self) -> bool:
+        now = time.monotonic()
+        updated = set()
+        with self._lock:
+            while self._pending and self._pending[0][0] <= now:
+                _, _, tk, fields = heapq.heappop(self._pending)
+                for f, v in fields.items():
+                    setattr(tk, f, v)
+                updated.add(tk)
+        if updated:
+            self.pendingTickersEvent.emit(updated)
+        return bool(updated)
+
+    def waitOnUpdate(self, timeout: float = 0) -> bool:
+        if self._pump():
+            return True
+        deadline = time.monotonic() + (timeout or 3600.0)
+        with self._lock:
+            nxt = self._pending[0][0] if self._pending else deadline
+        time.sleep(max(0.0, min(nxt, deadline) - time.monotonic()))
+        return self._pump()
+
+    def sleep(self, secs: float = 0.02) -> bool:
+        time.sleep(self._delay(max(secs, 0.0)))
+        self._pump()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        remaining = sum(1 for q in self._by_name.values() for e in q if not e[0])
+        return {"unused_calls": remaining, "misses": dict(self.misses)}
+
+
+def _replayed(name: str) -> Callable[..., Any]:
+    def call(self: ReplayIB, *args: Any, **kwargs: Any) -> Any:
+        return self._replay(name, args, kwargs)
+
+    call.__name__ = name
+    return call
+
+
+def _replayed_async(name: str) -> Callable[..., Any]:
+    async def call(self: ReplayIB, *args: Any, **kwargs: Any) -> Any:
+        _, seq, duration, result, _ = self._take(name, args, kwargs)
+        await asyncio.sleep(self._delay(duration))
+        self._emit_errors(seq)
+        return result
+
+    call.__name__ = name
+    return call
+
+
+for _name in CALLS:
+    setattr(ReplayIB, _name, _replayed(_name))
+for _name in ASYNC_CALLS:
+    setattr(ReplayIB, _name, _replayed_async(_name))
+
+
+__all__ = ["Recorder", "ReplayError", "ReplayIB", "read_records", "signature"]
@@ -7,6 +7,7 @@ from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 
+from portfolio_exporter.core import aggregate
 from portfolio_exporter.scripts import risk_watch
 
 
@@ -16,16 +17,26 @@ def _render(metrics: Dict[str, Any]) -> Table:
     table.add_column("Value", justify="right")
     for key, val in metrics.items():
         table.add_row(key, str(val))
+    snap = aggregate.book.snapshot()
+    if snap.legs:
+        for key, val in snap.headline().items():
+            table.add_row(key, f"{val:,.2f}")
+        for und, tot in sorted(snap.by_underlying.items()):
+            table.add_row(f"{und} Δ / θ", f"{tot['delta_exposure']:,.1f} / {tot['theta_exposure']:,.1f}")
     return table
 
 
 def run(refresh: float = 5.0, iterations: Optional[int] = None) -> None:
-    """Display risk metrics in real-time using Rich."""
+    """Display risk metrics in real-time using Rich.
+
+    Positions are loaded once; each refresh only re-quotes their market data.
+    """
 
     console = Console()
     count = 0
     # fetch and render initial metrics immediately
-    metrics = risk_watch.run(return_dict=True) or {}
+    pos_df = risk_watch.load_positions()
+    metrics = risk_watch.run(return_dict=True, pos_df=pos_df) or {}
     table = _render(metrics)
     with Live(table, console=console, refresh_per_second=4) as live:
         while True:
@@ -33,5 +44,6 @@ def run(refresh: float = 5.0, iterations: Optional[int] = None) -> None:
             if iterations is not None and count >= iterations:
                 break
             time.sleep(refresh)
-            metrics = risk_watch.run(return_dict=True) or {}
+            pos_df = risk_watch.refresh_marks(pos_df)
+            metrics = risk_watch.run(return_dict=True, pos_df=pos_df) or {}
             live.update(_render(metrics))
@@ -21,6 +21,7 @@ class RunLog:
         self._start = 0.0
         self.outputs: List[Path] = []
         self.timings: list[dict[str, int]] = []
+        self.counters: dict[str, dict] = {}
         self.env = {
             "OUTPUT_DIR": os.getenv("OUTPUT_DIR"),
             "PE_OUTPUT_DIR": os.getenv("PE_OUTPUT_DIR"),
@@ -45,6 +46,10 @@ class RunLog:
                 self.outputs.append(path)
                 seen.add(path.resolve())
 
+    def add_counters(self, name: str, counters: dict) -> None:
+        """Record a named group of counters (e.g. cache hits) for the manifest."""
+        self.counters[name] = dict(counters)
+
     @contextmanager
     def time(self, stage: str):
         """Record elapsed milliseconds for a code block labelled *stage*."""
@@ -95,6 +100,7 @@ class RunLog:
             "end": end_ts,
             "duration_ms": duration_ms,
             "outputs": outs,
+            "counters": _json_sanitize(self.counters),
             "warnings": [],
             "version": None,
         }
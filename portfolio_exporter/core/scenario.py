@@ -0,0 +1,265 @@
+"""Scenario-grid revaluation of option portfolios.
+
+Every option leg of a positions frame (as produced by
+``portfolio_greeks.run``) is fully repriced with Black-Scholes over a
+spot-shock × vol-shock × days-forward grid in a single broadcast NumPy pass.
+Results are aggregated per underlying and for the whole portfolio.
+
+Conventions match the ``*_exposure`` columns of ``portfolio_greeks``:
+P&L in account currency, delta in share-equivalents, gamma in shares per
+1.0 move of the underlying, vega per 1 vol point and theta per calendar day.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .greeks import bs_greeks_vec, implied_vol_vec
+
+# Relative spot moves (−10 % … +10 % in 1 % steps)
+DEFAULT_SPOT_SHOCKS = np.round(np.linspace(-0.10, 0.10, 21), 4)
+# Absolute vol shifts in vol points (−10 … +10 in 2-point steps)
+DEFAULT_VOL_SHOCKS = np.round(np.linspace(-0.10, 0.10, 11), 4)
+# Calendar days forward
+DEFAULT_DAYS = np.array([0, 1, 3, 7, 14])
+
+GREEKS = ("delta", "gamma", "vega", "theta")
+_MIN_VOL = 1e-4
+_YEAR_SECONDS = 365 * 24 * 3600
+
+
+@dataclass
+class ScenarioGrid:
+    """P&L and greek surfaces on a spot × vol × days grid.
+
+    Each surface has shape ``(n_underlyings, n_spot, n_vol, n_days)``;
+    :meth:`portfolio` sums over underlyings.
+    """
+
+    underlyings: List[str]
+    spot: np.ndarray
+    spot_shocks: np.ndarray
+    vol_shocks: np.ndarray
+    days: np.ndarray
+    pnl: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    theta: np.ndarray
+    legs: int = 0
+    skipped: List[str] = field(default_factory=list)
+
+    def portfolio(self, surface: str = "pnl") -> np.ndarray:
+        """Return the portfolio-level surface (summed over underlyings)."""
+
+        return getattr(self, surface).sum(axis=0)
+
+    def underlying(self, symbol: str, surface: str = "pnl") -> np.ndarray:
+        """Return one underlying's surface."""
+
+        return getattr(self, surface)[self.underlyings.index(symbol)]
+
+    def to_frame(self, include_portfolio: bool = True) -> pd.DataFrame:
+        """Return all surfaces in long format, one row per grid point."""
+
+        names = list(self.underlyings)
+        surfaces = {k: getattr(self, k) for k in ("pnl", *GREEKS)}
+        if include_portfolio:
+            names.append("PORTFOLIO")
+            surfaces = {k: np.concatenate([v, v.sum(axis=0, keepdims=True)]) for k, v in surfaces.items()}
+        idx = pd.MultiIndex.from_product(
+            [names, self.spot_shocks, self.vol_shocks, self.days],
+            names=["underlying", "spot_shock", "vol_shock", "days"],
+        )
+        return pd.DataFrame({k: v.ravel() for k, v in surfaces.items()}, index=idx).reset_index()
+
+
+def years_to_expiry(expiry: pd.Series, now: datetime) -> np.ndarray:
+    """Vectorised year fraction from *now* to the end of each expiry day."""
+
+    raw = expiry.astype(str).str.replace("-", "", regex=False).str.slice(0, 8)
+    dt = pd.to_datetime(raw, format="%Y%m%d", errors="coerce")
+    monthly = dt.isna() & raw.str.fullmatch(r"\d{6}")
+    if monthly.any():
+        dt[monthly] = pd.to_datetime(raw[monthly], format="%Y%m", errors="coerce")
+    end = dt.dt.tz_localize("UTC") + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    secs = (end - pd.Timestamp(now)).dt.total_seconds()
+    return secs.to_numpy(dtype=float) / _YEAR_SECONDS
+
+
+def _base_spots(df: pd.DataFrame, spot: Mapping[str, float] | None) -> pd.Series:
+    """Resolve one spot per underlying: explicit map ▸ underlying_price ▸ stock price."""
+
+    und = df["underlying"]
+    base = pd.Series(np.nan, index=pd.Index(und.unique(), name="underlying"), dtype=float)
+    if "underlying_price" in df.columns:
+        px = pd.to_numeric(df["underlying_price"], errors="coerce")
+        base = base.fillna(px[px > 0].groupby(und).median())
+    if "price" in df.columns:
+        stk = df["secType"].isin(["STK", "ETF"])
+        px = pd.to_numeric(df.loc[stk, "price"], errors="coerce")
+        base = base.fillna(px[px > 0].groupby(und[stk]).median())
+    if spot:
+        override = pd.Series({k: float(v) for k, v in spot.items()}, dtype=float)
+        base = override.reindex(base.index).fillna(base)
+    return base
+
+
+def revalue(
+    pos_df: pd.DataFrame,
+    spot_shocks: Sequence[float] | np.ndarray = DEFAULT_SPOT_SHOCKS,
+    vol_shocks: Sequence[float] | np.ndarray = DEFAULT_VOL_SHOCKS,
+    days: Sequence[float] | np.ndarray = DEFAULT_DAYS,
+    *,
+    spot: Mapping[str, float] | None = None,
+    r: float = 0.0,
+    now: datetime | None = None,
+) -> ScenarioGrid:
+    """Reprice every leg of *pos_df* over the scenario grid.
+
+    Parameters
+    ----------
+    pos_df:
+        Positions with ``underlying`` (or ``symbol``), ``secType``, ``qty``,
+        ``multiplier``, ``right``, ``strike`` and ``expiry``.  Leg vol comes
+        from ``iv`` when present, otherwise it is implied from ``price``.
+    spot_shocks:
+        Relative underlying moves, e.g. ``0.05`` for +5 %.
+    vol_shocks:
+        Absolute implied-vol shifts, e.g. ``0.02`` for +2 vol points.
+    days:
+        Calendar days forward; legs past expiry settle at intrinsic value.
+    spot:
+        Optional ``{underlying: price}`` overriding the spots found in
+        ``underlying_price`` / stock ``price`` columns.
+    r:
+        Annualised risk-free rate.
+    now:
+        Valuation time (defaults to the current UTC time).
+    """
+
+    now = now or datetime.now(timezone.utc)
+    ss = np.asarray(spot_shocks, dtype=float)
+    vs = np.asarray(vol_shocks, dtype=float)
+    dd = np.asarray(days, dtype=float)
+    shape = (ss.size, vs.size, dd.size)
+
+    df = pos_df.copy()
+    if "underlying" not in df.columns:
+        df["underlying"] = df["symbol"]
+    elif "symbol" in df.columns:
+        df["underlying"] = df["underlying"].fillna(df["symbol"])
+    df["underlying"] = df["underlying"].astype(str)
+    qty = pd.to_numeric(df.get("qty"), errors="coerce").fillna(0.0)
+    mult = pd.to_numeric(df.get("multiplier"), errors="coerce").fillna(1.0)
+    df["units"] = qty * mult
+
+    base = _base_spots(df, spot)
+    df["s0"] = df["underlying"].map(base)
+    sec = df.get("secType", pd.Series("", index=df.index)).astype(str)
+    is_opt = sec.isin(["OPT", "FOP"]).to_numpy()
+    is_stk = sec.isin(["STK", "ETF"]).to_numpy()
+
+    skipped: List[str] = []
+    opts = df.loc[is_opt]
+    if not opts.empty:
+        t0 = years_to_expiry(opts["expiry"], now)
+        strike = pd.to_numeric(opts["strike"], errors="coerce").to_numpy(dtype=float)
+        is_call = opts["right"].astype(str).str.upper().str.startswith("C").to_numpy()
+        s0 = opts["s0"].to_numpy(dtype=float)
+        iv = pd.to_numeric(opts.get("iv"), errors="coerce") if "iv" in opts else None
+        sigma = iv.to_numpy(dtype=float) if iv is not None else np.full(len(opts), np.nan)
+        need = ~(sigma > 0)
+        if need.any() and "price" in opts.columns:
+            px = pd.to_numeric(opts["price"], errors="coerce").to_numpy(dtype=float)
+            sigma[need] = implied_vol_vec(px[need], s0[need], strike[need], t0[need], r, is_call[need])
+        usable = (s0 > 0) & (strike > 0) & (t0 > 0) & (sigma > 0)
+        skipped.extend(opts.loc[~usable, "underlying"].astype(str).tolist())
+        opts = opts.loc[usable]
+        t0, strike, is_call, s0, sigma = (a[usable] for a in (t0, strike, is_call, s0, sigma))
+    stks = df.loc[is_stk & (df["s0"] > 0).to_numpy()]
+    skipped.extend(df.loc[is_stk & ~(df["s0"] > 0).to_numpy(), "underlying"].astype(str).tolist())
+
+    names = sorted(set(opts["underlying"]).union(stks["underlying"]))
+    code = {u: i for i, u in enumerate(names)}
+    surfaces = {k: np.zeros((len(names),) + shape) for k in ("pnl", *GREEKS)}
+    if not names:
+        return ScenarioGrid(names, np.array([]), ss, vs, dd, **surfaces, skipped=skipped)
+
+    # ── options: one broadcast pass over legs × spot × vol × days ──
+    if not opts.empty:
+        units = opts["units"].to_numpy(dtype=float)
+        S = s0[:, None, None, None] * (1.0 + ss[None, :, None, None])
+        vol = np.maximum(sigma[:, None, None, None] + vs[None, None, :, None], _MIN_VOL)
+        T = t0[:, None, None, None] - dd[None, None, None, :] / 365.0
+        call = is_call[:, None, None, None]
+        K = strike[:, None, None, None]
+        live = T > 0
+
+        leg = bs_greeks_vec(S, K, np.where(live, T, 1.0), r, vol, call, 1, with_price=True)
+        if not live.all():
+            # legs that expire inside the horizon settle at intrinsic
+            S, K, call, dead = np.broadcast_arrays(S, K, call, ~live)
+            itm = np.where(call, S > K, S < K)
+            leg["price"][dead] = np.where(call, S - K, K - S)[dead] * itm[dead]
+            leg["delta"][dead] = np.where(call, 1.0, -1.0)[dead] * itm[dead]
+            for g in ("gamma", "vega", "theta"):
+                leg[g][dead] = 0.0
+        base_val = bs_greeks_vec(s0, strike, t0, r, sigma, is_call, 1, with_price=True)["price"]
+        leg["pnl"] = leg.pop("price") - base_val[:, None, None, None]
+
+        # per-underlying sums as one (U × legs) @ (legs × grid) product
+        onehot = np.zeros((len(names), len(opts)))
+        onehot[opts["underlying"].map(code).to_numpy(), np.arange(len(opts))] = units
+        for k, arr in leg.items():
+            surfaces[k] += (onehot @ arr.reshape(len(opts), -1)).reshape((len(names),) + shape)
+
+    # ── stock / ETF legs: linear in spot, delta only ──
+    if not stks.empty:
+        rows = stks["underlying"].map(code).to_numpy()
+        units = stks["units"].to_numpy(dtype=float)
+        np.add.at(surfaces["delta"], rows, units[:, None, None, None] * np.ones(shape))
+        move = (units * stks["s0"].to_numpy(dtype=float))[:, None] * ss[None, :]
+        np.add.at(surfaces["pnl"], rows, np.broadcast_to(move[:, :, None, None], (len(stks),) + shape))
+
+    spots = base.reindex(names).to_numpy(dtype=float)
+    return ScenarioGrid(
+        names, spots, ss, vs, dd, **surfaces, legs=int(len(opts) + len(stks)), skipped=skipped
+    )
+
+
+def summary(grid: ScenarioGrid) -> Dict[str, float]:
+    """Headline portfolio metrics from *grid* for dashboards."""
+
+    out: Dict[str, float] = {"legs": grid.legs, "skipped_legs": len(grid.skipped)}
+    if not grid.underlyings:
+        return out
+    pnl = grid.portfolio("pnl")
+    i0 = int(np.argmin(np.abs(grid.spot_shocks)))
+    j0 = int(np.argmin(np.abs(grid.vol_shocks)))
+    for g in GREEKS:
+        out[g] = float(grid.portfolio(g)[i0, j0, 0])
+    worst = np.unravel_index(int(np.argmin(pnl)), pnl.shape)
+    out["worst_pnl"] = float(pnl[worst])
+    out["worst_spot_shock"] = float(grid.spot_shocks[worst[0]])
+    out["worst_vol_shock"] = float(grid.vol_shocks[worst[1]])
+    out["worst_days"] = float(grid.days[worst[2]])
+    out["pnl_down"] = float(pnl[0, j0, 0])
+    out["pnl_up"] = float(pnl[-1, j0, 0])
+    return out
+
+
+__all__ = [
+    "DEFAULT_DAYS",
+    "DEFAULT_SPOT_SHOCKS",
+    "DEFAULT_VOL_SHOCKS",
+    "ScenarioGrid",
+    "revalue",
+    "summary",
+    "years_to_expiry",
+]
@@ -0,0 +1,305 @@
+"""Implied-volatility surfaces fitted from option-chain snapshots.
+
+Each expiry's smile is a raw SVI curve in total variance,
+
+    w(k) = a + b·(ρ·(k − m) + √((k − m)² + σ²)),   k = ln(K / S),
+
+fitted to the OTM quotes of an ``option_chain_snapshot`` export.  Fitted
+parameters are cached as JSON per symbol and day under
+``<output_dir>/volsurface`` so later runs answer lookups without touching
+the chain files or requesting market data.
+
+Lookups are vectorised: :meth:`VolSurface.iv` takes whole arrays of
+symbols, expiries and strikes.  Strikes outside the quoted range are held
+flat at the edge of the fitted smile; expiries between fitted ones
+interpolate total variance linearly in time.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+from scipy.optimize import least_squares
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_MIN_POINTS_SVI = 5  # fewer quotes than this → flat smile at the median vol
+_MIN_W = 1e-8
+
+
+@dataclass
+class Smile:
+    """Fitted SVI parameters for one symbol/expiry."""
+
+    expiry: str
+    t: float
+    spot: float
+    a: float
+    b: float
+    rho: float
+    m: float
+    sigma: float
+    k_min: float
+    k_max: float
+    n: int
+    rmse: float
+
+    def total_variance(self, k: np.ndarray) -> np.ndarray:
+        k = np.clip(k, self.k_min, self.k_max)
+        x = k - self.m
+        w = self.a + self.b * (self.rho * x + np.sqrt(x * x + self.sigma**2))
+        return np.maximum(w, _MIN_W)
+
+
+def fit_svi(k: ArrayLike, w: ArrayLike) -> tuple[np.ndarray, float]:
+    """Least-squares raw-SVI fit of total variance *w* against log-moneyness *k*.
+
+    Returns ``([a, b, rho, m, sigma], rmse)``.
+    """
+
+    k = np.asarray(k, dtype=float)
+    w = np.asarray(w, dtype=float)
+    w_max = float(w.max())
+    x0 = [float(w.min()) * 0.9, 0.1, -0.3, 0.0, 0.1]
+    lo = [-w_max, 0.0, -0.999, -1.0, 1e-4]
+    hi = [w_max, 5.0, 0.999, 1.0, 2.0]
+
+    def resid(p):
+        a, b, rho, m, sig = p
+        x = k - m
+        return a + b * (rho * x + np.sqrt(x * x + sig * sig)) - w
+
+    res = least_squares(resid, x0, bounds=(lo, hi), method="trf")
+    rmse = float(np.sqrt(np.mean(res.fun**2)))
+    return res.x, rmse
+
+
+def _expiry_key(expiry) -> str:
+    return str(expiry).replace("-", "").split(".")[0][:8]
+
+
+def _otm_quotes(chain: pd.DataFrame) -> pd.DataFrame:
+    """One IV per strike: OTM side preferred, both sides averaged at the money."""
+
+    df = chain.copy()
+    df["iv"] = pd.to_numeric(df["iv"], errors="coerce")
+    df["strike"] = pd.to_numeric(df["strike"], errors="coerce")
+    df = df[(df["iv"] > 0.01) & (df["iv"] < 5.0) & (df["strike"] > 0)]
+    if "right" in df.columns:
+        right = df["right"].astype(str).str.upper().str[0]
+        otm = ((right == "C") & (df["strike"] >= df["spot"])) | (
+            (right == "P") & (df["strike"] <= df["spot"])
+        )
+        df = df[otm | ~right.isin(["C", "P"])]
+    return df.groupby("strike", as_index=False).agg(iv=("iv", "mean"), spot=("spot", "median"))
+
+
+class VolSurface:
+    """Per-symbol collection of fitted expiry smiles."""
+
+    def __init__(self, smiles: Dict[str, List[Smile]] | None = None, asof: date | None = None):
+        self.asof = asof or datetime.now(timezone.utc).date()
+        self.smiles: Dict[str, List[Smile]] = {
+            sym: sorted(lst, key=lambda s: s.t) for sym, lst in (smiles or {}).items()
+        }
+
+    # ── construction ──
+    @classmethod
+    def from_chain(cls, chain: pd.DataFrame, asof: date | None = None) -> "VolSurface":
+        """Fit every symbol/expiry smile in an option-chain snapshot frame.
+
+        *chain* needs ``symbol``, ``expiry``, ``strike``, ``iv`` and ``spot``
+        columns (``right`` is used to keep OTM quotes when present).
+        """
+
+        asof = asof or datetime.now(timezone.utc).date()
+        smiles: Dict[str, List[Smile]] = {}
+        if chain.empty:
+            return cls(smiles, asof)
+        chain = chain.assign(
+            expiry=chain["expiry"].map(_expiry_key),
+            spot=pd.to_numeric(chain["spot"], errors="coerce"),
+        )
+        for (sym, exp), grp in chain.groupby(["symbol", "expiry"]):
+            exp_dt = pd.to_datetime(exp, format="%Y%m%d", errors="coerce")
+            if pd.isna(exp_dt):
+                continue
+            t = max((exp_dt.date() - asof).days + 1, 1) / 365.0
+            quotes = _otm_quotes(grp)
+            spot = float(quotes["spot"].median()) if not quotes.empty else float("nan")
+            if quotes.empty or not spot > 0:
+                continue
+            k = np.log(quotes["strike"].to_numpy(dtype=float) / spot)
+            w = quotes["iv"].to_numpy(dtype=float) ** 2 * t
+            if len(k) >= _MIN_POINTS_SVI:
+                (a, b, rho, m, sig), rmse = fit_svi(k, w)
+            else:
+                a, b, rho, m, sig = float(np.median(w)), 0.0, 0.0, 0.0, 0.1
+                rmse = float(np.sqrt(np.mean((w - a) ** 2)))
+            smiles.setdefault(str(sym), []).append(
+                Smile(exp, t, spot, a, b, rho, m, sig, float(k.min()), float(k.max()), len(k), rmse)
+            )
+        return cls(smiles, asof)
+
+    # ── lookups ──
+    def _symbol_iv(self, symbol: str, expiry: np.ndarray, strike: np.ndarray) -> np.ndarray:
+        smiles = self.smiles.get(symbol)
+        if not smiles:
+            return np.full(len(strike), np.nan)
+        exp_dt = pd.to_datetime(pd.Series(expiry), format="%Y%m%d", errors="coerce")
+        days = (exp_dt - pd.Timestamp(self.asof)).dt.days.to_numpy(dtype=float)
+        t = np.maximum(days + 1, 1) / 365.0
+        ts = np.array([s.t for s in smiles])
+        with np.errstate(all="ignore"):
+            # (n_smiles, n) total variance of every smile at every strike
+            w_all = np.vstack([s.total_variance(np.log(strike / s.spot)) for s in smiles])
+            if len(ts) == 1:
+                var = w_all[0] / ts[0]
+            else:
+                # linear in T between fitted expiries, flat vol beyond the ends
+                j = np.clip(np.searchsorted(ts, t), 1, len(ts) - 1)
+                cols = np.arange(len(t))
+                frac = (t - ts[j - 1]) / (ts[j] - ts[j - 1])
+                w = w_all[j - 1, cols] + frac * (w_all[j, cols] - w_all[j - 1, cols])
+                var = np.where(t <= ts[0], w_all[0] / ts[0], np.where(t >= ts[-1], w_all[-1] / ts[-1], w / t))
+            out = np.sqrt(var)
+        out[~(strike > 0) | np.isnan(days)] = np.nan
+        return out
+
+    def iv(self, symbol: ArrayLike, expiry: ArrayLike, strike: ArrayLike) -> np.ndarray:
+        """Implied vols for arrays of ``symbol`` / ``expiry`` / ``strike``.
+
+        Scalars broadcast; unknown symbols or unparsable inputs yield NaN.
+        """
+
+        sym, exp, k = np.broadcast_arrays(
+            np.asarray(symbol, dtype=object), np.asarray(expiry, dtype=object), np.asarray(strike, dtype=float)
+        )
+        sym, exp, k = sym.ravel(), exp.ravel(), k.ravel()
+        exp = np.array([_expiry_key(e) for e in exp], dtype=object)
+        out = np.full(k.shape, np.nan)
+        for name in pd.unique(sym):
+            sel = sym == name
+            out[sel] = self._symbol_iv(str(name), exp[sel], k[sel])
+        return out
+
+    # ── persistence ──
+    def to_dict(self) -> dict:
+        return {
+            "asof": self.asof.isoformat(),
+            "smiles": {sym: [asdict(s) for s in lst] for sym, lst in self.smiles.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VolSurface":
+        smiles = {sym: [Smile(**s) for s in lst] for sym, lst in data.get("smiles", {}).items()}
+        return cls(smiles, date.fromisoformat(data["asof"]))
+
+    def merge(self, other: "VolSurface") -> None:
+        for sym, lst in other.smiles.items():
+            self.smiles[sym] = sorted(lst, key=lambda s: s.t)
+
+
+# ───────────────────────── disk cache ─────────────────────────
+
+
+def cache_dir() -> Path:
+    base = os.getenv("OUTPUT_DIR") or os.getenv("PE_OUTPUT_DIR") or settings.output_dir
+    return Path(base).expanduser() / "volsurface"
+
+
+def _chain_files(symbol: str, chain_dir: Path) -> List[Path]:
+    """Option-chain snapshot CSVs that may hold *symbol*, newest first."""
+
+    return sorted(
+        list(chain_dir.glob(f"option_chain_{symbol}_*.csv")) + list(chain_dir.glob("option_chain_portfolio_*.csv")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+
+
+def _latest_chain(files: List[Path], symbol: str) -> pd.DataFrame:
+    """Rows for *symbol* from the newest snapshot in *files* that has any."""
+
+    for path in files:
+        try:
+            df = pd.read_csv(path, dtype={"expiry": str})
+        except Exception as exc:  # pragma: no cover - corrupt export
+            logger.debug("volsurface: skip %s: %s", path, exc)
+            continue
+        if "symbol" in df.columns:
+            df = df[df["symbol"].astype(str) == symbol]
+        if not df.empty and {"expiry", "strike", "iv", "spot"} <= set(df.columns):
+            return df.assign(symbol=symbol)
+    return pd.DataFrame()
+
+
+def load_surface(
+    symbols: Iterable[str],
+    *,
+    asof: date | None = None,
+    chain_dir: str | Path | None = None,
+    cache: str | Path | None = None,
+) -> VolSurface:
+    """Return a surface for *symbols*, fitting and caching any not yet seen today.
+
+    Cached fits live in ``<cache>/<SYMBOL>_<YYYYMMDD>.json``; missing or
+    stale ones are fitted from the newest ``option_chain_*`` CSV in
+    *chain_dir* (the output directory by default).  Symbols without a usable
+    snapshot are left out.
+    """
+
+    asof = asof or datetime.now(timezone.utc).date()
+    cdir = Path(cache) if cache else cache_dir()
+    src = Path(chain_dir).expanduser() if chain_dir else cdir.parent
+    surface = VolSurface(asof=asof)
+    for sym in dict.fromkeys(str(s) for s in symbols if isinstance(s, str) and s):
+        path = cdir / f"{sym}_{asof:%Y%m%d}.json"
+        files = _chain_files(sym, src)
+        # reuse today's fit unless a newer snapshot has landed since
+        if path.exists() and not (files and files[0].stat().st_mtime > path.stat().st_mtime):
+            try:
+                surface.merge(VolSurface.from_dict(json.loads(path.read_text())))
+                continue
+            except Exception as exc:  # pragma: no cover - corrupt cache
+                logger.debug("volsurface: refit %s: %s", path, exc)
+        chain = _latest_chain(files, sym)
+        if chain.empty:
+            continue
+        fitted = VolSurface.from_chain(chain, asof)
+        if sym not in fitted.smiles:
+            continue
+        try:
+            cdir.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(fitted.to_dict(), indent=2))
+        except OSError as exc:  # pragma: no cover - read-only output dir
+            logger.debug("volsurface: cache write failed: %s", exc)
+        surface.merge(fitted)
+    return surface
+
+
+def lookup_iv(
+    symbol: ArrayLike,
+    expiry: ArrayLike,
+    strike: ArrayLike,
+    **kwargs,
+) -> np.ndarray:
+    """Convenience wrapper: :func:`load_surface` for the symbols, then :meth:`VolSurface.iv`."""
+
+    sym = np.asarray(symbol, dtype=object)
+    surface = load_surface(pd.unique(sym.ravel()), **kwargs)
+    return surface.iv(sym, expiry, strike)
+
+
+__all__ = ["Smile", "VolSurface", "fit_svi", "load_surface", "lookup_iv"]
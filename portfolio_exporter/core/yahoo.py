@@ -0,0 +1,369 @@
+"""Bulk Yahoo Finance quotes with a short-lived on-disk cache.
+
+``live_feed`` used to walk its ticker list one symbol at a time, calling
+``.info`` and ``.fast_info`` and sleeping between symbols, with a seven-step
+fallback ladder for anything that came back blank.  :func:`quotes` instead:
+
+* answers from the ``quotes`` table (one row per symbol/field) when the
+  value is younger than ``ttl`` seconds, so a re-run is served from disk;
+* resolves every remaining symbol with a single batched ``yf.download``
+  of recent daily bars (last, open, high, low, previous close, volume);
+* runs what the batch cannot answer (symbols missing from the batch) per
+  symbol in a thread pool of ``workers`` threads.
+
+Bid/ask (:data:`DETAIL_FIELDS`) are not in the daily bars and cost a
+``.info`` request per symbol, so they are opt-in: pass them in ``fields``.
+
+The database lives next to ``bars.db`` in ``settings.output_dir``; set
+``PE_QUOTES_DB`` to move it or to ``off`` to keep the cache in memory.
+``PE_YF_QUOTE_TTL`` (seconds, default 60) and ``PE_YF_WORKERS`` (default 8)
+tune the cache lifetime and the pool size.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
+import pandas as pd
+import yfinance as yf
+
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# default fields: all served by the batched download
+FIELDS = ("last", "open", "high", "low", "prev_close", "volume")
+# opt-in fields only the per-symbol pass can supply
+DETAIL_FIELDS = ("bid", "ask")
+
+TTL: float = float(os.getenv("PE_YF_QUOTE_TTL", "60"))
+WORKERS: int = int(os.getenv("PE_YF_WORKERS", "8"))
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS quotes (
+    symbol TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value REAL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (symbol, field)
+);
+"""
+
+
+def _num(val: Any) -> float:
+    """Return ``val`` as float, NaN for blanks and IB-style ``-1`` placeholders."""
+
+    try:
+        out = float(val)
+    except (TypeError, ValueError):
+        return math.nan
+    return math.nan if out == -1 else out
+
+
+def first_valid(*vals: Any) -> float:
+    """First value that is neither None nor NaN, as float (NaN if none)."""
+
+    for v in vals:
+        num = _num(v)
+        if not math.isnan(num):
+            return num
+    return math.nan
+
+
+class QuoteStore:
+    """SQLite store of quote fields keyed on ``(symbol, field)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _resolve_path(self) -> str:
+        if self._path is not None:
+            return str(self._path)
+        env = os.environ.get("PE_QUOTES_DB")
+        if env:
+            return ":memory:" if env.lower() == "off" else os.path.expanduser(env)
+        return str(Path(os.path.expanduser(settings.output_dir)) / "quotes.db")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        path = self._resolve_path()
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(_DDL)
+        except sqlite3.Error as exc:
+            logger.debug("Quote cache at %s unavailable (%s); using memory", path, exc)
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_DDL)
+        self._conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def read(self, symbols: Sequence[str], max_age: float) -> Dict[str, Dict[str, float]]:
+        """Return ``{symbol: {field: value}}`` for entries younger than *max_age*."""
+
+        out: Dict[str, Dict[str, float]] = {}
+        if not symbols or max_age <= 0:
+            return out
+        cutoff = time.time() - max_age
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(symbols), 500):
+                chunk = list(symbols[i : i + 500])
+                rows = db.execute(
+                    "SELECT symbol, field, value FROM quotes "
+                    f"WHERE ts>=? AND symbol IN ({', '.join('?' * len(chunk))})",
+                    (cutoff, *chunk),
+                ).fetchall()
+                for sym, field, value in rows:
+                    out.setdefault(sym, {})[field] = math.nan if value is None else value
+        return out
+
+    def write(self, values: Mapping[str, Mapping[str, float]]) -> None:
+        """Upsert ``{symbol: {field: value}}``; NaN is stored as a known blank."""
+
+        now = time.time()
+        rows = [
+            (sym, field, None if math.isnan(val) else val, now)
+            for sym, fields in values.items()
+            for field, val in fields.items()
+        ]
+        if not rows:
+            return
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO quotes (symbol, field, value, ts) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            db.commit()
+
+
+def _batch_frame(data: pd.DataFrame, symbol: str, batch: Sequence[str]) -> pd.DataFrame:
+    """Extract *symbol* from a (possibly multi-ticker) ``yf.download`` frame."""
+
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return pd.DataFrame()
+        sub = data[symbol]
+    elif len(batch) == 1:
+        sub = data
+    else:
+        return pd.DataFrame()
+    return sub.dropna(subset=["Close"]) if "Close" in sub else pd.DataFrame()
+
+
+def _from_bars(bars: pd.DataFrame) -> Dict[str, float]:
+    if bars.empty:
+        return {}
+    last = bars.iloc[-1]
+    return {
+        "last": _num(last.get("Close")),
+        "open": _num(last.get("Open")),
+        "high": _num(last.get("High")),
+        "low": _num(last.get("Low")),
+        "volume": _num(last.get("Volume")),
+        "prev_close": _num(bars["Close"].iloc[-2]) if len(bars) > 1 else math.nan,
+    }
+
+
+def last_price(
+    symbol: str,
+    info: Mapping[str, Any] | None = None,
+    fast: Mapping[str, Any] | None = None,
+) -> float:
+    """Best-effort last price for a symbol the batched download missed.
+
+    Order: the given info/fast_info values (regular, pre-market, previous
+    close), a 1m intraday bar, then the last valid close of 5 days and of
+    one year of daily history.  Returns NaN when nothing resolves.
+    """
+
+    info = info or {}
+    fast = fast or {}
+    price = first_valid(
+        info.get("regularMarketPrice"),
+        info.get("preMarketPrice"),
+        fast.get("last_price"),
+        fast.get("lastPrice"),
+        fast.get("previous_close"),
+        fast.get("previousClose"),
+        info.get("previousClose"),
+    )
+    if not math.isnan(price):
+        return price
+    tk = yf.Ticker(symbol)
+    attempts = (
+        lambda: yf.download(symbol, period="1d", interval="1m", progress=False),
+        lambda: tk.history(period="5d", interval="1d"),
+        lambda: tk.history(period="1y", interval="1d"),
+    )
+    for attempt in attempts:
+        ratelimit.acquire("yahoo")
+        try:
+            bars = attempt()
+        except Exception as exc:
+            logger.debug("yfinance fallback failed for %s: %s", symbol, exc)
+            continue
+        if bars is None or bars.empty:
+            continue
+        close = bars["Close"]
+        if isinstance(close, pd.DataFrame):  # single-ticker download with MultiIndex columns
+            close = close.iloc[:, 0]
+        close = close.dropna()
+        if not close.empty:
+            return float(close.iloc[-1])
+    return math.nan
+
+
+class YahooQuotes:
+    """Resolve quotes through :class:`QuoteStore` (see module docstring)."""
+
+    def __init__(
+        self, store: QuoteStore | None = None, ttl: float | None = None, workers: int | None = None
+    ) -> None:
+        self.store = store or QuoteStore()
+        self.ttl = TTL if ttl is None else ttl
+        self.workers = max(1, int(workers or WORKERS))
+        self._stats = {"cached": 0, "batch": 0, "detail": 0, "failed": 0}
+
+    def _download(self, symbols: Sequence[str]) -> Dict[str, Dict[str, float]]:
+        ratelimit.acquire("yahoo")
+        try:
+            data = yf.download(
+                tickers=list(symbols),
+                period="5d",
+                interval="1d",
+                group_by="ticker",
+                auto_adjust=False,
+                threads=True,
+                progress=False,
+            )
+        except Exception as exc:
+            logger.warning("yfinance batch error %s: %s", ",".join(symbols), exc)
+            return {}
+        if data is None or data.empty:
+            return {}
+        return {s: _from_bars(_batch_frame(data, s, symbols)) for s in symbols}
+
+    def _detail(self, symbol: str, have: Mapping[str, float], fields: Sequence[str]) -> Dict[str, float]:
+        """Per-symbol pass: bid/ask from ``.info`` plus anything the batch left blank."""
+
+        out: Dict[str, float] = {}
+        tk = yf.Ticker(symbol)
+        ratelimit.acquire("yahoo")
+        try:
+            fast = dict(tk.fast_info or {})
+        except Exception:
+            fast = {}
+        info: Dict[str, Any] = {}
+        if any(f in fields for f in DETAIL_FIELDS):
+            ratelimit.acquire("yahoo")
+            try:
+                info = tk.info or {}
+            except Exception as exc:
+                logger.debug("yfinance info failed for %s: %s", symbol, exc)
+        candidates = {
+            "bid": (fast.get("bid"), fast.get("bid_price"), info.get("bid")),
+            "ask": (fast.get("ask"), fast.get("ask_price"), info.get("ask")),
+            "open": (fast.get("open"), info.get("open")),
+            "high": (fast.get("day_high"), fast.get("dayHigh"), info.get("dayHigh")),
+            "low": (fast.get("day_low"), fast.get("dayLow"), info.get("dayLow")),
+            "prev_close": (fast.get("previous_close"), fast.get("previousClose"), info.get("previousClose")),
+            "volume": (fast.get("last_volume"), fast.get("volume"), info.get("volume")),
+        }
+        for field in fields:
+            if not math.isnan(have.get(field, math.nan)):
+                continue
+            if field == "last":
+                out["last"] = last_price(symbol, info=info, fast=fast)
+            elif field in candidates:
+                out[field] = first_valid(*candidates[field])
+        return out
+
+    def quotes(self, symbols: Iterable[str], fields: Sequence[str] = FIELDS) -> pd.DataFrame:
+        """Return a frame indexed by symbol with one column per field.
+
+        Symbols nothing could resolve keep NaN values; blanks are cached too,
+        so a re-run inside ``ttl`` does not retry them.
+        """
+
+        symbols = list(dict.fromkeys(symbols))
+        fields = list(fields)
+        t0 = time.monotonic()
+        have = self.store.read(symbols, self.ttl)
+        due = [s for s in symbols if any(f not in have.get(s, {}) for f in fields)]
+        self._stats["cached"] += len(symbols) - len(due)
+
+        fresh: Dict[str, Dict[str, float]] = {}
+        if due:
+            batch = self._download(due)
+            self._stats["batch"] += sum(1 for s in due if batch.get(s))
+            for sym in due:
+                vals = {f: v for f, v in batch.get(sym, {}).items() if f in fields}
+                fresh[sym] = {f: vals.get(f, math.nan) for f in fields}
+
+            todo = [s for s in due if any(math.isnan(v) for v in fresh[s].values())]
+            if todo:
+                def _one(sym: str) -> Dict[str, float]:
+                    try:
+                        return self._detail(sym, fresh[sym], fields)
+                    except Exception as exc:
+                        logger.warning("yfinance quote failed for %s: %s", sym, exc)
+                        return {}
+
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(todo))) as pool:
+                    for sym, extra in zip(todo, pool.map(_one, todo)):
+                        fresh[sym].update(extra)
+                self._stats["detail"] += len(todo)
+            self._stats["failed"] += sum(1 for s in due if math.isnan(fresh[s].get("last", 0.0)))
+            self.store.write(fresh)
+            logger.info(
+                "yfinance quotes: %d cached, %d fetched in %.2fs",
+                len(symbols) - len(due),
+                len(due),
+                time.monotonic() - t0,
+            )
+
+        rows = {s: {**have.get(s, {}), **fresh.get(s, {})} for s in symbols}
+        return pd.DataFrame.from_dict(rows, orient="index").reindex(index=symbols, columns=fields)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+yahoo_quotes = YahooQuotes()
+
+
+def quotes(symbols: Iterable[str], fields: Sequence[str] = FIELDS) -> pd.DataFrame:
+    """Quotes through the process-wide :data:`yahoo_quotes` service."""
+
+    return yahoo_quotes.quotes(symbols, fields)
+
+
+__all__ = [
+    "DETAIL_FIELDS",
+    "FIELDS",
+    "QuoteStore",
+    "YahooQuotes",
+    "first_valid",
+    "last_price",
+    "quotes",
+    "yahoo_quotes",
+]
@@ -16,7 +16,7 @@ import warnings
 import io
 import contextlib
 from portfolio_exporter.core.config import settings
-from portfolio_exporter.core import io
+from portfolio_exporter.core import history, io
 from utils.progress import iter_progress
 from portfolio_exporter.core.ui import run_with_spinner
 from reportlab.lib.pagesizes import letter, landscape  # PDF output (landscape added)
@@ -148,21 +148,11 @@ def load_ib_positions_ib(
 
 
 def fetch_ohlc(tickers, days_back=60) -> pd.DataFrame:
-    """Download daily OHLCV plus today’s pre‑market quote."""
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=days_back)
-    data = yf.download(
-        tickers,
-        start=start.date(),
-        end=end.date() + timedelta(days=1),
-        group_by="ticker",
-        auto_adjust=False,
-        progress=False,
-    )
+    """Daily OHLCV (including today’s bar) from the shared history service."""
+    frames = history.daily_bars(tickers, days=days_back)
     rows = []
-    for t in iter_progress(tickers, "Processing tickers"):
-        d = data[t].dropna().reset_index()
-        d.columns = ["date", "open", "high", "low", "close", "adj_close", "volume"]
+    for t in iter_progress(list(frames), "Processing tickers"):
+        d = frames[t].dropna(subset=["close"]).copy()
         d["ticker"] = t
         rows.append(d)
     return pd.concat(rows, ignore_index=True)
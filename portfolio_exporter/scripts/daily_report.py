@@ -14,6 +14,7 @@ import pandas as pd
 from rich.console import Console
 
 from portfolio_exporter.core import cli as cli_helpers
+from portfolio_exporter.core import events as events_core
 from portfolio_exporter.core import json as json_helpers
 from portfolio_exporter.core import io as core_io
 from portfolio_exporter.core.runlog import RunLog
@@ -140,6 +141,16 @@ def _expiry_radar(
         if "theta_exposure" in df.columns
         else "theta" if "theta" in df.columns else None
     )
+    # earnings / ex-dividend dates that land before each leg's expiry
+    flags = pd.DataFrame(index=df.index)
+    if "underlying" in df.columns:
+        try:
+            flags = events_core.before_expiry(
+                df, symbol="underlying", expiry="expiry_dt", on=now.date()
+            )
+        except Exception as exc:
+            if console:
+                console.print(f"Expiry radar: event calendar unavailable ({exc})", style="yellow")
     rows: list[dict[str, Any]] = []
     for date, grp in df.groupby(df["expiry_dt"].dt.date):
         row: dict[str, Any] = {"date": date.isoformat(), "count": int(len(grp))}
@@ -150,6 +161,12 @@ def _expiry_radar(
         if basis == "combos" and "structure" in grp.columns:
             by_struct = grp.groupby("structure").size().to_dict()
             row["by_structure"] = {str(k): int(v) for k, v in by_struct.items()}
+        for kind, key in (("earnings", "earnings_before"), ("ex_dividend", "ex_div_before")):
+            col = f"{kind}_before_expiry"
+            if col in flags.columns:
+                hit = grp.loc[flags.loc[grp.index, col], "underlying"]
+                if not hit.empty:
+                    row[key] = sorted(set(hit.astype(str).str.upper()))
         rows.append(row)
     result["rows"] = sorted(rows, key=lambda r: r["date"])
     return result
@@ -229,6 +246,9 @@ def _build_html(
                     r["by_structure"] = "; ".join(
                         f"{k}: {v}" for k, v in r["by_structure"].items()
                     )
+                for k in ("earnings_before", "ex_div_before"):
+                    if k in r:
+                        r[k] = ", ".join(r[k])
                 tab_rows.append(r)
             sec_parts.append(pd.DataFrame(tab_rows).to_html(index=False))
         else:
@@ -306,6 +326,9 @@ def _build_pdf_flowables(
                     r["by_structure"] = ", ".join(
                         f"{k}: {v}" for k, v in r["by_structure"].items()
                     )
+                for k in ("earnings_before", "ex_div_before"):
+                    if k in r:
+                        r[k] = ", ".join(r[k])
                 tab_rows.append(r)
             df_r = pd.DataFrame(tab_rows)
             flow.append(RLTable([df_r.columns.tolist()] + df_r.values.tolist()))
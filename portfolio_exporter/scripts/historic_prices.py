@@ -2,10 +2,9 @@ import os
 import csv
 import argparse
 from portfolio_exporter.core.config import settings
-from portfolio_exporter.core import io
+from portfolio_exporter.core import history, io
 from portfolio_exporter.core.ui import run_with_spinner
 import pandas as pd
-import yfinance as yf
 
 try:  # optional dependencies
     import xlsxwriter  # type: ignore
@@ -99,52 +98,22 @@ def load_tickers() -> list[str]:
 
 def fetch_and_prepare_data(tickers):
     """
-    Batch-fetch OHLCV data for tickers over last 60 days with daily interval.
+    Fetch daily OHLCV data for tickers over the last 60 days.
+    Bars come from the shared history service, so only days missing from the
+    local bar cache are downloaded.
     Raises ValueError if ticker list is empty.
     Returns DataFrame with columns:
     ["date","ticker","open","high","low","close","adj_close","volume"]
     """
     if not tickers:
         raise ValueError("No data fetched for any ticker.")
-    data = yf.download(
-        tickers=tickers,
-        period="60d",
-        interval="1d",
-        group_by="ticker",
-        auto_adjust=False,
-    )
-    columns = ["date", "ticker", "open", "high", "low", "close", "adj_close", "volume"]
-    if data.empty:
-        return pd.DataFrame(columns=columns)
-    dfs = []
-    if isinstance(data.columns, pd.MultiIndex):
-        iterable = iter_progress(tickers, "split") if PROGRESS else tickers
-        for ticker in iterable:
-            if ticker in data:
-                df_t = data[ticker].reset_index()
-                df_t["Ticker"] = ticker
-                dfs.append(df_t)
-    else:
-        df_t = data.reset_index()
-        df_t["Ticker"] = tickers[0]
-        dfs.append(df_t)
-    result = pd.concat(dfs, ignore_index=True)
-    # Rename columns and enforce types
-    result = result.rename(
-        columns={
-            "Date": "date",
-            "Ticker": "ticker",
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Adj Close": "adj_close",
-            "Volume": "volume",
-        }
-    )
-    result["date"] = result["date"].dt.strftime("%Y-%m-%d")
+    frames = history.daily_bars(tickers, days=60)
+    if PROGRESS:
+        frames = {t: frames[t] for t in iter_progress(list(frames), "split")}
+    result = history.long_frame(frames)
+    result["date"] = pd.to_datetime(result["date"]).dt.strftime("%Y-%m-%d")
     result["volume"] = result["volume"].fillna(0).astype(int)
-    return result[columns]
+    return result
 
 
 def save_to_csv(df: pd.DataFrame):
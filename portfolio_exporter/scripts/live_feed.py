@@ -25,6 +25,11 @@ from zoneinfo import ZoneInfo
 import pandas as pd
 from typing import List, Dict, Any
 from portfolio_exporter.core.ui import run_with_spinner
+from portfolio_exporter.core import accounts as accounts_core
+from portfolio_exporter.core import cli as cli_helpers
+from portfolio_exporter.core import contracts as contracts_core
+from portfolio_exporter.core import rates as rates_core
+from portfolio_exporter.core import yahoo as yahoo_core
 import numpy as np
 import math
 
@@ -70,117 +75,6 @@ except Exception:
     _yf_session = None
 
 
-# ---------- helpers -------------------------------------------------
-def _first_valid(*vals):
-    """
-    Return the first value that is neither None nor NaN.
-    Treats float('nan') / numpy.nan as missing, same as None.
-    """
-    for v in vals:
-        if v is None:
-            continue
-        if isinstance(v, (float, np.floating)) and math.isnan(v):
-            continue
-        return v
-    return None
-
-
-def _yf_resolve_last_price(
-    yf_symbol: str,
-    label: str | None = None,
-    info: Dict[str, Any] | None = None,
-    fast: Dict[str, Any] | None = None,
-) -> float:
-    """
-    Best-effort ladder to resolve a last price from Yahoo Finance.
-
-    Order:
-    1) Provided info/fast_info values (regular + pre-market + previous close)
-    2) 1m intraday bar, then 5m
-    3) 2d daily bar last close
-    4) 5d history last valid close
-    5) previousClose via info
-    6) 1y history last valid close
-    Returns float or NaN.
-    """
-    try:
-        tk = yf.Ticker(yf_symbol)
-        if fast is None:
-            try:
-                fast = tk.fast_info or {}
-            except Exception:
-                fast = {}
-        # Step 1: info/fast
-        price = _first_valid(
-            (info or {}).get("regularMarketPrice"),
-            (info or {}).get("preMarketPrice"),
-            fast.get("last_price"),
-            fast.get("lastPrice"),
-            fast.get("previous_close"),
-            fast.get("previousClose"),
-            (info or {}).get("previousClose"),
-        )
-        # Step 2: intraday 1m
-        if price is None or pd.isna(price):
-            try:
-                intr = yf.download(yf_symbol, period="1d", interval="1m", progress=False)
-                if intr is not None and not intr.empty:
-                    price = float(intr["Close"].dropna().iloc[-1])
-            except Exception:
-                pass
-        # Step 3: intraday 5m
-        if price is None or pd.isna(price):
-            try:
-                intr5 = yf.download(yf_symbol, period="1d", interval="5m", progress=False)
-                if intr5 is not None and not intr5.empty:
-                    price = float(intr5["Close"].dropna().iloc[-1])
-            except Exception:
-                pass
-        # Step 4: 2d daily
-        if price is None or pd.isna(price):
-            try:
-                daily = yf.download(yf_symbol, period="2d", interval="1d", progress=False)
-                if daily is not None and not daily.empty:
-                    price = float(daily["Close"].dropna().iloc[-1])
-            except Exception:
-                pass
-        # Step 5: 5d history
-        if price is None or pd.isna(price):
-            try:
-                hist5 = tk.history(period="5d", interval="1d")
-                if hist5 is not None and not hist5.empty:
-                    close_vals = hist5["Close"].dropna()
-                    if not close_vals.empty:
-                        price = float(close_vals.iloc[-1])
-            except Exception:
-                pass
-        # Step 6: previousClose via info (if not provided)
-        if price is None or pd.isna(price):
-            try:
-                inf = info if info is not None else tk.info
-                pc = inf.get("previousClose") if isinstance(inf, dict) else None
-                if pc is not None and not pd.isna(pc):
-                    price = float(pc)
-            except Exception:
-                pass
-        # Step 7: 1y history last valid close
-        if price is None or pd.isna(price):
-            try:
-                hist1y = tk.history(period="1y", interval="1d")
-                if hist1y is not None and not hist1y.empty:
-                    close_vals = hist1y["Close"].dropna()
-                    if not close_vals.empty:
-                        price = float(close_vals.iloc[-1])
-            except Exception as e:
-                if label:
-                    logging.warning("1y history fallback failed for %s: %s", label, e)
-        return price if price is not None else float("nan")
-    except Exception as e:
-        if label:
-            logging.warning("yfinance resolution failed for %s: %s", label, e)
-        return float("nan")
-
-
 # optional PDF dependencies
 try:
     from reportlab.lib.pagesizes import letter, landscape
@@ -197,19 +91,11 @@ try:
 except Exception:  # pragma: no cover - optional
     PROGRESS = False
 
-try:
-    from pandas_datareader import data as web
-
-    FRED_AVAILABLE = True
-except ImportError:
-    FRED_AVAILABLE = False
-
-
 # ----------------------------------------------------------
 # Try to import ib_insync; if unavailable we’ll silently skip
 # ----------------------------------------------------------
 try:
-    from ib_insync import IB, Stock, Index, Future, Option
+    from ib_insync import IB, Contract, Stock, Index, Future, Option
 
     IB_AVAILABLE = True
 except ImportError:
@@ -251,9 +137,43 @@ OUTPUT_DIR = os.path.expanduser(settings.output_dir)
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, f"live_quotes_{DATE_TAG}_{TIME_TAG}.csv")
 OUTPUT_POS_CSV = os.path.join(OUTPUT_DIR, f"live_positions_{DATE_TAG}_{TIME_TAG}.csv")
 
-from portfolio_exporter.core.ib_config import HOST as IB_HOST, PORT as IB_PORT, client_id as _cid
-IB_CID = _cid("live_feed", default=2)  # separate clientId
+
+def _qualify(ib, contracts):
+    """Bulk-qualify *contracts*; if the batch call fails, qualify one by one.
+
+    A single bad contract or a transient error then costs only its own row.
+    """
+    try:
+        return contracts_core.qualify(ib, *contracts)
+    except Exception as exc:
+        logging.warning("IB bulk qualification failed (%s); qualifying individually", exc)
+    out = []
+    for c in contracts:
+        try:
+            (q,) = contracts_core.qualify(ib, c)
+        except Exception as exc:
+            logging.debug("IB qualification failed for %s: %s", c, exc)
+            q = None
+        out.append(q)
+    return out
+
+
+def _subscribe(ib, contracts, require):
+    """Stream *contracts* through the shared line budget, ``IB_TIMEOUT`` per line."""
+
+    from portfolio_exporter.core import ib as ib_core
+
+    return ib_core.line_scheduler(ib).subscribe(contracts, require, timeout=IB_TIMEOUT)
+
+
+def _ib_session():
+    """Borrow the process-wide IB session shared by all scripts."""
+
+    from portfolio_exporter.core import ib as ib_core
+
+    return ib_core.session(factory=IB, timeout=3)
 IB_TIMEOUT = 4.0  # seconds to wait per batch
+YF_COLUMNS = ["last", "bid", "ask", "open", "high", "low", "prev_close", "volume"]
 
 # yfinance proxy map for friendly tickers
 PROXY_MAP = {
@@ -335,15 +255,16 @@ def _load_portfolio_tickers() -> list[str]:
     return load_tickers()
 
 
-def fetch_ib_positions(ib: "IB") -> tuple[list[Option], set[str]]:
+def fetch_ib_positions(ib: "IB", accounts: List[str] | None = None) -> tuple[list[Option], set[str]]:
     """
     Return a list of *Option contracts currently held* plus the underlying
     symbols for those positions (to guarantee we snapshot them too).
+    ``accounts`` limits the positions to those accounts.
     """
     opts: list[Option] = []
     underlyings: set[str] = set()
     try:
-        positions = ib.positions()
+        positions = accounts_core.select(ib.positions(), accounts)
         for p in positions:
             con = p.contract
             if con.secType == "OPT":
@@ -369,15 +290,14 @@ def fetch_ib_quotes(tickers: list[str], opt_cons: list[Option]) -> pd.DataFrame:
     if not IB_AVAILABLE:
         return pd.DataFrame()
 
-    ib = IB()
     try:
-        ib.connect(IB_HOST, IB_PORT, clientId=IB_CID, timeout=3)
+        ib = _ib_session()
     except Exception:
         logging.warning("IBKR Gateway not reachable — skipping IB pull.")
         return pd.DataFrame()
 
     combined_rows: list[dict] = []
-    reqs: dict[str, any] = {}
+    pending: list[tuple[str, Any]] = []
 
     # Build contracts & request market data
     iterable = iter_progress(tickers, "IB snapshots") if PROGRESS else tickers
@@ -390,31 +310,23 @@ def fetch_ib_quotes(tickers: list[str], opt_cons: list[Option]) -> pd.DataFrame:
         #     continue
         if tk in SYMBOL_MAP:
             cls, kw = SYMBOL_MAP[tk]
-            con = cls(**kw)
+            pending.append((tk, cls(**kw)))
         else:
-            con = Stock(tk, "SMART", "USD")
-        try:
-            ql = ib.qualifyContracts(con)
-            if not ql:
-                raise ValueError("not qualified")
-            md = ib.reqMktData(ql[0], "", False, False)
-            reqs[tk] = md
-        except Exception:
-            continue  # will fall back to yfinance later
+            pending.append((tk, Stock(tk, "SMART", "USD")))
 
     # ----- option contracts -----
-    for opt in opt_cons:
-        try:
-            ql = ib.qualifyContracts(opt)
-            if not ql:
-                continue
-            # Use a normal snapshot (regulatorySnapshot=False) to avoid 10170 permission errors
-            md = ib.reqMktData(ql[0], "", False, False)
-            reqs[opt.localSymbol] = md
-        except Exception:
-            continue
+    pending.extend((opt.localSymbol, opt) for opt in opt_cons)
 
-    ib.sleep(IB_TIMEOUT)
+    # Qualify everything in one cached bulk call (one by one if it fails);
+    # unqualified tickers fall back to yfinance later
+    qualified = _qualify(ib, [con for _, con in pending])
+    served = [(key, ql) for (key, _), ql in zip(pending, qualified) if ql is not None]
+
+    # Stream through the line budget (normal streams, not regulatory snapshots,
+    # to avoid 10170 permission errors); each line is released as soon as its
+    # ticker is quoted, at most IB_TIMEOUT
+    mds = _subscribe(ib, [ql for _, ql in served], ("quote",))
+    reqs = {key: md for (key, _), md in zip(served, mds) if md is not None}
 
     for key, md in reqs.items():
         last_price = _clean_price(
@@ -464,9 +376,6 @@ def fetch_ib_quotes(tickers: list[str], opt_cons: list[Option]) -> pd.DataFrame:
                 "source": "IB",
             }
         )
-        ib.cancelMktData(md.contract)
-
-    ib.disconnect()
 
     df_ib = pd.DataFrame(combined_rows)
     # ------------------------------------------------------------------
@@ -476,101 +385,70 @@ def fetch_ib_quotes(tickers: list[str], opt_cons: list[Option]) -> pd.DataFrame:
     return df_ib
 
 
-def fetch_yf_quotes(tickers: list[str]) -> pd.DataFrame:
-    rows = []
-    ts = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    iterable = iter_progress(tickers, "yfinance") if PROGRESS else tickers
-    for t in iterable:
-        if t in YIELD_MAP:
-            continue  # yields fetched via FRED
-        yf_tkr = PROXY_MAP.get(t, t)
-        try:
-            info = yf.Ticker(yf_tkr).info
-            # fast_info is more reliable after hours – use it to back-fill gaps
-            fast = yf.Ticker(yf_tkr).fast_info or {}
-            price = _yf_resolve_last_price(yf_tkr, label=t, info=info, fast=fast)
-            bid = _first_valid(fast.get("bid"), fast.get("bid_price"), info.get("bid"))
-            ask = _first_valid(fast.get("ask"), fast.get("ask_price"), info.get("ask"))
-            day_high = _first_valid(fast.get("day_high"), fast.get("dayHigh"))
-            day_low = _first_valid(fast.get("day_low"), fast.get("dayLow"))
-            prev_close = _first_valid(
-                fast.get("previous_close"),
-                fast.get("previousClose"),
-                info.get("previousClose"),
-            )
-            vol = _first_valid(
-                fast.get("last_volume"), fast.get("volume"), info.get("volume")
-            )
-        except Exception as e:
-            logging.warning("yfinance info fail %s: %s", t, e)
-            bid = ask = day_high = day_low = vol = np.nan
-            prev_close = np.nan
-            price = _yf_resolve_last_price(yf_tkr, label=t)
-        # Yahoo yields like ^TNX return 10× the percentage; rescale
-        if t in {"^IRX", "^FVX", "^TNX", "^TYX"} and price is not None:
-            price = price / 10.0
-        
-        rows.append(
-            {
-                "ticker": t,
-                "last": price,
-                "bid": bid,
-                "ask": ask,
-                "open": info.get("open") if "info" in locals() else np.nan,
-                "high": day_high,
-                "low": day_low,
-                "prev_close": prev_close,
-                "volume": vol,
-                "source": "YF",
-            }
-        )
-        time.sleep(0.1)
-    df = pd.DataFrame(rows)
+def fetch_yf_quotes(tickers: list[str], bid_ask: bool = True) -> pd.DataFrame:
+    """Quote *tickers* from Yahoo in one batch (see :mod:`core.yahoo`).
+
+    Friendly names go through ``PROXY_MAP``; yields are left to FRED.
+    Bid/ask need one ``.info`` request per symbol (run in the bounded
+    pool, and only for symbols IB did not quote); ``bid_ask=False`` leaves
+    them blank and keeps the fetch to the single batch download.
+    """
+    wanted = [t for t in tickers if t not in YIELD_MAP]
+    if not wanted:
+        return pd.DataFrame()
+    fields = yahoo_core.FIELDS + (yahoo_core.DETAIL_FIELDS if bid_ask else ())
+    yf_map = {t: PROXY_MAP.get(t, t) for t in wanted}
+    quotes = yahoo_core.quotes(yf_map.values(), fields)
+    df = quotes.loc[[yf_map[t] for t in wanted]].reindex(columns=YF_COLUMNS).reset_index(drop=True)
+    df.insert(0, "ticker", wanted)
+    # Yahoo yields like ^TNX return 10× the percentage; rescale
+    df.loc[df["ticker"].isin(["^IRX", "^FVX", "^TNX", "^TYX"]), "last"] /= 10.0
+    df["source"] = "YF"
     return df
 
 
 def fetch_fred_yields(tickers: list[str]) -> pd.DataFrame:
-    if not FRED_AVAILABLE:
+    """Latest constant-maturity yields from the local FRED store (:mod:`core.rates`)."""
+    series = {t: YIELD_MAP[t] for t in tickers if t in YIELD_MAP}
+    if not series:
         return pd.DataFrame()
+    latest = rates_core.latest(list(series.values()))
     rows = []
-    ts = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    iterable = iter_progress(tickers, "FRED") if PROGRESS else tickers
-    for t in iterable:
-        series = YIELD_MAP.get(t)
-        if not series:
+    for t, sid in series.items():
+        if sid not in latest:
+            logging.warning("FRED miss %s", t)
             continue
-        try:
-            val = web.DataReader(series, "fred").iloc[-1].values[0]
-            rows.append(
-                {
-                    "ticker": t,
-                    "last": val,
-                    "bid": np.nan,
-                    "ask": np.nan,
-                    "open": np.nan,
-                    "high": np.nan,
-                    "low": np.nan,
-                    "prev_close": np.nan,
-                    "volume": np.nan,
-                    "source": "FRED",
-                }
-            )
-        except Exception as e:
-            logging.warning("FRED miss %s: %s", t, e)
+        rows.append(
+            {
+                "ticker": t,
+                "last": latest[sid][1],
+                "bid": np.nan,
+                "ask": np.nan,
+                "open": np.nan,
+                "high": np.nan,
+                "low": np.nan,
+                "prev_close": np.nan,
+                "volume": np.nan,
+                "source": "FRED",
+            }
+        )
     return pd.DataFrame(rows)
 
 
 # -------------------- POSITION P&L SNAPSHOT --------------------
-def fetch_live_positions(ib: "IB") -> pd.DataFrame:
+def fetch_live_positions(ib: "IB", accounts: List[str] | None = None) -> pd.DataFrame:
     """
     Return a DataFrame with real‑time P&L for ALL open positions in the account.
 
-    Columns: timestamp · ticker · secType · position · avg_cost · last ·
+    Columns: timestamp · account · ticker · secType · position · avg_cost · last ·
              market_value · cost_basis · unrealized_pnl · unrealized_pnl_pct
              (combo positions are labeled as OPT_COMBO – detected either as BAG or multi‑leg heuristics)
+
+    ``accounts`` limits the rows to those accounts; a contract held in
+    several accounts is quoted once.
     """
     try:
-        positions = ib.positions()
+        positions = accounts_core.select(ib.positions(), accounts)
     except Exception as e:
         logging.warning("IB positions() failed: %s", e)
         return pd.DataFrame()
@@ -596,23 +474,29 @@ def fetch_live_positions(ib: "IB") -> pd.DataFrame:
                 combo_leg_con_ids.add(leg.conId)
 
     # prepare market‑data requests
-    md_reqs = {}
-    for pos in positions:
-        con = pos.contract
-        # Skip individual legs that are part of a combo
-        if con.conId in combo_leg_con_ids:
-            continue
-
-        try:
-            (ql,) = ib.qualifyContracts(con)
-            md = ib.reqMktData(ql, "", False, False)
-            md_reqs[con.conId] = (con, md, pos.avgCost, pos.position)
-        except Exception:
-            continue
-
-    ib.sleep(IB_TIMEOUT)  # allow quotes to update
+    # Skip individual legs that are part of a combo
+    wanted = [pos for pos in positions if pos.contract.conId not in combo_leg_con_ids]
+    leg_templates = {
+        leg.conId: Contract(conId=leg.conId, exchange=leg.exchange)
+        for pos in wanted
+        if pos.contract.secType == "BAG"
+        for leg in pos.contract.comboLegs or []
+    }
+    qualified = _qualify(ib, [pos.contract for pos in wanted])
+    leg_map = dict(zip(leg_templates, _qualify(ib, list(leg_templates.values()))))
+
+    held = [(pos, ql) for pos, ql in zip(wanted, qualified) if ql is not None]
+    unique = {ql.conId or id(ql): ql for _, ql in held}
+    # hold each line for a two-sided book: a lone close or last tick arrives
+    # first and would otherwise release the line before bid/ask
+    quotes = dict(zip(unique, _subscribe(ib, list(unique.values()), ("bid_ask",))))
+    md_reqs = [
+        (getattr(pos, "account", ""), pos.contract, md, pos.avgCost, pos.position)
+        for pos, ql in held
+        if (md := quotes.get(ql.conId or id(ql))) is not None
+    ]
 
-    for conId, (con, md, avg_cost, qty) in md_reqs.items():
+    for account, con, md, avg_cost, qty in md_reqs:
         raw_last = (
             _clean_price(md.last) if md.last is not None else _clean_price(md.close)
         )
@@ -625,12 +509,10 @@ def fetch_live_positions(ib: "IB") -> pd.DataFrame:
 
         combo_legs_data = []
         if con.secType == "BAG" and con.comboLegs:
-            from ib_insync import Contract
-
             for leg in con.comboLegs:
-                leg_contract = ib.qualifyContracts(
-                    Contract(conId=leg.conId, exchange=leg.exchange)
-                )[0]
+                leg_contract = leg_map.get(leg.conId)
+                if leg_contract is None:
+                    continue
                 combo_legs_data.append(
                     {
                         "symbol": leg_contract.symbol,
@@ -649,6 +531,7 @@ def fetch_live_positions(ib: "IB") -> pd.DataFrame:
         rows.append(
             {
                 "timestamp": ts_now,
+                "account": account,
                 "ticker": con.symbol,
                 # Mark as OPT_COMBO if it's a BAG *or* detected multi‑leg set
                 "secType": (
@@ -679,7 +562,6 @@ def fetch_live_positions(ib: "IB") -> pd.DataFrame:
                 "combo_legs": combo_legs_data if combo_legs_data else None,
             }
         )
-        ib.cancelMktData(md.contract)
 
     return pd.DataFrame(rows)
 
@@ -756,22 +638,29 @@ def _current_output_paths() -> tuple[str, str]:
     return base_q, base_pos
 
 
-def run(fmt: str = "csv", include_indices: bool = True) -> None:
+def run(
+    fmt: str = "csv",
+    include_indices: bool = True,
+    accounts: List[str] | None = None,
+    yf_bid_ask: bool = True,
+) -> None:
     """Programmatic entrypoint used by the Live-Market menu.
 
     - Avoids interactive prompts
     - Supports fmt in {csv, excel, pdf}
     - Optionally excludes macro/index extras if include_indices=False
+    - ``accounts`` limits positions to those accounts; the positions CSV is
+      then also split into one file per account
+    - ``yf_bid_ask=False`` skips the per-symbol Yahoo bid/ask requests
     """
     # ----- resolve tickers -----
     tickers = load_tickers()
     opt_list, opt_under = ([], set())
     if IB_AVAILABLE:
-        ib_tmp = IB()
         try:
-            ib_tmp.connect(IB_HOST, IB_PORT, clientId=99, timeout=3)
-            opt_list, opt_under = fetch_ib_positions(ib_tmp)
-            ib_tmp.disconnect()
+            ib = _ib_session()
+            accounts = accounts_core.resolve(ib, accounts)
+            opt_list, opt_under = fetch_ib_positions(ib, accounts)
         except Exception:
             pass
     extras = (ALWAYS_TICKERS + EXTRA_TICKERS) if include_indices else []
@@ -788,7 +677,7 @@ def run(fmt: str = "csv", include_indices: bool = True) -> None:
     remaining = [t for t in tickers if t not in served]
     remaining_yields = [t for t in remaining if t in YIELD_MAP]
     remaining = [t for t in remaining if t not in YIELD_MAP]
-    df_yf = fetch_yf_quotes(remaining) if remaining else pd.DataFrame()
+    df_yf = fetch_yf_quotes(remaining, bid_ask=yf_bid_ask) if remaining else pd.DataFrame()
     df_fred = fetch_fred_yields(remaining_yields) if remaining_yields else pd.DataFrame()
     df = pd.concat([df_ib, df_yf, df_fred], ignore_index=True)
     df.insert(0, "timestamp", ts_now)
@@ -798,11 +687,8 @@ def run(fmt: str = "csv", include_indices: bool = True) -> None:
     pct_map: dict[str, float] = {}
     df_pos = pd.DataFrame()
     if IB_AVAILABLE:
-        ib_live = IB()
         try:
-            ib_live.connect(IB_HOST, IB_PORT, clientId=98, timeout=3)
-            df_pos = fetch_live_positions(ib_live)
-            ib_live.disconnect()
+            df_pos = fetch_live_positions(_ib_session(), accounts)
             if not df_pos.empty:
                 pnl_map = df_pos.groupby("ticker")["unrealized_pnl"].sum().to_dict()
                 cost_map = df_pos.groupby("ticker")["cost_basis"].sum().to_dict()
@@ -854,10 +740,15 @@ def run(fmt: str = "csv", include_indices: bool = True) -> None:
         out_q = base_q + ".csv"
         df.to_csv(out_q, index=False, quoting=csv.QUOTE_MINIMAL, float_format="%.3f")
         if not df_pos.empty:
-            out_p = base_pos + ".csv"
-            df_pos.to_csv(
-                out_p, index=False, quoting=csv.QUOTE_MINIMAL, float_format="%.3f"
-            )
+            if accounts:
+                accounts_core.save_partitioned(
+                    df_pos, os.path.basename(base_pos), "csv", os.path.dirname(base_pos)
+                )
+            else:
+                out_p = base_pos + ".csv"
+                df_pos.to_csv(
+                    out_p, index=False, quoting=csv.QUOTE_MINIMAL, float_format="%.3f"
+                )
         logging.info("Saved live snapshot → %s", out_q)
 
 
@@ -874,6 +765,12 @@ def main():
         action="store_true",
         help="Save a PDF instead of CSV.",
     )
+    parser.add_argument(
+        "--no-yf-bid-ask",
+        action="store_true",
+        help="Leave bid/ask blank for Yahoo-quoted tickers (one batch request instead of one per ticker).",
+    )
+    cli_helpers.add_accounts_arg(parser)
     # Ignore any extra args when invoked from a parent menu
     args, _ = parser.parse_known_args()
 
@@ -888,7 +785,7 @@ def main():
             fmt = choice
 
     # Defer to run() so menu and CLI share behavior
-    run(fmt=fmt, include_indices=True)
+    run(fmt=fmt, include_indices=True, accounts=args.accounts, yf_bid_ask=not args.no_yf_bid_ask)
 
 
 ### Removed legacy lightweight run() in favor of unified run() above.
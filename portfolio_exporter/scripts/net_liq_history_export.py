@@ -22,9 +22,11 @@ from typing import Optional
 import pandas as pd
 import requests
 
+from portfolio_exporter.core import accounts as accounts_core
 from portfolio_exporter.core import cli as cli_helpers
 from portfolio_exporter.core import io as core_io
 from portfolio_exporter.core import json as json_helpers
+from portfolio_exporter.core import ratelimit
 from portfolio_exporter.core.runlog import RunLog
 from portfolio_exporter.core.config import settings
 
@@ -63,15 +65,9 @@ def _read_tws_file() -> Optional[pd.DataFrame]:
     return None
 
 
-def _pa_rest_download() -> pd.DataFrame:
-    if not CP_TOKEN:
-        sys.exit("❌  Set CP_REFRESH_TOKEN env-var or edit CP_TOKEN in script.")
-
-    session = requests.Session()
-    session.verify = VERIFY_SSL
-    r = session.post(f"{CP_BASE}/iserver/reauthorize", json={"refreshtoken": CP_TOKEN})
-    r.raise_for_status()
-    params = {"acctIds": "", "fromDate": "", "toDate": "", "format": "CSV"}
+def _pa_performance(session: requests.Session, acct: str = "") -> pd.DataFrame:
+    params = {"acctIds": acct, "fromDate": "", "toDate": "", "format": "CSV"}
+    ratelimit.acquire("cp")
     r = session.get(f"{CP_BASE}/pa/performance/timeweighted", params=params)
     r.raise_for_status()
     df_all = pd.read_csv(io.StringIO(r.text))
@@ -85,10 +81,64 @@ def _pa_rest_download() -> pd.DataFrame:
     sys.exit("❌  Unexpected column layout from PortfolioAnalyst CSV.")
 
 
-def _read_fixture_csv(path: Path) -> pd.DataFrame:
+def _cp_accounts(session: requests.Session) -> list[str]:
+    """Account IDs visible to the Client Portal login."""
+
+    ratelimit.acquire("cp")
+    r = session.get(f"{CP_BASE}/portfolio/accounts")
+    r.raise_for_status()
+    ids = (a.get("accountId") or a.get("id") for a in r.json() or [])
+    return [str(a) for a in ids if a]
+
+
+def _pa_rest_download(accounts: list[str] | None = None) -> pd.DataFrame:
+    if not CP_TOKEN:
+        sys.exit("❌  Set CP_REFRESH_TOKEN env-var or edit CP_TOKEN in script.")
+
+    session = requests.Session()
+    session.verify = VERIFY_SSL
+    ratelimit.acquire("cp")
+    r = session.post(f"{CP_BASE}/iserver/reauthorize", json={"refreshtoken": CP_TOKEN})
+    r.raise_for_status()
+    if accounts and "all" in accounts:
+        # PortfolioAnalyst takes real account IDs only
+        accounts = _cp_accounts(session)
+        if not accounts:
+            sys.exit("❌  Client Portal reported no accounts for --accounts all.")
+    if not accounts:
+        return _pa_performance(session)
+    # one PortfolioAnalyst request per account, issued concurrently
+    frames = accounts_core.fan_out(lambda acct: _pa_performance(session, acct), accounts)
+    failed = [a for a, f in frames.items() if isinstance(f, BaseException)]
+    if failed:
+        sys.exit(f"❌  PortfolioAnalyst download failed for: {', '.join(failed)}")
+    return _combine_accounts({a: f["net_liq"] for a, f in frames.items()})
+
+
+def _combine_accounts(series: dict[str, pd.Series]) -> pd.DataFrame:
+    """Wide frame with one ``net_liq_<acct>`` column per account plus the total.
+
+    Dates missing for an account carry its last known value forward so the
+    total is not understated on days only some accounts reported.
+    """
+
+    wide = pd.DataFrame({f"net_liq_{a}": s for a, s in series.items()}).sort_index().ffill()
+    wide.insert(0, "net_liq", wide.sum(axis=1, min_count=1))
+    return wide
+
+
+def _read_fixture_csv(path: Path, accounts: list[str] | None = None) -> pd.DataFrame:
     df = pd.read_csv(path)
     for col in ["NetLiq", "NetLiquidation", "NetLiquidationByCurrency"]:
         if col in df.columns and "Date" in df.columns:
+            if accounts and "Account" in df.columns:
+                if "all" not in accounts:
+                    df = df[df["Account"].isin(accounts)]
+                series = {
+                    str(a): _parse_dates(g.set_index("Date")[[col]])[col]
+                    for a, g in df.groupby("Account", sort=True)
+                }
+                return _combine_accounts(series)
             df = df[["Date", col]].rename(columns={col: "net_liq"}).set_index("Date")
             return _parse_dates(df)
     sys.exit("❌  Unexpected column layout in fixture CSV.")
@@ -102,18 +152,25 @@ def _filter_range(df: pd.DataFrame, start: str | None, end: str | None) -> pd.Da
     return df
 
 
-def _load_data(source: str, fixture_csv: Path | None) -> pd.DataFrame:
+def _load_data(
+    source: str, fixture_csv: Path | None, accounts: list[str] | None = None
+) -> pd.DataFrame:
+    """Load the Net-Liq history; ``accounts`` adds per-account columns.
+
+    Per-account history comes from Client Portal or a fixture with an
+    ``Account`` column; the TWS export only covers the logged-in account.
+    """
     if source == "fixture":
         if not fixture_csv:
             sys.exit("❌  --fixture-csv is required when source=fixture.")
-        return _read_fixture_csv(fixture_csv)
+        return _read_fixture_csv(fixture_csv, accounts)
     if source == "tws":
         df = _read_tws_file()
         if df is None:
             sys.exit("❌  dailyNetLiq.csv not found.")
         return df
     if source in {"clientportal", "cp"}:
-        return _pa_rest_download()
+        return _pa_rest_download(accounts)
     if source == "auto":
         # Prefer local TWS export when present
         df = _read_tws_file()
@@ -121,10 +178,10 @@ def _load_data(source: str, fixture_csv: Path | None) -> pd.DataFrame:
             return df
         # Then try Client Portal if token is available
         if CP_TOKEN:
-            return _pa_rest_download()
+            return _pa_rest_download(accounts)
         # If a fixture was explicitly provided, use it
         if fixture_csv:
-            return _read_fixture_csv(fixture_csv)
+            return _read_fixture_csv(fixture_csv, accounts)
         # As a developer-friendly fallback, try the repo fixture if present
         try:
             repo_root = Path(__file__).resolve().parents[2]
@@ -151,11 +208,11 @@ def _run_core(
     formats: dict[str, bool],
     outdir: Path,
 ) -> tuple[pd.DataFrame, dict, list[Path]]:
-    df = _load_data(ns.source, ns.fixture_csv)
+    df = _load_data(ns.source, ns.fixture_csv, getattr(ns, "accounts", None))
     df = _filter_range(df, ns.start, ns.end)
     if df.empty:
         sys.exit("❌  No data in the selected date range.")
-    df = df.rename(columns={"net_liq": "NetLiq"})
+    df = df.rename(columns=lambda c: c.replace("net_liq", "NetLiq"))
 
     outputs = {k: "" for k in formats}
     written: list[Path] = []
@@ -195,6 +252,7 @@ def cli(ns: argparse.Namespace) -> dict:
                 tpath = core_io.save(pd.DataFrame(rl.timings), "timings", "csv", outdir)
                 summary["outputs"].append(str(tpath))
                 written.append(tpath)
+        rl.add_counters("ratelimit", ratelimit.limiter.stats())
         rl.add_outputs(written)
         manifest_path = rl.finalize(write=bool(written))
 
@@ -222,6 +280,7 @@ def get_arg_parser() -> argparse.ArgumentParser:
         default="auto",
     )
     parser.add_argument("--fixture-csv", type=Path)
+    cli_helpers.add_accounts_arg(parser)
     parser.add_argument("--csv", action="store_true")
     parser.add_argument("--pdf", action="store_true")
     cli_helpers.add_common_output_args(parser, include_excel=True)
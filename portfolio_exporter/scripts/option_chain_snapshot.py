@@ -4,8 +4,10 @@ option_chain_snapshot.py  –  Export a full option-chain snapshot for one or mo
 
 • Uses IBKR market-data (ib_insync) and writes CSVs to your iCloud Downloads dir.
 • Handles live, frozen, delayed-streaming *or* delayed-snapshot data automatically.
-• If Greeks / IV or bid/ask are still missing after streaming, it takes a one-shot
-  delayed snapshot for each affected contract to fill the gaps.
+• If bid/ask are still missing after streaming, it takes a one-shot delayed
+  snapshot for each affected contract; missing IV is solved from the marks for
+  the whole chain in one batch and feeds the greek fallback, either
+  Black-Scholes or the American (BAW) engine per ``settings.greeks.model``.
 
 Usage
 =====
@@ -28,6 +30,9 @@ import os
 import time
 from portfolio_exporter.core.config import settings
 from portfolio_exporter.core import io
+from portfolio_exporter.core import contracts as contracts_core
+from portfolio_exporter.core import open_interest as oi_core
+from portfolio_exporter.core import ratelimit
 from portfolio_exporter.core.ui import run_with_spinner
 from datetime import datetime, timezone, date
 from typing import List, Sequence
@@ -38,7 +43,7 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from ib_insync import IB, Option, Stock
-from utils.bs import bs_greeks
+from portfolio_exporter.core.greeks import greeks_kernel, implied_vol_vec
 
 try:  # optional dependencies
     import xlsxwriter  # type: ignore
@@ -66,6 +71,7 @@ def _safe_spot(ib: IB, stk: Stock, streaming_tk):
     if spot_val and spot_val > 0:
         return spot_val
     # pull adjusted close (1‑day bar, regular trading hours)
+    ratelimit.acquire("ib_hist", client=ib)
     bars = ib.reqHistoricalData(
         stk,
         endDateTime="",
@@ -81,42 +87,27 @@ def _safe_spot(ib: IB, stk: Stock, streaming_tk):
 # ─────────── contract resolution helper ───────────
 def _resolve_contract(ib: IB, template: Option):
     """
-    Return a fully‑qualified Contract for the given template, handling
-    ambiguous matches via `ib.qualifyContracts` first (fast‑path) and
-    falling back to `reqContractDetails` only if qualification fails.
+    Return a fully‑qualified Contract for the given template, or None.
 
-    Preference order for ambiguous matches:
-      1. tradingClass equal to the underlying symbol
-      2. first contract returned by IB
-
-    Returns None if no contract can be qualified.
+    Ambiguous matches prefer the contract whose tradingClass equals the
+    underlying symbol, else the first one IB returns.  Results (including
+    "no security definition") come from the persistent contract cache when
+    available; see :func:`_resolve_contracts` for the bulk form.
     """
-    # --- fast path: qualifyContracts ----------------------------------------------------
-    try:
-        ql = ib.qualifyContracts(template)
-        if ql:
-            # If there is only one qualified contract, use it immediately
-            if len(ql) == 1:
-                return ql[0]
-            # More than one – pick by tradingClass heuristics
-            for c in ql:
-                if c.tradingClass == template.symbol:
-                    return c
-            return ql[0]
-    except Exception:
-        # qualification can raise when template is too fuzzy – fall through
-        pass
+    return _resolve_contracts(ib, [template])[0]
+
 
-    # --- slow path: reqContractDetails --------------------------------------------------
-    cds = ib.reqContractDetails(template)
-    if not cds:
-        return None
-    if len(cds) == 1:
-        return cds[0].contract
-    for cd in cds:
-        if cd.contract.tradingClass == template.symbol:
-            return cd.contract
-    return cds[0].contract
+def _resolve_contracts(ib: IB, templates: list[Option]) -> list:
+    """Bulk :func:`_resolve_contract`: cached, with misses requested concurrently."""
+    out: list = [None] * len(templates)
+    by_symbol: dict[str, list[int]] = {}
+    for i, t in enumerate(templates):
+        by_symbol.setdefault(t.symbol, []).append(i)
+    for sym, idx in by_symbol.items():
+        found = contracts_core.resolve(ib, *(templates[i] for i in idx), prefer=sym)
+        for i, c in zip(idx, found):
+            out[i] = c
+    return out
 
 
 # ───────────────────────── CONFIG ──────────────────────────
@@ -349,41 +340,11 @@ def fetch_yf_open_interest(symbol: str, expiry: str) -> dict[tuple[float, str],
     Return {(strike, right): open_interest} for a given symbol‑expiry pair
     using yfinance.
 
-    yfinance expects the expiry in 'YYYY‑MM‑DD' format, whereas IB returns
-    'YYYYMMDD'.  We normalise the string first, then attempt to fetch.
-    Falls back to {} on any error or if the dataframe is empty.
+    Served from the shared per-trade-date cache in
+    :mod:`portfolio_exporter.core.open_interest`; IB-style ``YYYYMMDD``
+    expiries are accepted.  Falls back to {} on any error or empty chain.
     """
-    # normalise expiry to YYYY‑MM‑DD for yfinance
-    if len(expiry) == 8 and expiry.isdigit():
-        expiry_fmt = f"{expiry[:4]}-{expiry[4:6]}-{expiry[6:]}"
-    else:
-        expiry_fmt = expiry
-
-    try:
-        oc = yf.Ticker(symbol).option_chain(expiry_fmt)
-    except Exception as e:  # pragma: no cover – network failures
-        logger.debug("yfinance OI fetch fail %s %s: %s", symbol, expiry_fmt, e)
-        return {}
-
-    mapping: dict[tuple[float, str], int] = {}
-    for right, df in (("C", oc.calls), ("P", oc.puts)):
-        if getattr(df, "empty", True):
-            continue
-        for _, row in df[["strike", "openInterest"]].dropna().iterrows():
-            try:
-                mapping[(float(row["strike"]), right)] = int(row["openInterest"])
-            except Exception:
-                continue
-    return mapping
-
-
-def _wait_for_snapshots(ib: IB, snaps: list[tuple], timeout=8.0):
-    """Wait until all tickers have a non-None timestamp or timeout."""
-    end = time.time() + timeout
-    while time.time() < end:
-        if all(getattr(tk, "time", None) for _, tk in snaps):
-            break
-        time.sleep(0.25)
+    return oi_core.mapping(symbol, expiry)
 
 
 def _wait_attr(tk, field: str, timeout: float = 2.0) -> None:
@@ -397,11 +358,46 @@ def _wait_attr(tk, field: str, timeout: float = 2.0) -> None:
 
 
 # ─────────── core chain routine ───────────
-def snapshot_chain(ib: IB, symbol: str, expiry_hint: str | None = None) -> pd.DataFrame:
+def _snapshot_missing(ib: IB, missing: list) -> None:
+    """Fill ``(contract, ticker)`` pairs from one-shot snapshots.
+
+    Pending snapshots occupy market-data lines too, so they go out in
+    batches no larger than the line budget, paced by the shared IB
+    market-data bucket, and each batch is awaited once.
+    """
+
+    from portfolio_exporter.core import ib as ib_core
+
+    budget = ib_core.line_scheduler(ib).budget
+    for start in range(0, len(missing), budget):
+        batch = missing[start : start + budget]
+        snaps = []
+        for con, _ in batch:
+            ratelimit.acquire("ib_mktdata", client=ib)
+            # snapshot: genericTickList must be empty
+            snaps.append(ib.reqMktData(con, "", True, False))
+        ib_core.wait_ready(ib, snaps, ("price",), timeout=2.0)
+        for (_, tk), snap in zip(batch, snaps):
+            for fld in ("bid", "ask", "last", "close", "impliedVolatility"):
+                val = getattr(snap, fld, None)
+                if val not in (None, -1):
+                    setattr(tk, fld, val)
+            if getattr(snap, "modelGreeks", None):
+                tk.modelGreeks = snap.modelGreeks
+            # Copy volume if present
+            if getattr(snap, "volume", None) not in (None, -1):
+                tk.volume = snap.volume
+            if snap.contract:
+                ib.cancelMktData(snap.contract)
+
+
+def snapshot_chain(
+    ib: IB, symbol: str, expiry_hint: str | None = None, greeks_model: str | None = None
+) -> pd.DataFrame:
     logger.info("Snapshot %s", symbol)
 
     stk = Stock(symbol, "SMART", "USD")
-    ib.qualifyContracts(stk)
+    contracts_core.qualify(ib, stk)
     if not stk.conId:
         raise RuntimeError(f"Unable to qualify underlying {symbol}")
 
@@ -439,8 +435,11 @@ def snapshot_chain(ib: IB, symbol: str, expiry_hint: str | None = None) -> pd.Da
     # ── spot price and ±20 strikes ────────────────────────────────
     strikes_all = sorted(chain.strikes)
 
+    from portfolio_exporter.core import ib as ib_core
+
+    ratelimit.acquire("ib_mktdata", client=ib)
     spot_tk = ib.reqMktData(stk, "", True, False)
-    ib.sleep(0.5)
+    ib_core.wait_ready(ib, [spot_tk], ("price",), timeout=0.5)
 
     spot = _safe_spot(ib, stk, spot_tk)
 
@@ -488,114 +487,74 @@ def snapshot_chain(ib: IB, symbol: str, expiry_hint: str | None = None) -> pd.Da
         for right in ("C", "P")
     ]
 
-    contracts: list[Option] = []
-    for tmpl in raw_templates:
-        # --- first try with tradingClass as provided (root_tc) -----------------
-        c = _resolve_contract(ib, tmpl)
-
-        # --- fallback #1: strip tradingClass if first attempt failed -----------
-        if c is None and use_trading_class:
-            tmpl_no_tc = Option(
-                tmpl.symbol,
-                tmpl.lastTradeDateOrContractMonth,
-                tmpl.strike,
-                tmpl.right,
-                exchange=tmpl.exchange,
-                currency=tmpl.currency,
-            )
-            c = _resolve_contract(ib, tmpl_no_tc)
-
-        # --- fallback #2: use the underlying symbol as tradingClass ------------
-        if c is None and use_trading_class and root_tc != symbol:
-            tmpl_sym_tc = Option(
-                tmpl.symbol,
-                tmpl.lastTradeDateOrContractMonth,
-                tmpl.strike,
-                tmpl.right,
-                exchange=tmpl.exchange,
-                currency=tmpl.currency,
-                tradingClass=symbol,  # use the underlying itself
+    # Resolve every strike in one bulk pass, then retry only the misses
+    resolved = _resolve_contracts(ib, raw_templates)
+
+    # Fallbacks for the misses: strip tradingClass, then try the underlying
+    # symbol itself as tradingClass
+    fallbacks = []
+    if use_trading_class:
+        fallbacks.append(None)
+        if root_tc != symbol:
+            fallbacks.append(symbol)
+    for tc in fallbacks:
+        missing = [i for i, c in enumerate(resolved) if c is None]
+        if not missing:
+            break
+        retry = [
+            Option(
+                raw_templates[i].symbol,
+                raw_templates[i].lastTradeDateOrContractMonth,
+                raw_templates[i].strike,
+                raw_templates[i].right,
+                exchange=raw_templates[i].exchange,
+                currency=raw_templates[i].currency,
+                **({"tradingClass": tc} if tc else {}),
             )
-            c = _resolve_contract(ib, tmpl_sym_tc)
+            for i in missing
+        ]
+        for i, c in zip(missing, _resolve_contracts(ib, retry)):
+            resolved[i] = c
 
-        if c:
-            contracts.append(c)
+    contracts: list[Option] = [c for c in resolved if c]
 
     if not contracts:
         raise RuntimeError(
             "No option contracts qualified for the chosen strikes / expiry"
         )
 
-    # stream market data (need streaming for generic-tick 101)
-    snapshots = [
-        (
-            c,
-            ib.reqMktData(
-                c,
-                "",  # let IB decide tick types; avoids eid errors
-                snapshot=False,
-                regulatorySnapshot=False,
-            ),
-        )
-        for c in contracts
-    ]
-    _wait_for_snapshots(ib, snapshots)
-
-    # cancel streams
-    for _, snap in snapshots:
-        ib.cancelMktData(snap.contract)
-
-    # ── one-shot snapshot fallback for missing price/IV ──
-    for con, tk in snapshots:
-        price_missing = (tk.bid in (None, -1)) and (tk.last in (None, -1))
-        iv_missing = math.isnan(_g(tk, "impliedVolatility"))
-        if price_missing or iv_missing:
-            snap = ib.reqMktData(
-                con, "", True, False
-            )  # snapshot: genericTickList must be empty
-            ib.sleep(0.35)
-            for fld in ("bid", "ask", "last", "close", "impliedVolatility"):
-                val = getattr(snap, fld, None)
-                if val not in (None, -1):
-                    setattr(tk, fld, val)
-            if getattr(snap, "modelGreeks", None):
-                tk.modelGreeks = snap.modelGreeks
-            # Copy volume if present
-            if getattr(snap, "volume", None) not in (None, -1):
-                tk.volume = snap.volume
-            if snap.contract:
-                ib.cancelMktData(snap.contract)
+    # stream market data (need streaming for generic-tick 101) through the
+    # line budget; each line is held until the ticker is quoted and carries
+    # model greeks (with IV), at most 8s
+    # ("" → let IB decide tick types; avoids eid errors)
+    tickers = ib_core.line_scheduler(ib).subscribe(
+        contracts, require=("quote", "greeks"), timeout=8.0
+    )
+    snapshots = [(c, tk) for c, tk in zip(contracts, tickers) if tk is not None]
+
+    # ── one-shot snapshot fallback for missing prices ──
+    # (missing IV is solved from the marks below, no extra request needed)
+    _snapshot_missing(
+        ib,
+        [
+            (con, tk)
+            for con, tk in snapshots
+            if (tk.bid in (None, -1)) and (tk.last in (None, -1))
+        ],
+    )
 
     # build rows
     ts_local = datetime.now(ZoneInfo("Europe/Istanbul"))
     ts = ts_local.isoformat()
     rows = []
+    marks = []  # mid ▸ last ▸ close, used to solve missing IV
     for con, tk in snapshots:
-        oi_attr = "callOpenInterest" if con.right == "C" else "putOpenInterest"
-        iv_val = _g(tk, "impliedVolatility")
-        delta_val = _g(tk, "delta")
-        gamma_val = _g(tk, "gamma")
-        vega_val = _g(tk, "vega")
-        theta_val = _g(tk, "theta")
-
-        # Black-Scholes fallback if still NaN
-        if any(np.isnan(x) for x in (delta_val, gamma_val, vega_val, theta_val)):
-            if spot and iv_val and not np.isnan(iv_val):
-                exp_dt = datetime.strptime(expiry, "%Y%m%d").replace(
-                    tzinfo=timezone.utc
-                )
-                T = max(
-                    (exp_dt - datetime.now(timezone.utc)).total_seconds()
-                    / (365 * 24 * 3600),
-                    1 / (365 * 24),
-                )
-                bs = bs_greeks(spot, con.strike, T, 0.01, iv_val, con.right == "C")
-                delta_val = bs["delta"] if np.isnan(delta_val) else delta_val
-                gamma_val = bs["gamma"] if np.isnan(gamma_val) else gamma_val
-                vega_val = bs["vega"] if np.isnan(vega_val) else vega_val
-                theta_val = bs["theta"] if np.isnan(theta_val) else theta_val
-
         mid_price = np.nan if any(np.isnan([tk.bid, tk.ask])) else (tk.bid + tk.ask) / 2
+        mark = mid_price
+        for fld in ("last", "close"):
+            if np.isnan(mark):
+                mark = _attr(tk, fld)
+        marks.append(mark)
 
         rows.append(
             {
@@ -608,21 +567,51 @@ def snapshot_chain(ib: IB, symbol: str, expiry_hint: str | None = None) -> pd.Da
                 "bid": tk.bid if tk.bid not in (None, -1) else np.nan,
                 "ask": tk.ask if tk.ask not in (None, -1) else np.nan,
                 "mid_price": mid_price,
-                "iv": iv_val,
-                "delta": delta_val,
-                "gamma": gamma_val,
-                "vega": vega_val,
-                "theta": theta_val,
+                "iv": _g(tk, "impliedVolatility"),
+                "delta": _g(tk, "delta"),
+                "gamma": _g(tk, "gamma"),
+                "vega": _g(tk, "vega"),
+                "theta": _g(tk, "theta"),
                 "open_interest": yf_open_interest.get((con.strike, con.right), np.nan),
                 "volume": _attr(tk, "volume"),
             }
         )
 
-    df = (
-        pd.DataFrame(rows).sort_values(["right", "strike"]).reset_index(drop=True)
-        if rows
-        else pd.DataFrame()
-    )
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+
+    if spot and not np.isnan(spot):
+        exp_dt = datetime.strptime(expiry, "%Y%m%d").replace(tzinfo=timezone.utc)
+        T = max(
+            (exp_dt - datetime.now(timezone.utc)).total_seconds() / (365 * 24 * 3600),
+            1 / (365 * 24),
+        )
+        strikes_arr = df["strike"].to_numpy(dtype=float)
+        is_call = df["right"].to_numpy() == "C"
+
+        # Solve IV in one batch for every contract IB left without one
+        iv = df["iv"].to_numpy(dtype=float)
+        need_iv = np.isnan(iv)
+        if need_iv.any():
+            iv[need_iv] = implied_vol_vec(
+                np.asarray(marks, dtype=float)[need_iv],
+                spot,
+                strikes_arr[need_iv],
+                T,
+                0.01,
+                is_call[need_iv],
+            )
+            df["iv"] = iv
+
+        # Model fallback (BS or American) for any greek still NaN – one pass over the chain
+        kernel = greeks_kernel(greeks_model or settings.greeks.model)
+        bs = kernel(spot, strikes_arr, T, 0.01, iv, is_call, multiplier=1)
+        for col in ("delta", "gamma", "vega", "theta"):
+            vals = df[col].to_numpy(dtype=float)
+            df[col] = np.where(np.isnan(vals), bs[col], vals)
+
+    df = df.sort_values(["right", "strike"]).reset_index(drop=True)
 
     return df
 
@@ -676,6 +665,7 @@ def run(
     fmt: str = "csv",
     symbols: str | None = None,
     symbol_expiries: str | None = None,
+    greeks_model: str | None = None,
 ) -> None:
     filetype = fmt.lower()
     # Ensure output directory exists at write-time
@@ -691,7 +681,9 @@ def run(
         txt=filetype == "txt",
     )
 
-    ib = IB()
+    from portfolio_exporter.core import ib as ib_core
+
+    ib = ib_core.make_client(IB)
     try:
         ib.connect(IB_HOST, IB_PORT, IB_CID, timeout=10)
 
@@ -750,7 +742,7 @@ def run(
         for hint in hints:
             try:
                 df = run_with_spinner(
-                    f"Fetching {sym} chain…", snapshot_chain, ib, sym, hint
+                    f"Fetching {sym} chain…", snapshot_chain, ib, sym, hint, greeks_model
                 )
                 if df.empty:
                     logger.warning("%s %s – no data", sym, hint)
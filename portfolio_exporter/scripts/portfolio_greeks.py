@@ -48,22 +48,28 @@ except Exception:  # pragma: no cover - optional dependency
 import sqlite3
 import pandas as pd
 
-# Prefer in-package BS greeks; fall back to legacy utils in dev trees
-try:
-    from portfolio_exporter.core.greeks import bs_greeks  # type: ignore
-except Exception:  # pragma: no cover - optional fallback for local dev
-    from utils.bs import bs_greeks  # type: ignore
-try:
-    from legacy.option_chain_snapshot import fetch_yf_open_interest
-except Exception:  # pragma: no cover - optional
-    def fetch_yf_open_interest(*args, **kwargs):  # type: ignore
-        return {}
+from portfolio_exporter.core.greeks import (
+    GREEKS_MODELS,
+    bs_greeks_vec,
+    greeks_cache,
+    greeks_kernel,
+    implied_vol_vec,
+)
 try:
     from portfolio_exporter.core.ui import run_with_spinner
 except Exception:  # pragma: no cover - fallback
     def run_with_spinner(msg, func, *args, **kwargs):
         return func(*args, **kwargs)
+from portfolio_exporter.core import accounts as accounts_core
+from portfolio_exporter.core import aggregate
+from portfolio_exporter.core import attribution
 from portfolio_exporter.core import combo as combo_core
+from portfolio_exporter.core import contracts as contracts_core
+from portfolio_exporter.core import open_interest as oi_core
+from portfolio_exporter.core import rates as rates_core
+from portfolio_exporter.core import ratelimit
+from portfolio_exporter.core import scenario as scenario_core
+from portfolio_exporter.core import volsurface
 from portfolio_exporter.core import io as io_core
 from portfolio_exporter.core import config as config_core
 from portfolio_exporter.core import cli as cli_helpers
@@ -127,18 +133,21 @@ CP_URL = "https://localhost:5000/v1/pa/performance"
 IB_ACCOUNT = os.getenv("IB_ACCOUNT") or "U4380392"
 
 
-def bootstrap_nav(ib: "IB", days: int = 365) -> pd.Series:
+def bootstrap_nav(ib: "IB", days: int = 365, account: str | None = None) -> pd.Series:
     """
     Try to fetch historical NetLiq series in order of preference:
     1) Client-Portal REST (all available history)
     2) API reqPnL fallback (365 days)
     Returns pd.Series indexed by date or empty series on failure.
+    ``account`` defaults to ``IB_ACCOUNT``.
     """
+    account = account or IB_ACCOUNT
     # ---- 1) Client-Portal REST ----
     try:
         parms = {"period": "all", "fields": "nav"}
+        ratelimit.acquire("cp")
         resp = requests.get(
-            f"{CP_URL}/{IB_ACCOUNT}", params=parms, verify=False, timeout=20
+            f"{CP_URL}/{account}", params=parms, verify=False, timeout=20
         )
         resp.raise_for_status()
         data = resp.json().get("nav", [])
@@ -157,7 +166,7 @@ def bootstrap_nav(ib: "IB", days: int = 365) -> pd.Series:
 
     # ---- 2) reqPnL fallback (365 days) ----
     try:
-        pnl_obj = ib.reqPnL(IB_ACCOUNT, modelCode="", accountCode="")
+        pnl_obj = ib.reqPnL(account, modelCode="", accountCode="")
         # allow stream to populate
         ib.sleep(2)
         if pnl_obj.dailyPnLSeries:
@@ -231,6 +240,15 @@ except Exception:  # pragma: no cover - optional fallback
         return default
 IB_CID = _cid("portfolio_greeks", default=11)  # separate clientId from snapshots
 
+
+def _ib_session() -> IB:
+    """Borrow the process-wide IB session shared by all scripts."""
+
+    from portfolio_exporter.core import ib as ib_core
+
+    return ib_core.session(factory=IB, timeout=10)
+
+
 # contract multipliers by secType (IB doesn't always fill this field)
 DEFAULT_MULT = {
     "OPT": 100,
@@ -241,36 +259,27 @@ DEFAULT_MULT = {
 }
 
 
-# ───────────────────── expiry normaliser for Yahoo OI ─────────────────────
-def _normalised_expiry(exp_str: str) -> str:
-    """
-    Convert IB expiry (YYYYMMDD or YYYYMM) to a canonical key so that we
-    hit the right cache entry when calling fetch_yf_open_interest.
-    YYYYMM    → YYYYMM   (monthly)
-    YYYYMMDD  → YYYYMMDD (weekly)
-    """
-    if len(exp_str) == 6 and exp_str.isdigit():  # monthly
-        return exp_str
-    elif len(exp_str) >= 8 and exp_str[:8].isdigit():  # weekly/full
-        return exp_str[:8]
-    return exp_str
-
-
 # tunables
 TIMEOUT_SECONDS = 40  # seconds to wait for model-Greeks before falling back
-DEFAULT_SIGMA = 0.40  # fallback IV if IB does not provide one
+DEFAULT_SIGMA = 0.40  # last-resort IV: no IB IV, no solvable mark, no fitted smile
 
-RISK_FREE_RATE = 0.01  # annualised risk-free rate for BS fallback
+RISK_FREE_RATE = 0.01  # BS-fallback rate when the FRED T-bill yield is unavailable
 
 # ───────────────────── helpers ──────────────────────
 
 
-def _net_liq(ib: "IB") -> float:
-    """Return current NetLiquidation as float or np.nan on failure."""
+def _net_liq(ib: "IB", accounts: List[str] | None = None) -> float:
+    """Return current NetLiquidation as float or np.nan on failure.
+
+    With ``accounts`` the NetLiquidation of those accounts is summed.
+    """
     try:
-        for row in ib.accountSummary():
-            if getattr(row, "tag", "") == "NetLiquidation":
-                return float(row.value)
+        rows = [r for r in ib.accountSummary() if getattr(r, "tag", "") == "NetLiquidation"]
+        if accounts:
+            picked = accounts_core.select(rows, accounts)
+            return float(sum(float(r.value) for r in picked)) if picked else np.nan
+        for row in rows:
+            return float(row.value)
     except Exception as exc:
         logger.warning(f"Could not fetch NetLiquidation: {exc}")
     return np.nan
@@ -313,10 +322,10 @@ def _get_underlying(ib: IB, c: Contract) -> Contract | None:
     if raw is None:
         return None
     try:
-        qc = ib.qualifyContracts(raw)
-        if qc:
-            UNDER_CACHE[sym] = qc[0]
-            return qc[0]
+        qc = contracts_core.qualify(ib, raw)[0]
+        if qc is not None:
+            UNDER_CACHE[sym] = qc
+            return qc
     except Exception as exc:
         logger.debug(f"Underlying qualify failed for {sym}: {exc}")
     return None
@@ -341,23 +350,17 @@ def _multiplier(c: Contract) -> int:
         return DEFAULT_MULT.get(c.secType, 1)
 
 
-def _has_any_greeks_populated(ticker: Ticker) -> bool:
-    """Return True if *any* of the standard greek sets have a non-NaN delta."""
-    for name in ("modelGreeks", "lastGreeks", "bidGreeks", "askGreeks"):
-        g = getattr(ticker, name, None)
-        if g and g.delta is not None and not math.isnan(g.delta):
-            return True
-    return False
-
-
 # ───────────────── pull positions & request data ─────────────────
 
 
-def list_positions(ib: IB) -> List[Tuple[Position, Ticker]]:
+def list_positions(ib: IB, accounts: List[str] | None = None) -> List[Tuple[Position, Ticker]]:
     """
     Retrieve option/FOP positions and fetch live market data streams for Greeks.
+
+    ``accounts`` restricts the positions to those accounts; a contract held
+    in several accounts is subscribed once and its ticker shared.
     """
-    raw_positions = [p for p in ib.positions() if p.position != 0]
+    raw_positions = [p for p in accounts_core.select(ib.positions(), accounts) if p.position != 0]
 
     # Expand IB "BAG" combo positions into per-leg pseudo-positions so we can
     # fetch Greeks for each option leg. Some accounts only show combos as BAGs
@@ -376,14 +379,16 @@ def list_positions(ib: IB) -> List[Tuple[Position, Ticker]]:
                 legs = getattr(p.contract, "comboLegs", None) or []
                 if not legs:
                     continue
-                # For each leg, qualify by conId and synthesize a Position-like object
+                # Qualify all legs by conId at once (cached), then synthesize
+                # a Position-like object per leg
+                templates = []
                 for leg in legs:
+                    c = Contract()
+                    c.conId = int(getattr(leg, "conId"))
+                    templates.append(c)
+                leg_contracts = contracts_core.resolve(ib, *templates)
+                for leg, lc in zip(legs, leg_contracts):
                     try:
-                        # Qualify the leg contract by conId to obtain full details
-                        c = Contract()
-                        c.conId = int(getattr(leg, "conId"))
-                        cds = ib.reqContractDetails(c)
-                        lc = cds[0].contract if cds else None
                         if lc is None:
                             continue
                         # Compute effective leg quantity (respect leg action/buy/sell and ratio)
@@ -395,11 +400,12 @@ def list_positions(ib: IB) -> List[Tuple[Position, Ticker]]:
 
                         # Build a minimal Position-like object with required attributes
                         class _PosLike:
-                            def __init__(self, contract, position):
+                            def __init__(self, contract, position, account):
                                 self.contract = contract
                                 self.position = position
+                                self.account = account
 
-                        positions.append(_PosLike(lc, eff_qty))
+                        positions.append(_PosLike(lc, eff_qty, getattr(p, "account", "")))
                     except Exception:
                         # Skip legs we cannot qualify
                         continue
@@ -417,33 +423,36 @@ def list_positions(ib: IB) -> List[Tuple[Position, Ticker]]:
         "Requesting live market data (Greeks)…"
     )
 
-    bundles: List[Tuple[Position, Ticker]] = []
-    for pos in positions:
-        qc = ib.qualifyContracts(pos.contract)
-        if not qc:
+    qualified = contracts_core.qualify(ib, *(pos.contract for pos in positions))
+    wanted: list[tuple[Position, Contract]] = []
+    for pos, c in zip(positions, qualified):
+        if c is None:
             logger.warning(f"Could not qualify {pos.contract.localSymbol}. Skipping.")
             continue
-        c = qc[0]
         if not c.exchange:
             c.exchange = "SMART"
         if not c.currency:
             c.currency = "USD"
-
-        tk = ib.reqMktData(
-            c,
-            genericTickList="106",  # IV only; greeks auto-populate via MODEL_OPTION
-            snapshot=False,
-            regulatorySnapshot=False,
-        )
-        bundles.append((pos, tk))
-
-    # wait until every ticker has at least one greek populated, or timeout
-    deadline = time.time() + TIMEOUT_SECONDS
-    while time.time() < deadline:
-        ib.sleep(0.25)
-        if all(_has_any_greeks_populated(tk) for _, tk in bundles):
-            break
-    else:
+        wanted.append((pos, c))
+
+    # Stream through the market-data line budget; each line is recycled as
+    # soon as its ticker has greeks (or after TIMEOUT_SECONDS)
+    from portfolio_exporter.core import ib as ib_core
+
+    unique: Dict[Any, Contract] = {}
+    for _, c in wanted:
+        unique.setdefault(getattr(c, "conId", 0) or id(c), c)
+    tickers = ib_core.line_scheduler(ib).subscribe(
+        unique.values(),
+        require=("greeks",),
+        timeout=TIMEOUT_SECONDS,
+        generic_ticks="106",  # IV only; greeks auto-populate via MODEL_OPTION
+    )
+    by_key = dict(zip(unique, tickers))
+    bundles: List[Tuple[Position, Ticker]] = [
+        (pos, by_key[getattr(c, "conId", 0) or id(c)]) for pos, c in wanted
+    ]
+    if not all(ib_core.READY_CHECKS["greeks"](tk) for _, tk in bundles):
         logger.warning("Timeout waiting for Greeks; some tickers may lack data.")
 
     return bundles
@@ -588,6 +597,12 @@ def main() -> None:
         action="store_true",
         help="Include index options (e.g. VIX) in output.",
     )
+    parser.add_argument(
+        "--greeks-model",
+        choices=GREEKS_MODELS,
+        default=settings.greeks.model,
+        help="Fallback model for greeks IB does not provide (bs = European, american = BAW).",
+    )
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
         "--flat-csv",
@@ -694,10 +709,11 @@ def main() -> None:
         )
         sys.exit(0)
 
-    ib = IB()
+    from portfolio_exporter.core import ib as ib_core
+
     try:
-        logger.info(f"Connecting to IBKR on {IB_HOST}:{IB_PORT} with CID {IB_CID} …")
-        ib.connect(IB_HOST, IB_PORT, IB_CID, timeout=10)
+        logger.info(f"Connecting to IBKR on {IB_HOST}:{IB_PORT} …")
+        ib = _ib_session()
     except Exception as exc:
         logger.error(f"IBKR connection failed: {exc}", exc_info=True)
         sys.exit(1)
@@ -718,7 +734,6 @@ def main() -> None:
     pkgs = list_positions(ib)
     if not pkgs:
         logger.warning("No option/FOP positions with data – exiting.")
-        ib.disconnect()
         sys.exit(0)
 
     if args.symbols:
@@ -727,14 +742,13 @@ def main() -> None:
         pkgs = [p for p in pkgs if p[0].contract.symbol.upper() in filt]
         if not pkgs:
             logger.warning("No positions match filter – exiting.")
-            ib.disconnect()
             sys.exit(0)
 
     ts_utc = datetime.now(timezone.utc)  # for option T calculation
     ts_local = datetime.now(ZoneInfo("Europe/Istanbul"))  # local timestamp
     ts_iso = ts_local.strftime("%Y-%m-%d %H:%M:%S")  # what we write to CSV
     rows: List[Dict[str, Any]] = []
-    yf_oi_cache: Dict[tuple[str, str], dict[tuple[float, str], int]] = {}
+    bs_inputs: List[Tuple[float, float, float]] = []  # (spot, T, sigma) per row
 
     iterable = iter_progress(pkgs, "Processing portfolio greeks") if PROGRESS else pkgs
     for pos, tk in iterable:
@@ -762,17 +776,20 @@ def main() -> None:
         iv_from_greeks = getattr(src, "impliedVol", np.nan)
         und_price = getattr(src, "undPrice", np.nan)
 
-        # ───── BS fallback, incl. quick underlying snapshot ─────
+        # ───── BS fallback inputs, incl. quick underlying snapshot ─────
+        # Greeks themselves are computed for all legs at once after the loop.
+        S = T = sigma = np.nan
         if any(math.isnan(v) for v in greeks.values()):
             S = und_price
             if math.isnan(S):
                 try:
                     under = _get_underlying(ib, c)
                     if under:
+                        ratelimit.acquire("ib_mktdata", client=ib)
                         snap = ib.reqMktData(
                             under, "", snapshot=True, regulatorySnapshot=False
                         )
-                        ib.sleep(1.0)
+                        ib_core.wait_ready(ib, [snap], ("price",), timeout=1.0)
                         prices = [
                             snap.midpoint(),
                             snap.last,
@@ -792,9 +809,7 @@ def main() -> None:
                 except Exception as e:
                     logger.debug(f"Underlying snapshot failed for {c.localSymbol}: {e}")
 
-            K = getattr(c, "strike", np.nan)
             exp_str = getattr(c, "lastTradeDateOrContractMonth", "")
-            T = np.nan
             try:
                 if len(exp_str) >= 8:
                     exp_naive = datetime.strptime(exp_str[:8], "%Y%m%d")
@@ -816,28 +831,13 @@ def main() -> None:
             except Exception:
                 pass
 
+            # NaN sigma is solved from the option mark after the loop
             sigma = iv_from_greeks
             if math.isnan(sigma) or sigma <= 0:
                 sigma = getattr(tk, "impliedVolatility", np.nan)
-            if math.isnan(sigma) or sigma <= 0:
-                sigma = DEFAULT_SIGMA
-
-            if not any(math.isnan(x) for x in (S, K, T, sigma)):
-                bs = bs_greeks(S, K, T, RISK_FREE_RATE, sigma, c.right == "C")
-                for k in greeks:
-                    if math.isnan(greeks[k]):
-                        greeks[k] = bs[k]
-
-        # ---- open‑interest from Yahoo Finance (cached) ----
-        raw_exp = getattr(c, "lastTradeDateOrContractMonth", "")
-        exp_key = _normalised_expiry(raw_exp)
-        oi_key = (c.symbol, exp_key)
-        if oi_key not in yf_oi_cache:
-            yf_oi_cache[oi_key] = fetch_yf_open_interest(oi_key[0], oi_key[1])
-        open_int = yf_oi_cache[oi_key].get(
-            (getattr(c, "strike", np.nan), getattr(c, "right", "")),
-            np.nan,
-        )
+            if sigma is None or math.isnan(sigma) or sigma <= 0:
+                sigma = np.nan
+        bs_inputs.append((S, T, sigma))
 
         # ---- robust volume ----
         volume = getattr(tk, "volume", np.nan)
@@ -847,8 +847,9 @@ def main() -> None:
             or volume == -1
         ):
             try:
+                ratelimit.acquire("ib_mktdata", client=ib)
                 snap_vol = ib.reqMktData(c, "", snapshot=True, regulatorySnapshot=False)
-                ib.sleep(0.8)
+                ib_core.wait_ready(ib, [snap_vol], ("volume",), timeout=0.8)
                 vol_attr = getattr(snap_vol, "volume", np.nan)
                 if vol_attr not in (None, -1):
                     volume = vol_attr
@@ -877,7 +878,7 @@ def main() -> None:
                 "multiplier": mult,
                 "option_price": option_price,
                 "underlying_price": und_price,
-                "open_interest": open_int,
+                "open_interest": np.nan,  # filled from Yahoo after the loop
                 "volume": volume,
                 "iv": (
                     iv_from_greeks
@@ -885,10 +886,6 @@ def main() -> None:
                     else tk.impliedVolatility
                 ),
                 **greeks,
-                "delta_exposure": greeks["delta"] * qty * mult,
-                "gamma_exposure": greeks["gamma"] * qty * mult,
-                "vega_exposure": greeks["vega"] * qty * mult,
-                "theta_exposure": greeks["theta"] * qty * mult,
             }
         )
 
@@ -902,11 +899,59 @@ def main() -> None:
 
     if not rows:
         logger.warning("No rows produced – nothing to write.")
-        ib.disconnect()
         sys.exit(0)
 
-    # ─── optionally dump flat CSV to stdout and file ───
     df = pd.DataFrame(rows)
+    # open interest from Yahoo: every chain in the book prefetched, one merge
+    df["open_interest"] = oi_core.merge(df)
+
+    # ───── vectorised model fallback for every leg missing IB greeks ─────
+    greek_cols = ["delta", "gamma", "vega", "theta"]
+    spot_arr, t_arr, sigma_arr = (np.asarray(a, dtype=float) for a in zip(*bs_inputs))
+    strike_arr = pd.to_numeric(df["strike"], errors="coerce").to_numpy(dtype=float)
+    is_call = df["right"].to_numpy() == "C"
+    needs_bs = df[greek_cols].isna().any(axis=1).to_numpy()
+    rate = rates_core.risk_free_rate(default=RISK_FREE_RATE)
+
+    # implied vol from the option marks, one batch for all legs lacking IB IV
+    solve = needs_bs & np.isnan(sigma_arr)
+    if solve.any():
+        sigma_arr[solve] = implied_vol_vec(
+            pd.to_numeric(df["option_price"], errors="coerce").to_numpy(dtype=float)[solve],
+            spot_arr[solve],
+            strike_arr[solve],
+            t_arr[solve],
+            rate,
+            is_call[solve],
+        )
+        iv_col = pd.to_numeric(df["iv"], errors="coerce")
+        df["iv"] = iv_col.where(iv_col.notna(), pd.Series(sigma_arr, index=df.index))
+    # then the fitted smile for that symbol/expiry, and only then the flat default
+    unsolved = needs_bs & np.isnan(sigma_arr)
+    if unsolved.any():
+        sigma_arr[unsolved] = volsurface.lookup_iv(
+            df["symbol"].to_numpy(dtype=object)[unsolved],
+            df["expiry"].to_numpy(dtype=object)[unsolved],
+            strike_arr[unsolved],
+        )
+    sigma_arr = np.where(needs_bs & np.isnan(sigma_arr), DEFAULT_SIGMA, sigma_arr)
+
+    bs = greeks_kernel(args.greeks_model)(
+        spot_arr,
+        strike_arr,
+        t_arr,
+        rate,
+        sigma_arr,
+        is_call,
+        multiplier=1,  # per-share like IB model greeks; exposure applies mult
+    )
+    for g in greek_cols:
+        vals = df[g].to_numpy(dtype=float)
+        df[g] = np.where(np.isnan(vals), bs[g], vals)
+    for g in greek_cols:
+        df[f"{g}_exposure"] = df[g] * df["position"] * df["multiplier"]
+
+    # ─── optionally dump flat CSV to stdout and file ───
     if not args.include_indices:
         df = df[~df["symbol"].isin(["VIX"])]
     if args.flat_csv:
@@ -1043,35 +1088,35 @@ def main() -> None:
         logger.info(f"Saved {len(df_pos)} detailed rows and total → {fn_pos}")
         logger.info(f"Saved totals         → {fn_tot}")
 
-    ib.disconnect()
-
 
-def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
+def _load_positions(accounts: List[str] | None = None) -> pd.DataFrame:  # pragma: no cover - replaced in tests
     """Connect to IBKR and return current positions with greeks.
 
-    The returned DataFrame includes ``symbol``, ``secType``, ``qty``,
-    ``multiplier`` and the option greeks ``delta``, ``gamma``, ``vega`` and
-    ``theta``.  Option greeks are pulled live from IBKR while stock/ETF
-    positions receive a delta of ``1`` and zero for the remaining greeks.
+    The returned DataFrame includes ``account``, ``symbol``, ``secType``,
+    ``qty``, ``multiplier`` and the option greeks ``delta``, ``gamma``,
+    ``vega`` and ``theta``.  Option greeks are pulled live from IBKR while
+    stock/ETF positions receive a delta of ``1`` and zero for the remaining
+    greeks.  ``accounts`` (``"all"`` allowed) limits the rows to those
+    accounts; otherwise every account the session reports is included.
     """
 
-    ib = IB()
     try:
-        ib.connect(IB_HOST, IB_PORT, IB_CID, timeout=10)
+        ib = _ib_session()
     except Exception as exc:  # pragma: no cover - network
         logger.error(f"IBKR connect failed in _load_positions: {exc}")
         return pd.DataFrame()
+    accounts = accounts_core.resolve(ib, accounts)
 
     # -------- options & futures options --------
-    bundles = list_positions(ib)
-    # Build avg cost lookup by conId for P&L calculations
-    avg_cost_map: dict[int, float] = {}
+    bundles = list_positions(ib, accounts)
+    # Build avg cost lookup by (account, conId) for P&L calculations
+    avg_cost_map: dict[tuple[str, int], float] = {}
     try:
         for p in ib.positions():
             try:
                 cid = int(getattr(p.contract, "conId", 0))
                 if cid:
-                    avg_cost_map[cid] = float(getattr(p, "avgCost", float("nan")))
+                    avg_cost_map[(getattr(p, "account", ""), cid)] = float(getattr(p, "avgCost", float("nan")))
             except Exception:
                 continue
     except Exception:
@@ -1105,7 +1150,8 @@ def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
             conid_val = int(getattr(c, "conId", 0))
         except Exception:
             conid_val = 0
-        avg_cost_raw = avg_cost_map.get(conid_val, float("nan"))
+        account = getattr(pos, "account", "")
+        avg_cost_raw = avg_cost_map.get((account, conid_val), float("nan"))
         # Normalize avg cost to per-unit for options/FOP where needed.
         # Some IB endpoints return avgCost per contract (price * multiplier), others per unit.
         # Heuristic: if avg_cost is much larger than the current mark price and multiplier>1, treat it as per-contract and divide.
@@ -1130,6 +1176,7 @@ def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
 
         opt_rows.append(
             {
+                "account": account,
                 "symbol": c.localSymbol,
                 "underlying": c.symbol,
                 "secType": c.secType,
@@ -1143,6 +1190,8 @@ def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
                 "gamma": getattr(src, "gamma", float("nan")),
                 "vega": getattr(src, "vega", float("nan")),
                 "theta": getattr(src, "theta", float("nan")),
+                "iv": getattr(src, "impliedVol", float("nan")),
+                "underlying_price": getattr(src, "undPrice", float("nan")),
                 "price": option_price if option_price is not None else float("nan"),
                 "avg_cost": avg_cost_raw,
                 "avg_cost_unit": per_unit_cost,
@@ -1152,12 +1201,13 @@ def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
 
     # -------- stock / ETF positions --------
     stk_rows: list[dict[str, float | str | int]] = []
-    for p in ib.positions():
+    for p in accounts_core.select(ib.positions(), accounts):
         if p.contract.secType in {"STK", "ETF"} and p.position != 0:
             # best-effort price snapshot is not fetched here; leave price NaN
             ac = float(getattr(p, "avgCost", float("nan")))
             stk_rows.append(
                 {
+                    "account": getattr(p, "account", ""),
                     "symbol": p.contract.symbol,
                     "underlying": p.contract.symbol,
                     "secType": p.contract.secType,
@@ -1177,8 +1227,6 @@ def _load_positions() -> pd.DataFrame:  # pragma: no cover - replaced in tests
                     "pnl_leg": float("nan"),
                 }
             )
-
-    ib.disconnect()
     return pd.DataFrame(opt_rows + stk_rows)
 
 
@@ -2207,6 +2255,80 @@ def _print_combos(console: Console, combos_df: Optional[pd.DataFrame]) -> None:
     console.print(t)
 
 
+SECOND_ORDER = ("vanna", "volga", "charm", "speed")
+
+
+def _model_greeks(pos_df: pd.DataFrame, model: str = "bs") -> None:
+    """Fill model greeks on option legs of *pos_df* in place.
+
+    Inputs come from ``underlying_price`` (or the matching stock price),
+    ``iv`` (implied from ``price`` when IB sent none, else read off the
+    fitted :mod:`~portfolio_exporter.core.volsurface` smile) and ``expiry``.  One
+    :func:`bs_greeks_vec` pass adds vanna/volga/charm/speed; delta/gamma/vega/
+    theta that IB left NaN are filled from the *model* kernel (``"bs"`` or
+    ``"american"``, the latter through :data:`greeks_cache`) and tagged in
+    ``greeks_source``.  Legs without usable
+    inputs stay NaN; stock legs get 0 second-order greeks.
+    """
+
+    for g in SECOND_ORDER:
+        pos_df[g] = 0.0
+    is_opt = pos_df["secType"].isin(["OPT", "FOP"])
+    if not is_opt.any():
+        return
+    opts = pos_df.loc[is_opt]
+    und = opts["underlying"].astype(str)
+    spot = pd.Series(np.nan, index=opts.index, dtype=float)
+    if "underlying_price" in opts:
+        spot = pd.to_numeric(opts["underlying_price"], errors="coerce").where(lambda x: x > 0)
+    if "price" in pos_df.columns:
+        stk = pos_df["secType"].isin(["STK", "ETF"])
+        stk_px = pd.to_numeric(pos_df.loc[stk, "price"], errors="coerce")
+        stk_px = stk_px[stk_px > 0].groupby(pos_df.loc[stk, "underlying"]).last()
+        spot = spot.fillna(und.map(stk_px))
+    s = spot.to_numpy(dtype=float)
+    k = pd.to_numeric(opts["strike"], errors="coerce").to_numpy(dtype=float)
+    t = scenario_core.years_to_expiry(opts["expiry"], datetime.now(timezone.utc))
+    is_call = opts["right"].astype(str).str.upper().str.startswith("C").to_numpy()
+    r = rates_core.risk_free_rate()
+    iv = (
+        pd.to_numeric(opts["iv"], errors="coerce").to_numpy(dtype=float)
+        if "iv" in opts
+        else np.full(len(opts), np.nan)
+    )
+    need = ~(iv > 0)
+    if need.any() and "price" in opts:
+        px = pd.to_numeric(opts["price"], errors="coerce").to_numpy(dtype=float)
+        iv[need] = implied_vol_vec(px[need], s[need], k[need], t[need], r, is_call[need])
+    need = ~(iv > 0)
+    if need.any():
+        iv[need] = volsurface.lookup_iv(
+            und.to_numpy(dtype=object)[need], opts["expiry"].to_numpy(dtype=object)[need], k[need]
+        )
+    # closed-form BS is cheaper than any cache lookup; only BAW is cached
+    res = bs_greeks_vec(s, k, t, r, iv, is_call, 1, higher_order=True)
+    for g in SECOND_ORDER:
+        pos_df.loc[is_opt, g] = res[g]
+
+    first = ["delta", "gamma", "vega", "theta"]
+    missing = opts[first].apply(pd.to_numeric, errors="coerce").isna().any(axis=1).to_numpy()
+    if not missing.any():
+        return
+    if model != "bs":
+        con_ids = opts["conId"].to_numpy(dtype=object) if "conId" in opts else [None] * len(opts)
+        res = greeks_cache.greeks_vec(con_ids, s, k, t, r, iv, is_call, 1, model=model)
+    filled = np.zeros(len(opts), dtype=bool)
+    for g in first:
+        cur = pd.to_numeric(opts[g], errors="coerce").to_numpy(dtype=float)
+        fill = np.isnan(cur) & ~np.isnan(res[g])
+        filled |= fill
+        pos_df.loc[is_opt, g] = np.where(fill, res[g], cur)
+    if filled.any():
+        src = pos_df.loc[is_opt, "greeks_source"].to_numpy(dtype=object)
+        src[filled] = "BS" if model == "bs" else "BAW"
+        pos_df.loc[is_opt, "greeks_source"] = src
+
+
 def run(
     fmt: str = "csv",
     write_positions: bool = True,
@@ -2219,8 +2341,17 @@ def run(
     *,
     output_dir: str | Path | None = None,
     return_frames: bool = False,
+    greeks_model: str | None = None,
+    accounts: List[str] | None = None,
 ) -> Any:
-    """Aggregate per-position Greeks and optionally persist the results."""
+    """Aggregate per-position Greeks and optionally persist the results.
+
+    ``greeks_model`` picks the fallback for greeks IB did not send (``"bs"``
+    or ``"american"``); defaults to ``settings.greeks.model``.  With
+    ``accounts`` the positions are fetched for those accounts in one pass,
+    the totals carry one row per account plus an ``ALL`` row, and each
+    positions/totals file is also written per account.
+    """
 
     outdir = Path(output_dir or config_core.settings.output_dir).expanduser()
     try:
@@ -2242,7 +2373,8 @@ def run(
 
     pos_df: pd.DataFrame
     if positions_override is None:
-        pos_df = run_with_spinner("Fetching positions…", _load_positions).copy()
+        loader = (lambda: _load_positions(accounts)) if accounts else _load_positions
+        pos_df = run_with_spinner("Fetching positions…", loader).copy()
     else:
         csv_df = positions_override.copy()
         for col in ["delta", "gamma", "vega", "theta", "multiplier"]:
@@ -2269,6 +2401,8 @@ def run(
         for c in cols:
             if c not in csv_df.columns:
                 csv_df[c] = np.nan
+        # optional pricing inputs used by scenario revaluation
+        cols += [c for c in ("price", "iv", "underlying_price") if c in csv_df.columns]
         pos_df = csv_df[cols].copy()
         # synthesize conId if missing
         if pos_df.get("conId").isna().any():
@@ -2314,15 +2448,18 @@ def run(
             )
         )
 
-    for greek in ["delta", "gamma", "vega", "theta"]:
+    _model_greeks(pos_df, greeks_model or settings.greeks.model)
+    greek_cols = ["delta", "gamma", "vega", "theta", *SECOND_ORDER]
+    for greek in greek_cols:
         pos_df[f"{greek}_exposure"] = pos_df[greek] * pos_df.qty * pos_df.multiplier
 
-    totals = (
-        pos_df[[f"{g}_exposure" for g in ["delta", "gamma", "vega", "theta"]]]
-        .sum()
-        .to_frame()
-        .T
-    )
+    # Seed the shared incremental book; live views apply per-leg ticks to it
+    # and read totals via ``aggregate.book.snapshot()``.
+    by_account = bool(accounts) and "account" in pos_df.columns
+    book_key = ("account", "conId") if by_account else "conId"
+    totals = aggregate.book.load(pos_df, key=book_key).snapshot().totals_frame()
+    if by_account:
+        totals = accounts_core.totals(pos_df, aggregate.EXPOSURES)
 
     combos_df = pd.DataFrame()
     resolved_source = "none"
@@ -2583,9 +2720,15 @@ def run(
                 logger.warning("Persist combos failed: %s", exc)
 
     if write_positions:
-        io_core.save(pos_df, "portfolio_greeks_positions", fmt, outdir)
+        if by_account:
+            accounts_core.save_partitioned(pos_df, "portfolio_greeks_positions", fmt, outdir)
+        else:
+            io_core.save(pos_df, "portfolio_greeks_positions", fmt, outdir)
     if write_totals:
-        io_core.save(totals, "portfolio_greeks_totals", fmt, outdir)
+        if by_account:
+            accounts_core.save_partitioned(totals, "portfolio_greeks_totals", fmt, outdir)
+        else:
+            io_core.save(totals, "portfolio_greeks_totals", fmt, outdir)
         if combos:
             # Drop auxiliary columns from CSV output
             save_df = combos_df.drop(columns=["__db_legs_detail", "__strike_source", "__healed_legs"], errors="ignore")
@@ -2619,7 +2762,7 @@ def run(
                 pass
 
     if return_dict:
-        totals_row = totals.iloc[0].to_dict()
+        totals_row = totals.iloc[-1].drop("account", errors="ignore").to_dict()
         combo_sum: Dict[str, float] = {}
         if (
             combos
@@ -2636,6 +2779,55 @@ def run(
     return None
 
 
+def _combo_labels(positions: pd.DataFrame) -> Dict[str, str]:
+    """Map leg key (``conId`` as text) → combo label detected on *positions*."""
+
+    try:
+        combos_df = combo_core.detect_from_positions(positions)
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.warning("Combo detection for explain failed: %s", exc)
+        return {}
+    labels: Dict[str, str] = {}
+    for i, row in enumerate(combos_df.itertuples(index=False)):
+        label = f"{row.underlying} {row.expiry} {row.structure} #{i + 1}"
+        for cid in pd.to_numeric(pd.Series(list(row.legs or []), dtype=object), errors="coerce").dropna():
+            labels[str(int(cid))] = label
+    return labels
+
+
+def explain(paths: list[str]) -> Dict[str, Any]:
+    """Attribute P&L across the given positions snapshots (any order).
+
+    Consecutive snapshots are paired after sorting by time; returns the leg
+    frame plus per-underlying, per-combo and portfolio totals.
+    """
+
+    times, frames = attribution.load_snapshots(os.path.expanduser(p) for p in paths)
+    legs = attribution.explain_many(frames, times)
+    labels = _combo_labels(frames[-1])
+    legs["combo"] = legs["key"].map(labels).fillna("single")
+    return {
+        "legs": legs,
+        "by_underlying": attribution.summarize(legs, "underlying"),
+        "by_combo": attribution.summarize(legs, ["underlying", "combo"]),
+        "totals": attribution.totals(legs),
+        "start": times[0],
+        "end": times[-1],
+    }
+
+
+def _print_explain(console: Console, result: Dict[str, Any]) -> None:
+    cols = ["pnl", *attribution.COMPONENTS]
+    table = Table(title=f"P&L explain {result['start']:%Y-%m-%d %H:%M} → {result['end']:%Y-%m-%d %H:%M}")
+    table.add_column("Underlying")
+    for c in cols:
+        table.add_column(c, justify="right")
+    for row in result["by_underlying"].itertuples(index=False):
+        table.add_row(str(row.underlying), *(f"{getattr(row, c):,.2f}" for c in cols))
+    table.add_row("TOTAL", *(f"{result['totals'][c]:,.2f}" for c in cols), style="bold")
+    console.print(table)
+
+
 def main(argv: list[str] | None = None) -> Dict[str, Any]:
     parser = argparse.ArgumentParser(description="Portfolio Greeks exporter")
     parser.add_argument("--positions-csv")
@@ -2655,7 +2847,37 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
     parser.add_argument("--output-dir")
     parser.add_argument("--no-files", action="store_true")
     parser.add_argument("--preflight", action="store_true")
+    parser.add_argument("--greeks-model", choices=GREEKS_MODELS, default=None)
+    cli_helpers.add_accounts_arg(parser)
+    parser.add_argument(
+        "--explain",
+        nargs="+",
+        metavar="SNAPSHOT",
+        help="Attribute P&L between positions snapshots (older newer [more…])",
+    )
     args = parser.parse_args(argv)
+    if args.explain is not None and len(args.explain) < 2:
+        parser.error("--explain needs at least two snapshots")
+
+    if args.explain:
+        outdir = cli_helpers.resolve_output_dir(args.output_dir)
+        quiet, _pretty = cli_helpers.resolve_quiet(args.no_pretty)
+        res = explain(args.explain)
+        outputs: Dict[str, str] = {}
+        if args.output_dir and not args.no_files:
+            for name in ("legs", "by_underlying", "by_combo"):
+                outputs[name] = str(io_core.save(res[name], f"portfolio_greeks_explain_{name}", "csv", outdir))
+        if not quiet and not args.json:
+            _print_explain(Console(), res)
+        summary = json_helpers.report_summary(
+            {"legs": len(res["legs"]), "underlyings": len(res["by_underlying"]), "combos": len(res["by_combo"])},
+            outputs=outputs,
+            meta={"script": "portfolio_greeks", "mode": "explain"},
+        )
+        summary["totals"] = res["totals"]
+        if args.json:
+            cli_helpers.print_json(summary, quiet)
+        return summary
 
     if args.preflight:
         from portfolio_exporter.core import schemas as pa_schemas
@@ -2709,7 +2931,11 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
             persist_combos=args.persist_combos,
             output_dir=outdir,
             return_frames=True,
+            greeks_model=args.greeks_model,
+            accounts=args.accounts,
         )
+        rl.add_counters("greeks_cache", greeks_cache.stats())
+        rl.add_counters("ratelimit", ratelimit.limiter.stats())
 
         outputs: Dict[str, str] = {}
         written: list[Path] = []
@@ -2732,11 +2958,11 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
         summary = json_helpers.report_summary(
             {
                 "positions": len(pos_df),
-                "totals": 1,
+                "totals": len(totals),
                 "combos": len(combos_df),
             },
             outputs=outputs,
-            meta={"script": "portfolio_greeks"},
+            meta={"script": "portfolio_greeks", **({"accounts": args.accounts} if args.accounts else {})},
         )
         if manifest_path:
             summary["outputs"].append(str(manifest_path))
@@ -237,36 +237,31 @@ def _ensure_delta(df: pd.DataFrame) -> pd.DataFrame:
     missing = d["delta"].isna() | (~d["delta"].apply(lambda v: isinstance(v, (int, float))))
     if missing.any():
         try:
-            from portfolio_exporter.core.greeks import bs_greeks
+            import numpy as np
 
-            # Compute t in years based on expiry vs today
-            def _row_delta(row) -> float:
-                try:
-                    exp = date.fromisoformat(str(row.get("expiry")))
-                except Exception:
-                    return float("nan")
-                t = max((exp - date.today()).days, 1) / 365.0
-                spot = row.get("last")
-                if pd.isna(spot) or not spot:
-                    spot = row.get("mid")
-                if pd.isna(spot) or not spot:
-                    return float("nan")
-                strike = float(row.get("strike"))
-                iv = row.get("iv")
-                if pd.isna(iv) or not iv:
-                    return float("nan")
-                g = bs_greeks(
-                    float(spot),
-                    float(strike),
-                    float(t),
-                    float(getattr(settings.greeks, "risk_free", 0.0) or 0.0),
-                    float(iv),
-                    call=str(row.get("right", "C")).upper() == "C",
-                    multiplier=1,
-                )
-                return float(g.get("delta", float("nan")))
+            from portfolio_exporter.core.greeks import bs_greeks_vec
 
-            calc = d.apply(_row_delta, axis=1)
+            def _num(col: str) -> pd.Series:
+                if col not in d.columns:
+                    return pd.Series(np.nan, index=d.index)
+                return pd.to_numeric(d[col], errors="coerce")
+
+            # Compute t in years based on expiry vs today
+            exp = pd.to_datetime(d["expiry"].astype(str), errors="coerce", format="%Y-%m-%d")
+            days = (exp - pd.Timestamp(date.today())).dt.days.to_numpy(dtype=float)
+            t = np.maximum(days, 1.0) / 365.0
+            spot = _num("last")
+            spot = spot.where(spot.notna() & (spot != 0), _num("mid"))
+            g = bs_greeks_vec(
+                spot.to_numpy(dtype=float),
+                _num("strike").to_numpy(dtype=float),
+                t,
+                float(getattr(settings.greeks, "risk_free", 0.0) or 0.0),
+                _num("iv").to_numpy(dtype=float),
+                d["right"].fillna("C").astype(str).str.upper().to_numpy() == "C",
+                multiplier=1,
+            )
+            calc = pd.Series(g["delta"], index=d.index)
             d.loc[missing, "delta"] = calc[missing]
         except Exception:
             pass
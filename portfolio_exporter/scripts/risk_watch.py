@@ -1,15 +1,127 @@
 from __future__ import annotations
 
+import logging
+import math
+
 import pandas as pd
 
-from portfolio_exporter.core import io
+from portfolio_exporter.core import aggregate, io, scenario
+from portfolio_exporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _positions() -> pd.DataFrame:
+    """Fetch live positions via the portfolio Greeks pipeline."""
+
+    from portfolio_exporter.scripts import portfolio_greeks
+
+    pos_df, _totals, _combos = portfolio_greeks.run(
+        write_positions=False, write_totals=False, combos=False, return_frames=True
+    )
+    return pos_df
+
+
+def load_positions() -> pd.DataFrame:
+    """Positions frame for :func:`run`; empty when IB is unavailable."""
+
+    try:
+        return _positions()
+    except Exception as exc:  # pragma: no cover - IB offline
+        logger.warning("risk_watch: positions unavailable: %s", exc)
+        return pd.DataFrame()
+
+
+def refresh_marks(pos_df: pd.DataFrame) -> pd.DataFrame:
+    """Re-quote an already loaded positions frame without refetching positions.
+
+    Option legs are quoted in one :func:`core.ib.quote_many` batch and each
+    underlying once; only ``price``, ``iv`` and ``underlying_price`` change.
+    Option greeks are then re-derived from the new marks with the configured
+    model and :data:`aggregate.book` is reloaded.  Legs no source prices keep
+    their previous marks and greeks.
+    """
+
+    if pos_df.empty or "secType" not in pos_df.columns:
+        return pos_df
+
+    from portfolio_exporter.core import ib as ib_core
+    from portfolio_exporter.scripts import portfolio_greeks
+
+    df = pos_df.copy()
+    is_opt = df["secType"].isin(["OPT", "FOP"])
+    opts = df.loc[is_opt]
+    expiry = pd.to_datetime(
+        opts["expiry"].astype(str).str.replace("-", "", regex=False).str[:8], format="%Y%m%d", errors="coerce"
+    ).dt.strftime("%Y-%m-%d")
+    quotable = expiry.notna() & pd.to_numeric(opts["strike"], errors="coerce").notna()
+    specs = list(
+        zip(
+            opts.loc[quotable, "underlying"].astype(str),
+            expiry[quotable],
+            opts.loc[quotable, "strike"].astype(float),
+            opts.loc[quotable, "right"].astype(str).str.upper().str[:1],
+        )
+    )
+    requoted = []
+    for idx, q in zip(opts.index[quotable], ib_core.quote_many(specs) if specs else []):
+        mid = (q or {}).get("mid")
+        if mid is None or not math.isfinite(mid) or mid <= 0:
+            continue
+        iv = q.get("iv")
+        df.at[idx, "price"] = mid
+        # no IV on the quote: implied again from the new mark
+        df.at[idx, "iv"] = iv if iv is not None and math.isfinite(iv) and iv > 0 else math.nan
+        requoted.append(idx)
+
+    spots = {}
+    for und in df["underlying"].dropna().astype(str).unique():
+        try:
+            mid = ib_core.quote_stock(und)["mid"]
+        except Exception as exc:
+            logger.debug("risk_watch: spot refresh failed for %s: %s", und, exc)
+            continue
+        if mid is not None and math.isfinite(mid) and mid > 0:
+            spots[und] = float(mid)
+    spot = df["underlying"].astype(str).map(spots)
+    if "underlying_price" in df.columns:
+        df["underlying_price"] = spot.where(is_opt).fillna(df["underlying_price"])
+    stk = df["secType"].isin(["STK", "ETF"])
+    df.loc[stk, "price"] = spot[stk].fillna(df.loc[stk, "price"])
+
+    if requoted:
+        first = ["delta", "gamma", "vega", "theta"]
+        df.loc[requoted, first] = math.nan
+        if "greeks_source" not in df.columns:
+            df["greeks_source"] = "IB"
+        portfolio_greeks._model_greeks(df, settings.greeks.model)
+    for greek in aggregate.GREEKS:
+        if greek in df.columns:
+            df[f"{greek}_exposure"] = df[greek] * df["qty"] * df["multiplier"]
+    aggregate.book.load(df)
+    return df
+
+
+def run(
+    fmt: str = "csv",
+    return_dict: bool = False,
+    pos_df: pd.DataFrame | None = None,
+):
+    """Revalue the portfolio over the default scenario grid.
 
+    With ``return_dict`` the headline metrics (net greeks, worst-case grid
+    P&L and ±10 % spot P&L) are returned for dashboards; otherwise the metrics
+    and the full spot × vol × days grid are saved as ``risk_metrics`` and
+    ``risk_scenarios``.
+    """
 
-def run(fmt: str = "csv", return_dict: bool = False):
-    """Generate simple risk metrics and optionally return them."""
+    if pos_df is None:
+        pos_df = load_positions()
 
-    metrics = {"net_liq": 0.0, "delta": 0.0}
+    grid = scenario.revalue(pos_df, r=settings.greeks.risk_free) if not pos_df.empty else None
+    metrics = scenario.summary(grid) if grid is not None else {"legs": 0, "skipped_legs": 0}
     if return_dict:
         return metrics
-    df = pd.DataFrame([metrics])
-    io.save(df, "risk_metrics", fmt)
+    io.save(pd.DataFrame([metrics]), "risk_metrics", fmt)
+    if grid is not None:
+        io.save(grid.to_frame(), "risk_scenarios", fmt)
@@ -17,14 +17,11 @@ import sys
 
 from portfolio_exporter.core.config import settings
 try:  # optional IBKR config
-    from portfolio_exporter.core.ib_config import HOST as IB_HOST, PORT as IB_PORT, client_id as _cid
+    from portfolio_exporter.core.ib_config import HOST as IB_HOST, PORT as IB_PORT
 except Exception:  # pragma: no cover - fallback defaults
     IB_HOST = "127.0.0.1"  # type: ignore
     IB_PORT = 7497  # type: ignore
 
-    def _cid(name: str, default: int = 0) -> int:  # type: ignore
-        return default
-
 from typing import Iterable, List, Tuple
 from typing import Optional, Any, Dict
 
@@ -32,7 +29,9 @@ import pandas as pd
 import numpy as np
 import logging
 
+from portfolio_exporter.core import accounts as accounts_core
 from portfolio_exporter.core import combo as combo_core
+from portfolio_exporter.core import contracts as contracts_core
 from portfolio_exporter.core import io as io_core
 from portfolio_exporter.core import io as core_io
 from portfolio_exporter.core import config as config_core
@@ -330,7 +329,7 @@ def _choose_underlying_effect(g: "pd.DataFrame") -> str:
         return "Mixed"
     return "Unknown"
 # ───── Lightweight executions loader & action classifier ─────
-def _load_trades() -> pd.DataFrame | None:
+def _load_trades(accounts: List[str] | None = None) -> pd.DataFrame | None:
     """Fetch executed trades from IBKR.
 
     Raises
@@ -351,7 +350,7 @@ def _load_trades() -> pd.DataFrame | None:
         )
 
     start, end = prompt_date_range()
-    trades, _open_orders = fetch_trades_ib(start, end)
+    trades, _open_orders = fetch_trades_ib(start, end, accounts=accounts)
     trades = filter_trades(trades, start, end)
     df = pd.DataFrame([t.__dict__ for t in trades])
     if df.empty:
@@ -360,22 +359,22 @@ def _load_trades() -> pd.DataFrame | None:
     return df
 
 
-def _load_open_orders() -> pd.DataFrame:
+def _load_open_orders(accounts: List[str] | None = None) -> pd.DataFrame:
     # Use optional top-level IB binding; return empty if unavailable
     if IB is None:
         return pd.DataFrame()
-    ib = IB()
     try:
-        ib.connect(IB_HOST, IB_PORT, clientId=IB_OPEN_CID, timeout=5)
+        ib = _ib_session(timeout=5)
     except Exception as exc:  # pragma: no cover - connection optional
-        logger.warning("IBKR connection failed for open orders: host=%s port=%s cid=%s err=%s", IB_HOST, IB_PORT, IB_OPEN_CID, exc)
+        logger.warning("IBKR connection failed for open orders: host=%s port=%s err=%s", IB_HOST, IB_PORT, exc)
         return pd.DataFrame()
 
     rows = []
-    for o in ib.openOrders():
+    for o in accounts_core.select(ib.openOrders(), accounts_core.resolve(ib, accounts)):
         c = o.contract
         rows.append(
             {
+                "account": getattr(o, "account", ""),
                 "PermId": o.permId,
                 "OrderId": o.orderId,
                 "symbol": c.symbol,
@@ -389,7 +388,6 @@ def _load_open_orders() -> pd.DataFrame:
                 "Action": "Open",
             }
         )
-    ib.disconnect()
     return pd.DataFrame(rows)
 
 
@@ -691,10 +689,12 @@ class OpenOrder:
     order_ref: str | None
 
 
-# ───────────────────────── CONFIG ──────────────────────────
-# Use Türkiye local time (Europe/Istanbul) for timestamp tags
-IB_CID = _cid("trades_report", default=5)
-IB_OPEN_CID = _cid("trades_report_open", default=19)
+def _ib_session(timeout: float = 10):
+    """Borrow the process-wide IB session shared by all scripts."""
+
+    from portfolio_exporter.core import ib as ib_core
+
+    return ib_core.session(factory=IB, timeout=timeout)
 
 
 MONTH_MAP = {m.lower(): i for i, m in enumerate(calendar.month_name) if m}
@@ -764,25 +764,45 @@ def filter_trades(trades: Iterable[Trade], start: date, end: date) -> List[Trade
     return [t for t in trades if start <= t.datetime.date() <= end]
 
 
-def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder]]:
+def _qualify_legs(ib: Any, contracts: Iterable[Any]) -> Dict[int, Any]:
+    """Qualify the legs of every BAG in *contracts* in one cached bulk call."""
+
+    legs: Dict[int, Any] = {}
+    for c in contracts:
+        if getattr(c, "secType", "") != "BAG":
+            continue
+        for leg in getattr(c, "comboLegs", None) or []:
+            if leg.conId not in legs:
+                from ib_insync import Contract
+
+                legs[leg.conId] = Contract(conId=leg.conId, exchange=leg.exchange)
+    if not legs:
+        return {}
+    qualified = contracts_core.qualify(ib, *legs.values())
+    return {cid: q for cid, q in zip(legs, qualified) if q is not None}
+
+
+def fetch_trades_ib(
+    start: date, end: date, accounts: List[str] | None = None
+) -> Tuple[List[Trade], List[OpenOrder]]:
     """
     Return (trades, open_orders) within [start, end] inclusive.
     Uses execDetails / commissionReport / openOrder callbacks.
+
+    ``accounts`` keeps only those accounts' executions and orders; they are
+    requested once for every account the login manages and split locally.
     """
     if IB is None or ExecutionFilter is None:
         return [], []
 
-    ib = IB()
-
     try:
-        ib.connect(IB_HOST, IB_PORT, clientId=IB_CID, timeout=10)
+        ib = _ib_session(timeout=10)
     except Exception as exc:
         # Align with other scripts: downgrade to a warning and continue offline
         logger.warning(
-            "IBKR connection failed for executions: host=%s port=%s cid=%s err=%s",
+            "IBKR connection failed for executions: host=%s port=%s err=%s",
             IB_HOST,
             IB_PORT,
-            IB_CID,
             exc,
         )
         return [], []
@@ -807,11 +827,14 @@ def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder
         )
         all_execs.extend(ib.reqExecutions(filt))
         day = next_day
+    accounts = accounts_core.resolve(ib, accounts)
+    all_execs = [f for f in all_execs if not accounts or f.execution.acctNumber in accounts]
     print(f"[INFO] pulled {len(all_execs)} executions between {start} and {end}")
     ib.sleep(0.3)  # brief pause so CommissionReport callbacks arrive
     ib.commissionReportEvent -= _comm
 
     execs = [(det.contract, det.execution) for det in all_execs]
+    leg_map = _qualify_legs(ib, [c for c, _ in execs])
 
     # --- Build Trade objects ---------------------------------------------------
     trades: List[Trade] = []
@@ -822,18 +845,15 @@ def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder
 
         # ensure contract is qualified for full fields
         if not contract.conId:
-            (qualified,) = ib.qualifyContracts(contract)
-            contract = qualified
+            contract = contracts_core.qualify(ib, contract)[0] or contract
 
         combo_legs_data = []
         if contract.secType == "BAG" and contract.comboLegs:
-            from ib_insync import Contract
-
             for leg in contract.comboLegs:
-                # For combo legs, we need to qualify each leg's contract to get details like symbol, expiry, strike, right
-                leg_contract = ib.qualifyContracts(
-                    Contract(conId=leg.conId, exchange=leg.exchange)
-                )[0]
+                # Legs were qualified up front for symbol, expiry, strike, right
+                leg_contract = leg_map.get(leg.conId)
+                if leg_contract is None:
+                    continue
                 combo_legs_data.append(
                     {
                         "symbol": leg_contract.symbol,
@@ -890,7 +910,11 @@ def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder
     # --- Capture open orders ---------------------------------------------------
     ib.reqAllOpenOrders()
     ib.sleep(1.5)  # allow gateway to populate the cache; was 0.6
-    open_trades_snapshot: List["Trade"] = ib.openTrades()
+    open_trades_snapshot: List["Trade"] = [
+        t for t in ib.openTrades() if not accounts or t.order.account in accounts
+    ]
+
+    order_leg_map = _qualify_legs(ib, [tr.contract for tr in open_trades_snapshot])
 
     open_orders: List[OpenOrder] = []
     for tr in open_trades_snapshot:
@@ -900,12 +924,10 @@ def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder
 
         combo_legs_data = []
         if c.secType == "BAG" and c.comboLegs:
-            from ib_insync import Contract
-
             for leg in c.comboLegs:
-                leg_contract = ib.qualifyContracts(
-                    Contract(conId=leg.conId, exchange=leg.exchange)
-                )[0]
+                leg_contract = order_leg_map.get(leg.conId)
+                if leg_contract is None:
+                    continue
                 combo_legs_data.append(
                     {
                         "symbol": leg_contract.symbol,
@@ -947,7 +969,6 @@ def fetch_trades_ib(start: date, end: date) -> Tuple[List[Trade], List[OpenOrder
             )
         )
 
-    ib.disconnect()
     return trades, open_orders
 
 
@@ -2238,6 +2259,7 @@ def get_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--until")
     parser.add_argument("--summary-only", action="store_true")
     parser.add_argument("--cluster-window-sec", type=int, default=60)
+    cli_helpers.add_accounts_arg(parser)
     cli_helpers.add_common_output_args(parser)
     cli_helpers.add_common_debug_args(parser)
     return parser
@@ -2270,14 +2292,16 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
                 print(f"❌ Failed to read executions CSV: {exc}")
                 return {}
         else:
-            t = _load_trades()
+            t = _load_trades(args.accounts)
             if t is None:
                 return {}
             df_exec = t
             try:
-                df_open = _load_open_orders()
+                df_open = _load_open_orders(args.accounts)
             except Exception:
                 df_open = None
+        if args.accounts and "all" not in args.accounts and "account" in df_exec.columns:
+            df_exec = df_exec[df_exec["account"].isin(args.accounts)].reset_index(drop=True)
 
         n_total = len(df_exec) if isinstance(df_exec, pd.DataFrame) else 0
         since_dt = _parse_when(args.since)
@@ -2371,7 +2395,11 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
                 # Prefer vectorized streaming intent
                 df_all["position_effect"] = _compute_streaming_effect(df_all, prev_positions_df)
                 df_all = _attach_intent_flags(df_all)
-                path_report = io_core.save(df_all, "trades_report", "csv", outdir)
+                if args.accounts:
+                    path_report, *parts = accounts_core.save_partitioned(df_all, "trades_report", "csv", outdir)
+                    written.extend(parts)
+                else:
+                    path_report = io_core.save(df_all, "trades_report", "csv", outdir)
                 outputs["trades_report"] = str(path_report)
                 written.append(path_report)
                 # Ensure combos carry position_effect; detection already annotates
@@ -2420,6 +2448,10 @@ def main(argv: list[str] | None = None) -> Dict[str, Any]:
         manifest_path = rl.finalize(write=bool(written))
 
         meta: Dict[str, Any] = {"script": "trades_report"}
+        if args.accounts and "account" in df_exec.columns:
+            meta["accounts"] = {
+                str(a): int(n) for a, n in df_exec["account"].value_counts(sort=False).sort_index().items()
+            }
         # intent meta counters
         try:
             total_id = int(sum(1 for r in debug_intent_rows if r.get("match_mode") == "id"))
@@ -0,0 +1,157 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import accounts as accounts_core
+from portfolio_exporter.core import cli as cli_helpers
+from portfolio_exporter.core.fake_ib import FakeConfig, FakeIB
+from portfolio_exporter.scripts import live_feed
+from portfolio_exporter.scripts import net_liq_history_export as nlh
+from portfolio_exporter.scripts import portfolio_greeks as pg
+
+
+def test_parse_accounts():
+    assert cli_helpers.parse_accounts("U1, U2,U1") == ["U1", "U2"]
+    assert cli_helpers.parse_accounts("ALL") == ["all"]
+    ns = cli_helpers.add_accounts_arg(argparse.ArgumentParser()).parse_args([])
+    assert ns.accounts is None
+
+
+def test_resolve_and_totals():
+    ib = FakeIB(FakeConfig(legs=6, symbols=2, accounts=2))
+    acct_a, acct_b = ib.managedAccounts()
+    assert accounts_core.resolve(ib, None) == []
+    assert accounts_core.resolve(ib, ["all"]) == [acct_a, acct_b]
+    assert accounts_core.resolve(ib, [acct_b, "U999"]) == [acct_b]
+
+    df = pd.DataFrame({"account": ["B", "A", "B"], "delta_exposure": [1.0, 2.0, 3.0], "x": [9, 9, 9]})
+    out = accounts_core.totals(df, ["delta_exposure", "vega_exposure"])
+    assert out["account"].tolist() == ["A", "B", accounts_core.TOTAL]
+    assert out["delta_exposure"].tolist() == [2.0, 4.0, 6.0]
+
+
+def test_list_positions_subscribes_each_contract_once():
+    ib = FakeIB(FakeConfig(legs=40, symbols=3, accounts=3, seed=3))
+    ib.connect()
+    bundles = pg.list_positions(ib)
+    con_ids = {pos.contract.conId for pos, _ in bundles}
+    assert {pos.account for pos, _ in bundles} == set(ib.managedAccounts())
+    assert ib.calls["reqMktData"] == len(con_ids)
+
+    first = ib.managedAccounts()[0]
+    only = pg.list_positions(ib, [first])
+    assert only and all(pos.account == first for pos, _ in only)
+
+
+def test_run_writes_per_account_totals(monkeypatch, tmp_path):
+    fake = pd.DataFrame(
+        {
+            "account": ["U1", "U2", "U2"],
+            "underlying": ["AAA", "AAA", "BBB"],
+            "secType": ["OPT", "OPT", "STK"],
+            "conId": [1, 1, 2],
+            "qty": [1, 2, 10],
+            "multiplier": [100, 100, 1],
+            "right": ["C", "C", ""],
+            "strike": [10.0, 10.0, 0.0],
+            "expiry": ["20990101", "20990101", ""],
+            "delta": [0.5, 0.5, 1.0],
+            "gamma": [0.1, 0.1, 0.0],
+            "vega": [0.2, 0.2, 0.0],
+            "theta": [-0.1, -0.1, 0.0],
+        }
+    )
+    monkeypatch.setattr(pg, "_load_positions", lambda accounts=None: fake)
+    pg.run(fmt="csv", combos=False, output_dir=tmp_path, accounts=["all"])
+
+    totals = pd.read_csv(tmp_path / "portfolio_greeks_totals.csv")
+    assert totals["account"].tolist() == ["U1", "U2", accounts_core.TOTAL]
+    assert totals["delta_exposure"].tolist() == pytest.approx([50.0, 110.0, 160.0])
+    for acct in ("U1", "U2"):
+        part = pd.read_csv(tmp_path / f"portfolio_greeks_positions_{acct}.csv")
+        assert set(part["account"]) == {acct}
+
+    # without --accounts the book is keyed on conId alone: the contract held
+    # in both accounts still counts once per account
+    out = tmp_path / "merged"
+    pg.run(fmt="csv", combos=False, output_dir=out)
+    totals = pd.read_csv(out / "portfolio_greeks_totals.csv")
+    assert totals["delta_exposure"].iloc[-1] == pytest.approx(160.0)
+
+
+def test_live_feed_saves_positions_per_account(monkeypatch, tmp_path):
+    quotes = pd.DataFrame({"ticker": ["AAA"], "last": [1.0], "source": ["IB"]})
+    pos = pd.DataFrame(
+        {
+            "account": ["U1", "U2"],
+            "ticker": ["AAA", "AAA"],
+            "unrealized_pnl": [1.0, 2.0],
+            "cost_basis": [10.0, 20.0],
+        }
+    )
+    monkeypatch.setattr(live_feed, "IB_AVAILABLE", True)
+    monkeypatch.setattr(live_feed, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(live_feed, "load_tickers", lambda: ["AAA"])
+    monkeypatch.setattr(live_feed, "_ib_session", lambda: object())
+    monkeypatch.setattr(live_feed.accounts_core, "resolve", lambda ib, accts: ["U1", "U2"])
+    monkeypatch.setattr(live_feed, "fetch_ib_positions", lambda ib, accts: ([], set()))
+    monkeypatch.setattr(live_feed, "fetch_ib_quotes", lambda tickers, opts: quotes)
+    monkeypatch.setattr(live_feed, "fetch_live_positions", lambda ib, accts: pos)
+    live_feed.run(fmt="csv", include_indices=False, accounts=["all"])
+
+    files = sorted(p.name for p in tmp_path.glob("live_positions_*.csv"))
+    assert len(files) == 3
+    merged, *parts = files
+    assert len(pd.read_csv(tmp_path / merged)) == 2
+    for acct, part in zip(("U1", "U2"), parts):
+        assert part == merged.replace(".csv", f"_{acct}.csv")
+        assert set(pd.read_csv(tmp_path / part)["account"]) == {acct}
+
+
+def test_net_liq_fixture_by_account(tmp_path):
+    src = tmp_path / "nl.csv"
+    pd.DataFrame(
+        {
+            "Date": ["2024-01-02", "2024-01-02", "2024-01-03"],
+            "Account": ["U1", "U2", "U1"],
+            "NetLiq": [100.0, 50.0, 110.0],
+        }
+    ).to_csv(src, index=False)
+    df = nlh._read_fixture_csv(src, ["all"])
+    assert list(df.columns) == ["net_liq", "net_liq_U1", "net_liq_U2"]
+    assert df["net_liq"].tolist() == [150.0, 160.0]
+    single = nlh._read_fixture_csv(src, ["U2"])
+    assert single["net_liq"].tolist() == [50.0]
+
+
+def test_net_liq_rest_resolves_all_to_account_ids(monkeypatch):
+    class Resp:
+        def __init__(self, payload=None, text=""):
+            self.payload, self.text = payload, text
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.payload
+
+    class Session:
+        acct_ids = []
+
+        def post(self, url, json=None):
+            return Resp()
+
+        def get(self, url, params=None):
+            if url.endswith("/portfolio/accounts"):
+                return Resp([{"accountId": "U1"}, {"id": "U2"}])
+            Session.acct_ids.append(params["acctIds"])
+            nl = {"U1": 100.0, "U2": 50.0}[params["acctIds"]]
+            return Resp(text=f"Date,NetLiquidation\n2024-01-02,{nl}\n")
+
+    monkeypatch.setattr(nlh, "CP_TOKEN", "token")
+    monkeypatch.setattr(nlh.requests, "Session", Session)
+    df = nlh._pa_rest_download(["all"])
+    assert sorted(Session.acct_ids) == ["U1", "U2"]
+    assert list(df.columns) == ["net_liq", "net_liq_U1", "net_liq_U2"]
+    assert df["net_liq"].tolist() == [150.0]
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core.aggregate import EXPOSURES, GREEKS, GreeksBook
+
+
+def _book_df(n=500, seed=1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "conId": np.arange(n),
+            "underlying": rng.choice(["SPY", "QQQ", "IWM"], n),
+            "qty": rng.integers(-10, 10, n),
+            "multiplier": 100,
+            "price": rng.uniform(0.5, 20, n),
+        }
+    )
+    for g in GREEKS:
+        df[g] = rng.normal(size=n)
+    df.loc[3, "vega"] = np.nan
+    return df
+
+
+def _full(df):
+    out = {g + "_exposure": (df[g] * df.qty * df.multiplier).sum() for g in GREEKS}
+    out["market_value"] = (df.price * df.qty * df.multiplier).sum()
+    return out
+
+
+def test_incremental_matches_full_recompute():
+    df = _book_df()
+    book = GreeksBook().load(df)
+    assert book.totals() == pytest.approx(_full(df))
+
+    rng = np.random.default_rng(2)
+    for _ in range(2_000):
+        i = int(rng.integers(len(df)))
+        delta, price, qty = rng.normal(), rng.uniform(1, 5), int(rng.integers(-5, 5))
+        df.loc[i, ["delta", "price", "qty"]] = [delta, price, qty]
+        book.upsert(i, delta=delta, price=price, qty=qty)
+
+    assert book.totals() == pytest.approx(_full(df), rel=1e-9, abs=1e-6)
+    snap = book.snapshot()
+    assert snap.legs == len(df)
+    for und, grp in df.groupby("underlying"):
+        assert snap.by_underlying[und] == pytest.approx(_full(grp), rel=1e-9, abs=1e-6)
+    assert snap.totals_frame().columns.tolist() == list(EXPOSURES)
+
+
+def test_move_remove_and_snapshot_isolation():
+    book = GreeksBook()
+    book.upsert("a", underlying="SPY", qty=2, multiplier=100, delta=0.5, theta=-0.02)
+    book.upsert("b", underlying="QQQ", qty=-1, multiplier=100, delta=0.3)
+    snap = book.snapshot()
+    assert snap.portfolio["delta_exposure"] == pytest.approx(70.0)
+
+    book.upsert("a", underlying="QQQ")
+    assert "SPY" not in book.snapshot().by_underlying
+    assert book.totals("QQQ")["delta_exposure"] == pytest.approx(70.0)
+
+    book.remove("b")
+    book.remove("missing")
+    assert book.totals()["delta_exposure"] == pytest.approx(100.0)
+    # earlier snapshots are frozen copies
+    assert snap.by_underlying["SPY"]["delta_exposure"] == pytest.approx(100.0)
+    assert book.version > snap.version
+
+    with pytest.raises(KeyError):
+        book.upsert("a", rho=1.0)
+
+
+def test_periodic_resync_bounds_drift():
+    book = GreeksBook(resync_every=100)
+    book.upsert("x", underlying="X", qty=1, multiplier=1, delta=1e-3)
+    book.upsert("big", underlying="X", qty=1, multiplier=1, delta=1e12)
+    for _ in range(97):
+        book.upsert("big", delta=1e12)
+    # running sum has lost the small leg's low bits; the 100th update re-sums
+    book.remove("big")
+    assert book.totals()["delta_exposure"] == 1e-3
+
+
+def test_load_adds_up_duplicate_keys():
+    df = pd.DataFrame(
+        {
+            "account": ["U1", "U2"],
+            "conId": [1, 1],
+            "underlying": ["SPY", "SPY"],
+            "qty": [1, 2],
+            "multiplier": 100,
+            "delta": 0.5,
+        }
+    )
+    assert GreeksBook().load(df).totals()["delta_exposure"] == pytest.approx(150.0)
+    by_acct = GreeksBook().load(df, key=("account", "conId"))
+    assert len(by_acct) == 2 and by_acct.totals()["delta_exposure"] == pytest.approx(150.0)
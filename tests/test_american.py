@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core.american import american_greeks_vec, baw_price_vec
+from portfolio_exporter.core.greeks import bs_greeks_vec, bs_price_vec, greeks_kernel
+
+
+def test_call_without_dividends_is_european():
+    s = np.array([80.0, 100.0, 120.0])
+    am = baw_price_vec(s, 100.0, 0.5, 0.05, 0.3, True)
+    eu = bs_price_vec(s, 100.0, 0.5, 0.05, 0.3, True)
+    np.testing.assert_allclose(am, eu, rtol=1e-12)
+
+
+def test_put_carries_early_exercise_premium():
+    # binomial (4000 steps) references for American puts: (s, k, t, r, vol, q)
+    cases = [
+        ((100.0, 100.0, 1.0, 0.05, 0.3, 0.0), 9.8697),
+        ((80.0, 100.0, 2.0, 0.05, 0.4, 0.0), 26.9330),
+        ((110.0, 100.0, 0.5, 0.10, 0.35, 0.10), 5.8459),
+    ]
+    for (s, k, t, r, v, q), ref in cases:
+        am = float(baw_price_vec(s, k, t, r, v, False, q))
+        assert am == pytest.approx(ref, abs=0.05)
+    assert float(baw_price_vec(100.0, 100.0, 1.0, 0.05, 0.3, False)) > float(
+        bs_price_vec(100.0, 100.0, 1.0, 0.05, 0.3, False)
+    )
+    # deep ITM put is worth exactly its intrinsic value
+    assert float(baw_price_vec(50.0, 100.0, 1.0, 0.05, 0.2, False)) == pytest.approx(50.0)
+
+
+def test_greeks_match_bs_interface():
+    out = american_greeks_vec([100.0, -1.0], 100.0, 1.0, 0.05, 0.3, [True, False], 1)
+    assert set(out) == {"delta", "gamma", "vega", "theta"}
+    ref = bs_greeks_vec(100.0, 100.0, 1.0, 0.05, 0.3, True, 1)
+    for g in out:
+        assert out[g][0] == pytest.approx(float(ref[g]), rel=1e-3)
+        assert np.isnan(out[g][1])
+    put = american_greeks_vec(100.0, 100.0, 1.0, 0.05, 0.3, False, 1)
+    assert -1.0 < put["delta"] < float(bs_greeks_vec(100.0, 100.0, 1.0, 0.05, 0.3, False, 1)["delta"])
+    assert greeks_kernel("american") is american_greeks_vec
+    with pytest.raises(ValueError):
+        greeks_kernel("heston")
+
+
+def test_portfolio_greeks_american_fallback(monkeypatch):
+    from portfolio_exporter.scripts import portfolio_greeks
+
+    fake = pd.DataFrame(
+        [
+            {
+                "underlying": "XYZ",
+                "secType": "OPT",
+                "qty": 1,
+                "multiplier": 100,
+                "right": "P",
+                "strike": 100.0,
+                "expiry": "20991218",
+                "delta": np.nan,
+                "gamma": np.nan,
+                "vega": np.nan,
+                "theta": np.nan,
+                "iv": 0.3,
+                "underlying_price": 100.0,
+            }
+        ]
+    )
+    monkeypatch.setattr(portfolio_greeks, "_load_positions", lambda: fake)
+    monkeypatch.delattr(portfolio_greeks, "args", raising=False)
+    pos_df, _, _ = portfolio_greeks.run(
+        write_positions=False, write_totals=False, combos=False, return_frames=True, greeks_model="american"
+    )
+    assert pos_df.loc[0, "greeks_source"] == "BAW"
+    assert -1.0 < pos_df.loc[0, "delta"] < 0.0
+
+
+def test_10k_contracts_in_one_pass():
+    n = 10_000
+    rng = np.random.default_rng(7)
+    args = (
+        rng.uniform(50, 150, n),
+        100.0,
+        rng.uniform(0.02, 2.0, n),
+        0.04,
+        rng.uniform(0.1, 0.8, n),
+        rng.random(n) > 0.5,
+    )
+    out = american_greeks_vec(*args, 1)
+    assert all(np.isfinite(out[g]).all() and out[g].shape == (n,) for g in out)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import attribution
+from portfolio_exporter.scripts import portfolio_greeks
+
+
+def _snap(spot=100.0, iv=0.20, price=5.0, qty=2):
+    return pd.DataFrame(
+        [
+            {
+                "conId": 1, "underlying": "SPY", "secType": "OPT", "expiry": "20261218",
+                "right": "C", "strike": 100.0, "qty": qty, "multiplier": 100,
+                "price": price, "underlying_price": spot, "iv": iv,
+                "delta": 0.5, "gamma": 0.04, "vega": 0.2, "theta": -0.05,
+            },
+            {
+                "conId": 2, "underlying": "SPY", "secType": "STK", "expiry": None,
+                "right": None, "strike": None, "qty": 10, "multiplier": 1,
+                "price": spot, "underlying_price": spot, "iv": None,
+                "delta": None, "gamma": None, "vega": None, "theta": None,
+            },
+        ]
+    )
+
+
+def test_two_snapshot_decomposition():
+    older = _snap()
+    newer = _snap(spot=102.0, iv=0.22, price=6.5)
+    legs = attribution.explain(older, newer, days=1.0).set_index("conId")
+
+    opt = legs.loc[1]
+    assert opt["status"] == "held"
+    assert opt["pnl"] == pytest.approx(1.5 * 200)
+    assert opt["delta_pnl"] == pytest.approx(0.5 * 200 * 2.0)
+    assert opt["gamma_pnl"] == pytest.approx(0.5 * 0.04 * 200 * 4.0)
+    assert opt["vega_pnl"] == pytest.approx(0.2 * 200 * 2.0)
+    assert opt["theta_pnl"] == pytest.approx(-0.05 * 200)
+    parts = opt[["delta_pnl", "gamma_pnl", "vega_pnl", "theta_pnl", "residual"]].sum()
+    assert parts == pytest.approx(opt["pnl"])
+
+    stk = legs.loc[2]
+    assert stk["pnl"] == pytest.approx(20.0)
+    assert stk["delta_pnl"] == pytest.approx(20.0)
+    assert stk["residual"] == pytest.approx(0.0)
+
+
+def test_opened_closed_and_resized_legs():
+    older = _snap()
+    newer = _snap(qty=3).iloc[[0]].copy()
+    newer.loc[len(newer)] = {**newer.iloc[0].to_dict(), "conId": 3, "strike": 105.0}
+    legs = attribution.explain(older, newer).set_index("conId")
+    assert legs.loc[1, "status"] == "resized"
+    assert legs.loc[2, "status"] == "closed"
+    assert legs.loc[3, "status"] == "opened"
+    assert np.isnan(legs.loc[3, "pnl"])
+
+
+def test_explain_cli_orders_files_and_aggregates(tmp_path):
+    _snap(spot=102.0, price=6.5).to_csv(tmp_path / "portfolio_greeks_positions_20261016_1100.csv", index=False)
+    _snap().to_csv(tmp_path / "portfolio_greeks_positions_20261016_1000.csv", index=False)
+    files = sorted(str(p) for p in tmp_path.glob("*.csv"))[::-1]
+    out = tmp_path / "out"
+    summary = portfolio_greeks.main(["--explain", *files, "--output-dir", str(out), "--json"])
+    assert summary["sections"]["legs"] == 2
+    assert summary["totals"]["pnl"] == pytest.approx(300.0 + 20.0)
+    assert (out / "portfolio_greeks_explain_by_underlying.csv").exists()
+
+
+def test_many_snapshots_use_one_merge(monkeypatch):
+    rng = np.random.default_rng(0)
+    n_legs, n_snaps = 2_000, 200
+    base = pd.DataFrame(
+        {
+            "conId": np.arange(n_legs),
+            "underlying": rng.choice(["SPY", "QQQ", "IWM", "AAPL"], n_legs),
+            "secType": "OPT",
+            "expiry": "20261218",
+            "right": rng.choice(["C", "P"], n_legs),
+            "strike": rng.uniform(50, 150, n_legs).round(),
+            "qty": rng.integers(-5, 5, n_legs),
+            "multiplier": 100,
+        }
+    )
+    frames, times = [], []
+    t0 = pd.Timestamp("2026-10-16 13:30", tz="UTC")
+    for i in range(n_snaps):
+        df = base.copy()
+        for c in ("price", "underlying_price", "iv", "delta", "gamma", "vega", "theta"):
+            df[c] = rng.uniform(0.01, 1.0, n_legs)
+        frames.append(df)
+        times.append(t0 + pd.Timedelta(minutes=2 * i))
+
+    merges = []
+    merge = pd.DataFrame.merge
+    monkeypatch.setattr(pd.DataFrame, "merge", lambda self, *a, **k: merges.append(1) or merge(self, *a, **k))
+
+    legs = attribution.explain_many(frames, times)
+    assert len(merges) == 1
+    assert len(legs) == n_legs * (n_snaps - 1)
@@ -3,19 +3,29 @@ from portfolio_exporter.core import chain
 
 
 def test_fetch_chain_stub(monkeypatch):
-    def fake_quote(symbol, expiry, strike, right):
-        return {
-            "mid": 1.23,
-            "bid": 1.2,
-            "ask": 1.26,
-            "delta": 0.5,
-            "gamma": 0.1,
-            "vega": 0.2,
-            "theta": -0.03,
-            "iv": 0.25,
-        }
+    calls = []
 
-    monkeypatch.setattr(chain, "quote_option", fake_quote)
+    def fake_quote_many(specs):
+        specs = list(specs)
+        calls.append(specs)
+        return [
+            None
+            if strike == 12 and right == "P"
+            else {
+                "mid": 1.23,
+                "bid": 1.2,
+                "ask": 1.26,
+                "delta": 0.5,
+                "gamma": 0.1,
+                "vega": 0.2,
+                "theta": -0.03,
+                "iv": 0.25,
+            }
+            for _, _, strike, right in specs
+        ]
+
+    monkeypatch.setattr("portfolio_exporter.core.ib.quote_many", fake_quote_many)
     out = chain.fetch_chain("FAKE", "2099-01-01", strikes=[10, 12])
-    assert len(out) == 4
+    assert len(calls) == 1 and len(calls[0]) == 4
+    assert len(out) == 3
     assert {"strike", "right", "mid", "delta", "iv"}.issubset(out.columns)
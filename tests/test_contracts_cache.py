@@ -0,0 +1,139 @@
+from datetime import date
+from types import SimpleNamespace
+
+from ib_insync import Event, Option, Stock
+
+from portfolio_exporter.core.contracts import ContractCache
+
+
+class FakeIB:
+    """Qualifies known symbols/strikes; counts round-trips."""
+
+    def __init__(self, known, ambiguous=()):
+        self.known = known  # (symbol, strike) -> conId
+        self.ambiguous = set(ambiguous)  # (symbol, strike) IB cannot pick one for
+        self.calls = 0
+        self.errorEvent = Event("errorEvent")
+
+    def _unknown(self, c):
+        if (c.symbol, float(c.strike or 0)) not in self.ambiguous:
+            self.errorEvent.emit(self.calls, 200, "No security definition has been found", c)
+
+    def qualifyContracts(self, *contracts):
+        self.calls += 1
+        ok = []
+        for c in contracts:
+            cid = self.known.get((c.symbol, float(c.strike or 0)))
+            if cid:
+                c.conId = cid
+                c.localSymbol = f"{c.symbol}{cid}"
+                c.tradingClass = c.symbol
+                ok.append(c)
+            else:
+                self._unknown(c)
+        return ok
+
+    def reqContractDetails(self, contract):
+        self.calls += 1
+        cid = self.known.get((contract.symbol, float(contract.strike or 0)))
+        if not cid:
+            self._unknown(contract)
+            return []
+        found = [
+            Option(contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike,
+                   contract.right, "SMART", tradingClass=tc, conId=cid + i)
+            for i, tc in enumerate(("SPXW", "SPX"))
+        ]
+        return [SimpleNamespace(contract=c) for c in found]
+
+
+def _opt(strike, expiry="20991217"):
+    return Option("SPY", expiry, strike, "C", "SMART", currency="USD")
+
+
+def test_bulk_qualify_hits_disk_on_second_run(tmp_path):
+    path = tmp_path / "contracts.db"
+    ib = FakeIB({("SPY", 400.0): 11, ("SPY", 410.0): 12, ("SPY", 0.0): 1})
+    first = ContractCache(path).qualify(ib, _opt(400), _opt(410), _opt(999), Stock("SPY", "SMART", "USD"))
+    assert [getattr(c, "conId", None) for c in first] == [11, 12, None, 1]
+    assert ib.calls == 1
+
+    cache = ContractCache(path)  # fresh process
+    templates = [_opt(400), _opt(410), _opt(999), Stock("SPY", "SMART", "USD")]
+    again = cache.qualify(ib, *templates)
+    assert ib.calls == 1  # served from disk, negative entry included
+    assert [getattr(c, "conId", None) for c in again] == [11, 12, None, 1]
+    assert templates[0].conId == 11 and templates[0].localSymbol == "SPY11"
+    assert cache.by_conid([12])[12].strike == 410.0
+
+
+def test_negative_entries_expire(tmp_path):
+    ib = FakeIB({})
+    cache = ContractCache(tmp_path / "c.db", negative_ttl=0.0)
+    cache.qualify(ib, _opt(1))
+    cache.qualify(ib, _opt(1))
+    assert ib.calls == 2
+
+
+def test_only_unknown_contracts_are_negative_cached(tmp_path):
+    ib = FakeIB({}, ambiguous={("SPY", 2.0)})
+    cache = ContractCache(tmp_path / "c.db")
+    assert cache.qualify(ib, _opt(1), _opt(2)) == [None, None]
+    # error 200 is cached; the ambiguous template is asked again
+    assert cache.qualify(ib, _opt(1), _opt(2)) == [None, None]
+    assert ib.calls == 2
+    cache.resolve(ib, _opt(1), _opt(2))
+    assert ib.calls == 3
+
+    class Down(FakeIB):
+        def qualifyContracts(self, *contracts):
+            self.calls += 1
+            return []  # timed out: no error 200 for anyone
+
+    down = Down({})
+    cache.qualify(down, _opt(3))
+    cache.qualify(down, _opt(3))
+    assert down.calls == 2
+
+
+def test_expired_contracts_are_evicted(tmp_path):
+    ib = FakeIB({("SPY", 400.0): 11})
+    cache = ContractCache(tmp_path / "c.db")
+    cache.qualify(ib, _opt(400, expiry="20300115"))
+    assert cache.by_conid([11])
+    assert cache.evict_expired(today=date(2030, 1, 16)) >= 2
+    assert cache.by_conid([11]) == {}
+
+
+def test_resolve_prefers_trading_class(tmp_path):
+    ib = FakeIB({("SPX", 5000.0): 100})
+    cache = ContractCache(tmp_path / "c.db")
+    tmpl = Option("SPX", "20991217", 5000, "C", "SMART", currency="USD")
+    (c,) = cache.resolve(ib, tmpl, prefer="SPX")
+    assert c.tradingClass == "SPX" and c.conId == 101
+    (again,) = cache.resolve(ib, Option("SPX", "20991217", 5000, "C", "SMART", currency="USD"))
+    assert again.conId == 101 and ib.calls == 1
+
+
+def test_live_feed_qualifies_individually_when_bulk_fails(monkeypatch):
+    from portfolio_exporter.core import contracts
+    from portfolio_exporter.core import fake_ib
+    from portfolio_exporter.scripts import live_feed
+
+    class FlakyIB(fake_ib.FakeIB):
+        def qualifyContracts(self, *contracts):
+            if len(contracts) > 1:
+                raise TimeoutError("bulk request timed out")
+            return super().qualifyContracts(*contracts)
+
+    monkeypatch.setattr(contracts, "contract_cache", ContractCache(":memory:"))
+    ib = FlakyIB(fake_ib.FakeConfig(legs=6, symbols=2))
+    ib.connect()
+    df = live_feed.fetch_live_positions(ib)
+    assert len(df) == len({p.contract.conId for p in ib.positions()})
+
+    # the watchlist quote pull falls back the same way instead of sending
+    # every ticker to yfinance
+    monkeypatch.setattr(live_feed, "_ib_session", lambda: ib)
+    quotes = live_feed.fetch_ib_quotes(["AAA", "BBB"], [])
+    assert quotes["ticker"].tolist() == ["AAA", "BBB"]
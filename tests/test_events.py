@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import events
+from portfolio_exporter.scripts import daily_report
+
+TODAY = date.today()
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.calls = []
+        self.cal = {
+            "AAA": {"earnings": [TODAY + timedelta(days=5)], "ex_dividend": [TODAY + timedelta(days=40)]},
+            "BBB": {"earnings": [TODAY + timedelta(days=60)], "ex_dividend": []},
+            "ETF": {"earnings": [], "ex_dividend": []},
+        }
+
+    def __call__(self, symbol):
+        self.calls.append(symbol)
+        if symbol == "BAD":
+            raise ConnectionError("offline")
+        return self.cal[symbol]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("PE_EVENTS", "on")
+    fetcher = FakeFetcher()
+    svc = events.EventService(store=events.EventStore(":memory:"), fetcher=fetcher)
+    return svc, fetcher
+
+
+def test_refresh_intervals(service):
+    svc, fetcher = service
+    assert sorted(svc.refresh(["aaa", "BBB", "ETF", "BAD"])) == ["AAA", "BBB", "ETF"]
+    status = svc.store.status(["AAA", "BBB", "ETF"], TODAY.isoformat())
+    assert status["AAA"][1] == svc.near_interval
+    assert status["BBB"][1] == svc.default_interval
+    assert status["ETF"][1] == svc.unknown_interval
+
+    # within every interval only the failed symbol is retried
+    assert svc.refresh(["AAA", "BBB", "ETF", "BAD"]) == []
+    assert fetcher.calls.count("AAA") == 1 and fetcher.calls.count("BAD") == 2
+
+    # two days later: only the symbol with a near event is due again
+    svc.store._db().execute("UPDATE fetched SET ts = ts - ?", (2 * events.DAY,))
+    fetcher.cal["AAA"] = {"earnings": [TODAY + timedelta(days=6)]}
+    assert svc.refresh(["AAA", "BBB"]) == ["AAA"]
+    assert svc.next_events(["AAA"])["earnings"].iloc[0] == pd.Timestamp(TODAY + timedelta(days=6))
+
+
+def test_before_expiry_is_vectorized(service):
+    svc, fetcher = service
+    legs = pd.DataFrame(
+        {
+            "underlying": ["AAA", "aaa", "BBB", "ETF"],
+            "expiry": [
+                (TODAY + timedelta(days=7)).strftime("%Y%m%d"),
+                (TODAY + timedelta(days=45)).isoformat(),
+                (TODAY + timedelta(days=30)).isoformat(),
+                (TODAY + timedelta(days=30)).isoformat(),
+            ],
+        },
+        index=[10, 11, 12, 13],
+    )
+    out = svc.before_expiry(legs)
+    assert out.index.tolist() == [10, 11, 12, 13]
+    assert out["earnings_before_expiry"].tolist() == [True, True, False, False]
+    assert out["ex_dividend_before_expiry"].tolist() == [False, True, False, False]
+    assert out.loc[12, "next_earnings"] == pd.Timestamp(TODAY + timedelta(days=60))
+    assert sorted(fetcher.calls) == ["AAA", "BBB", "ETF"]
+
+
+class FixedDate(daily_report.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 10)
+
+
+def test_expiry_radar_flags_events(service, monkeypatch):
+    svc, fetcher = service
+    fetcher.cal["AAPL"] = {"earnings": [date(2024, 1, 12)]}
+    fetcher.cal["MSFT"] = {"earnings": [date(2024, 1, 30)], "ex_dividend": [date(2024, 1, 11)]}
+    monkeypatch.setattr(events, "event_service", svc)
+    data = Path(__file__).parent / "data"
+    mapping = {"portfolio_greeks_positions": data / "positions_sample.csv"}
+    monkeypatch.setattr("portfolio_exporter.core.io.latest_file", lambda name, *a, **k: mapping.get(name))
+    monkeypatch.setattr(daily_report, "datetime", FixedDate)
+
+    res = daily_report.main(["--json", "--expiry-window", "40"])
+    rows = {r["date"]: r for r in res["expiry_radar"]["rows"]}
+    assert rows["2024-01-19"]["earnings_before"] == ["AAPL"]
+    assert rows["2024-02-16"]["ex_div_before"] == ["MSFT"]
+    assert rows["2024-02-16"]["earnings_before"] == ["MSFT"]
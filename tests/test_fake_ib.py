@@ -0,0 +1,60 @@
+from datetime import date
+
+import pytest
+from ib_insync import Option, Stock
+
+from portfolio_exporter.core import ib as core_ib
+from portfolio_exporter.core.fake_ib import FakeConfig, FakeIB
+from portfolio_exporter.scripts import portfolio_greeks as pg
+from portfolio_exporter.scripts import trades_report as tr
+
+
+@pytest.fixture
+def fake_env(monkeypatch):
+    monkeypatch.setenv("PE_FAKE_IB", "legs=60,symbols=5,expiries=3,executions=40,seed=7")
+    yield
+    core_ib.pool.close_all()
+
+
+def test_spec_parsing():
+    cfg = FakeConfig.from_spec("legs=10000, latency=0.002,errors=0.01")
+    assert (cfg.legs, cfg.latency, cfg.errors) == (10000, 0.002, 0.01)
+    assert FakeConfig.from_spec("1") == FakeConfig()
+    with pytest.raises(ValueError):
+        FakeConfig.from_spec("nope=1")
+
+
+def test_portfolio_greeks_runs_against_fake_session(fake_env):
+    ib = pg._ib_session()
+    assert isinstance(ib, FakeIB) and core_ib.pool.peek() is ib
+    bundles = pg.list_positions(ib)
+    assert len(bundles) == len([p for p in ib.positions() if p.contract.secType == "OPT"])
+    assert all(tk.modelGreeks is not None for _, tk in bundles)
+    assert ib.calls["reqMktData"] == ib.calls["cancelMktData"] == len(bundles)
+
+
+def test_trades_report_reads_fake_executions(fake_env):
+    trades, opens = tr.fetch_trades_ib(date.today(), date.today())
+    ib = core_ib.pool.peek()
+    fills = [f for f in ib.market.fills if f.time.date() >= date.today()]
+    assert len(trades) == len(fills)
+    assert all(t.commission > 0 for t in trades)
+    assert len(opens) == len(ib.market.trades)
+
+
+def test_errors_and_line_cap_are_reported():
+    ib = FakeIB(FakeConfig(legs=10, symbols=2, lines=2, errors=1.0))
+    seen = []
+    ib.errorEvent += lambda req, code, msg, contract: seen.append(code)
+    ib.connect()
+    assert ib.qualifyContracts(Stock("AAPL", "SMART", "USD")) == []
+    for pos in ib.positions()[-3:]:
+        ib.reqMktData(Option(conId=pos.contract.conId))
+    assert seen == [200, 354, 354, 101]
+
+    ok = FakeIB(FakeConfig(legs=10, symbols=2))
+    (stk,) = ok.qualifyContracts(Stock("AAPL", "SMART", "USD"))
+    tk = ok.reqMktData(stk)
+    assert ok.waitOnUpdate(timeout=1) and tk.bid < tk.ask
+    bars = ok.reqHistoricalData(stk, "", "30 D", "1 day", "TRADES", True)
+    assert bars and bars[-1].close == ok.market.underlying("AAPL")["spot"]
@@ -0,0 +1,75 @@
+"""Scalar vs vectorised Black-Scholes: numerical parity.
+
+All public entry points (core scalar, ``utils.bs`` and ``tech_signals_ibkr``)
+delegate to ``bs_greeks_vec``; parity is asserted against an independent
+``math``-only reference so the kernel itself is checked too
+(``tech_signals_ibkr._bs_delta`` is covered in its own test module).
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from portfolio_exporter.core.greeks import bs_greeks, bs_greeks_vec
+
+
+def _reference(s, k, t, r, v, call):
+    """Textbook closed form, per share, vega per 1% and theta per day."""
+    ncdf = lambda x: 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+    d1 = (math.log(s / k) + (r + 0.5 * v * v) * t) / (v * math.sqrt(t))
+    d2 = d1 - v * math.sqrt(t)
+    pdf = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    carry = r * k * math.exp(-r * t)
+    if call:
+        delta, theta = ncdf(d1), -s * pdf * v / (2 * math.sqrt(t)) - carry * ncdf(d2)
+    else:
+        delta, theta = ncdf(d1) - 1.0, -s * pdf * v / (2 * math.sqrt(t)) + carry * ncdf(-d2)
+    return {
+        "delta": delta,
+        "gamma": pdf / (s * v * math.sqrt(t)),
+        "vega": s * pdf * math.sqrt(t) / 100.0,
+        "theta": theta / 365.0,
+    }
+
+
+def _book(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.uniform(20, 500, n),
+        rng.uniform(20, 500, n),
+        rng.uniform(1 / 365, 2.0, n),
+        0.03,
+        rng.uniform(0.05, 1.5, n),
+        rng.random(n) < 0.5,
+    )
+
+
+@pytest.mark.parametrize("n", [1, 1_000, 100_000])
+def test_scalar_vs_vectorised(n):
+    s, k, t, r, v, call = _book(n)
+    vec = bs_greeks_vec(s, k, t, r, v, call, 1)
+    # the scalar API is checked on at most 1k rows
+    m = min(n, 1_000)
+    scalar = [bs_greeks(s[i], k[i], t[i], r, v[i], call=bool(call[i]), multiplier=1) for i in range(m)]
+
+    # parity: vectorised vs scalar API vs math reference on a sample
+    for i in np.linspace(0, n - 1, min(n, 2_000)).astype(int):
+        ref = _reference(s[i], k[i], t[i], r, v[i], bool(call[i]))
+        for g, val in ref.items():
+            assert vec[g][i] == pytest.approx(val, rel=1e-9, abs=1e-12)
+    for i, row in enumerate(scalar):
+        for g, val in row.items():
+            assert val == pytest.approx(vec[g][i], rel=1e-12, abs=1e-15)
+
+
+def test_all_entry_points_agree():
+    import importlib
+
+    ub = importlib.import_module("utils.bs")
+
+    args = (105.0, 100.0, 0.4, 0.02, 0.3)
+    vec = bs_greeks_vec(*args, False, 1)
+    assert ub.bs_greeks(*args, False) == pytest.approx({g: float(x) for g, x in vec.items()})
+    assert ub._bs_delta(*args, False) == pytest.approx(float(vec["delta"]))
+    assert bs_greeks(*args, call=False, multiplier=100)["vega"] == pytest.approx(100 * float(vec["vega"]))
@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core.greeks import bs_greeks, bs_greeks_vec
+
+
+def test_vec_matches_scalar():
+    spot = np.array([100.0, 100.0, 95.0, 250.0])
+    strike = np.array([100.0, 110.0, 90.0, 240.0])
+    t = np.array([0.5, 0.25, 1.0, 0.02])
+    vol = np.array([0.2, 0.35, 0.25, 0.6])
+    is_call = np.array([True, False, True, False])
+
+    out = bs_greeks_vec(spot, strike, t, 0.01, vol, is_call, multiplier=100)
+    for i in range(len(spot)):
+        ref = bs_greeks(
+            spot[i], strike[i], t[i], 0.01, vol[i], call=bool(is_call[i]), multiplier=100
+        )
+        for g in ("delta", "gamma", "vega", "theta"):
+            assert out[g][i] == pytest.approx(ref[g], rel=1e-10, abs=1e-12)
+
+
+def test_vec_broadcasts_scalars_and_flags_invalid():
+    out = bs_greeks_vec(100.0, [90.0, 100.0, -1.0, 100.0], 0.5, 0.01, [0.2, 0.2, 0.2, 0.0], True, 1)
+    assert out["delta"].shape == (4,)
+    assert 0.5 < out["delta"][1] < 0.6
+    assert math.isnan(out["delta"][2])
+    assert math.isnan(out["gamma"][3])
+
+
+def test_quick_chain_ensure_delta_fills_missing():
+    from portfolio_exporter.scripts import quick_chain
+
+    df = pd.DataFrame(
+        {
+            "expiry": ["2099-01-16", "2099-01-16"],
+            "right": ["C", "P"],
+            "strike": [100.0, 100.0],
+            "last": [100.0, 100.0],
+            "iv": [0.25, 0.25],
+            "delta": [None, -0.4],
+        }
+    )
+    out = quick_chain._ensure_delta(df)
+    assert 0.0 < out.loc[0, "delta"] <= 1.0
+    assert out.loc[1, "delta"] == pytest.approx(-0.4)
+
+
+def test_implied_vol_round_trip():
+    from portfolio_exporter.core.greeks import bs_price_vec, implied_vol_vec
+
+    strike = np.array([60.0, 90.0, 100.0, 110.0, 160.0, 100.0])
+    t = np.array([0.1, 0.5, 0.25, 1.0, 2.0, 0.02])
+    vol = np.array([0.8, 0.3, 0.2, 0.45, 1.1, 0.15])
+    is_call = np.array([False, True, True, False, True, True])
+    price = bs_price_vec(100.0, strike, t, 0.02, vol, is_call)
+
+    iv = implied_vol_vec(price, 100.0, strike, t, 0.02, is_call)
+    np.testing.assert_allclose(iv, vol, atol=1e-5)
+
+
+def test_implied_vol_rejects_arbitrage_prices():
+    from portfolio_exporter.core.greeks import implied_vol_vec
+
+    # below intrinsic, above spot, zero and NaN marks are all unsolvable
+    iv = implied_vol_vec([5.0, 150.0, 0.0, np.nan], 110.0, 100.0, 0.5, 0.0, True)
+    assert np.isnan(iv).all()
+
+    # marks within tol of intrinsic carry no volatility information
+    iv = implied_vol_vec([5e-7, 10.0 + 5e-7], [100.0, 110.0], 100.0, 0.5, 0.0, [True, True])
+    assert np.isnan(iv).all()
+
+
+def test_greeks_cache_hits_within_tolerance_and_evicts():
+    from portfolio_exporter.core.greeks import GreeksCache
+
+    cache = GreeksCache(maxsize=4, spot_tol=1e-3, iv_tol=1e-3)
+    ids = [1, 2, 3]
+    strikes = [95.0, 100.0, 105.0]
+    first = cache.greeks_vec(ids, 100.0, strikes, 0.25, 0.01, 0.3, True, 1)
+    again = cache.greeks_vec(ids, 100.00001, strikes, 0.25, 0.01, 0.30001, True, 1)
+    assert cache.hits == 3 and cache.misses == 3
+    np.testing.assert_array_equal(first["delta"], again["delta"])
+
+    moved = cache.greeks_vec(ids, 101.0, strikes, 0.25, 0.01, 0.3, True, 1)
+    assert cache.misses == 6
+    assert (moved["delta"] > first["delta"]).all()
+    assert cache.stats()["size"] == 4
+
+    # legs without a conId are computed but never cached
+    cache.greeks_vec([None], 100.0, 100.0, 0.25, 0.01, 0.3, True, 1)
+    assert cache.misses == 6 and cache.hits == 3
+
+    # a new risk-free rate never reuses greeks computed at the old one
+    cache.clear()
+    cache.greeks_vec(ids, 100.0, strikes, 0.25, 0.01, 0.3, True, 1)
+    hiked = cache.greeks_vec(ids, 100.0, strikes, 0.25, 0.05, 0.3, True, 1)
+    assert cache.hits == 0 and cache.misses == 6
+    assert (hiked["delta"] > first["delta"]).all()
+
+
+def test_greeks_cache_holds_a_book_larger_than_maxsize():
+    from portfolio_exporter.core.greeks import GreeksCache
+
+    cache = GreeksCache(maxsize=4)
+    n = 50
+    ids = list(range(n))
+    strikes = np.linspace(80, 120, n)
+    first = cache.greeks_vec(ids, 100.0, strikes, 0.25, 0.01, 0.3, True, 1, model="american")
+    again = cache.greeks_vec(ids, 100.0, strikes, 0.25, 0.01, 0.3, True, 1, model="american")
+    assert cache.hits == n and cache.stats()["size"] == n
+    for g in first:
+        np.testing.assert_array_equal(first[g], again[g])
+
+
+def test_runlog_manifest_includes_counters(tmp_path):
+    import json
+
+    from portfolio_exporter.core.runlog import RunLog
+
+    with RunLog(script="cache_test", output_dir=tmp_path) as rl:
+        rl.add_counters("greeks_cache", {"hits": 5, "misses": 1})
+        path = rl.finalize(write=True)
+    manifest = json.loads(path.read_text())
+    assert manifest["counters"]["greeks_cache"] == {"hits": 5, "misses": 1}
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+
+from portfolio_exporter.core import history as hist
+from portfolio_exporter.core.history import BarStore, HistoryService
+
+
+def _bars(days):
+    today = date.today()
+    return [
+        SimpleNamespace(date=today - timedelta(days=i), open=1, high=2, low=0.5, close=1.5, volume=100)
+        for i in range(days - 1, -1, -1)
+    ]
+
+
+class FakeIB:
+    """Synchronous IB double: serves bars except for symbols in *empty*."""
+
+    def __init__(self, empty=()):
+        self.empty = set(empty)
+        self.requests = []
+
+    def isConnected(self):
+        return True
+
+    def reqHistoricalData(self, contract, end, duration, bar_size, what, useRTH=True):
+        self.requests.append((contract.symbol, duration, what))
+        if contract.symbol in self.empty:
+            return []
+        return _bars(min(int(duration.split()[0]), 30))
+
+
+def _yf_download(calls):
+    def fake(tickers, start, end, **kwargs):
+        calls.append((tuple(tickers), start))
+        idx = pd.date_range(start, periods=3, freq="D", name="Date")
+        cols = pd.MultiIndex.from_product([tickers, ["Open", "High", "Low", "Close", "Adj Close", "Volume"]])
+        return pd.DataFrame(1.0, index=idx, columns=cols)
+
+    return fake
+
+
+def test_second_run_fetches_only_the_tail(tmp_path):
+    ib = FakeIB()
+    svc = HistoryService(BarStore(tmp_path / "bars.db"), ttl=0.0)
+    out = svc.daily_bars(["AAA", "BBB", "AAA"], days=30, ib=ib)
+    assert sorted(out) == ["AAA", "BBB"] and len(out["AAA"]) == 30
+    assert ib.requests == [("AAA", "31 D", "TRADES"), ("BBB", "31 D", "TRADES")]
+
+    ib.requests.clear()
+    svc = HistoryService(BarStore(tmp_path / "bars.db"), ttl=0.0)  # fresh process
+    again = svc.daily_bars(["AAA"], days=30, ib=ib)
+    assert ib.requests == [("AAA", "1 D", "TRADES")]
+    assert len(again["AAA"]) == 30
+
+    svc.ttl = 3600
+    svc.daily_bars(["AAA"], days=30, ib=ib)
+    assert len(ib.requests) == 1
+
+
+def test_ib_misses_fall_back_to_one_yfinance_batch(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr("yfinance.download", _yf_download(calls))
+    ib = FakeIB(empty={"^TNX", "GC=F"})
+    svc = HistoryService(BarStore(tmp_path / "bars.db"))
+    out = svc.daily_bars(["SPY", "^TNX", "GC=F"], days=10, ib=ib, what={"^TNX": "MIDPOINT"})
+    assert ("^TNX", "11 D", "MIDPOINT") in ib.requests
+    assert len(calls) == 1 and set(calls[0][0]) == {"^TNX", "GC=F"}
+    assert len(out["^TNX"]) == 3 and list(out["SPY"].columns) == list(hist.COLUMNS)
+
+
+def test_each_ib_request_takes_a_shared_pacing_token(monkeypatch):
+    taken = []
+    monkeypatch.setattr(hist.ratelimit, "acquire", lambda source, n=1, client=None: taken.append(source))
+    svc = HistoryService(BarStore(":memory:"))
+    svc.daily_bars(["A", "B", "C", "A"], days=5, ib=FakeIB())
+    assert taken == ["ib_hist"] * 3
+
+
+def test_futures_are_cached_per_contract_month(tmp_path):
+    ib = FakeIB()
+    svc = HistoryService(BarStore(tmp_path / "bars.db"), ttl=0.0)
+    march = SimpleNamespace(symbol="ES", secType="FUT", conId=1, lastTradeDateOrContractMonth="202403")
+    june = SimpleNamespace(symbol="ES", secType="FUT", conId=2, lastTradeDateOrContractMonth="202406")
+    svc.daily_bars(["ES"], days=20, ib=ib, contracts={"ES": march})
+    svc.daily_bars(["ES"], days=20, ib=ib, contracts={"ES": march})
+    # after the roll the new month is requested in full, not as a tail
+    out = svc.daily_bars(["ES"], days=20, ib=ib, contracts={"ES": june})
+    assert [d for _, d, _ in ib.requests] == ["21 D", "1 D", "21 D"]
+    assert len(out["ES"]) == 21
+
+    # a future with no conId or expiry is never cached
+    ib.requests.clear()
+    front = SimpleNamespace(symbol="NQ", secType="FUT", conId=0, lastTradeDateOrContractMonth="")
+    for _ in range(2):
+        out = svc.daily_bars(["NQ"], days=20, ib=ib, contracts={"NQ": front})
+        assert len(out["NQ"]) == 21
+    assert [d for _, d, _ in ib.requests] == ["21 D", "21 D"]
+    assert svc.store.coverage("NQ", "ib:TRADES") is None
@@ -0,0 +1,87 @@
+import sys
+import time
+
+import ib_insync
+import ib_insync.contract
+import pytest
+from ib_insync import Stock
+
+from portfolio_exporter.core import contracts
+from portfolio_exporter.core import ib as core_ib
+from portfolio_exporter.core.fake_ib import FakeConfig, FakeIB
+from portfolio_exporter.core.replay import Recorder, ReplayError, ReplayIB, read_records
+from portfolio_exporter.scripts import portfolio_greeks as pg
+
+SPEC = "legs=40,symbols=4,expiries=3,latency=0.01,errors=0.05,seed=3"
+
+
+@pytest.fixture(autouse=True)
+def _real_ib_insync(monkeypatch):
+    # other test modules replace ib_insync in sys.modules; pickling needs the real one
+    monkeypatch.setitem(sys.modules, "ib_insync", ib_insync)
+    monkeypatch.setitem(sys.modules, "ib_insync.contract", ib_insync.contract)
+
+
+def _greeks(bundles):
+    return [
+        (pos.contract.conId, pos.position, tk.bid, tk.ask, tk.modelGreeks.delta if tk.modelGreeks else None)
+        for pos, tk in bundles
+    ]
+
+
+def test_recorded_portfolio_session_replays_identically(monkeypatch, tmp_path):
+    path = str(tmp_path / "run.ibrec")
+    monkeypatch.setattr(pg, "TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(contracts, "contract_cache", contracts.ContractCache())
+    monkeypatch.setenv("PE_FAKE_IB", SPEC)
+    monkeypatch.setenv("PE_IB_RECORD", path)
+    try:
+        ib = pg._ib_session()
+        assert isinstance(ib, Recorder)
+        live = _greeks(pg.list_positions(ib))
+    finally:
+        core_ib.pool.close_all()
+    kinds = {rec[0] for rec in read_records(path)}
+    assert kinds == {"header", "call", "tick", "error"}
+
+    monkeypatch.delenv("PE_IB_RECORD")
+    monkeypatch.setenv("PE_IB_REPLAY", path)
+    monkeypatch.setenv("PE_IB_REPLAY_SPEED", "max")
+    monkeypatch.setattr(contracts, "contract_cache", contracts.ContractCache())  # fresh process
+    errors = []
+    try:
+        ib = pg._ib_session()
+        assert isinstance(ib, ReplayIB)
+        ib.errorEvent += lambda *a: errors.append(a[1])
+        replayed = _greeks(pg.list_positions(ib))
+    finally:
+        core_ib.pool.close_all()
+    assert replayed == live
+    assert errors and set(errors) <= {200, 354}
+    assert ib.stats() == {"unused_calls": 0, "misses": {}}
+
+
+def test_replay_paces_ticks_and_rejects_unknown_calls(tmp_path):
+    path = str(tmp_path / "q.ibrec")
+    rec = Recorder(FakeIB(FakeConfig(legs=5, symbols=1, latency=0.05)), path)
+    rec.connect()
+    (stk,) = rec.qualifyContracts(Stock("AAPL", "SMART", "USD"))
+    tk = rec.reqMktData(stk, "", False, False)
+    while not rec.waitOnUpdate(timeout=1):
+        pass
+    rec.disconnect()
+
+    for speed, slow in ((1.0, True), (0.0, False)):
+        ib = ReplayIB(path, speed=speed)
+        ib.connect()
+        (again,) = ib.qualifyContracts(Stock("AAPL", "SMART", "USD"))
+        assert again.conId == stk.conId
+        t0 = time.perf_counter()
+        replayed = ib.reqMktData(again, "", False, False)
+        assert replayed.bid != replayed.bid  # NaN until the update is due
+        assert ib.waitOnUpdate(timeout=1)
+        assert (replayed.bid, replayed.ask) == (tk.bid, tk.ask)
+        if slow:  # recorded latency is reproduced (a lower bound, not a timing race)
+            assert time.perf_counter() - t0 >= 0.04
+        with pytest.raises(ReplayError):
+            ib.positions()
@@ -0,0 +1,272 @@
+import pytest
+
+from portfolio_exporter.core import ib as core_ib
+from portfolio_exporter.scripts import option_chain_snapshot, tech_signals_ibkr
+
+
+class FakeIB:
+    instances: list["FakeIB"] = []
+
+    def __init__(self):
+        self.connected = False
+        self.fail_probe = False
+        self.connect_args = None
+        self.RequestTimeout = 0
+        FakeIB.instances.append(self)
+
+    def connect(self, host, port, clientId, timeout):
+        self.connect_args = (host, port, clientId)
+        self.connected = True
+
+    def isConnected(self):
+        return self.connected
+
+    def reqCurrentTime(self):
+        if self.fail_probe:
+            raise TimeoutError("no reply")
+
+    def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture(autouse=True)
+def _reset_instances():
+    FakeIB.instances = []
+
+
+def test_session_is_shared_and_uses_configured_client_id(monkeypatch):
+    monkeypatch.setenv("IB_CLIENT_ID_SESSION", "77")
+    pool = core_ib.SessionPool()
+    a = pool.session(factory=FakeIB)
+    b = pool.session(factory=FakeIB)
+    assert a is b
+    assert a.connect_args[2] == 77
+    assert pool.stats() == {"connects": 1, "reuses": 1, "reconnects": 0, "open": 1}
+
+
+def test_dropped_connection_is_replaced():
+    pool = core_ib.SessionPool()
+    first = pool.session(factory=FakeIB)
+    first.disconnect()
+    second = pool.session(factory=FakeIB)
+    assert second is not first and second.isConnected()
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_idle_session_failing_probe_reconnects():
+    pool = core_ib.SessionPool(probe_after=0.0)
+    first = pool.session(factory=FakeIB)
+    assert pool.session(factory=FakeIB) is first
+    first.fail_probe = True
+    second = pool.session(factory=FakeIB)
+    assert second is not first
+    assert not first.isConnected()
+    assert first.RequestTimeout == 0
+
+
+def test_close_all_disconnects():
+    pool = core_ib.SessionPool()
+    with pool.borrow(factory=FakeIB) as ib:
+        assert ib.isConnected()
+    assert ib.isConnected()
+    pool.close_all()
+    assert not ib.isConnected()
+    assert pool.stats()["open"] == 0
+
+
+class FakeTicker:
+    def __init__(self):
+        self.bid = self.ask = self.last = float("nan")
+        self.modelGreeks = None
+
+
+class StreamingIB:
+    """Delivers one ticker field per network update."""
+
+    def __init__(self, updates):
+        self.updates = list(updates)
+        self.waits = 0
+
+    def waitOnUpdate(self, timeout):
+        self.waits += 1
+        if self.updates:
+            self.updates.pop(0)()
+            return True
+        return False
+
+
+def test_wait_ready_returns_as_soon_as_fields_arrive():
+    a, b = FakeTicker(), FakeTicker()
+    ib = StreamingIB(
+        [
+            lambda: setattr(a, "bid", 1.0),
+            lambda: setattr(a, "ask", 1.1),
+            lambda: setattr(b, "last", 5.0),
+            lambda: pytest.fail("waited past readiness"),
+        ]
+    )
+    assert core_ib.wait_ready(ib, [a, b], ("quote",), timeout=5.0) == [True, True]
+    assert ib.waits == 3
+
+
+def test_wait_ready_reports_stragglers_at_deadline():
+    a, b = FakeTicker(), FakeTicker()
+    a.last = 2.0
+    b.bid, b.ask = 1.0, 1.1
+    ib = StreamingIB([])
+    ready = core_ib.wait_ready(ib, [a, b], ("quote", "greeks"), timeout=0.01)
+    assert ready == [False, False]
+    a.modelGreeks = type("G", (), {"delta": 0.4})()
+    assert core_ib.wait_ready(ib, [a], ("greeks",), timeout=0.0) == [True]
+
+
+class LineLimitedIB:
+    """Fills a quote for every open line on each update; enforces a line cap."""
+
+    def __init__(self, cap, dead=()):
+        self.cap = cap
+        self.dead = set(dead)
+        self.open = {}
+        self.peak = 0
+
+    def reqMktData(self, contract, generic, snapshot, regulatory):
+        assert len(self.open) < self.cap, "error 101: max tickers reached"
+        tk = FakeTicker()
+        tk.contract = contract
+        self.open[contract] = tk
+        self.peak = max(self.peak, len(self.open))
+        return tk
+
+    def cancelMktData(self, contract):
+        del self.open[contract]
+
+    def waitOnUpdate(self, timeout):
+        for c, tk in self.open.items():
+            if c not in self.dead:
+                tk.bid, tk.ask = 1.0, 1.1
+
+
+def test_line_scheduler_pages_through_budget():
+    ib = LineLimitedIB(cap=5, dead={7})
+    sched = core_ib.LineScheduler(ib, budget=5)
+    tickers = sched.subscribe(range(23), ("quote",), timeout=0.05)
+    assert [tk.contract for tk in tickers] == list(range(23))
+    assert all(tk.bid == 1.0 for i, tk in enumerate(tickers) if i != 7)
+    assert ib.open == {} and ib.peak == 5
+    st = sched.stats()
+    assert st["requests"] == 23 and st["ready"] == 22 and st["timeouts"] == 1
+    assert st["peak_lines"] == 5 and st["queue_wait_max"] > 0
+    assert st["throughput"] > 0
+
+
+def test_line_scheduler_holds_line_until_required_fields():
+    class LastFirstIB(LineLimitedIB):
+        """Sends the last trade first, the book and greeks on later updates."""
+
+        def waitOnUpdate(self, timeout):
+            for tk in self.open.values():
+                if tk.last != tk.last:
+                    tk.last = 2.0
+                elif tk.bid != tk.bid:
+                    tk.bid, tk.ask = 1.0, 1.1
+                else:
+                    tk.modelGreeks = type("G", (), {"delta": 0.4})()
+
+    tickers = core_ib.LineScheduler(LastFirstIB(cap=3), budget=3).subscribe(
+        range(4), ("bid_ask",), timeout=5.0
+    )
+    assert all(tk.ask == 1.1 and tk.modelGreeks is None for tk in tickers)
+    tickers = core_ib.LineScheduler(LastFirstIB(cap=3), budget=3).subscribe(
+        range(4), ("quote", "greeks"), timeout=5.0
+    )
+    assert all(tk.ask == 1.1 and tk.modelGreeks.delta == 0.4 for tk in tickers)
+
+
+def test_chain_snapshot_fallback_stays_within_line_budget(monkeypatch):
+    monkeypatch.setattr(core_ib, "_MARKET_DATA_LINES", 5)
+    ib = LineLimitedIB(cap=5)
+    missing = [(f"C{i}", FakeTicker()) for i in range(12)]
+    option_chain_snapshot._snapshot_missing(ib, missing)
+    assert ib.peak == 5 and ib.open == {}
+    assert all(tk.bid == 1.0 and tk.ask == 1.1 for _, tk in missing)
+
+
+def test_health_monitor_opens_and_half_opens_circuit():
+    now = [0.0]
+    mon = core_ib.HealthMonitor(failures=3, cooldown=60, clock=lambda: now[0])
+    for _ in range(3):
+        assert mon.allow("ib")
+        mon.record("ib", False, 1.0)
+    assert not mon.allow("ib") and mon.stats()["ib"]["state"] == "open"
+    now[0] = 61.0
+    assert mon.allow("ib")  # trial call
+    mon.record("ib", False, 1.0)
+    assert not mon.allow("ib")
+    now[0] = 122.0
+    assert mon.allow("ib")
+    mon.record("ib", True, 0.2)
+    st = mon.stats()["ib"]
+    assert st["state"] == "closed" and st["trips"] == 2 and st["skipped"] == 2
+    assert st["success_rate"] == 0.2 and st["latency_max"] == 1.0
+
+
+class BlankIB:
+    """Connected session whose snapshots stay empty (e.g. outside RTH)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.disconnects = 0
+
+    def isConnected(self):
+        return True
+
+    def reqMktData(self, contract, generic, snapshot=False):
+        self.requests += 1
+        return FakeTicker()
+
+    def waitOnUpdate(self, timeout):
+        return False
+
+    def disconnect(self):
+        self.disconnects += 1
+
+
+def test_blank_snapshots_trip_breaker_without_disconnecting(monkeypatch):
+    import pandas as pd
+
+    ib = BlankIB()
+    monkeypatch.setattr(core_ib, "_ib", lambda: ib)
+    monkeypatch.setattr(core_ib, "QUOTE_TIMEOUT", 0.0)
+    monkeypatch.setattr(core_ib, "health", core_ib.HealthMonitor(failures=2, cooldown=60))
+    monkeypatch.setattr(
+        "yfinance.Ticker.history", lambda self, period: pd.DataFrame({"Close": [9.0]})
+    )
+    for _ in range(4):
+        assert core_ib.quote_stock("XYZ")["mid"] == 9.0
+    assert ib.requests == 2 and ib.disconnects == 0
+    st = core_ib.health.stats()
+    assert st["ib"]["state"] == "open" and st["yfinance"]["ok"] == 4
+
+
+class Handlers(list):
+    def __iadd__(self, fn):
+        self.append(fn)
+        return self
+
+    def __isub__(self, fn):
+        self.remove(fn)
+        return self
+
+
+def test_tech_signals_detaches_error_handler_on_failure(monkeypatch):
+    ts = tech_signals_ibkr
+    session = type("Session", (), {"errorEvent": Handlers()})()
+    monkeypatch.setattr(core_ib, "session", lambda **kw: session)
+
+    def boom(ib, *contracts):
+        raise RuntimeError("qualify failed")
+
+    monkeypatch.setattr(ts.contracts_core, "qualify", boom)
+    with pytest.raises(RuntimeError):
+        ts.run(tickers=["AAA"], return_df=True)
+    assert session.errorEvent == []
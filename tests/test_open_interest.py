@@ -0,0 +1,68 @@
+import math
+import types
+
+import pandas as pd
+
+from portfolio_exporter.core import ib as core_ib
+from portfolio_exporter.core import open_interest as oi
+
+
+def _chain(strikes, oi_calls, oi_puts, **extra):
+    calls = pd.DataFrame({"strike": strikes, "openInterest": oi_calls, **extra})
+    puts = pd.DataFrame({"strike": strikes, "openInterest": oi_puts, **extra})
+    return types.SimpleNamespace(calls=calls, puts=puts)
+
+
+def test_prefetch_merge_and_cache(monkeypatch):
+    downloads = []
+
+    def fake_chain(self, expiry):
+        downloads.append((self.ticker, expiry))
+        if self.ticker == "BAD":
+            raise ValueError("no chain")
+        return _chain([100.0, 105.0], [10, 20], [1, 2])
+
+    monkeypatch.setattr("yfinance.Ticker.option_chain", fake_chain)
+    svc = oi.OpenInterestService(store=oi.OpenInterestStore(":memory:"), workers=4)
+    legs = pd.DataFrame(
+        {
+            "symbol": ["AAA", "AAA", "BBB", "AAA", "BAD"],
+            "expiry": ["20990116", "2099-01-16", "20990220", "20990220", "20990116"],
+            "strike": [105, 100.0, 100.0, 110.0, 100.0],
+            "right": ["C", "P", "CALL", "C", "C"],
+        },
+        index=[7, 3, 5, 1, 9],
+    )
+    out = svc.merge(legs)
+    assert out.index.tolist() == [7, 3, 5, 1, 9]
+    assert out.iloc[:3].tolist() == [20.0, 1.0, 10.0]
+    assert math.isnan(out.loc[1]) and math.isnan(out.loc[9])
+    assert sorted(downloads) == [
+        ("AAA", "2099-01-16"),
+        ("AAA", "2099-02-20"),
+        ("BAD", "2099-01-16"),
+        ("BBB", "2099-02-20"),
+    ]
+
+    # stored for today's trade date: only the failed chain is retried
+    assert svc.mapping("AAA", "20990116") == {(100.0, "C"): 10, (105.0, "C"): 20, (100.0, "P"): 1, (105.0, "P"): 2}
+    svc.merge(legs)
+    assert len(downloads) == 5 and downloads[-1][0] == "BAD"
+
+
+def test_ib_fallback_feeds_the_cache(monkeypatch):
+    monkeypatch.setattr(core_ib, "_ib", lambda: types.SimpleNamespace(isConnected=lambda: False))
+    svc = oi.OpenInterestService(store=oi.OpenInterestStore(":memory:"))
+    monkeypatch.setattr(oi, "oi_service", svc)
+    downloads = []
+
+    def fake_chain(self, expiry):
+        downloads.append(expiry)
+        return _chain([100.0], [42], [7], bid=[1.0], ask=[1.2], impliedVolatility=[0.2])
+
+    monkeypatch.setattr("yfinance.Ticker.option_chain", fake_chain)
+    monkeypatch.setattr("yfinance.Ticker.history", lambda self, period: pd.DataFrame({"Close": [100.0]}))
+
+    core_ib.quote_many([("FAKE", "2099-01-16", 100, "C")])
+    assert oi.mapping("FAKE", "20990116") == {(100.0, "C"): 42, (100.0, "P"): 7}
+    assert downloads == ["2099-01-16"]
@@ -50,3 +50,63 @@ def test_greeks_aggregation(monkeypatch):
     assert legs["gamma_exposure"] == pytest.approx(2 * 0.1 + 1 * 0.2)
     assert legs["vega_exposure"] == pytest.approx(2 * 0.2 + 1 * 0.3)
     assert legs["theta_exposure"] == pytest.approx(2 * -0.05 + 1 * -0.02)
+
+
+def test_second_order_exposures(monkeypatch):
+    from portfolio_exporter.core.greeks import bs_greeks_vec
+
+    fake = pd.DataFrame(
+        [
+            {
+                "underlying": "SPY",
+                "secType": "OPT",
+                "qty": -3,
+                "multiplier": 100,
+                "right": "C",
+                "strike": 105.0,
+                "expiry": "20991218",
+                "delta": 0.4,
+                "gamma": 0.02,
+                "vega": 0.3,
+                "theta": -0.01,
+                "iv": 0.25,
+                "underlying_price": 100.0,
+            },
+            {
+                "underlying": "SPY",
+                "secType": "STK",
+                "qty": 100,
+                "multiplier": 1,
+                "right": "",
+                "strike": 0.0,
+                "expiry": "",
+                "delta": 1.0,
+                "gamma": 0.0,
+                "vega": 0.0,
+                "theta": 0.0,
+            },
+        ]
+    )
+    monkeypatch.setattr(
+        "portfolio_exporter.scripts.portfolio_greeks._load_positions", lambda: fake
+    )
+    # a CLI test may leave a module-level ``args`` pointing at a positions CSV
+    monkeypatch.delattr(portfolio_greeks, "args", raising=False)
+
+    result, pos_df, totals, _ = portfolio_greeks.run(
+        write_positions=False,
+        write_totals=False,
+        return_dict=True,
+        combos=False,
+        return_frames=True,
+    )
+    for g in ("vanna", "volga", "charm", "speed"):
+        assert f"{g}_exposure" in totals.columns
+        assert pos_df.loc[1, g] == 0.0
+    t_years = (
+        pd.Timestamp("2099-12-18 23:59:59", tz="UTC") - pd.Timestamp.now(tz="UTC")
+    ).total_seconds() / (365 * 24 * 3600)
+    r = portfolio_greeks.settings.greeks.risk_free
+    ref = bs_greeks_vec(100.0, 105.0, t_years, r, 0.25, True, 1, higher_order=True)
+    assert result["legs"]["vanna_exposure"] == pytest.approx(-300 * ref["vanna"], rel=1e-4)
+    assert result["legs"]["speed_exposure"] == pytest.approx(-300 * ref["speed"], rel=1e-4)
@@ -0,0 +1,40 @@
+import math
+import types
+
+import pandas as pd
+
+from portfolio_exporter.core import ib as core_ib
+
+
+class DummyIB:
+    def isConnected(self) -> bool:
+        return False
+
+
+def test_quote_many_downloads_each_chain_once(monkeypatch):
+    monkeypatch.setattr(core_ib, "_ib", lambda: DummyIB())
+    downloads = []
+
+    def fake_chain(self, expiry):
+        downloads.append((self.ticker, expiry))
+        tbl = pd.DataFrame(
+            {"strike": [100.0, 105.0], "bid": [1.0, 0.5], "ask": [1.2, 0.7],
+             "impliedVolatility": [0.25, 0.2]}
+        )
+        return types.SimpleNamespace(calls=tbl, puts=tbl)
+
+    monkeypatch.setattr("yfinance.Ticker.option_chain", fake_chain)
+    monkeypatch.setattr(
+        "yfinance.Ticker.history", lambda self, period: pd.DataFrame({"Close": [101.0]})
+    )
+    specs = [
+        ("FAKE", "2099-01-16", 100, "C"),
+        ("FAKE", "2099-01-16", 105, "p"),
+        ("FAKE", "2099-01-16", 110, "C"),
+        ("FAKE", "2099-02-20", 100, "P"),
+    ]
+    out = core_ib.quote_many(specs)
+    assert sorted(downloads) == [("FAKE", "2099-01-16"), ("FAKE", "2099-02-20")]
+    assert out[2] is None
+    assert math.isclose(out[0]["mid"], 1.1) and math.isclose(out[1]["mid"], 0.6)
+    assert all(not math.isnan(q["delta"]) for q in (out[0], out[1], out[3]))
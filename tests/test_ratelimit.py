@@ -0,0 +1,91 @@
+import types
+
+import pytest
+
+from portfolio_exporter.core import ratelimit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.slept.append(secs)
+        self.now += secs
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setenv("PE_RATELIMIT", "on")
+    clk = Clock()
+    monkeypatch.setattr(ratelimit.time, "sleep", clk.sleep)
+    return clk
+
+
+def test_bucket_bursts_then_holds_the_rate(clock, tmp_path):
+    lim = ratelimit.RateLimiter(tmp_path / "rl.db", limits={"src": (5, 1.0)}, clock=clock)
+    for _ in range(5):
+        assert lim.acquire("src") == 0.0
+    # 20 more requests at 5/s take 4 seconds, spread evenly
+    for _ in range(20):
+        lim.acquire("src")
+    assert clock.now - 1_000.0 == pytest.approx(4.0)
+    assert clock.slept == pytest.approx([0.2] * 20)
+    assert lim.stats()["src"]["waited"] == 20
+
+    # idle time refills up to capacity only
+    clock.now += 60
+    assert [lim.reserve("src") for _ in range(6)] == pytest.approx([0, 0, 0, 0, 0, 0.2])
+
+
+def test_bucket_is_shared_through_the_database(clock, tmp_path):
+    path = tmp_path / "rl.db"
+    a = ratelimit.RateLimiter(path, limits={"src": (2, 10.0)}, clock=clock)
+    b = ratelimit.RateLimiter(path, limits={"src": (2, 10.0)}, clock=clock)
+    assert a.reserve("src") == 0.0
+    assert b.reserve("src") == 0.0
+    # both "processes" drew from the same bucket: the next caller queues
+    # behind the reservation the one before it made
+    assert a.reserve("src") == pytest.approx(5.0)
+    assert b.reserve("src") == pytest.approx(10.0)
+    a.close()
+    b.close()
+
+
+def test_simulated_clients_overrides_and_switch(clock, tmp_path, monkeypatch):
+    lim = ratelimit.RateLimiter(tmp_path / "rl.db", limits={"src": (1, 1.0)}, clock=clock)
+    fake = types.SimpleNamespace(simulated=True)
+    for _ in range(10):
+        assert lim.acquire("src", client=fake) == 0.0
+    assert lim.stats() == {}
+
+    monkeypatch.setenv("PE_RATE_SRC", "100/10")
+    assert lim.limit("src") == (100.0, 10.0)
+    with pytest.raises(KeyError):
+        lim.limit("nope")
+
+    monkeypatch.setenv("PE_RATELIMIT", "off")
+    assert lim.acquire("src", n=500) == 0.0
+    assert clock.slept == []
+
+
+def test_wait_runs_on_the_client_event_loop(clock, tmp_path):
+    lim = ratelimit.RateLimiter(tmp_path / "rl.db", limits={"src": (1, 2.0)}, clock=clock)
+    slept = []
+    ib = types.SimpleNamespace(sleep=slept.append)
+    lim.acquire("src", client=ib)
+    assert lim.acquire("src", client=ib) == pytest.approx(2.0)
+    # ib.sleep keeps the IB event loop running; time.sleep would block it
+    assert slept == pytest.approx([2.0]) and clock.slept == []
+
+
+@pytest.mark.parametrize("spec", ["0/10", "10/0", "-5/1", "abc", "nan/1"])
+def test_non_positive_overrides_fall_back_to_default(clock, tmp_path, monkeypatch, spec):
+    lim = ratelimit.RateLimiter(tmp_path / "rl.db", limits={"src": (5, 1.0)}, clock=clock)
+    monkeypatch.setenv("PE_RATE_SRC", spec)
+    assert lim.limit("src") == (5, 1.0)
+    assert lim.acquire("src") == 0.0
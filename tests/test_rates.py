@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import rates
+from portfolio_exporter.scripts import live_feed
+
+
+class FakeReader:
+    """FRED stand-in serving business-day observations up to ``last``."""
+
+    def __init__(self, last):
+        self.last = last
+        self.calls = []
+
+    def __call__(self, series, start, end):
+        self.calls.append((series, start, end))
+        idx = pd.bdate_range(max(start, self.last - timedelta(days=30)), min(end, self.last))
+        base = {"DGS3MO": 5.0, "DGS10": 4.0}.get(series, 3.0)
+        return pd.Series([base + i / 100 for i in range(len(idx))], index=idx, name=series)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("PE_FRED", "on")
+    reader = FakeReader(date.today() - timedelta(days=10))
+    svc = rates.YieldService(store=rates.YieldStore(":memory:"), reader=reader, ttl=3600)
+    return svc, reader
+
+
+def test_incremental_refresh(service):
+    svc, reader = service
+    first = svc.latest(["DGS10", "DGS3MO"])
+    assert sorted(s for s, *_ in reader.calls) == ["DGS10", "DGS3MO"]
+    assert all(start == rates.HISTORY_START for _, start, _ in reader.calls)
+    stored = len(svc.store.read("DGS10"))
+
+    # inside the ttl nothing is requested
+    svc.latest(["DGS10", "DGS3MO"])
+    assert len(reader.calls) == 2
+
+    # after it, only observations past the last stored date are requested
+    svc.ttl = 0
+    reader.last = date.today()
+    svc.refresh(["DGS10"])
+    series, start, _ = reader.calls[-1]
+    assert series == "DGS10" and start == first["DGS10"][0].date() + timedelta(days=1)
+    hist = svc.history("DGS10")
+    assert len(hist) > stored and hist.index.is_monotonic_increasing
+    obs = hist.dropna()
+    assert svc.latest(["DGS10"])["DGS10"] == (obs.index[-1], obs.iloc[-1])
+    assert svc.stats()["tail"] >= 1
+
+
+def test_risk_free_rate_and_live_feed(service, monkeypatch):
+    svc, reader = service
+    monkeypatch.setattr(rates, "yield_service", svc)
+    assert rates.risk_free_rate() == pytest.approx(svc.latest(["DGS3MO"])["DGS3MO"][1] / 100)
+
+    df = live_feed.fetch_fred_yields(["US10Y", "AAPL", "US2Y"])
+    assert df["ticker"].tolist() == ["US10Y", "US2Y"]
+    assert set(df["source"]) == {"FRED"}
+
+    monkeypatch.setenv("PE_FRED", "off")
+    empty = rates.YieldService(store=rates.YieldStore(":memory:"), reader=reader)
+    monkeypatch.setattr(rates, "yield_service", empty)
+    assert rates.risk_free_rate(default=0.02) == 0.02
+
+
+def test_failed_fetch_backs_off(service, monkeypatch):
+    svc, reader = service
+    calls = []
+
+    def down(series, start, end):
+        calls.append(series)
+        raise ConnectionError("FRED down")
+
+    svc.reader = down
+    assert svc.refresh(["DGS10"]) == {} and svc.refresh(["DGS10"]) == {}
+    assert calls == ["DGS10"] and svc.stats()["backoff"] == 1
+    assert svc.store.failure("DGS10")[1] == 1
+
+    # once the delay has passed the series is retried; a second failure
+    # doubles the delay, a success clears it
+    clock = [rates.time.time() + svc.backoff]
+    monkeypatch.setattr(rates.time, "time", lambda: clock[0])
+    svc.refresh(["DGS10"])
+    assert calls == ["DGS10"] * 2 and svc.store.failure("DGS10")[1] == 2
+    clock[0] += svc.backoff
+    svc.refresh(["DGS10"])
+    assert len(calls) == 2
+    clock[0] += svc.backoff
+    svc.reader = reader
+    assert svc.refresh(["DGS10"])["DGS10"] > 0
+    assert svc.store.failure("DGS10") is None
+
+
+def test_store_last_skips_blank_observations():
+    store = rates.YieldStore(":memory:")
+    idx = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"])
+    store.write("DGS3MO", pd.Series([5.1, 5.2, float("nan")], index=idx))
+    assert store.last("DGS3MO") == (pd.Timestamp("2024-01-03"), 5.2)
+    assert store.last("DGS10") is None
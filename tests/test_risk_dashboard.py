@@ -3,12 +3,18 @@ from portfolio_exporter.core import risk_dash
 
 def test_dashboard_calls_watch(monkeypatch):
     calls = []
+    loads = []
+    refreshes = []
 
-    def fake_watch(return_dict=False):
+    def fake_watch(return_dict=False, pos_df=None):
         calls.append(return_dict)
         return {"net_liq": 1.0}
 
     monkeypatch.setattr("portfolio_exporter.scripts.risk_watch.run", fake_watch)
+    monkeypatch.setattr("portfolio_exporter.scripts.risk_watch.load_positions", lambda: loads.append(1) or "book")
+    monkeypatch.setattr(
+        "portfolio_exporter.scripts.risk_watch.refresh_marks", lambda df: refreshes.append(df) or df
+    )
 
     class DummyLive:
         def __init__(self, *a, **k):
@@ -26,5 +32,7 @@ def test_dashboard_calls_watch(monkeypatch):
     monkeypatch.setattr(risk_dash, "Live", DummyLive)
     monkeypatch.setattr(risk_dash.time, "sleep", lambda *_: None)
 
-    risk_dash.run(refresh=0, iterations=1)
+    risk_dash.run(refresh=0, iterations=3)
     assert calls and calls[0] is True
+    # positions are fetched once; later refreshes only re-quote them
+    assert len(loads) == 1 and refreshes == ["book", "book"]
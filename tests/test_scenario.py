@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import scenario
+from portfolio_exporter.core.greeks import bs_price_vec
+
+NOW = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def _book() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {"underlying": "SPY", "secType": "OPT", "qty": -2, "multiplier": 100, "right": "P",
+             "strike": 95.0, "expiry": "20260320", "iv": 0.25, "underlying_price": 100.0},
+            {"underlying": "SPY", "secType": "OPT", "qty": 1, "multiplier": 100, "right": "C",
+             "strike": 105.0, "expiry": "2026-03-20", "iv": 0.2, "underlying_price": 100.0},
+            {"underlying": "AAPL", "secType": "STK", "qty": 50, "multiplier": 1, "price": 200.0},
+        ]
+    )
+
+
+def test_revalue_matches_full_reprice():
+    grid = scenario.revalue(_book(), [-0.05, 0.0, 0.05], [0.0, 0.02], [0, 7], now=NOW)
+    assert grid.underlyings == ["AAPL", "SPY"]
+    assert grid.pnl.shape == (2, 3, 2, 2)
+
+    end = pd.Timestamp("2026-03-20 23:59:59", tz="UTC")
+    t0 = (end - pd.Timestamp(NOW)).total_seconds() / (365 * 24 * 3600)
+    t1 = t0 - 7 / 365
+    base = -2 * bs_price_vec(100, 95, t0, 0, 0.25, False) + bs_price_vec(100, 105, t0, 0, 0.2, True)
+    shocked = -2 * bs_price_vec(95, 95, t1, 0, 0.27, False) + bs_price_vec(95, 105, t1, 0, 0.22, True)
+    spy = grid.underlying("SPY")
+    assert spy[0, 1, 1] == pytest.approx(100 * (shocked - base), rel=1e-9)
+    assert spy[1, 0, 0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_stock_legs_are_linear():
+    grid = scenario.revalue(_book(), [-0.1, 0.0, 0.1], [0.0], [0], now=NOW)
+    aapl = grid.underlying("AAPL")
+    np.testing.assert_allclose(aapl[:, 0, 0], [-1000.0, 0.0, 1000.0])
+    assert (grid.underlying("AAPL", "delta") == 50).all()
+    frame = grid.to_frame()
+    assert set(frame["underlying"]) == {"AAPL", "SPY", "PORTFOLIO"}
+
+
+def test_expired_legs_settle_at_intrinsic():
+    df = pd.DataFrame(
+        [{"underlying": "X", "secType": "OPT", "qty": 1, "multiplier": 100, "right": "C",
+          "strike": 100.0, "expiry": "20260105", "iv": 0.3, "underlying_price": 100.0}]
+    )
+    grid = scenario.revalue(df, [0.1], [0.0], [0, 7], now=NOW)
+    base = 100 * bs_price_vec(100, 100, (3 * 86400 + 86399) / (365 * 86400), 0, 0.3, True)
+    assert grid.pnl[0, 0, 0, 1] == pytest.approx(1000.0 - base)
+    assert grid.delta[0, 0, 0, 1] == 100.0
+    assert grid.gamma[0, 0, 0, 1] == 0.0
+
+
+def test_unpriceable_legs_are_skipped():
+    df = _book()
+    df.loc[1, "iv"] = np.nan  # no iv and no price to imply from
+    grid = scenario.revalue(df, now=NOW)
+    assert grid.skipped == ["SPY"]
+    assert grid.legs == 2
+
+
+def test_grid_is_fast_for_large_books():
+    n = 2000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "underlying": rng.choice(["SPY", "QQQ", "IWM", "AAPL"], n),
+            "secType": "OPT",
+            "qty": rng.integers(-5, 6, n),
+            "multiplier": 100,
+            "right": rng.choice(["C", "P"], n),
+            "strike": rng.uniform(80, 120, n),
+            "expiry": "20260918",
+            "iv": rng.uniform(0.15, 0.5, n),
+            "underlying_price": 100.0,
+        }
+    )
+    grid = scenario.revalue(df, now=NOW)
+    assert grid.pnl.shape == (4, 21, 11, 5)
+
+
+def test_risk_watch_returns_metrics():
+    from portfolio_exporter.scripts import risk_watch
+
+    book = _book()
+    book.loc[book.secType == "OPT", "expiry"] = "20991218"
+    metrics = risk_watch.run(return_dict=True, pos_df=book)
+    assert metrics["legs"] == 3
+    assert metrics["worst_pnl"] <= 0.0
+    assert {"delta", "gamma", "vega", "theta", "pnl_up", "pnl_down"} <= set(metrics)
+
+
+def test_refresh_marks_requotes_without_positions(monkeypatch):
+    from portfolio_exporter.core import aggregate
+    from portfolio_exporter.core import ib as ib_core
+    from portfolio_exporter.scripts import risk_watch
+
+    book = _book()
+    book.loc[book.secType == "OPT", "expiry"] = "20991218"
+    book["conId"] = [1, 2, 3]
+    for g in ("delta", "gamma", "vega", "theta"):
+        book[g] = [0.5, 0.5, 1.0] if g == "delta" else 0.0
+    specs_seen = []
+
+    def fake_many(specs):
+        specs_seen.extend(specs)
+        return [{"mid": 4.0, "iv": 0.3}, None]
+
+    monkeypatch.setattr(ib_core, "quote_many", fake_many)
+    monkeypatch.setattr(ib_core, "quote_stock", lambda sym: {"mid": {"SPY": 110.0, "AAPL": 210.0}[sym]})
+    monkeypatch.setattr(risk_watch, "_positions", lambda: pytest.fail("positions refetched"))
+    monkeypatch.setattr(aggregate, "book", aggregate.GreeksBook())
+
+    out = risk_watch.refresh_marks(book)
+    assert specs_seen == [("SPY", "2099-12-18", 95.0, "P"), ("SPY", "2099-12-18", 105.0, "C")]
+    assert out.loc[0, "price"] == 4.0 and out.loc[0, "iv"] == 0.3
+    assert out.loc[0, "delta"] < 0 and out.loc[0, "greeks_source"] == "BS"
+    # unquoted leg keeps its previous greeks but sees the new spot
+    assert out.loc[1, "delta"] == 0.5 and out.loc[1, "underlying_price"] == 110.0
+    assert out.loc[2, "price"] == 210.0
+    assert aggregate.book.totals()["market_value"] == pytest.approx(-2 * 100 * 4.0 + 50 * 210.0)
+    assert book.loc[0, "iv"] == 0.25  # input frame untouched
@@ -28,8 +28,8 @@ def test_include_open(monkeypatch):
             }
         ]
     )
-    monkeypatch.setattr(trades_report, "_load_trades", lambda: execs)
-    monkeypatch.setattr(trades_report, "_load_open_orders", lambda: opens)
+    monkeypatch.setattr(trades_report, "_load_trades", lambda accounts=None: execs)
+    monkeypatch.setattr(trades_report, "_load_open_orders", lambda accounts=None: opens)
     out = trades_report.run(
         fmt="csv", show_actions=True, include_open=True, return_df=True
     )
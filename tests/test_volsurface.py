@@ -0,0 +1,57 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_exporter.core import volsurface
+
+ASOF = date(2026, 1, 5)
+
+
+def _svi_chain() -> pd.DataFrame:
+    rows = []
+    for expiry, days in (("20260220", 47), ("20260417", 103)):
+        t = days / 365.0  # matches from_chain: calendar days incl. expiry day
+        for strike in np.arange(60.0, 141.0, 5.0):
+            k = np.log(strike / 100.0)
+            w = (0.03 + 0.08 * (-0.5 * (k - 0.02) + np.sqrt((k - 0.02) ** 2 + 0.04**2))) * t / 0.2
+            for right in ("C", "P"):
+                rows.append(
+                    {"symbol": "XYZ", "spot": 100.0, "expiry": expiry, "strike": strike,
+                     "right": right, "iv": float(np.sqrt(w / t))}
+                )
+    return pd.DataFrame(rows)
+
+
+def test_fits_smile_and_answers_vectorised_lookups():
+    chain = _svi_chain()
+    surface = volsurface.VolSurface.from_chain(chain, ASOF)
+    assert [s.expiry for s in surface.smiles["XYZ"]] == ["20260220", "20260417"]
+
+    quoted = chain[(chain.expiry == "20260220") & (chain.right == "P")].set_index("strike")["iv"]
+    iv = surface.iv("XYZ", "2026-02-20", [60.0, 80.0, 100.0])
+    np.testing.assert_allclose(iv, quoted.loc[[60.0, 80.0, 100.0]].to_numpy(), atol=1e-4)
+    # the put wing is priced well above the flat at-the-money vol
+    assert iv[0] > iv[2] * 1.3
+
+    mixed = surface.iv(["XYZ", "XYZ", "XYZ", "ABC"], ["20260320", "20260220", "20260220", "20260220"],
+                       [100.0, 10.0, 100.0, 100.0])
+    lo, hi = sorted(surface.iv("XYZ", ["20260220", "20260417"], 100.0))
+    assert lo <= mixed[0] <= hi  # interpolated between expiries
+    assert mixed[1] == pytest.approx(surface.iv("XYZ", "20260220", 60.0)[0])  # flat beyond strikes
+    assert np.isnan(mixed[3])
+
+
+def test_load_surface_caches_fit_per_day(tmp_path):
+    _svi_chain().to_csv(tmp_path / "option_chain_XYZ_auto_20260105_0930.csv", index=False)
+    cache = tmp_path / "volsurface"
+
+    first = volsurface.load_surface(["XYZ", "NOPE"], asof=ASOF, chain_dir=tmp_path, cache=cache)
+    assert list(first.smiles) == ["XYZ"]
+    assert (cache / "XYZ_20260105.json").exists()
+
+    # cached fit is used even once the snapshot is gone
+    (tmp_path / "option_chain_XYZ_auto_20260105_0930.csv").unlink()
+    again = volsurface.load_surface(["XYZ"], asof=ASOF, chain_dir=tmp_path, cache=cache)
+    assert again.iv("XYZ", "20260220", 90.0)[0] == pytest.approx(first.iv("XYZ", "20260220", 90.0)[0])
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from portfolio_exporter.core import yahoo
+from portfolio_exporter.scripts import live_feed
+
+
+class FakeYF:
+    """Stand-in for the yfinance module recording every network call."""
+
+    def __init__(self, closes):
+        self.closes = closes
+        self.downloads = []
+        self.tickers = []
+
+    def download(self, tickers=None, **kw):
+        syms = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.downloads.append(syms)
+        idx = pd.to_datetime(["2024-01-02", "2024-01-03"])
+        frames = {
+            s: pd.DataFrame(
+                {"Open": [1.0, 2.0], "High": [3.0, 4.0], "Low": [0.5, 1.5], "Close": c, "Volume": [10, 20]},
+                index=idx,
+            )
+            for s in syms
+            if (c := self.closes.get(s)) is not None
+        }
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def Ticker(self, sym):
+        self.tickers.append(sym)
+
+        class T:
+            fast_info = {"last_price": 42.0} if sym == "LATE" else {}
+            info = {"bid": 1.0, "ask": 1.2}
+
+            def history(self, **kw):
+                return pd.DataFrame()
+
+        return T()
+
+
+def test_batch_then_pool_then_cache(monkeypatch):
+    fake = FakeYF({"AAA": [9.0, 10.0], "BBB": [19.0, np.nan]})
+    monkeypatch.setattr(yahoo, "yf", fake)
+    svc = yahoo.YahooQuotes(store=yahoo.QuoteStore(":memory:"), ttl=60, workers=4)
+
+    df = svc.quotes(["AAA", "BBB", "LATE", "AAA"], fields=["last", "prev_close", "volume"])
+    assert list(df.index) == ["AAA", "BBB", "LATE"]
+    assert fake.downloads[0] == ["AAA", "BBB", "LATE"]
+    assert df.loc["AAA"].tolist() == [10.0, 9.0, 20.0]
+    # BBB's last bar is blank: the previous one is used and prev_close is unknown
+    assert df.loc["BBB", "last"] == 19.0 and math.isnan(df.loc["BBB", "prev_close"])
+    assert df.loc["LATE", "last"] == 42.0
+    assert sorted(fake.tickers) == ["BBB", "LATE"]
+
+    calls = (len(fake.downloads), len(fake.tickers))
+    again = svc.quotes(["AAA", "BBB", "LATE"], fields=["last", "prev_close", "volume"])
+    assert (len(fake.downloads), len(fake.tickers)) == calls
+    pd.testing.assert_frame_equal(again, df)
+    assert svc.stats()["cached"] == 3
+
+    svc.ttl = 0
+    svc.quotes(["AAA"], fields=["last"])
+    assert fake.downloads[-1] == ["AAA"]
+
+
+def test_live_feed_uses_bulk_quotes(monkeypatch):
+    fake = FakeYF({"AAA": [1.0, 2.0], "BBB": [3.0, 4.0], "^TNX": [40.0, 45.0], "GC=F": [1900.0, 2000.0]})
+    monkeypatch.setattr(yahoo, "yf", fake)
+    monkeypatch.setattr(yahoo, "yahoo_quotes", yahoo.YahooQuotes(store=yahoo.QuoteStore(":memory:")))
+    monkeypatch.setitem(live_feed.PROXY_MAP, "GOLD", "GC=F")
+
+    df = live_feed.fetch_yf_quotes(["AAA", "^TNX", "GOLD", "US10Y"])
+    assert df["ticker"].tolist() == ["AAA", "^TNX", "GOLD"]
+    assert df["last"].tolist() == [2.0, 4.5, 2000.0]
+    assert df.loc[0, "bid"] == 1.0 and df.loc[0, "ask"] == 1.2
+    assert set(df["source"]) == {"YF"}
+    assert len(fake.downloads) == 1
+
+    # opting out keeps the fetch to the batch download
+    fake.tickers.clear()
+    df = live_feed.fetch_yf_quotes(["BBB"], bid_ask=False)
+    assert fake.tickers == [] and df["bid"].isna().all()
@@ -18,6 +18,7 @@ import pandas as pd
 import yfinance as yf
 from ib_insync import IB, Option, Stock, Ticker, Index, Future, util
 
+from portfolio_exporter.core import history
 from utils.bs import bs_greeks, norm_cdf, _bs_delta
 from utils.ib import _parse_ib_month, _first_valid_expiry, front_future
 
@@ -25,52 +26,18 @@ log = logging.getLogger(__name__)
 
 def get_historical_prices(tickers, days_back=60) -> pd.DataFrame:
     """
-    Batch-fetch OHLCV data for tickers over last `days_back` days with daily interval.
+    Fetch daily OHLCV data for tickers over last `days_back` days via the
+    shared history service (local bar cache, tail-only refresh).
     Raises ValueError if ticker list is empty.
     Returns DataFrame with columns:
     ["date","ticker","open","high","low","close","adj_close","volume"]
     """
     if not tickers:
         raise ValueError("No data fetched for any ticker.")
-    data = yf.download(
-        tickers=tickers,
-        period=f"{days_back}d",
-        interval="1d",
-        group_by="ticker",
-        auto_adjust=False,
-        progress=False,
-    )
-    columns = ["date", "ticker", "open", "high", "low", "close", "adj_close", "volume"]
-    if data.empty:
-        return pd.DataFrame(columns=columns)
-    dfs = []
-    if isinstance(data.columns, pd.MultiIndex):
-        for ticker in tickers:
-            if ticker in data:
-                df_t = data[ticker].reset_index()
-                df_t["Ticker"] = ticker
-                dfs.append(df_t)
-    else:
-        df_t = data.reset_index()
-        df_t["Ticker"] = tickers[0]
-        dfs.append(df_t)
-    result = pd.concat(dfs, ignore_index=True)
-    # Rename columns and enforce types
-    result = result.rename(
-        columns={
-            "Date": "date",
-            "Ticker": "ticker",
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Adj Close": "adj_close",
-            "Volume": "volume",
-        }
-    )
-    result["date"] = result["date"].dt.strftime("%Y-%m-%d")
+    result = history.long_frame(history.daily_bars(tickers, days=days_back))
+    result["date"] = pd.to_datetime(result["date"]).dt.strftime("%Y-%m-%d")
     result["volume"] = result["volume"].fillna(0).astype(int)
-    return result[columns]
+    return result
 
 def get_greeks(ib: IB) -> pd.DataFrame:
     """